@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+class AnalysisCache:
+    """Disk-backed cache of commit descriptions keyed by a hash of the prompt inputs."""
+    
+    def __init__(self, path="analysis_cache.db", max_entries=1000, ttl_seconds=30 * 24 * 3600):
+        """
+        Initialize the analysis cache.
+        
+        Args:
+            path (str, optional): Path to the SQLite database file. Defaults to "analysis_cache.db".
+            max_entries (int, optional): Maximum number of cached descriptions. Defaults to 1000.
+            ttl_seconds (int, optional): Time after which an entry expires. Defaults to 30 days.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.connection = None
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(prompt_inputs, model_name, max_tokens):
+        """
+        Build the cache key for a set of prompt inputs.
+        
+        Args:
+            prompt_inputs (dict): Fully rendered values substituted into the prompt.
+            model_name (str): Name of the model used for the analysis.
+            max_tokens (int): Maximum tokens for the response.
+        
+        Returns:
+            str: Hex digest identifying the request.
+        """
+        payload = json.dumps(
+            {'inputs': prompt_inputs, 'model_name': model_name, 'max_tokens': max_tokens},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def connect(self):
+        """
+        Open the database and create the schema if needed.
+        
+        Returns:
+            sqlite3.Connection: Open database connection.
+        """
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS analyses (
+                    key TEXT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS analyses_accessed_at ON analyses (accessed_at)"
+            )
+            self.connection.commit()
+        return self.connection
+    
+    def close(self):
+        """Close the database connection if it is open."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+    
+    def get(self, key):
+        """
+        Look up a cached description.
+        
+        Args:
+            key (str): Cache key from make_key().
+        
+        Returns:
+            str: Cached description, or None on a miss.
+        """
+        now = time.time()
+        try:
+            with self.lock:
+                connection = self.connect()
+                row = connection.execute(
+                    "SELECT description, created_at FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+                
+                if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    connection.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                    connection.commit()
+                    row = None
+                
+                if row:
+                    connection.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (now, key))
+                    connection.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to read analysis cache: {str(e)}")
+            row = None
+        
+        if row:
+            self.hits += 1
+            return row[0]
+        
+        self.misses += 1
+        return None
+    
+    def set(self, key, description):
+        """
+        Store a description and evict expired or least recently used entries.
+        
+        Args:
+            key (str): Cache key from make_key().
+            description (str): Description to cache.
+        """
+        now = time.time()
+        try:
+            with self.lock:
+                connection = self.connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO analyses (key, description, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, description, now, now)
+                )
+                
+                if self.ttl_seconds:
+                    connection.execute(
+                        "DELETE FROM analyses WHERE created_at < ?", (now - self.ttl_seconds,)
+                    )
+                
+                if self.max_entries:
+                    connection.execute(
+                        "DELETE FROM analyses WHERE key IN ("
+                        "SELECT key FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+                connection.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to write analysis cache: {str(e)}")
+    
+    def get_stats(self):
+        """
+        Get cache hit and miss counters.
+        
+        Returns:
+            dict: Dictionary with 'hits', 'misses' and 'hit_rate'.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
\ No newline at end of file
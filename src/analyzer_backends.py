@@ -0,0 +1,914 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from metrics import record_run, bind_context
+
+OPENAI_API_BASE = 'https://api.openai.com/v1'
+
+# Responses worth retrying: timeouts, rate limits and transient server errors
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+class StreamAbandoned(Exception):
+    """Raised into a backend streaming a response that is no longer waited for."""
+
+class TokenGate:
+    """on_token callback that stops forwarding text once its response is abandoned."""
+    
+    def __init__(self, on_token=None):
+        """
+        Initialize the gate.
+        
+        Args:
+            on_token (callable, optional): Callback receiving the text while the gate is open.
+                Defaults to None.
+        """
+        self.on_token = on_token
+        self.closed = False
+        self.lock = threading.Lock()
+    
+    def __call__(self, delta):
+        """
+        Forward a piece of text.
+        
+        Raises:
+            StreamAbandoned: If the gate was closed, which stops a streaming backend.
+        """
+        with self.lock:
+            if self.closed:
+                raise StreamAbandoned()
+            if self.on_token:
+                self.on_token(delta)
+    
+    def close(self):
+        """Drop all further text; returns once no text is being forwarded."""
+        with self.lock:
+            self.closed = True
+
+class AnalyzerBackend:
+    """Language model backend used by CommitAnalyzer to complete prompts."""
+    
+    name = None
+    
+    # Whether the backend needs OPENAI_API_KEY
+    requires_api_key = True
+    
+    def __init__(self, model_name="gpt-3.5-turbo", temperature=0.7):
+        """
+        Initialize the backend.
+        
+        Args:
+            model_name (str, optional): Name of the model to use. Defaults to "gpt-3.5-turbo".
+            temperature (float, optional): Sampling temperature. Defaults to 0.7.
+        """
+        self.model_name = model_name
+        self.temperature = temperature
+        self.lock = threading.Lock()
+        self.usage = {'requests': 0, 'failures': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+    
+    def complete(self, template, values, max_tokens, on_token=None):
+        """
+        Fill a prompt template and return the model's answer.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated.
+                Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        raise NotImplementedError
+    
+    async def acomplete(self, template, values, max_tokens, on_token=None):
+        """
+        Asynchronously fill a prompt template and return the model's answer.
+        
+        Backends without native asyncio support run complete() in the default executor.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated.
+                Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, bind_context(self.complete), template, values, max_tokens, on_token)
+    
+    def set_async_session(self, session):
+        """
+        Use an aiohttp session for asynchronous requests.
+        
+        Args:
+            session (aiohttp.ClientSession): Session of the asyncio engine.
+        """
+    
+    def record_usage(self, prompt_tokens=0, completion_tokens=0, failed=False):
+        """
+        Count a request and the tokens it used, also towards the processing run in progress.
+        
+        Args:
+            prompt_tokens (int, optional): Tokens of the prompt. Defaults to 0.
+            completion_tokens (int, optional): Tokens of the response. Defaults to 0.
+            failed (bool, optional): Whether the request failed. Defaults to False.
+        """
+        with self.lock:
+            self.usage['requests'] += 1
+            self.usage['failures'] += int(failed)
+            self.usage['prompt_tokens'] += prompt_tokens or 0
+            self.usage['completion_tokens'] += completion_tokens or 0
+        
+        record_run('llm_requests')
+        record_run('llm_failures', int(failed))
+        record_run('prompt_tokens', prompt_tokens or 0)
+        record_run('completion_tokens', completion_tokens or 0)
+    
+    def get_usage(self):
+        """
+        Get the requests and tokens used so far.
+        
+        Returns:
+            dict: 'requests', 'failures', 'prompt_tokens', 'completion_tokens' and 'total_tokens'.
+        """
+        with self.lock:
+            usage = dict(self.usage)
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        return usage
+
+class LangChainBackend(AnalyzerBackend):
+    """Backend running the prompts as LangChain chains on ChatOpenAI."""
+    
+    name = 'langchain'
+    
+    def __init__(self, model_name="gpt-3.5-turbo", temperature=0.7, request_timeout=None):
+        """
+        Initialize the LangChain backend.
+        
+        LangChain is imported when the first prompt is completed.
+        
+        Args:
+            model_name (str, optional): Name of the OpenAI model to use. Defaults to "gpt-3.5-turbo".
+            temperature (float, optional): Sampling temperature. Defaults to 0.7.
+            request_timeout (float or tuple, optional): Timeout of OpenAI requests in seconds,
+                or a (connect, read) tuple. Defaults to None (client default).
+        """
+        super().__init__(model_name, temperature)
+        self.request_timeout = request_timeout
+        
+        # Chains by template and response limit, built on first use
+        self.chains = {}
+    
+    def get_chain(self, template, max_tokens):
+        """
+        Get the chain for a template and response limit, building it on first use.
+        
+        Args:
+            template (str): Prompt template.
+            max_tokens (int): Maximum tokens of the response.
+        
+        Returns:
+            LLMChain: Chain completing the template.
+        """
+        key = (template, max_tokens)
+        if key not in self.chains:
+            from langchain.chat_models import ChatOpenAI
+            from langchain.prompts import ChatPromptTemplate
+            from langchain.chains import LLMChain
+            
+            llm = ChatOpenAI(
+                model_name=self.model_name,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                request_timeout=self.request_timeout
+            )
+            self.chains[key] = LLMChain(llm=llm, prompt=ChatPromptTemplate.from_template(template))
+        return self.chains[key]
+    
+    def complete(self, template, values, max_tokens, on_token=None):
+        """
+        Fill a prompt template and return the model's answer.
+        
+        The response is not streamed; on_token receives it in one piece.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with the response text. Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        from langchain.callbacks import get_openai_callback
+        
+        chain = self.get_chain(template, max_tokens)
+        try:
+            with get_openai_callback() as callback:
+                result = chain.run(values)
+        except Exception:
+            self.record_usage(failed=True)
+            raise
+        
+        self.record_usage(callback.prompt_tokens, callback.completion_tokens)
+        if on_token:
+            on_token(result)
+        return result
+    
+    async def acomplete(self, template, values, max_tokens, on_token=None):
+        """
+        Asynchronously fill a prompt template and return the model's answer.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with the response text. Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        from langchain.callbacks import get_openai_callback
+        
+        chain = self.get_chain(template, max_tokens)
+        try:
+            with get_openai_callback() as callback:
+                result = await chain.arun(values)
+        except Exception:
+            self.record_usage(failed=True)
+            raise
+        
+        self.record_usage(callback.prompt_tokens, callback.completion_tokens)
+        if on_token:
+            on_token(result)
+        return result
+    
+    def set_async_session(self, session):
+        """
+        Route the OpenAI client's asynchronous requests through an aiohttp session.
+        
+        Args:
+            session (aiohttp.ClientSession): Session of the asyncio engine.
+        """
+        import openai
+        
+        if hasattr(openai, 'aiosession'):
+            openai.aiosession.set(session)
+
+class OpenAIChatBackend(AnalyzerBackend):
+    """Backend calling the chat completions endpoint directly over HTTP."""
+    
+    name = 'openai'
+    
+    def __init__(self, model_name="gpt-3.5-turbo", temperature=0.7, request_timeout=None, max_retries=3,
+                 backoff_seconds=1.0, max_backoff_seconds=30.0, stream=False, api_key=None, api_base=None,
+                 session=None):
+        """
+        Initialize the chat completions backend.
+        
+        Args:
+            model_name (str, optional): Name of the model to use. Defaults to "gpt-3.5-turbo".
+            temperature (float, optional): Sampling temperature. Defaults to 0.7.
+            request_timeout (float or tuple, optional): Timeout of requests in seconds, or a
+                (connect, read) tuple. When streaming, the read timeout applies between chunks.
+                Defaults to None (session default).
+            max_retries (int, optional): Retries after connection errors, timeouts, rate limits
+                and server errors. Defaults to 3.
+            backoff_seconds (float, optional): Delay before the first retry, doubled on each
+                further retry. Defaults to 1.0.
+            max_backoff_seconds (float, optional): Longest delay between retries. Defaults to 30.0.
+            stream (bool, optional): Stream responses even when no on_token callback is given.
+                Defaults to False.
+            api_key (str, optional): API key, or an empty string for servers without
+                authentication. Defaults to the OPENAI_API_KEY environment variable.
+            api_base (str, optional): Base URL of the API. Defaults to the OPENAI_API_BASE
+                environment variable or 'https://api.openai.com/v1'.
+            session (requests.Session, optional): Session used for all requests. Defaults to a new session.
+        """
+        super().__init__(model_name, temperature)
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.stream = stream
+        self.api_key = api_key if api_key is not None else os.getenv('OPENAI_API_KEY')
+        self.api_base = (api_base or os.getenv('OPENAI_API_BASE') or OPENAI_API_BASE).rstrip('/')
+        self.requires_api_key = api_key is None
+        self.session = session or requests.Session()
+        self.aiosession = None
+    
+    def build_payload(self, template, values, max_tokens, stream):
+        """
+        Build the body of a chat completions request.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            stream (bool): Whether to stream the response.
+        
+        Returns:
+            dict: Request body.
+        """
+        payload = {
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': template.format(**values)}],
+            'temperature': self.temperature,
+            'max_tokens': max_tokens,
+            'stream': stream
+        }
+        if stream:
+            # Ask for a final chunk carrying the token usage
+            payload['stream_options'] = {'include_usage': True}
+        return payload
+    
+    def get_headers(self):
+        """Get the request headers."""
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        return headers
+    
+    def get_retry_delay(self, attempt, retry_after=None):
+        """
+        Get the delay before a retry.
+        
+        Args:
+            attempt (int): Number of the failed attempt, starting at 0.
+            retry_after (str, optional): Retry-After header of the response. Defaults to None.
+        
+        Returns:
+            float: Seconds to wait.
+        """
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.max_backoff_seconds)
+        except ValueError:
+            pass
+        
+        delay = min(self.backoff_seconds * 2 ** attempt, self.max_backoff_seconds)
+        return random.uniform(delay / 2, delay)
+    
+    @staticmethod
+    def parse_stream_line(line):
+        """
+        Parse one line of a server-sent event stream.
+        
+        Args:
+            line (str): Line of the response body.
+        
+        Returns:
+            tuple: (text delta, usage dict or None, whether the stream is done).
+        """
+        line = line.strip()
+        if not line.startswith('data:'):
+            return "", None, False
+        
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return "", None, True
+        
+        chunk = json.loads(data)
+        choices = chunk.get('choices') or []
+        delta = ((choices[0].get('delta') or {}).get('content') or "") if choices else ""
+        return delta, chunk.get('usage'), False
+    
+    def finish(self, parts, usage):
+        """Record the usage of a completed request and join the response text."""
+        usage = usage or {}
+        self.record_usage(usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+        return "".join(parts)
+    
+    def read_response(self, data, on_token=None):
+        """
+        Read a non-streamed chat completion.
+        
+        Args:
+            data (dict): Decoded response body.
+            on_token (callable, optional): Called with the response text. Defaults to None.
+        
+        Returns:
+            str: Response text.
+        """
+        content = data['choices'][0]['message'].get('content') or ""
+        if on_token and content:
+            on_token(content)
+        return self.finish([content], data.get('usage'))
+    
+    def complete(self, template, values, max_tokens, on_token=None):
+        """
+        Fill a prompt template and return the model's answer.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated;
+                giving it enables streaming. Defaults to None.
+        
+        Returns:
+            str: Model response.
+        
+        Raises:
+            requests.RequestException: If the request still fails after the retries. A stream
+                that breaks off after text was passed to on_token is not retried.
+            StreamAbandoned: If on_token abandoned the response.
+        """
+        stream = self.stream or on_token is not None
+        payload = self.build_payload(template, values, max_tokens, stream)
+        url = f"{self.api_base}/chat/completions"
+        
+        attempt = 0
+        while True:
+            parts = []
+            try:
+                response = self.session.post(
+                    url, json=payload, headers=self.get_headers(), timeout=self.request_timeout, stream=stream
+                )
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    if not stream:
+                        return self.read_response(response.json(), on_token)
+                    
+                    usage = None
+                    with response:
+                        for line in response.iter_lines(decode_unicode=True):
+                            delta, chunk_usage, done = self.parse_stream_line(line or "")
+                            if done:
+                                break
+                            if delta:
+                                parts.append(delta)
+                                if on_token:
+                                    on_token(delta)
+                            usage = chunk_usage or usage
+                    return self.finish(parts, usage)
+                
+                delay = self.get_retry_delay(attempt, response.headers.get('Retry-After'))
+                response.close()
+                logging.warning(f"Chat completion returned {response.status_code}, retrying in {delay:.1f}s")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A retry would pass the text already streamed to on_token a second time
+                if attempt >= self.max_retries or parts:
+                    self.record_usage(failed=True)
+                    raise
+                delay = self.get_retry_delay(attempt)
+                logging.warning(f"Chat completion failed, retrying in {delay:.1f}s: {str(e)}")
+            except (requests.RequestException, StreamAbandoned, ValueError, KeyError, IndexError):
+                self.record_usage(failed=True)
+                raise
+            
+            attempt += 1
+            time.sleep(delay)
+    
+    def set_async_session(self, session):
+        """
+        Use an aiohttp session for asynchronous requests.
+        
+        Args:
+            session (aiohttp.ClientSession): Session of the asyncio engine.
+        """
+        self.aiosession = session
+    
+    def get_async_timeout(self):
+        """Translate the request timeout into an aiohttp timeout."""
+        import aiohttp
+        
+        if isinstance(self.request_timeout, (tuple, list)):
+            return aiohttp.ClientTimeout(sock_connect=self.request_timeout[0], sock_read=self.request_timeout[1])
+        return aiohttp.ClientTimeout(total=self.request_timeout)
+    
+    async def acomplete(self, template, values, max_tokens, on_token=None):
+        """
+        Asynchronously fill a prompt template and return the model's answer.
+        
+        Requests go through the session given to set_async_session(), or a
+        short-lived session when none was set.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated;
+                giving it enables streaming. Defaults to None.
+        
+        Returns:
+            str: Model response.
+        
+        Raises:
+            aiohttp.ClientError: If the request still fails after the retries.
+        """
+        import aiohttp
+        
+        if self.aiosession is None:
+            async with aiohttp.ClientSession() as session:
+                return await self.acomplete_with(session, template, values, max_tokens, on_token)
+        return await self.acomplete_with(self.aiosession, template, values, max_tokens, on_token)
+    
+    async def acomplete_with(self, session, template, values, max_tokens, on_token=None):
+        """Run acomplete() on a given aiohttp session."""
+        import aiohttp
+        
+        stream = self.stream or on_token is not None
+        payload = self.build_payload(template, values, max_tokens, stream)
+        url = f"{self.api_base}/chat/completions"
+        
+        attempt = 0
+        while True:
+            parts = []
+            try:
+                async with session.post(
+                    url, json=payload, headers=self.get_headers(), timeout=self.get_async_timeout()
+                ) as response:
+                    if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                        response.raise_for_status()
+                        if not stream:
+                            return self.read_response(await response.json(), on_token)
+                        
+                        usage = None
+                        async for raw_line in response.content:
+                            delta, chunk_usage, done = self.parse_stream_line(raw_line.decode('utf-8'))
+                            if done:
+                                break
+                            if delta:
+                                parts.append(delta)
+                                if on_token:
+                                    on_token(delta)
+                            usage = chunk_usage or usage
+                        return self.finish(parts, usage)
+                    
+                    delay = self.get_retry_delay(attempt, response.headers.get('Retry-After'))
+                    logging.warning(f"Chat completion returned {response.status}, retrying in {delay:.1f}s")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # A retry would pass the text already streamed to on_token a second time
+                if attempt >= self.max_retries or parts:
+                    self.record_usage(failed=True)
+                    raise
+                delay = self.get_retry_delay(attempt)
+                logging.warning(f"Chat completion failed, retrying in {delay:.1f}s: {str(e)}")
+            except (aiohttp.ClientError, StreamAbandoned, ValueError, KeyError, IndexError):
+                self.record_usage(failed=True)
+                raise
+            
+            attempt += 1
+            await asyncio.sleep(delay)
+
+class LlamaCppBackend(AnalyzerBackend):
+    """Backend running a GGUF model in-process on the CPU with llama.cpp."""
+    
+    name = 'llama_cpp'
+    requires_api_key = False
+    
+    # Tokens left free for the chat template wrapped around the prompt
+    TEMPLATE_OVERHEAD_TOKENS = 64
+    
+    def __init__(self, model_path, context_tokens=4096, threads=None, temperature=0.7):
+        """
+        Initialize the llama.cpp backend.
+        
+        llama-cpp-python is imported and the model loaded when the first prompt is completed.
+        
+        Args:
+            model_path (str): Path to the GGUF model file.
+            context_tokens (int, optional): Context window of the model, shared by the prompt
+                and the response. Defaults to 4096.
+            threads (int, optional): CPU threads used for inference. Defaults to None (llama.cpp default).
+            temperature (float, optional): Sampling temperature. Defaults to 0.7.
+        """
+        super().__init__(os.path.basename(model_path), temperature)
+        self.model_path = model_path
+        self.context_tokens = context_tokens
+        self.threads = threads
+        self.llama = None
+        
+        # A model instance runs one completion at a time
+        self.run_lock = threading.Lock()
+    
+    def load_model(self):
+        """
+        Load the model, once.
+        
+        Returns:
+            llama_cpp.Llama: Loaded model.
+        
+        Raises:
+            ValueError: If llama-cpp-python is not installed or the model file is missing.
+        """
+        if self.llama is None:
+            try:
+                from llama_cpp import Llama
+            except ImportError:
+                raise ValueError("The llama_cpp runner requires llama-cpp-python. Install it with pip install llama-cpp-python.")
+            
+            if not os.path.isfile(self.model_path):
+                raise ValueError(f"Local model file not found: {self.model_path}")
+            
+            logging.info(f"Loading local model {self.model_path}")
+            self.llama = Llama(
+                model_path=self.model_path,
+                n_ctx=self.context_tokens,
+                n_threads=self.threads,
+                verbose=False
+            )
+        return self.llama
+    
+    def complete(self, template, values, max_tokens, on_token=None):
+        """
+        Fill a prompt template and return the model's answer.
+        
+        The response limit is lowered when the prompt leaves less room in the context window.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated.
+                Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        prompt = template.format(**values)
+        try:
+            with self.run_lock:
+                llama = self.load_model()
+                prompt_tokens = len(llama.tokenize(prompt.encode('utf-8')))
+                room = self.context_tokens - prompt_tokens - self.TEMPLATE_OVERHEAD_TOKENS
+                if room <= 0:
+                    raise ValueError(f"Prompt of {prompt_tokens} tokens does not fit the local model's context")
+                
+                response = llama.create_chat_completion(
+                    messages=[{'role': 'user', 'content': prompt}],
+                    max_tokens=min(max_tokens, room),
+                    temperature=self.temperature,
+                    stream=on_token is not None
+                )
+                
+                if on_token is None:
+                    content = response['choices'][0]['message'].get('content') or ""
+                    usage = response.get('usage') or {}
+                    self.record_usage(usage.get('prompt_tokens', prompt_tokens), usage.get('completion_tokens', 0))
+                    return content
+                
+                parts = []
+                for chunk in response:
+                    delta = chunk['choices'][0].get('delta', {}).get('content') if chunk.get('choices') else None
+                    if delta:
+                        parts.append(delta)
+                        on_token(delta)
+        except Exception:
+            self.record_usage(failed=True)
+            raise
+        
+        content = "".join(parts)
+        self.record_usage(prompt_tokens, len(llama.tokenize(content.encode('utf-8'), add_bos=False)))
+        return content
+
+class FallbackBackend(AnalyzerBackend):
+    """Backend asking a second backend when the first one fails or misses its latency target."""
+    
+    name = 'fallback'
+    
+    def __init__(self, primary, secondary, latency_slo=None):
+        """
+        Initialize the fallback backend.
+        
+        Args:
+            primary (AnalyzerBackend): Backend asked first.
+            secondary (AnalyzerBackend): Backend asked when the primary fails or is too slow.
+            latency_slo (float, optional): Seconds after which the primary's answer is no longer
+                waited for. Defaults to None (no limit).
+        """
+        super().__init__(primary.model_name, primary.temperature)
+        self.primary = primary
+        self.secondary = secondary
+        self.latency_slo = latency_slo
+        self.requires_api_key = primary.requires_api_key or secondary.requires_api_key
+        self.fallbacks = 0
+        
+        # Runs primary requests that may be abandoned when they exceed the latency target
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='analyzer') if latency_slo else None
+    
+    def record_fallback(self, reason):
+        """Count and log a request answered by the secondary backend."""
+        with self.lock:
+            self.fallbacks += 1
+        logging.warning(f"{self.primary.name} backend {reason}, using the {self.secondary.name} backend")
+    
+    def complete(self, template, values, max_tokens, on_token=None):
+        """
+        Fill a prompt template and return the answer of the first backend that succeeds in time.
+        
+        When the secondary backend takes over, on_token starts receiving its
+        text, possibly after part of the primary's. With a latency target the
+        primary streams through a TokenGate, which is closed on fallback so an
+        abandoned primary passes on no more text and stops at its next token.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated.
+                Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        gate = None
+        try:
+            if self.executor is None:
+                return self.primary.complete(template, values, max_tokens, on_token)
+            
+            gate = TokenGate(on_token)
+            future = self.executor.submit(bind_context(self.primary.complete), template, values, max_tokens, gate)
+            return future.result(timeout=self.latency_slo)
+        except FutureTimeoutError:
+            future.cancel()
+            self.record_fallback(f"exceeded the {self.latency_slo}s latency target")
+        except Exception as e:
+            self.record_fallback(f"failed ({str(e)})")
+        
+        if gate:
+            gate.close()
+        return self.secondary.complete(template, values, max_tokens, on_token)
+    
+    async def acomplete(self, template, values, max_tokens, on_token=None):
+        """
+        Asynchronously fill a prompt template and return the answer of the first backend that succeeds in time.
+        
+        Args:
+            template (str): Prompt template with {placeholders}.
+            values (dict): Values substituted into the template.
+            max_tokens (int): Maximum tokens of the response.
+            on_token (callable, optional): Called with each piece of text as it is generated.
+                Defaults to None.
+        
+        Returns:
+            str: Model response.
+        """
+        # Primaries running in an executor thread keep going after the timeout cancels the wait
+        gate = TokenGate(on_token) if self.latency_slo else on_token
+        try:
+            return await asyncio.wait_for(
+                self.primary.acomplete(template, values, max_tokens, gate), self.latency_slo
+            )
+        except asyncio.TimeoutError:
+            self.record_fallback(f"exceeded the {self.latency_slo}s latency target")
+        except Exception as e:
+            self.record_fallback(f"failed ({str(e)})")
+        
+        if self.latency_slo:
+            gate.close()
+        return await self.secondary.acomplete(template, values, max_tokens, on_token)
+    
+    def set_async_session(self, session):
+        """
+        Use an aiohttp session for asynchronous requests of both backends.
+        
+        Args:
+            session (aiohttp.ClientSession): Session of the asyncio engine.
+        """
+        self.primary.set_async_session(session)
+        self.secondary.set_async_session(session)
+    
+    def get_usage(self):
+        """
+        Get the requests and tokens used so far by both backends.
+        
+        Returns:
+            dict: Summed usage of both backends, plus 'fallbacks' and the usage of each
+                backend under its name.
+        """
+        primary, secondary = self.primary.get_usage(), self.secondary.get_usage()
+        usage = {key: primary[key] + secondary[key] for key in primary}
+        with self.lock:
+            usage['fallbacks'] = self.fallbacks
+        usage[self.primary.name] = primary
+        usage[self.secondary.name] = secondary
+        return usage
+
+# Remote backends selectable with the ai.backend setting; "local" selects ai.local
+BACKENDS = {backend.name: backend for backend in (LangChainBackend, OpenAIChatBackend)}
+
+# Local runners selectable with the ai.local.runner setting
+LOCAL_RUNNERS = ('llama_cpp', 'server')
+
+# Ways of combining the local and the remote backend, set with ai.local.mode
+LOCAL_MODES = ('off', 'fallback', 'first_pass')
+
+def create_backend(ai_config, http_pool=None):
+    """
+    Create the analyzer backend selected in the `ai` configuration section.
+    
+    Args:
+        ai_config (dict): The `ai` configuration section.
+        http_pool (HttpSessionPool, optional): Shared connection pool and timeouts. Defaults to None.
+    
+    Returns:
+        AnalyzerBackend: Configured backend.
+    
+    Raises:
+        ValueError: If a backend, runner or mode name is unknown.
+    """
+    name = ai_config.get('backend', LangChainBackend.name)
+    local_config = ai_config.get('local') or {}
+    
+    if name == 'local':
+        return create_local_backend(local_config, ai_config, http_pool)
+    
+    remote = create_remote_backend(name, ai_config, http_pool)
+    mode = local_config.get('mode', 'off')
+    if mode == 'off':
+        return remote
+    
+    local = create_local_backend(local_config, ai_config, http_pool)
+    latency_slo = local_config.get('latency_slo_seconds')
+    if mode == 'fallback':
+        return FallbackBackend(remote, local, latency_slo)
+    if mode == 'first_pass':
+        return FallbackBackend(local, remote, latency_slo)
+    
+    raise ValueError(f"Unknown local model mode '{mode}', expected one of: {', '.join(LOCAL_MODES)}")
+
+def create_remote_backend(name, ai_config, http_pool=None):
+    """
+    Create a backend calling the OpenAI API.
+    
+    Args:
+        name (str): Backend name, a key of BACKENDS.
+        ai_config (dict): The `ai` configuration section.
+        http_pool (HttpSessionPool, optional): Shared connection pool and timeouts. Defaults to None.
+    
+    Returns:
+        AnalyzerBackend: Configured backend.
+    """
+    model_name = ai_config.get('model', 'gpt-3.5-turbo')
+    temperature = ai_config.get('temperature', 0.7)
+    
+    if name == LangChainBackend.name:
+        return LangChainBackend(
+            model_name=model_name,
+            temperature=temperature,
+            request_timeout=http_pool.configure_openai() if http_pool else None
+        )
+    
+    if name == OpenAIChatBackend.name:
+        return OpenAIChatBackend(
+            model_name=model_name,
+            temperature=temperature,
+            request_timeout=(http_pool.connect_timeout, http_pool.read_timeout) if http_pool else None,
+            max_retries=ai_config.get('max_retries', 3),
+            stream=ai_config.get('stream', False),
+            api_base=ai_config.get('api_base'),
+            session=http_pool.get_session() if http_pool else None
+        )
+    
+    raise ValueError(
+        f"Unknown analyzer backend '{name}', expected one of: {', '.join(sorted(BACKENDS))}, local"
+    )
+
+def create_local_backend(local_config, ai_config, http_pool=None):
+    """
+    Create a backend running a model on this machine.
+    
+    Args:
+        local_config (dict): The `ai.local` configuration section.
+        ai_config (dict): The `ai` configuration section.
+        http_pool (HttpSessionPool, optional): Shared connection pool and timeouts. Defaults to None.
+    
+    Returns:
+        AnalyzerBackend: Configured backend.
+    """
+    runner = local_config.get('runner', 'llama_cpp')
+    temperature = local_config.get('temperature', ai_config.get('temperature', 0.7))
+    
+    if runner == 'llama_cpp':
+        return LlamaCppBackend(
+            model_path=local_config.get('model_path', 'models/model.gguf'),
+            context_tokens=local_config.get('context_tokens', 4096),
+            threads=local_config.get('threads'),
+            temperature=temperature
+        )
+    
+    if runner == 'server':
+        # Local servers get no retries so a fallback is not held up by a server that is down
+        return OpenAIChatBackend(
+            model_name=local_config.get('model', 'local'),
+            temperature=temperature,
+            request_timeout=(http_pool.connect_timeout, http_pool.read_timeout) if http_pool else None,
+            max_retries=local_config.get('max_retries', 0),
+            api_key=local_config.get('api_key', ''),
+            api_base=local_config.get('server_url', 'http://localhost:8080/v1'),
+            session=http_pool.get_session() if http_pool else None
+        )
+    
+    raise ValueError(f"Unknown local model runner '{runner}', expected one of: {', '.join(LOCAL_RUNNERS)}")
@@ -0,0 +1,1111 @@
+import os
+import base64
+import time
+import asyncio
+import logging
+import threading
+import aiohttp
+import requests
+from github_client import GitHubClient, CommitSummary
+from github_requests import JSON_MEDIA_TYPE
+from git_mirror_client import GitMirrorClient
+from telegram_sender import TelegramSender, StreamingMessage, STREAM_PLACEHOLDER
+from delivery_router import DeliveryRouter
+from targets import target_name
+from metrics import MetricsServer, count_run
+from messenger_base import MessengerBase
+
+GITHUB_API_URL = 'https://api.github.com'
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+class AsyncGitHubClient:
+    """Asynchronous client for the GitHub REST API built on aiohttp."""
+    
+    def __init__(self, session, token=None, repository=None, patch_selector=None, request_layer=None,
+                 details_source='rest'):
+        """
+        Initialize the asynchronous GitHub client.
+        
+        Args:
+            session (aiohttp.ClientSession): Session used for all requests.
+            token (str, optional): GitHub personal access token. Defaults to None.
+            repository (str, optional): Repository name in format 'username/repo'. Defaults to None.
+            patch_selector (PatchSelector, optional): Picks the diff hunks kept with the commit details.
+                Defaults to None, which leaves diffs out.
+            request_layer (GitHubRequestLayer, optional): Layer whose ETag cache and rate limit state
+                the requests share. Defaults to None, which sends plain requests.
+            details_source (str, optional): 'graphql' to fetch the details of a page of commits
+                with batched GraphQL queries. Defaults to 'rest'.
+        """
+        self.token = token or os.getenv('GITHUB_TOKEN')
+        if not self.token:
+            raise ValueError("GitHub token is required. Set it in .env file or pass it to the constructor.")
+        
+        self.session = session
+        self.repository_name = repository
+        self.patch_selector = patch_selector
+        self.request_layer = request_layer
+        self.details_source = details_source
+    
+    async def request(self, path, params=None, accept=JSON_MEDIA_TYPE):
+        """
+        Send a GET request to the GitHub API.
+        
+        With a request layer, the request is conditional and paced like
+        GitHubRequestLayer.get(), sharing its cache and quota state.
+        
+        Args:
+            path (str): API path or absolute URL.
+            params (dict, optional): Query parameters. Defaults to None.
+            accept (str, optional): Accept header. Defaults to the JSON media type.
+        
+        Returns:
+            tuple: (decoded body, response links).
+        
+        Raises:
+            aiohttp.ClientError: If the request fails.
+        """
+        layer = self.request_layer
+        if not layer:
+            url = path if path.startswith('http') else f"{GITHUB_API_URL}{path}"
+            headers = {'Authorization': f"token {self.token}", 'Accept': accept}
+            response, body = await self.send('GET', url, headers, params=params, accept=accept)
+            response.raise_for_status()
+            return body, response.links
+        
+        url, key, cached, headers = layer.prepare(path, params, accept)
+        wait = layer.get_pause(cached)
+        if wait is None:
+            return layer.serve_cached(key, cached, self.repository_name)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        response, body = await self.send('GET', url, headers, params=params, accept=accept)
+        layer.update_rate_limit(response.headers)
+        
+        retry_after = layer.get_retry_after(response.status, response.headers)
+        if retry_after is not None:
+            await asyncio.sleep(retry_after)
+            response, body = await self.send('GET', url, headers, params=params, accept=accept)
+            layer.update_rate_limit(response.headers)
+        
+        if response.status == 304 and cached:
+            return layer.serve_cached(key, cached, self.repository_name)
+        
+        layer.record_usage(self.repository_name, cache_hit=False)
+        response.raise_for_status()
+        layer.store(key, response.headers, body, response.links)
+        return body, response.links
+    
+    async def graphql(self, query, variables=None):
+        """
+        Send a GraphQL query through the request layer.
+        
+        Args:
+            query (str): GraphQL query document.
+            variables (dict, optional): Query variables. Defaults to None.
+        
+        Returns:
+            dict: The 'data' member of the response.
+        
+        Raises:
+            aiohttp.ClientError: If the request fails.
+            requests.RequestException: If the query reports errors.
+        """
+        layer = self.request_layer
+        url, payload, headers = layer.prepare_graphql(query, variables)
+        response, body = await self.send('POST', url, headers, payload=payload)
+        
+        retry_after = layer.get_retry_after(response.status, response.headers)
+        if retry_after is not None:
+            await asyncio.sleep(retry_after)
+            response, body = await self.send('POST', url, headers, payload=payload)
+        
+        layer.record_usage(self.repository_name, cache_hit=False)
+        response.raise_for_status()
+        return layer.read_graphql(response.headers, body)
+    
+    async def send(self, method, url, headers, params=None, payload=None, accept=JSON_MEDIA_TYPE):
+        """
+        Send a request and read the body of a successful response.
+        
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL.
+            headers (dict): Request headers.
+            params (dict, optional): Query parameters. Defaults to None.
+            payload (dict, optional): JSON body. Defaults to None.
+            accept (str, optional): Media type of the response. Defaults to the JSON media type.
+        
+        Returns:
+            tuple: (released response, decoded body or None if the status is not 2xx).
+        """
+        async with self.session.request(method, url, params=params, json=payload, headers=headers) as response:
+            body = None
+            if 200 <= response.status < 300:
+                body = await response.json() if accept.endswith('json') else await response.text()
+            return response, body
+    
+    async def get_readme_content(self):
+        """
+        Get the content of the README file from the repository.
+        
+        Returns:
+            str: Content of the README file or empty string if not found.
+        """
+        readme = await self.get_readme()
+        return readme['content'] if readme else ""
+    
+    async def get_readme(self):
+        """
+        Get the README file of the repository together with its blob SHA.
+        
+        Returns:
+            dict: Dictionary with 'sha' and 'content', or None if not found.
+        """
+        if not self.repository_name:
+            logging.error("Repository not set.")
+            return None
+        
+        try:
+            data, _ = await self.request(f"/repos/{self.repository_name}/readme")
+            content = base64.b64decode(data.get('content', '')).decode('utf-8')
+            return {'sha': data.get('sha', ''), 'content': content}
+        except (aiohttp.ClientError, ValueError) as e:
+            logging.error(f"Failed to get README content: {str(e)}")
+            return None
+    
+    async def get_latest_commits(self, branch="main", limit=5, since=None):
+        """
+        Get the latest commits from the repository, paging only until limit is reached.
+        
+        Args:
+            branch (str, optional): Branch name. Defaults to "main".
+            limit (int, optional): Maximum number of commits to fetch. Defaults to 5.
+            since (str or datetime, optional): Commit SHA or timestamp; only newer commits
+                are returned. Defaults to None.
+        
+        Returns:
+            list: List of raw commit payloads, newest first.
+        """
+        if not self.repository_name:
+            logging.error("Repository not set.")
+            return []
+        
+        if limit <= 0:
+            return []
+        
+        since_sha, since_date = GitHubClient.parse_since(since)
+        params = {'sha': branch, 'per_page': min(limit, GitHubClient.MAX_PER_PAGE)}
+        if since_date:
+            params['since'] = since_date.isoformat()
+        
+        commits = []
+        url = f"/repos/{self.repository_name}/commits"
+        try:
+            while url and len(commits) < limit:
+                page, links = await self.request(url, params=params)
+                for commit in page:
+                    if (since_sha and commit['sha'].startswith(since_sha)) or len(commits) >= limit:
+                        return commits
+                    commits.append(commit)
+                
+                # The next link already carries the query parameters
+                url = str(links['next']['url']) if 'next' in links else None
+                params = None
+            return commits
+        except aiohttp.ClientError as e:
+            logging.error(f"Failed to get commits: {str(e)}")
+            return []
+    
+    async def get_commit_details(self, commit):
+        """
+        Fetch the full details of a commit.
+        
+        Args:
+            commit (dict): Raw commit payload containing at least 'sha'.
+        
+        Returns:
+            dict: Dictionary containing commit details.
+        """
+        if not commit:
+            return {}
+        
+        try:
+            data, _ = await self.request(f"/repos/{self.repository_name}/commits/{commit['sha']}")
+            return GitHubClient.details_from_json(data, self.patch_selector)
+        except aiohttp.ClientError as e:
+            logging.error(f"Error extracting commit details: {str(e)}")
+            return {}
+    
+    async def get_commit_details_batch(self, commits):
+        """
+        Fetch the details of several commits with batched GraphQL queries.
+        
+        Same queries and conditions as GitHubClient.get_commit_details_batch().
+        
+        Args:
+            commits (list): Raw commit payloads containing at least 'sha'.
+        
+        Returns:
+            dict: Commit details by SHA. Commits that could not be fetched are left out.
+        """
+        if self.details_source != 'graphql' or not self.request_layer or self.patch_selector:
+            return {}
+        if not self.repository_name:
+            logging.error("Repository not set.")
+            return {}
+        
+        shas = [commit['sha'] for commit in commits]
+        
+        details = {}
+        for offset in range(0, len(shas), GitHubClient.GRAPHQL_BATCH_SIZE):
+            batch = shas[offset:offset + GitHubClient.GRAPHQL_BATCH_SIZE]
+            query, variables = GitHubClient.build_details_query(self.repository_name, batch)
+            try:
+                data = await self.graphql(query, variables)
+            except (aiohttp.ClientError, requests.RequestException) as e:
+                logging.error(f"Failed to get commit details with GraphQL: {str(e)}")
+                continue
+            details.update(GitHubClient.details_from_batch(data, batch))
+        return details
+
+class AsyncGitMirrorClient:
+    """Runs the git commands of a GitMirrorClient off the event loop."""
+    
+    def __init__(self, client):
+        """
+        Initialize the asynchronous git mirror client.
+        
+        Args:
+            client (GitMirrorClient): Client reading the local mirror.
+        """
+        self.client = client
+        self.repository_name = client.repository_name
+    
+    async def get_readme(self):
+        """
+        Get the README file of the default branch together with its blob SHA.
+        
+        Returns:
+            dict: Dictionary with 'sha' and 'content', or None if not found.
+        """
+        return await asyncio.to_thread(self.client.get_readme)
+    
+    async def get_latest_commits(self, branch="main", limit=5, since=None):
+        """
+        Get the latest commits of a branch.
+        
+        Args:
+            branch (str, optional): Branch name. Defaults to "main".
+            limit (int, optional): Maximum number of commits to return. Defaults to 5.
+            since (str or datetime, optional): Commit SHA or timestamp; only newer commits
+                are returned. Defaults to None.
+        
+        Returns:
+            list: List of commit payloads with 'sha', newest first.
+        """
+        commits = await asyncio.to_thread(self.client.get_latest_commits, branch, limit, since)
+        return [commit.raw_data for commit in commits]
+    
+    async def get_commit_details(self, commit):
+        """
+        Read the full details of a commit.
+        
+        Args:
+            commit (dict): Commit payload containing at least 'sha'.
+        
+        Returns:
+            dict: Dictionary containing commit details.
+        """
+        if not commit:
+            return {}
+        return await asyncio.to_thread(self.client.get_commit_details, CommitSummary(commit))
+    
+    async def get_commit_details_batch(self, commits):
+        """
+        Read the details of several commits; the mirror reads each commit on its own.
+        
+        Args:
+            commits (list): Commit payloads containing at least 'sha'.
+        
+        Returns:
+            dict: Always empty.
+        """
+        return {}
+
+class AsyncTelegramSender(TelegramSender):
+    """Sends messages through the Telegram Bot API using aiohttp."""
+    
+    def __init__(self, session, token=None, channel_id=None):
+        """
+        Initialize the asynchronous Telegram sender.
+        
+        Args:
+            session (aiohttp.ClientSession): Session used for all requests.
+            token (str, optional): Telegram bot token. Defaults to None.
+            channel_id (str, optional): Telegram channel ID. Defaults to None.
+        """
+        self.token = token or os.getenv('TELEGRAM_BOT_TOKEN')
+        if not self.token:
+            raise ValueError("Telegram bot token is required. Set it in .env file or pass it to the constructor.")
+        
+        self.session = session
+        self.channel_id = channel_id
+    
+    async def send_message(self, message, channel_id=None):
+        """
+        Send a message to the Telegram channel.
+        
+        Args:
+            message (str): Message to send.
+            channel_id (str, optional): Channel ID to send the message to. Defaults to None.
+        
+        Returns:
+            bool: True if message was sent successfully, False otherwise.
+        """
+        target_channel = channel_id or self.channel_id
+        if not target_channel:
+            logging.error("Channel ID is required. Set it with set_channel() or pass it to send_message().")
+            return False
+        
+        for part in self.split_message(message):
+            # Parts with incomplete Markdown are sent as plain text
+            payload = {'chat_id': target_channel, 'text': part}
+            if self.is_markdown_balanced(part):
+                payload['parse_mode'] = 'Markdown'
+            try:
+                async with self.session.post(
+                    f"{TELEGRAM_API_URL}/bot{self.token}/sendMessage", json=payload
+                ) as response:
+                    result = await response.json()
+            except aiohttp.ClientError as e:
+                logging.error(f"Failed to send message to Telegram: {str(e)}")
+                return False
+            
+            if not result.get('ok'):
+                logging.error(f"Failed to send message to Telegram: {result.get('description', 'unknown error')}")
+                return False
+        
+        logging.info(f"Message sent to channel {target_channel}")
+        return True
+    
+    async def call(self, method, payload):
+        """
+        Call a Bot API method.
+        
+        Args:
+            method (str): Method name, e.g. 'editMessageText'.
+            payload (dict): Method parameters.
+        
+        Returns:
+            dict: Decoded response, with 'ok' and either 'result' or the error details.
+        
+        Raises:
+            aiohttp.ClientError: If the request fails.
+        """
+        async with self.session.post(f"{TELEGRAM_API_URL}/bot{self.token}/{method}", json=payload) as response:
+            return await response.json()
+    
+    async def start_stream(self, project_name, commit_details, channel_id=None, min_interval=3.0):
+        """
+        Post the message for a commit right away, to be completed while its description is generated.
+        
+        Args:
+            project_name (str): Name of the project.
+            commit_details (dict): Dictionary containing commit details.
+            channel_id (str, optional): Channel ID to send the message to. Defaults to None.
+            min_interval (float, optional): Least seconds between edits. Defaults to 3.0.
+        
+        Returns:
+            AsyncStreamingMessage: Posted message, or None if it could not be sent.
+        """
+        target_channel = channel_id or self.channel_id
+        if not target_channel:
+            logging.error("Channel ID is required. Set it with set_channel() or pass it to start_stream().")
+            return None
+        
+        stream = AsyncStreamingMessage(
+            self,
+            target_channel,
+            lambda description: self.format_commit_message(project_name, commit_details, description),
+            min_interval
+        )
+        try:
+            if await stream.start():
+                return stream
+        except aiohttp.ClientError as e:
+            logging.error(f"Failed to send message to Telegram: {str(e)}")
+        return None
+
+class AsyncStreamingMessage(StreamingMessage):
+    """Streamed Telegram message edited through the Bot API with aiohttp."""
+    
+    def __init__(self, sender, channel_id, render, min_interval=3.0):
+        """
+        Initialize the streamed message.
+        
+        Must be created in a coroutine; edits run on its event loop.
+        
+        Args:
+            sender (AsyncTelegramSender): Sender used for the Bot API calls.
+            channel_id (str): Channel ID to post to.
+            render (callable): Builds the full message text from a description.
+            min_interval (float, optional): Least seconds between edits. Defaults to 3.0.
+        """
+        super().__init__(sender, channel_id, render, min_interval)
+        self.pending_edit = None
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+    
+    async def start(self):
+        """
+        Post the message with a placeholder description.
+        
+        Returns:
+            bool: True if the message was posted, False otherwise.
+        """
+        message = self.fit(self.render(STREAM_PLACEHOLDER))
+        result = await self.sender.call(
+            'sendMessage', {'chat_id': self.channel_id, 'text': message, 'parse_mode': 'Markdown'}
+        )
+        if not result.get('ok'):
+            logging.error(f"Failed to send message to Telegram: {result.get('description', 'unknown error')}")
+            return False
+        
+        self.message_id = result['result']['message_id']
+        self.last_sent = message
+        self.next_edit_at = time.monotonic() + self.min_interval
+        return True
+    
+    def update(self, delta):
+        """
+        Add generated text, scheduling an edit at most once per interval.
+        
+        Edits run as separate tasks on the event loop. Backends completing in
+        an executor thread call this from that thread, so the text is handed
+        over to the loop first.
+        
+        Args:
+            delta (str): Newly generated text.
+        """
+        if threading.get_ident() != self.loop_thread:
+            self.loop.call_soon_threadsafe(self.update, delta)
+            return
+        
+        if self.pending_edit and not self.pending_edit.done():
+            with self.lock:
+                self.text += delta
+            return
+        
+        message = self.take_update(delta)
+        if message:
+            self.pending_edit = asyncio.ensure_future(self.edit(message))
+    
+    async def finish(self, description):
+        """
+        Replace the partial text with the final description.
+        
+        Args:
+            description (str): Final description.
+        
+        Returns:
+            bool: True if the message was completed, False otherwise.
+        """
+        if self.pending_edit:
+            await asyncio.gather(self.pending_edit, return_exceptions=True)
+        
+        parts = self.sender.split_message(self.render(description))
+        if not await self.edit(parts[0], final=True):
+            return False
+        
+        for part in parts[1:]:
+            if not await self.sender.send_message(part, channel_id=self.channel_id):
+                return False
+        return True
+    
+    async def discard(self):
+        """
+        Delete the posted message, e.g. when its description could not be generated.
+        
+        Returns:
+            bool: True if the message was deleted, False otherwise.
+        """
+        if self.pending_edit:
+            await asyncio.gather(self.pending_edit, return_exceptions=True)
+        
+        try:
+            result = await self.sender.call('deleteMessage', {'chat_id': self.channel_id, 'message_id': self.message_id})
+        except aiohttp.ClientError as e:
+            logging.error(f"Failed to delete message in Telegram: {str(e)}")
+            return False
+        
+        if not result.get('ok'):
+            logging.error(f"Failed to delete message in Telegram: {result.get('description', 'unknown error')}")
+            return False
+        return True
+    
+    async def edit(self, message, final=False):
+        """
+        Replace the text of the posted message.
+        
+        Args:
+            message (str): New message text.
+            final (bool, optional): Whether this is the final text. Defaults to False.
+        
+        Returns:
+            bool: True if the message shows the text, False otherwise.
+        """
+        if message == self.last_sent:
+            return True
+        
+        payload = {'chat_id': self.channel_id, 'message_id': self.message_id, 'text': message, 'parse_mode': 'Markdown'}
+        for _ in range(3):
+            try:
+                result = await self.sender.call('editMessageText', payload)
+            except aiohttp.ClientError as e:
+                logging.error(f"Failed to update message in Telegram: {str(e)}")
+                return False
+            
+            if result.get('ok'):
+                self.last_sent = message
+                return True
+            
+            description = result.get('description', 'unknown error')
+            if result.get('error_code') == 429:
+                retry_after = (result.get('parameters') or {}).get('retry_after', self.min_interval)
+                with self.lock:
+                    self.next_edit_at = time.monotonic() + retry_after
+                if not final:
+                    return False
+                await asyncio.sleep(retry_after)
+            elif result.get('error_code') == 400 and 'not modified' in description.lower():
+                return True
+            elif result.get('error_code') == 400 and final:
+                # Partial text may end inside a Markdown entity, the final text is sent as plain text if needed
+                payload.pop('parse_mode', None)
+            else:
+                if final:
+                    logging.error(f"Failed to update message in Telegram: {description}")
+                return False
+        
+        logging.error("Failed to update message in Telegram after retries")
+        return False
+
+class AsyncSmartCommitMessenger(MessengerBase):
+    """Asynchronous variant of SmartCommitMessenger running on a single event loop."""
+    
+    def __init__(self, config_path='../config/config.yaml'):
+        """
+        Initialize the asynchronous Smart Commit Messenger.
+        
+        Network clients are created by start(), inside the running event loop.
+        Ledger and outbox updates run in worker threads, so SQLite never blocks
+        the loop.
+        
+        Args:
+            config_path (str, optional): Path to the configuration file. Defaults to '../config/config.yaml'.
+        """
+        super().__init__(config_path)
+        
+        # The outbox worker drains in a thread with the synchronous sender
+        if self.outbox:
+            self.outbox_worker = self.create_outbox_worker(TelegramSender(request=self.http.telegram_request()).post_message)
+        
+        self.max_concurrency = self.config.get('pipeline', {}).get('max_concurrency', 4)
+        self.interval = self.config.get('schedule', {}).get('interval_minutes', 15)
+        self.session = None
+        self.semaphore = None
+        self.telegram_sender = None
+        self.router = None
+    
+    async def start(self):
+        """Open the HTTP session and create the shared network clients."""
+        if self.session is None:
+            options = self.http.aiohttp_options()
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=options['limit_per_host']),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=options['connect_timeout'],
+                    sock_read=options['read_timeout']
+                )
+            )
+            self.commit_analyzer.backend.set_async_session(self.session)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.github_clients = {}
+            self.telegram_sender = AsyncTelegramSender(self.session)
+            
+            # Each description is rendered and sent to every destination of its target at once
+            self.router = DeliveryRouter(self.telegram_sender.format_commit_message)
+    
+    async def close(self):
+        """Close the HTTP session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+    
+    def get_github_client(self, repository):
+        """
+        Get the GitHub client for a repository, sharing the HTTP session and request layer across targets.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+        
+        Returns:
+            AsyncGitHubClient: Client for the repository, or an AsyncGitMirrorClient
+                when its target reads a local git mirror.
+        """
+        if repository not in self.github_clients:
+            target = self.get_target(repository)
+            if target and target['source'] == 'git_mirror':
+                self.github_clients[repository] = AsyncGitMirrorClient(
+                    GitMirrorClient.from_target(target, self.config, self.patch_selector)
+                )
+                return self.github_clients[repository]
+            
+            self.github_clients[repository] = AsyncGitHubClient(
+                self.session,
+                repository=repository,
+                patch_selector=self.patch_selector,
+                request_layer=self.request_layer,
+                details_source=self.details_source
+            )
+        return self.github_clients[repository]
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+    
+    async def get_project_description(self, github_client):
+        """
+        Get the project description for a repository, refreshing it only when the README changes.
+        
+        Args:
+            github_client (AsyncGitHubClient): Client for the repository.
+        
+        Returns:
+            str: Project description for the analyzer.
+        """
+        repository = github_client.repository_name
+        entry = self.readme_cache.get_fresh(repository)
+        if entry:
+            return self.readme_cache.project_description(entry)
+        
+        async with self.semaphore:
+            readme = await github_client.get_readme()
+        description = self.reuse_project_description(repository, readme)
+        if description is not None:
+            return description
+        
+        summary = ""
+        if self.summarize_readme:
+            async with self.semaphore:
+                summary = await self.commit_analyzer.asummarize_project(readme['content'], self.summary_max_words)
+        return self.store_project_description(repository, readme, summary)
+    
+    async def process_all_targets(self):
+        """
+        Process the latest commits of every configured target concurrently.
+        
+        Returns:
+            bool: True if every target was processed successfully, False otherwise.
+        """
+        results = await asyncio.gather(
+            *(self.process_latest_commits(target) for target in self.targets),
+            return_exceptions=True
+        )
+        for target, result in zip(self.targets, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error processing {target_name(target)}: {str(result)}")
+        return bool(results) and all(result is True for result in results)
+    
+    async def process_latest_commits(self, target=None):
+        """
+        Process the latest commits from a configured target.
+        
+        Args:
+            target (dict, optional): Target from load_targets(). Defaults to the first target.
+        
+        Returns:
+            bool: True if processing was successful, False otherwise.
+        """
+        await self.start()
+        
+        if target is None:
+            if not self.targets:
+                logging.warning("No repository targets configured.")
+                return False
+            target = self.targets[0]
+        
+        github_client = self.get_github_client(target['repository'])
+        
+        since = self.get_since(target)
+        async with self.semaphore:
+            commits = await github_client.get_latest_commits(branch=target['branch'], limit=target['commit_limit'], since=since)
+        if not commits:
+            if since:
+                logging.info(f"No new commits for {target_name(target)} since {since}.")
+                return True
+            logging.warning(f"No commits found to process for {target_name(target)}.")
+            return False
+        
+        result = await self.process_commits(target, commits)
+        await asyncio.to_thread(self.advance_cursor, target, [commit['sha'] for commit in commits])
+        return result
+    
+    async def process_commits(self, target, commits):
+        """
+        Analyze and deliver the given commits of a target, skipping those already delivered.
+        
+        Details are fetched and analyzed concurrently, bounded by
+        pipeline.max_concurrency across all targets, and messages are sent in
+        commit order. A structured summary of the run is logged and kept in
+        last_run_summary.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            commits (list): Commit dictionaries, in delivery order.
+        
+        Returns:
+            bool: True if processing was successful, False otherwise.
+        """
+        with count_run() as stats:
+            pending = await asyncio.to_thread(self.select_pending, target, commits, lambda commit: commit['sha'])
+            if not pending:
+                return True
+            
+            await self.process_pending(target, pending)
+            await asyncio.to_thread(self.finish_run, target, len(commits), [commit['sha'] for commit in pending], stats)
+        return True
+    
+    async def process_pending(self, target, pending):
+        """
+        Fetch, analyze and deliver commits that were not delivered yet.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            pending (list): Commit dictionaries, in delivery order.
+        """
+        github_client = self.get_github_client(target['repository'])
+        project_description = await self.get_project_description(github_client)
+        
+        # With the GraphQL details source, one query covers the details of many commits
+        async with self.semaphore:
+            with self.metrics.timer('fetch_batch'):
+                prefetched = await github_client.get_commit_details_batch(pending)
+        
+        async def fetch(commit):
+            commit_details = prefetched.get(commit['sha'])
+            if not commit_details:
+                async with self.semaphore:
+                    with self.metrics.timer('fetch'):
+                        commit_details = await github_client.get_commit_details(commit)
+            if not commit_details:
+                logging.warning(f"Failed to get details for commit {commit['sha']}")
+            return commit_details
+        
+        async def prepare(commit):
+            commit_details = await fetch(commit)
+            if not commit_details:
+                return None, None
+            return commit_details, await self.analyze_commit_details(target, commit_details, project_description)
+        
+        # Digests are sent once every commit is analyzed, instead of per commit
+        digest_entries = [] if self.digest_mode and len(pending) >= self.digest_min_commits else None
+        
+        async def deliver(commit_details, description):
+            if not description:
+                return
+            
+            if digest_entries is not None:
+                digest_entries.append((commit_details, description))
+                return
+            
+            await self.deliver_commit(target, commit_details, description)
+        
+        if self.streaming and digest_entries is None:
+            # Messages are posted before their descriptions exist, so only the details are fetched ahead
+            tasks = [asyncio.ensure_future(fetch(commit)) for commit in pending]
+            for task in tasks:
+                commit_details = await task
+                if commit_details:
+                    await self.stream_commit(target, commit_details, project_description)
+        # Small commits of a push share analysis requests when batching is enabled
+        elif self.commit_analyzer.batch_size > 1 and len(pending) > 1:
+            for commit_details, description in await self.prepare_batch(target, fetch, pending, project_description):
+                await deliver(commit_details, description)
+        else:
+            tasks = [asyncio.ensure_future(prepare(commit)) for commit in pending]
+            
+            # Deliver in commit order as each preparation finishes
+            for task in tasks:
+                await deliver(*await task)
+        
+        if digest_entries:
+            await self.deliver_digest(target, digest_entries)
+    
+    async def analyze_commit_details(self, target, commit_details, readme_content):
+        """
+        Get the description of a commit, reusing a stored analysis when available.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            readme_content (str): Project description passed to the analyzer.
+        
+        Returns:
+            str: Description of the commit, or None if the analysis failed or no destination takes it.
+        """
+        if not await asyncio.to_thread(self.is_routed, target, commit_details):
+            return None
+        
+        description = await asyncio.to_thread(self.get_stored_description, target, commit_details['sha'])
+        if description:
+            return description
+        
+        async with self.semaphore:
+            with self.metrics.timer('analyze'):
+                description = await self.commit_analyzer.aanalyze_commit(commit_details, readme_content)
+        return await asyncio.to_thread(self.store_analysis, target, commit_details['sha'], description)
+    
+    async def prepare_batch(self, target, fetch, commits, project_description):
+        """
+        Fetch the details of several commits, then analyze those without a stored analysis together.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            fetch (callable): Coroutine function returning the details of a commit.
+            commits (list): Commit dictionaries.
+            project_description (str): Project description passed to the analyzer.
+        
+        Returns:
+            list: (commit details, description) tuples in commit order, with None for failed steps.
+        """
+        details = await asyncio.gather(*(fetch(commit) for commit in commits))
+        
+        prepared = []
+        missing = []
+        for commit_details in details:
+            if not commit_details:
+                prepared.append((None, None))
+                continue
+            if not await asyncio.to_thread(self.is_routed, target, commit_details):
+                prepared.append((commit_details, None))
+                continue
+            
+            description = await asyncio.to_thread(self.get_stored_description, target, commit_details['sha'])
+            prepared.append((commit_details, description))
+            if description is None:
+                missing.append(len(prepared) - 1)
+        
+        async with self.semaphore:
+            with self.metrics.timer('analyze'):
+                descriptions = await self.commit_analyzer.aanalyze_commits(
+                    [prepared[index][0] for index in missing], project_description
+                )
+        
+        for index, description in zip(missing, descriptions):
+            commit_details = prepared[index][0]
+            description = await asyncio.to_thread(self.store_analysis, target, commit_details['sha'], description)
+            prepared[index] = (commit_details, description)
+        
+        return prepared
+    
+    async def deliver_commit(self, target, commit_details, description):
+        """
+        Format and send the message for a commit to each matching destination and record the delivery.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            description (str): Description of the commit.
+        
+        Returns:
+            bool: True if the message was sent or queued to every destination, False otherwise.
+        """
+        sha = commit_details['sha']
+        destinations = await asyncio.to_thread(self.route_undelivered, target, commit_details)
+        
+        routed = {sha: [destination['name'] for destination in destinations]}
+        
+        async def send(destination):
+            with self.metrics.timer('format'):
+                message = self.router.render(destination, target['project_name'], commit_details, description)
+            return await self.send_or_queue(target, destination, message, [sha], routed)
+        
+        results = await self.router.afan_out(destinations, send)
+        return await asyncio.to_thread(self.record_commit_delivery, target, sha, destinations, results)
+    
+    async def deliver_digest(self, target, entries):
+        """
+        Send several analyzed commits of a target as a digest to each destination and record each delivery.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            entries (list): (commit_details, description) tuples, in delivery order.
+        
+        Returns:
+            bool: True if every digest message was sent or queued, False otherwise.
+        """
+        select = await asyncio.to_thread(self.get_digest_selector, target, entries)
+        routed = self.get_digest_routes(target, select)
+        failed = set()
+        
+        async def send_digest(destination):
+            with self.metrics.timer('format'):
+                messages = self.telegram_sender.format_digest_message(target['project_name'], select(destination), target['branch'])
+            
+            all_sent = True
+            for message, covered in messages:
+                shas = [commit_details['sha'] for commit_details, _ in covered]
+                success = await self.send_or_queue(target, destination, message, shas, routed)
+                self.log_digest(target, destination, covered, success)
+                if not success:
+                    failed.update(shas)
+                all_sent = all_sent and success
+            return all_sent
+        
+        results = await self.router.afan_out(target['destinations'], send_digest)
+        await asyncio.to_thread(self.record_digest_deliveries, target, entries, routed, failed)
+        return all(results)
+    
+    async def stream_commit(self, target, commit_details, readme_content):
+        """
+        Post the message for a commit at once and fill in the description as the model generates it.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            readme_content (str): Project description passed to the analyzer.
+        
+        Returns:
+            bool: True if the message was delivered, False otherwise.
+        """
+        sha = commit_details['sha']
+        if not await asyncio.to_thread(self.is_routed, target, commit_details):
+            return True
+        
+        description = await asyncio.to_thread(self.get_stored_description, target, sha)
+        if description:
+            return await self.deliver_commit(target, commit_details, description)
+        
+        destinations = await asyncio.to_thread(self.route_undelivered, target, commit_details)
+        stream = None
+        if destinations:
+            async with self.semaphore:
+                stream = await self.telegram_sender.start_stream(
+                    target['project_name'], commit_details, destinations[0]['channel_id'], self.edit_interval
+                )
+        
+        if stream is None:
+            # Messages that could not be posted are delivered as usual
+            description = await self.analyze_commit_details(target, commit_details, readme_content)
+            return bool(description) and await self.deliver_commit(target, commit_details, description)
+        
+        async with self.semaphore:
+            description = await self.commit_analyzer.aanalyze_commit(
+                commit_details, readme_content, on_token=stream.update
+            )
+        description = await asyncio.to_thread(self.store_analysis, target, sha, description)
+        if description is None:
+            await stream.discard()
+            return False
+        
+        success = await stream.finish(description)
+        await asyncio.to_thread(self.record_stream, target, sha, destinations[0], success, len(destinations) == 1)
+        
+        # The remaining destinations get the finished description
+        if len(destinations) > 1:
+            return await self.deliver_commit(target, commit_details, description) and success
+        return success
+    
+    async def send_or_queue(self, target, destination, message, shas, routed=None):
+        """
+        Send a message to a destination of the target, or hand it to the outbox when enabled.
+        
+        Direct deliveries are recorded for the destination; the status of the
+        commits is left to record_deliveries().
+        
+        Args:
+            target (dict): Target the message belongs to.
+            destination (dict): Destination to send the message to.
+            message (str): Message to send.
+            shas (list): SHAs of the commits the message covers.
+            routed (dict, optional): Names of all the destinations waiting for each commit,
+                by SHA, kept with queued messages. Defaults to None.
+        
+        Returns:
+            bool: True if the message was sent or queued, False otherwise.
+        """
+        if self.outbox:
+            await asyncio.to_thread(self.queue_message, target, destination, message, shas, routed)
+            return True
+        
+        async with self.semaphore:
+            with self.metrics.timer('send'):
+                success = await self.telegram_sender.send_message(message, channel_id=destination['channel_id'])
+        await asyncio.to_thread(self.record_sent, target, destination, shas, success)
+        return success
+    
+    async def watch_target(self, target, delay, interval_minutes):
+        """
+        Poll one target forever, starting after delay seconds.
+        
+        Args:
+            target (dict): Target to poll.
+            delay (float): Seconds to wait before the first run.
+            interval_minutes (int): Minutes between runs.
+        """
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await self.process_latest_commits(target)
+            except Exception as e:
+                logging.error(f"Error in scheduled job for {target_name(target)}: {str(e)}")
+            await asyncio.sleep(interval_minutes * 60)
+    
+    async def run(self, interval_minutes=None, continuous=True):
+        """
+        Process every target, then keep polling each one with staggered start times.
+        
+        Args:
+            interval_minutes (int, optional): Minutes between runs of a target.
+                Defaults to schedule.interval_minutes.
+            continuous (bool, optional): Keep running after the first pass. Defaults to True.
+        """
+        interval_minutes = interval_minutes or self.interval
+        
+        async with self:
+            if not continuous:
+                try:
+                    await self.process_all_targets()
+                except Exception as e:
+                    logging.error(f"Error in scheduled job: {str(e)}")
+                
+                if self.outbox_worker:
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, self.outbox_worker.drain, self.outbox_drain_timeout)
+                return
+            
+            if self.outbox_worker:
+                self.outbox_worker.start()
+            
+            metrics_server = MetricsServer.from_config(self.metrics, self.config)
+            if metrics_server:
+                metrics_server.start()
+            
+            # Spread the first runs evenly over one interval instead of starting all at once
+            step = interval_minutes * 60 / max(len(self.targets), 1)
+            try:
+                await asyncio.gather(*(
+                    self.watch_target(target, index * step, interval_minutes)
+                    for index, target in enumerate(self.targets)
+                ))
+            finally:
+                if metrics_server:
+                    metrics_server.stop()
+                if self.outbox_worker:
+                    self.outbox_worker.stop()
\ No newline at end of file
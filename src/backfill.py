@@ -0,0 +1,485 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice, chain
+from main import SmartCommitMessenger
+from commit_analyzer import ANALYSIS_FAILED_MESSAGE
+from pipeline import CommitPipeline
+from targets import load_targets, target_name
+
+# Orders in which a range of history can be replayed
+ORDERS = ('oldest_first', 'newest_first')
+
+class BackfillCheckpoint:
+    """Progress of backfill runs, saved after every chunk so an interrupted run resumes where it stopped."""
+    
+    def __init__(self, path="backfill_checkpoint.json"):
+        """
+        Initialize the checkpoint store.
+        
+        Args:
+            path (str, optional): Path to the JSON file holding the checkpoints. Defaults to "backfill_checkpoint.json".
+        """
+        self.path = path
+        self.entries = None
+    
+    def load(self):
+        """
+        Load the checkpoint file on first use.
+        
+        Returns:
+            dict: Checkpoints keyed by backfill range.
+        """
+        if self.entries is None:
+            self.entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r') as file:
+                        self.entries = json.load(file)
+                except (OSError, ValueError) as e:
+                    logging.error(f"Failed to load backfill checkpoint: {str(e)}")
+        return self.entries
+    
+    def save(self):
+        """Write the checkpoints to disk."""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as file:
+                json.dump(self.entries, file, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to save backfill checkpoint: {str(e)}")
+    
+    def get(self, key):
+        """
+        Get the checkpoint of a backfill range.
+        
+        Args:
+            key (str): Backfill range key.
+        
+        Returns:
+            dict: Checkpoint with 'position', 'last_sha', 'processed', 'failed' and 'done', or None.
+        """
+        return self.load().get(key)
+    
+    def update(self, key, **values):
+        """
+        Update the checkpoint of a backfill range and save it.
+        
+        Args:
+            key (str): Backfill range key.
+            **values: Fields to store.
+        """
+        entry = self.load().setdefault(key, {'position': 0, 'last_sha': None, 'processed': 0, 'failed': [], 'done': False})
+        entry.update(values, updated_at=time.time())
+        self.save()
+    
+    def clear(self, key):
+        """
+        Forget the checkpoint of a backfill range.
+        
+        Args:
+            key (str): Backfill range key.
+        """
+        if self.load().pop(key, None) is not None:
+            self.save()
+
+class Backfill:
+    """Replays a range of history through the pipeline in checkpointed chunks."""
+    
+    def __init__(self, messenger, target, head=None, base=None, since=None, until=None, limit=None,
+                 dry_run=False, export_path=None, checkpoint=None, chunk_size=20, commits_per_minute=None,
+                 pipeline=None, order=None):
+        """
+        Initialize the backfill.
+        
+        Args:
+            messenger (SmartCommitMessenger): Messenger providing the clients, analyzer and ledger.
+            target (dict): Target whose history is replayed.
+            head (str, optional): Branch or SHA the range ends at. Defaults to the target's branch.
+            base (str, optional): SHA the range starts after, exclusive. Defaults to None.
+            since (datetime, optional): Only commits after this time. Defaults to None.
+            until (datetime, optional): Only commits before this time. Defaults to None.
+            limit (int, optional): Only replay the newest limit commits of the range. Defaults to no limit.
+            dry_run (bool, optional): Analyze without sending or recording deliveries. Defaults to False.
+            export_path (str, optional): JSON Lines file receiving every description. Defaults to None.
+            checkpoint (BackfillCheckpoint, optional): Progress store. Defaults to "backfill_checkpoint.json".
+            chunk_size (int, optional): Commits listed and processed per step. Defaults to 20.
+            commits_per_minute (float, optional): Highest processing rate. Defaults to no limit.
+            pipeline (CommitPipeline, optional): Pipeline bounding the concurrency. Defaults to the messenger's.
+            order (str, optional): 'oldest_first' posts the history in the order it was written,
+                'newest_first' starts with the latest commits. Defaults to 'oldest_first' when a
+                limit, base or since bounds the range, since walking oldest first lists the whole
+                range before the first commit is processed, and to 'newest_first' otherwise.
+        
+        Raises:
+            ValueError: If the order is unknown.
+        """
+        if order is None:
+            order = 'oldest_first' if limit is not None or base or since else 'newest_first'
+        if order not in ORDERS:
+            raise ValueError(f"Unknown backfill order: {order}")
+        
+        self.messenger = messenger
+        self.target = target
+        self.head = head or target['branch']
+        self.base = base
+        self.since = since
+        self.until = until
+        self.limit = limit
+        self.dry_run = dry_run
+        self.export_path = export_path
+        self.checkpoint = checkpoint or BackfillCheckpoint()
+        self.chunk_size = max(chunk_size, 1)
+        self.commits_per_minute = commits_per_minute
+        self.pipeline = pipeline or messenger.pipeline
+        self.order = order
+        self.github_client = messenger.get_github_client(target['repository'])
+        self.export_lock = threading.Lock()
+        self.project_description = None
+        
+        # Dry runs keep their own progress, so they never mark a range as sent
+        self.key = (
+            f"{'dry-run:' if dry_run else ''}{target_name(target)}:{base or ''}..{self.head}"
+            f":{since.isoformat() if since else ''}..{until.isoformat() if until else ''}:{order}"
+        )
+        
+        # Oldest first, a limit picks the newest commits, so a different limit is a different range
+        if order == 'oldest_first' and limit is not None:
+            self.key += f":newest-{limit}"
+    
+    def run(self, restart=False):
+        """
+        Replay the range, resuming from the checkpoint unless restart is set.
+        
+        Commits that failed are kept in the checkpoint and tried again first by
+        the next run; the range is only done once none of them is left.
+        
+        Args:
+            restart (bool, optional): Ignore the checkpoint of the range. Defaults to False.
+        
+        Returns:
+            dict: 'listed', 'processed' and 'failed' commit counts of this run.
+        """
+        if restart:
+            self.checkpoint.clear(self.key)
+        
+        state = self.checkpoint.get(self.key) or {}
+        if state.get('done'):
+            logging.info(f"Backfill of {self.key} already completed; pass --restart to run it again.")
+            return {'listed': 0, 'processed': 0, 'failed': 0}
+        
+        position, commits = self.resume(state)
+        
+        # Commits that failed before the checkpoint are tried again first
+        retries = [commit for commit in map(self.github_client.get_commit, state.get('failed') or []) if commit]
+        if retries:
+            logging.info(f"Retrying {len(retries)} failed commit(s) of {self.key}")
+        retried = {commit.sha for commit in retries}
+        failed = list(retried)
+        commits = chain(retries, commits)
+        
+        self.project_description = self.messenger.get_project_description(self.github_client)
+        
+        stats = {'listed': 0, 'processed': 0, 'failed': 0}
+        processed = state.get('processed', 0)
+        while True:
+            chunk = list(islice(commits, self.chunk_size))
+            if not chunk:
+                break
+            
+            started = time.monotonic()
+            done, chunk_failed = self.process_chunk(chunk)
+            listed = [commit for commit in chunk if commit.sha not in retried]
+            shas = {commit.sha for commit in chunk}
+            failed = [sha for sha in failed if sha not in shas] + chunk_failed
+            position += len(listed)
+            processed += done
+            stats['listed'] += len(listed)
+            stats['processed'] += done
+            stats['failed'] += len(chunk_failed)
+            
+            progress = {'position': position, 'processed': processed, 'failed': failed}
+            if listed:
+                progress['last_sha'] = listed[-1].sha
+            self.checkpoint.update(self.key, **progress)
+            logging.info(f"Backfill of {target_name(self.target)}: {position} commits listed, {processed} processed")
+            self.throttle(started, len(chunk))
+        
+        # Newest first, a range cut short by the limit can be continued with a higher one
+        cut_short = self.order == 'newest_first' and self.limit is not None and position >= self.limit
+        self.checkpoint.update(self.key, done=not cut_short and not failed)
+        return stats
+    
+    def resume(self, state):
+        """
+        Open the commit listing, skipping the commits handled before the checkpoint.
+        
+        Skipped commits are only listed, never fetched or analyzed. When the
+        history no longer matches the checkpoint, the range starts over and
+        already delivered commits are skipped through the ledger.
+        
+        Args:
+            state (dict): Checkpoint of the range.
+        
+        Returns:
+            tuple: (position, iterator over the remaining commits).
+        """
+        commits = self.list_commits()
+        position = state.get('position', 0)
+        if not position:
+            return 0, commits
+        
+        last = deque(islice(commits, position), maxlen=1)
+        if last and last[0].sha == state.get('last_sha'):
+            logging.info(f"Resuming backfill of {self.key} after {position} commits")
+            return position, commits
+        
+        logging.warning(f"History of {self.key} changed since the checkpoint, starting over")
+        self.checkpoint.update(self.key, position=0, last_sha=None, failed=[])
+        return 0, self.list_commits()
+    
+    def list_commits(self):
+        """Open the commit listing of the range in the replay order."""
+        return self.github_client.iter_commits(
+            self.head, base=self.base, since=self.since, until=self.until,
+            reverse=self.order == 'oldest_first', limit=self.limit
+        )
+    
+    def process_chunk(self, chunk):
+        """
+        Run one chunk of commits through the pipeline.
+        
+        Args:
+            chunk (list): Commit objects, in replay order.
+        
+        Returns:
+            tuple: (processed commit count, SHAs of the commits that failed).
+        """
+        repository, branch = self.target['repository'], self.target['branch']
+        pending = chunk
+        if not self.dry_run:
+            pending = [commit for commit in chunk if not self.messenger.ledger.is_delivered(repository, branch, commit.sha)]
+        if not pending:
+            return 0, []
+        
+        prefetched = self.github_client.get_commit_details_batch(pending)
+        
+        analyze_batch = None
+        if self.messenger.commit_analyzer.batch_size > 1 and len(pending) > 1:
+            analyze_batch = lambda commits, details: self.analyze_batch(details)
+        
+        results = self.pipeline.run(
+            pending,
+            fetch=lambda commit: self.messenger.fetch_commit_details(self.github_client, commit, prefetched),
+            analyze=lambda commit, details: self.analyze(details),
+            deliver=lambda commit, details, description: self.deliver(details, description),
+            analyze_batch=analyze_batch
+        )
+        if self.dry_run:
+            failed = [commit.sha for commit, result in zip(pending, results) if not result['delivered']]
+        else:
+            # Commits no destination takes are recorded as delivered without a message
+            failed = [commit.sha for commit in pending if not self.messenger.ledger.is_delivered(repository, branch, commit.sha)]
+        return len(pending) - len(failed), failed
+    
+    def analyze(self, commit_details):
+        """
+        Describe a commit; dry runs reuse stored descriptions but write nothing to the ledger.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+        
+        Returns:
+            str: Description of the commit, or None if the analysis failed.
+        """
+        if not self.dry_run:
+            return self.messenger.analyze_commit_details(self.target, commit_details, self.project_description)
+        
+        entry = self.messenger.ledger.get_entry(self.target['repository'], self.target['branch'], commit_details['sha'])
+        if entry and entry['description']:
+            return entry['description']
+        return self.checked(self.messenger.commit_analyzer.analyze_commit(commit_details, self.project_description))
+    
+    def analyze_batch(self, commits_details):
+        """
+        Describe several commits with shared requests.
+        
+        Args:
+            commits_details (list): Commit details dictionaries.
+        
+        Returns:
+            list: Description of each commit, None where the analysis failed.
+        """
+        if not self.dry_run:
+            return self.messenger.analyze_commit_batch(self.target, commits_details, self.project_description)
+        return [
+            self.checked(description)
+            for description in self.messenger.commit_analyzer.analyze_commits(commits_details, self.project_description)
+        ]
+    
+    @staticmethod
+    def checked(description):
+        """Turn a failed dry-run analysis into None, so the commit counts as failed."""
+        if not description or description == ANALYSIS_FAILED_MESSAGE:
+            return None
+        return description
+    
+    def deliver(self, commit_details, description):
+        """
+        Export the description and, unless this is a dry run, send it to the target's destinations.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+            description (str): Description of the commit.
+        
+        Returns:
+            bool: True if the commit was handled.
+        """
+        if self.export_path:
+            self.export(commit_details, description)
+        
+        if self.dry_run:
+            subject = (commit_details.get('message') or '').split("\n")[0]
+            logging.info(f"Dry run: described {commit_details['sha'][:7]} {subject}")
+            return True
+        return self.messenger.deliver_commit(self.target, commit_details, description)
+    
+    def export(self, commit_details, description):
+        """
+        Append a commit and its rendered messages to the export file.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+            description (str): Description of the commit.
+        """
+        router = self.messenger.router
+        record = {
+            'repository': self.target['repository'],
+            'branch': self.target['branch'],
+            'sha': commit_details['sha'],
+            'author': commit_details.get('author', {}),
+            'message': commit_details.get('message', ''),
+            'url': commit_details.get('html_url', ''),
+            'description': description,
+            'messages': {
+                destination['name']: router.render(destination, self.target['project_name'], commit_details, description)
+                for destination in router.route(self.target, commit_details)
+            }
+        }
+        
+        with self.export_lock:
+            with open(self.export_path, 'a') as file:
+                file.write(json.dumps(record) + "\n")
+    
+    def throttle(self, started, count):
+        """
+        Sleep long enough to keep the processing rate under commits_per_minute.
+        
+        Args:
+            started (float): Monotonic time the chunk started.
+            count (int): Commits in the chunk.
+        """
+        if not self.commits_per_minute:
+            return
+        
+        remaining = count * 60 / self.commits_per_minute - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+def parse_date(value):
+    """Parse an ISO 8601 date or timestamp for the command line."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Not an ISO 8601 date: {value}")
+
+def parse_args(argv=None):
+    """Parse the backfill command line arguments."""
+    parser = argparse.ArgumentParser(description="Describe a range of commit history.")
+    parser.add_argument('--config', default='../config/config.yaml', help="Path to the configuration file.")
+    parser.add_argument('--repository', help="Repository in format 'username/repo'. Defaults to the first target.")
+    parser.add_argument('--branch', help="Branch to replay. Defaults to the target's branch.")
+    parser.add_argument('--range', dest='sha_range', metavar='BASE..HEAD',
+                        help="Commits after BASE up to HEAD; either side may be empty.")
+    parser.add_argument('--since', type=parse_date, help="Only commits after this ISO 8601 date.")
+    parser.add_argument('--until', type=parse_date, help="Only commits before this ISO 8601 date.")
+    parser.add_argument('--limit', type=int, help="Only replay the newest N commits of the range, in the replay order.")
+    parser.add_argument('--order', choices=ORDERS,
+                        help="Replay order. Defaults to backfill.order, else oldest_first for a bounded range and newest_first otherwise.")
+    parser.add_argument('--dry-run', action='store_true', help="Analyze without sending to Telegram.")
+    parser.add_argument('--export', dest='export_path', help="Append descriptions to this JSON Lines file.")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint of this range.")
+    parser.add_argument('--chunk-size', type=int, help="Commits processed per checkpoint.")
+    parser.add_argument('--max-concurrency', type=int, help="Cap on concurrent fetches and analyses.")
+    parser.add_argument('--commits-per-minute', type=float, help="Highest processing rate.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Replay a range of history through the pipeline."""
+    args = parse_args(argv)
+    
+    base, head = None, None
+    if args.sha_range:
+        if '..' not in args.sha_range:
+            logging.error("--range must look like BASE..HEAD")
+            return 2
+        base, head = (part.strip() or None for part in args.sha_range.split('..', 1))
+    
+    try:
+        messenger = SmartCommitMessenger(config_path=args.config)
+        backfill_config = messenger.config.get('backfill', {}) or {}
+        
+        target = messenger.targets[0] if messenger.targets else None
+        if args.repository or args.branch:
+            repository = args.repository or (target['repository'] if target else None)
+            branch = args.branch or (target['branch'] if target and not args.repository else 'main')
+            target = messenger.find_target(repository, branch) or next(iter(load_targets(
+                dict(messenger.config, targets=[{'repository': repository, 'branch': branch}])
+            )), None)
+        if not target:
+            logging.error("No repository to backfill.")
+            return 1
+        
+        pipeline = None
+        if args.max_concurrency:
+            pipeline_config = messenger.config.get('pipeline', {})
+            pipeline = CommitPipeline(
+                fetch_workers=pipeline_config.get('fetch_workers', 4),
+                analyze_workers=pipeline_config.get('analyze_workers', 2),
+                delivery_workers=pipeline_config.get('delivery_workers', 1),
+                max_concurrency=args.max_concurrency
+            )
+        
+        backfill = Backfill(
+            messenger, target,
+            head=head, base=base, since=args.since, until=args.until, limit=args.limit,
+            dry_run=args.dry_run, export_path=args.export_path,
+            checkpoint=BackfillCheckpoint(backfill_config.get('checkpoint_path', 'backfill_checkpoint.json')),
+            chunk_size=args.chunk_size or backfill_config.get('chunk_size', 20),
+            commits_per_minute=args.commits_per_minute or backfill_config.get('commits_per_minute'),
+            pipeline=pipeline,
+            order=args.order or backfill_config.get('order')
+        )
+        stats = backfill.run(restart=args.restart)
+        if not args.dry_run:
+            messenger.drain_outbox()
+    except Exception as e:
+        logging.error(f"Error running backfill: {str(e)}")
+        return 1
+    
+    logging.info(f"Backfill finished: {stats['listed']} listed, {stats['processed']} processed, {stats['failed']} failed")
+    return 0 if not stats['failed'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
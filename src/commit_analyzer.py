@@ -1,37 +1,15 @@
 import os
+import json
 import logging
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain
+from prompt_builder import PromptBuilder, README_TRUNCATED_MARKER
+from analyzer_backends import LangChainBackend
+from metrics import record_run
 
-class CommitAnalyzer:
-    """Analyzes commit information and generates human-readable descriptions using AI."""
-    
-    def __init__(self, model_name="gpt-3.5-turbo", max_tokens=500):
-        """
-        Initialize the commit analyzer.
-        
-        Args:
-            model_name (str, optional): Name of the OpenAI model to use. Defaults to "gpt-3.5-turbo".
-            max_tokens (int, optional): Maximum tokens for the response. Defaults to 500.
-        """
-        self.api_key = os.getenv('OPENAI_API_KEY')
-        if not self.api_key:
-            raise ValueError("OpenAI API key is required. Set it in .env file.")
-        
-        self.model_name = model_name
-        self.max_tokens = max_tokens
-        
-        # Initialize the language model
-        self.llm = ChatOpenAI(
-            model_name=self.model_name,
-            temperature=0.7,
-            max_tokens=self.max_tokens
-        )
-        
-        # Create the prompt template for commit analysis
-        self.prompt_template = ChatPromptTemplate.from_template(
-            """You are an expert at explaining technical changes in simple terms.
+# Description returned when the language model call fails
+ANALYSIS_FAILED_MESSAGE = "Failed to analyze commit due to an error."
+
+# Prompt template for commit analysis
+COMMIT_PROMPT = """You are an expert at explaining technical changes in simple terms.
             
             Analyze the following GitHub commit information and provide a clear, concise explanation 
             that would be understandable to non-technical team members.
@@ -55,15 +33,88 @@ class CommitAnalyzer:
             
             Keep your response concise and focused on explaining the changes in plain language.
             """
-        )
+
+# Prompt template analyzing several small commits in one request
+BATCH_PROMPT = """You are an expert at explaining technical changes in simple terms.
+            
+            Below are {count} commits from the same project. For each commit, provide a clear, concise
+            explanation that would be understandable to non-technical team members: what changed in
+            simple terms, the potential impact on the project, and anything important they should know.
+            
+            Project Description: {project_description}
+            
+            {commits}
+            
+            Respond with only a JSON array holding one object per commit, in the same order:
+            [{{"id": 1, "description": "..."}}, {{"id": 2, "description": "..."}}]
+            """
+
+# Prompt condensing a README into a short project description
+SUMMARY_PROMPT = """Summarize the following project README in at most {max_words} words.
+            
+            Describe what the project does, who it is for and its main components.
+            Leave out installation steps, badges, licensing and contribution guidelines.
+            
+            README:
+            {readme}
+            """
+
+class CommitAnalyzer:
+    """Analyzes commit information and generates human-readable descriptions using AI."""
+    
+    def __init__(self, model_name="gpt-3.5-turbo", max_tokens=500, cache=None, prompt_token_budget=None,
+                 batch_size=1, batch_token_budget=3000, request_timeout=None, backend=None, classifier=None):
+        """
+        Initialize the commit analyzer.
+        
+        Args:
+            model_name (str, optional): Name of the OpenAI model to use. Defaults to "gpt-3.5-turbo".
+            max_tokens (int, optional): Maximum tokens for the response. Defaults to 500.
+            cache (AnalysisCache, optional): Cache of previous descriptions. Defaults to None.
+            prompt_token_budget (int, optional): Maximum tokens of the commit prompt; larger
+                commits are condensed to fit. Defaults to None (no limit).
+            batch_size (int, optional): Maximum number of commits analyzed in one request by
+                analyze_commits(). Defaults to 1 (one request per commit).
+            batch_token_budget (int, optional): Maximum tokens of a batch prompt. Commits using more
+                than a quarter of it are analyzed on their own. Defaults to 3000.
+            request_timeout (float or tuple, optional): Timeout of OpenAI requests in seconds,
+                or a (connect, read) tuple, used by the default backend. Defaults to None (client default).
+            backend (AnalyzerBackend, optional): Backend completing the prompts.
+                Defaults to a LangChainBackend for model_name.
+            classifier (CommitClassifier, optional): Describes trivial commits without
+                asking the model. Defaults to None.
+        """
+        self.backend = backend or LangChainBackend(model_name, request_timeout=request_timeout)
+        
+        # Local backends run without an OpenAI account
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        if not self.api_key and self.backend.requires_api_key:
+            raise ValueError("OpenAI API key is required. Set it in .env file.")
+        
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.prompt_builder = PromptBuilder(model_name, prompt_token_budget) if prompt_token_budget else None
+        self.batch_size = max(1, batch_size)
+        self.batch_token_budget = batch_token_budget
+        self.token_counter = self.prompt_builder or PromptBuilder(model_name)
+        self.classifier = classifier
+    
+    def get_usage(self):
+        """
+        Get the requests and tokens used by the backend so far.
         
-        # Create the chain
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
+        Returns:
+            dict: 'requests', 'failures', 'prompt_tokens', 'completion_tokens' and 'total_tokens'.
+        """
+        return self.backend.get_usage()
     
     def format_files_changed(self, files_changed):
         """
         Format the files changed information for the prompt.
         
+        Files carrying selected diff hunks under 'patch' are followed by them.
+        
         Args:
             files_changed (list): List of dictionaries containing file change information.
             
@@ -82,16 +133,136 @@ class CommitAnalyzer:
             formatted_files += f"- {status}: {file.get('filename', '')} "
             formatted_files += f"(+{file.get('additions', 0)}, -{file.get('deletions', 0)})"
             formatted_files += "\n"
+            if file.get('patch'):
+                formatted_files += f"```diff\n{file['patch']}\n```\n"
         
         return formatted_files
     
-    def analyze_commit(self, commit_details, project_description=""):
+    def summarize_project(self, readme_content, max_words=150):
+        """
+        Condense a README into a short project description for the commit prompt.
+        
+        Args:
+            readme_content (str): Full README content.
+            max_words (int, optional): Maximum length of the summary. Defaults to 150.
+            
+        Returns:
+            str: Project summary, or empty string if the README is empty or summarizing failed.
+        """
+        if not readme_content or not readme_content.strip():
+            return ""
+        
+        try:
+            return self.backend.complete(
+                SUMMARY_PROMPT, {'readme': readme_content, 'max_words': max_words}, self.max_tokens
+            ).strip()
+        except Exception as e:
+            logging.error(f"Error summarizing project README: {str(e)}")
+            return ""
+    
+    async def asummarize_project(self, readme_content, max_words=150):
+        """
+        Asynchronously condense a README into a short project description.
+        
+        Args:
+            readme_content (str): Full README content.
+            max_words (int, optional): Maximum length of the summary. Defaults to 150.
+            
+        Returns:
+            str: Project summary, or empty string if the README is empty or summarizing failed.
+        """
+        if not readme_content or not readme_content.strip():
+            return ""
+        
+        try:
+            return (await self.backend.acomplete(
+                SUMMARY_PROMPT, {'readme': readme_content, 'max_words': max_words}, self.max_tokens
+            )).strip()
+        except Exception as e:
+            logging.error(f"Error summarizing project README: {str(e)}")
+            return ""
+    
+    def build_chain_input(self, commit_details, project_description=""):
+        """
+        Build the values substituted into the prompt template.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+            project_description (str, optional): Description of the project. Defaults to "".
+            
+        Returns:
+            dict: Input for the chain.
+        """
+        commit_message = commit_details.get('message', '')
+        
+        if self.prompt_builder:
+            # Condense the README, message and file list of large commits to fit the budget
+            project_description, commit_message, files_changed = self.prompt_builder.fit(
+                COMMIT_PROMPT,
+                project_description,
+                commit_message,
+                commit_details.get('files_changed', []),
+                self.format_files_changed
+            )
+        else:
+            # Format the files changed information
+            files_changed = self.format_files_changed(commit_details.get('files_changed', []))
+        
+        # GraphQL details only carry the number of changed files
+        if not commit_details.get('files_changed') and commit_details.get('files_count'):
+            files_changed = f"- {commit_details['files_count']} file(s), names not available\n"
+        
+        return {
+            'project_description': project_description,
+            'commit_message': commit_message,
+            'files_changed': files_changed,
+            'additions': commit_details.get('stats', {}).get('additions', 0),
+            'deletions': commit_details.get('stats', {}).get('deletions', 0),
+            'total_changes': commit_details.get('stats', {}).get('total', 0)
+        }
+    
+    def get_cached(self, chain_input):
+        """
+        Look up a previous description for the same chain input.
+        
+        Args:
+            chain_input (dict): Input for the chain.
+            
+        Returns:
+            tuple: (cache key, cached description), both None when caching is disabled.
+        """
+        if not self.cache:
+            return None, None
+        
+        cache_key = self.cache.make_key(chain_input, self.model_name, self.max_tokens)
+        cached = self.cache.get(cache_key)
+        record_run('analysis_cache_misses' if cached is None else 'analysis_cache_hits')
+        return cache_key, cached
+    
+    def get_templated(self, commit_details):
+        """
+        Get the templated description of a trivial commit.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+            
+        Returns:
+            str: Templated description, or None if the classifier is disabled or the commit needs the model.
+        """
+        description = self.classifier.classify(commit_details) if self.classifier else None
+        if description:
+            record_run('templated')
+        return description
+    
+    def analyze_commit(self, commit_details, project_description="", on_token=None):
         """
         Analyze a commit and generate a human-readable description.
         
         Args:
             commit_details (dict): Dictionary containing commit details.
             project_description (str, optional): Description of the project. Defaults to "".
+            on_token (callable, optional): Called with each piece of the description as the
+                model generates it. Not called for cached and templated descriptions. Defaults to None.
             
         Returns:
             str: Human-readable description of the commit changes.
@@ -100,24 +271,358 @@ class CommitAnalyzer:
             logging.error("No commit details provided for analysis.")
             return ""
         
+        # Trivial commits get a templated description without a model call
+        description = self.get_templated(commit_details)
+        if description:
+            return description
+        
         try:
-            # Format the files changed information
-            files_changed = self.format_files_changed(commit_details.get('files_changed', []))
+            chain_input = self.build_chain_input(commit_details, project_description)
             
-            # Prepare the input for the chain
-            chain_input = {
-                'project_description': project_description,
-                'commit_message': commit_details.get('message', ''),
-                'files_changed': files_changed,
-                'additions': commit_details.get('stats', {}).get('additions', 0),
-                'deletions': commit_details.get('stats', {}).get('deletions', 0),
-                'total_changes': commit_details.get('stats', {}).get('total', 0)
-            }
+            # Return the stored description if this exact prompt was analyzed before
+            cache_key, cached = self.get_cached(chain_input)
+            if cached is not None:
+                return cached
+        
+        except Exception as e:
+            logging.error(f"Error analyzing commit: {str(e)}")
+            return ANALYSIS_FAILED_MESSAGE
+        
+        return self.generate(chain_input, cache_key, on_token)
+    
+    def generate(self, chain_input, cache_key, on_token=None):
+        """
+        Ask the model for the description of a commit that is neither templated nor cached.
+        
+        Args:
+            chain_input (dict): Input built by build_chain_input().
+            cache_key (str): Cache key from get_cached(), None when caching is disabled.
+            on_token (callable, optional): Called with each piece of the description as the
+                model generates it. Defaults to None.
+            
+        Returns:
+            str: Human-readable description of the commit changes.
+        """
+        try:
+            result = self.backend.complete(COMMIT_PROMPT, chain_input, self.max_tokens, on_token).strip()
+            
+            if result:
+                record_run('generated')
+            if self.cache and result:
+                self.cache.set(cache_key, result)
             
-            # Run the chain to get the description
-            result = self.chain.run(chain_input)
-            return result.strip()
+            return result
         
         except Exception as e:
             logging.error(f"Error analyzing commit: {str(e)}")
-            return "Failed to analyze commit due to an error."
\ No newline at end of file
+            return ANALYSIS_FAILED_MESSAGE
+    
+    async def aanalyze_commit(self, commit_details, project_description="", on_token=None):
+        """
+        Asynchronously analyze a commit and generate a human-readable description.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+            project_description (str, optional): Description of the project. Defaults to "".
+            on_token (callable, optional): Called with each piece of the description as the
+                model generates it. Not called for cached and templated descriptions. Defaults to None.
+            
+        Returns:
+            str: Human-readable description of the commit changes.
+        """
+        if not commit_details:
+            logging.error("No commit details provided for analysis.")
+            return ""
+        
+        # Trivial commits get a templated description without a model call
+        description = self.get_templated(commit_details)
+        if description:
+            return description
+        
+        try:
+            chain_input = self.build_chain_input(commit_details, project_description)
+            
+            cache_key, cached = self.get_cached(chain_input)
+            if cached is not None:
+                return cached
+        
+        except Exception as e:
+            logging.error(f"Error analyzing commit: {str(e)}")
+            return ANALYSIS_FAILED_MESSAGE
+        
+        return await self.agenerate(chain_input, cache_key, on_token)
+    
+    async def agenerate(self, chain_input, cache_key, on_token=None):
+        """
+        Asynchronously ask the model for the description of a commit that is neither templated nor cached.
+        
+        Args:
+            chain_input (dict): Input built by build_chain_input().
+            cache_key (str): Cache key from get_cached(), None when caching is disabled.
+            on_token (callable, optional): Called with each piece of the description as the
+                model generates it. Defaults to None.
+            
+        Returns:
+            str: Human-readable description of the commit changes.
+        """
+        try:
+            result = (await self.backend.acomplete(COMMIT_PROMPT, chain_input, self.max_tokens, on_token)).strip()
+            
+            if result:
+                record_run('generated')
+            if self.cache and result:
+                self.cache.set(cache_key, result)
+            
+            return result
+        
+        except Exception as e:
+            logging.error(f"Error analyzing commit: {str(e)}")
+            return ANALYSIS_FAILED_MESSAGE
+    
+    def analyze_commits(self, commits_details, project_description=""):
+        """
+        Analyze several commits, packing small ones into shared requests.
+        
+        Commits are grouped into batches of up to batch_size within the batch
+        token budget and answered by one request each. Large commits, batches
+        of one and commits missing from a batch response get a request of their
+        own, reusing the prompt and cache key built while planning.
+        
+        Args:
+            commits_details (list): Commit details dictionaries.
+            project_description (str, optional): Description of the project. Defaults to "".
+            
+        Returns:
+            list: Description of each commit, in input order.
+        """
+        descriptions, singles, batches, prepared = self.plan_batches(commits_details, project_description)
+        
+        for batch in batches:
+            try:
+                # Batches answer for several commits, so they get a proportionally larger response limit
+                response = self.backend.complete(
+                    BATCH_PROMPT, self.build_batch_input(batch, project_description), self.max_tokens * len(batch)
+                )
+                answered = self.finish_batch(batch, response)
+            except Exception as e:
+                logging.error(f"Error analyzing commit batch: {str(e)}")
+                answered = {}
+            
+            descriptions.update(answered)
+            singles.extend(index for index, _, _ in batch if index not in answered)
+        
+        for index in singles:
+            if index in prepared:
+                descriptions[index] = self.generate(*prepared[index])
+            else:
+                descriptions[index] = self.analyze_commit(commits_details[index], project_description)
+        
+        return [descriptions[index] for index in range(len(commits_details))]
+    
+    async def aanalyze_commits(self, commits_details, project_description=""):
+        """
+        Asynchronously analyze several commits, packing small ones into shared requests.
+        
+        Args:
+            commits_details (list): Commit details dictionaries.
+            project_description (str, optional): Description of the project. Defaults to "".
+            
+        Returns:
+            list: Description of each commit, in input order.
+        """
+        descriptions, singles, batches, prepared = self.plan_batches(commits_details, project_description)
+        
+        for batch in batches:
+            try:
+                response = await self.backend.acomplete(
+                    BATCH_PROMPT, self.build_batch_input(batch, project_description), self.max_tokens * len(batch)
+                )
+                answered = self.finish_batch(batch, response)
+            except Exception as e:
+                logging.error(f"Error analyzing commit batch: {str(e)}")
+                answered = {}
+            
+            descriptions.update(answered)
+            singles.extend(index for index, _, _ in batch if index not in answered)
+        
+        for index in singles:
+            if index in prepared:
+                descriptions[index] = await self.agenerate(*prepared[index])
+            else:
+                descriptions[index] = await self.aanalyze_commit(commits_details[index], project_description)
+        
+        return [descriptions[index] for index in range(len(commits_details))]
+    
+    def plan_batches(self, commits_details, project_description=""):
+        """
+        Split commits into cached results, individual calls and batches.
+        
+        Args:
+            commits_details (list): Commit details dictionaries.
+            project_description (str, optional): Description of the project. Defaults to "".
+            
+        Returns:
+            tuple: (descriptions by index for cached, trivial and empty commits, indexes to analyze
+                individually, list of batches of (index, cache key, commit text) tuples, and
+                (chain input, cache key) by index for the commits that still need the model).
+        """
+        descriptions = {}
+        singles = []
+        batches = []
+        prepared = {}
+        
+        if self.batch_size == 1:
+            return descriptions, list(range(len(commits_details))), batches, prepared
+        
+        overhead = self.token_counter.count_tokens(BATCH_PROMPT) + self.token_counter.count_tokens(
+            self.fit_batch_description(project_description)
+        )
+        batch, used = [], overhead
+        for index, commit_details in enumerate(commits_details):
+            if not commit_details:
+                descriptions[index] = ""
+                continue
+            
+            description = self.get_templated(commit_details)
+            if description:
+                descriptions[index] = description
+                continue
+            
+            chain_input = self.build_chain_input(commit_details, project_description)
+            cache_key, cached = self.get_cached(chain_input)
+            if cached is not None:
+                descriptions[index] = cached
+                continue
+            
+            prepared[index] = (chain_input, cache_key)
+            text = self.format_batch_commit(len(batch) + 1, chain_input)
+            tokens = self.token_counter.count_tokens(text)
+            if tokens > self.batch_token_budget // 4:
+                singles.append(index)
+                continue
+            
+            if len(batch) == self.batch_size or used + tokens > self.batch_token_budget:
+                batches.append(batch)
+                batch, used = [], overhead
+                text = self.format_batch_commit(1, chain_input)
+            
+            batch.append((index, cache_key, text))
+            used += tokens
+        
+        if batch:
+            batches.append(batch)
+        
+        # A batch of one is just a regular request
+        for batch in [batch for batch in batches if len(batch) == 1]:
+            batches.remove(batch)
+            singles.append(batch[0][0])
+        
+        return descriptions, singles, batches, prepared
+    
+    def fit_batch_description(self, project_description):
+        """Shorten the project description to the share of the batch budget a single prompt would give it."""
+        if not self.prompt_builder:
+            return project_description
+        return self.prompt_builder.truncate(
+            project_description,
+            int(self.batch_token_budget * self.prompt_builder.readme_share),
+            README_TRUNCATED_MARKER
+        )
+    
+    @staticmethod
+    def format_batch_commit(number, chain_input):
+        """
+        Format one commit of a batch prompt.
+        
+        Args:
+            number (int): Position of the commit in the batch, starting at 1.
+            chain_input (dict): Input built by build_chain_input().
+            
+        Returns:
+            str: Commit section of the batch prompt.
+        """
+        return (
+            f"Commit {number}:\n"
+            f"Commit Message: {chain_input['commit_message']}\n"
+            f"Files Changed:\n{chain_input['files_changed']}"
+            f"Stats: +{chain_input['additions']}, -{chain_input['deletions']}, "
+            f"{chain_input['total_changes']} total changes\n"
+        )
+    
+    def build_batch_input(self, batch, project_description):
+        """
+        Build the values substituted into the batch prompt template.
+        
+        Args:
+            batch (list): (index, cache key, commit text) tuples.
+            project_description (str): Description of the project.
+            
+        Returns:
+            dict: Input for the batch chain.
+        """
+        return {
+            'count': len(batch),
+            'project_description': self.fit_batch_description(project_description),
+            'commits': "\n".join(text for _, _, text in batch)
+        }
+    
+    def finish_batch(self, batch, response):
+        """
+        Map a batch response back to the commits and cache the descriptions.
+        
+        Args:
+            batch (list): (index, cache key, commit text) tuples.
+            response (str): Raw model response.
+            
+        Returns:
+            dict: Descriptions by commit index, for the commits the response answered.
+        """
+        parsed = self.parse_batch_response(response)
+        
+        answered = {}
+        for number, (index, cache_key, _) in enumerate(batch, start=1):
+            description = parsed.get(number)
+            if not description:
+                continue
+            
+            answered[index] = description
+            if self.cache:
+                self.cache.set(cache_key, description)
+        
+        record_run('generated', len(answered))
+        if len(answered) < len(batch):
+            logging.warning(f"Batch response answered {len(answered)} of {len(batch)} commits")
+        
+        return answered
+    
+    @staticmethod
+    def parse_batch_response(response):
+        """
+        Parse the JSON array returned for a batch.
+        
+        Args:
+            response (str): Raw model response, possibly wrapped in a code fence.
+            
+        Returns:
+            dict: Non-empty descriptions by commit number, empty if the response is not valid.
+        """
+        start, end = response.find('['), response.rfind(']')
+        if start == -1 or end < start:
+            return {}
+        
+        try:
+            items = json.loads(response[start:end + 1])
+        except ValueError:
+            return {}
+        
+        parsed = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict) or not isinstance(item.get('description'), str):
+                continue
+            try:
+                number = int(item.get('id'))
+            except (TypeError, ValueError):
+                continue
+            if item['description'].strip():
+                parsed[number] = item['description'].strip()
+        return parsed
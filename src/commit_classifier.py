@@ -0,0 +1,217 @@
+import os
+import re
+import threading
+
+# Rules in the order they are tried
+RULES = ('merge', 'version_bump', 'lockfile', 'ci', 'docs')
+
+# Rules that look at the changed files and never match commits without a file list
+FILE_RULES = ('version_bump', 'lockfile', 'ci', 'docs')
+
+MERGE_PATTERN = re.compile(r"^Merge (pull request #\d+ from \S+|branch '[^']+'|remote-tracking branch '[^']+')")
+CONVENTIONAL_PATTERN = re.compile(r"^(\w+)(\([^)]*\))?!?:\s*")
+VERSION_MESSAGE_PATTERN = re.compile(
+    r"^(chore\(release\)|release\b|bump(ed)? (the )?version|version bump|v?\d+\.\d+\.\d+\S*$)", re.IGNORECASE
+)
+VERSION_PATTERN = re.compile(r"\bv?(\d+\.\d+\.\d+(?:[-+][0-9A-Za-z.-]+)?)\b")
+
+LOCKFILES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'bun.lockb', 'poetry.lock',
+    'Pipfile.lock', 'pdm.lock', 'uv.lock', 'Cargo.lock', 'go.sum', 'composer.lock', 'Gemfile.lock',
+    'mix.lock', 'pubspec.lock', 'packages.lock.json', 'flake.lock'
+}
+VERSION_FILES = {
+    'package.json', 'pyproject.toml', 'setup.py', 'setup.cfg', 'version.py', '_version.py', '__version__.py',
+    '__init__.py', 'VERSION', 'version.txt', 'Cargo.toml', 'pom.xml', 'build.gradle', 'gradle.properties',
+    'Chart.yaml', 'mix.exs', 'CHANGELOG.md', 'CHANGES.md', 'HISTORY.md', 'NEWS.md'
+}
+CI_FILES = {
+    '.gitlab-ci.yml', '.travis.yml', 'azure-pipelines.yml', 'Jenkinsfile', '.drone.yml',
+    'bitbucket-pipelines.yml', 'appveyor.yml', '.github/dependabot.yml'
+}
+CI_DIRECTORIES = ('.github/workflows/', '.circleci/', '.gitlab/ci/', '.buildkite/')
+DOC_EXTENSIONS = {'.md', '.rst', '.adoc'}
+DOC_DIRECTORIES = ('docs/', 'doc/')
+
+# Plain text files only count as documentation in a docs directory or with one of these names
+TEXT_DOC_NAMES = ('readme', 'license', 'licence', 'copying', 'authors', 'contributors', 'notice', 'changelog', 'changes')
+
+# Text files that configure the build or dependencies, wherever they are
+BUILD_TEXT_PATTERN = re.compile(r"^(requirements.*|constraints.*|CMakeLists)\.txt$", re.IGNORECASE)
+
+class CommitClassifier:
+    """Recognizes trivial commits and describes them from templates instead of asking the model."""
+    
+    def __init__(self, rules=RULES, max_changed_lines=20):
+        """
+        Initialize the commit classifier.
+        
+        Args:
+            rules (list, optional): Names of the rules to apply, out of RULES. Defaults to all rules.
+            max_changed_lines (int, optional): Largest version bump or documentation change
+                still treated as trivial. Defaults to 20.
+        
+        Raises:
+            ValueError: If a rule name is unknown.
+        """
+        unknown = set(rules) - set(RULES)
+        if unknown:
+            raise ValueError(f"Unknown classifier rules: {', '.join(sorted(unknown))}")
+        
+        self.rules = [rule for rule in RULES if rule in rules]
+        self.max_changed_lines = max_changed_lines
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.matches = {rule: 0 for rule in self.rules}
+    
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create the classifier from the `classifier` configuration section.
+        
+        Args:
+            config (dict): Configuration dictionary.
+        
+        Returns:
+            CommitClassifier: Classifier, or None if it is disabled.
+        """
+        classifier_config = config.get('classifier', {}) or {}
+        if not classifier_config.get('enabled', True):
+            return None
+        return cls(
+            rules=classifier_config.get('rules', RULES),
+            max_changed_lines=classifier_config.get('max_changed_lines', 20)
+        )
+    
+    def classify(self, commit_details):
+        """
+        Describe a commit if one of the rules recognizes it as trivial.
+        
+        Args:
+            commit_details (dict): Dictionary containing commit details.
+        
+        Returns:
+            str: Templated description, or None if the commit needs the model.
+        """
+        message = commit_details.get('message', '').strip()
+        files = commit_details.get('files_changed', [])
+        
+        description = None
+        for rule in self.rules:
+            description = getattr(self, f"match_{rule}")(message, files, commit_details.get('stats', {}))
+            if description:
+                break
+        
+        with self.lock:
+            self.checked += 1
+            if description:
+                self.matches[rule] += 1
+        return description
+    
+    def get_file_rules(self):
+        """
+        Get the enabled rules that need the list of changed files.
+        
+        Returns:
+            list: Names of the enabled rules out of FILE_RULES.
+        """
+        return [rule for rule in self.rules if rule in FILE_RULES]
+    
+    def get_stats(self):
+        """
+        Get the number of commits checked and the model calls avoided.
+        
+        Returns:
+            dict: 'checked', 'skipped' and the matches of each rule under 'rules'.
+        """
+        with self.lock:
+            return {'checked': self.checked, 'skipped': sum(self.matches.values()), 'rules': dict(self.matches)}
+    
+    def match_merge(self, message, files, stats):
+        """Describe merge commits, whose changes are described in the merged commits."""
+        first_line = message.splitlines()[0] if message else ""
+        if not MERGE_PATTERN.match(first_line):
+            return None
+        
+        # Pull request merges carry the pull request title after a blank line
+        title = next((line.strip() for line in message.splitlines()[1:] if line.strip()), "")
+        subject = f"{first_line} ({title})" if title else first_line
+        return (
+            f"{subject}. This merge combines work that was already done elsewhere and adds no changes "
+            f"of its own; the merged changes are described in their own commits."
+        )
+    
+    def match_version_bump(self, message, files, stats):
+        """Describe small commits that only raise the version number."""
+        subject = CONVENTIONAL_PATTERN.sub("", message.splitlines()[0]) if message else ""
+        if not files or not (VERSION_MESSAGE_PATTERN.match(message) or VERSION_MESSAGE_PATTERN.match(subject)):
+            return None
+        if stats.get('total', 0) > self.max_changed_lines:
+            return None
+        if not all(self.basename(file) in VERSION_FILES | LOCKFILES for file in files):
+            return None
+        
+        version = VERSION_PATTERN.search(message)
+        release = f"version {version.group(1)}" if version else "a new version"
+        return (
+            f"The project was prepared for release as {release}. Only version numbers and release notes "
+            f"changed ({self.list_files(files)}), so the project works as before."
+        )
+    
+    def match_lockfile(self, message, files, stats):
+        """Describe commits that only touch dependency lock files."""
+        if not files or not all(self.basename(file) in LOCKFILES for file in files):
+            return None
+        return (
+            f"Dependency lock files were updated ({self.list_files(files)}). They record the exact versions "
+            f"of the third-party libraries the project uses; the project's own code did not change."
+        )
+    
+    def match_ci(self, message, files, stats):
+        """Describe commits that only change the continuous integration configuration."""
+        if not files or not all(self.is_ci_file(file.get('filename', '')) for file in files):
+            return None
+        return (
+            f"The automated build and test setup was adjusted ({self.list_files(files)}). This changes how "
+            f"new work is checked, not how the project itself behaves."
+        )
+    
+    def match_docs(self, message, files, stats):
+        """Describe small documentation-only commits such as typo fixes."""
+        if not files or not all(self.is_doc_file(file.get('filename', '')) for file in files):
+            return None
+        if stats.get('total', 0) > self.max_changed_lines:
+            return None
+        return (
+            f"A small documentation update in {self.list_files(files)} "
+            f"(+{stats.get('additions', 0)}, -{stats.get('deletions', 0)}). "
+            f"The project's behaviour is unchanged."
+        )
+    
+    @staticmethod
+    def basename(file):
+        """Get the file name of a changed file without its directory."""
+        return os.path.basename(file.get('filename', ''))
+    
+    @staticmethod
+    def is_ci_file(path):
+        """Check whether a path belongs to the continuous integration configuration."""
+        return path in CI_FILES or os.path.basename(path) in CI_FILES or path.startswith(CI_DIRECTORIES)
+    
+    @staticmethod
+    def is_doc_file(path):
+        """Check whether a path is documentation."""
+        name = os.path.basename(path)
+        if BUILD_TEXT_PATTERN.match(name):
+            return False
+        if os.path.splitext(name)[1].lower() == '.txt':
+            return path.startswith(DOC_DIRECTORIES) or name.lower().startswith(TEXT_DOC_NAMES)
+        return os.path.splitext(name)[1].lower() in DOC_EXTENSIONS or path.startswith(DOC_DIRECTORIES)
+    
+    def list_files(self, files, limit=3):
+        """List the names of up to limit changed files."""
+        names = [self.basename(file) for file in files]
+        listed = ", ".join(names[:limit])
+        if len(names) > limit:
+            listed += f" and {len(names) - limit} more"
+        return listed
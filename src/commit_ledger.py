@@ -0,0 +1,236 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+
+# Delivery status values stored in the ledger
+STATUS_ANALYZED = 'analyzed'
+STATUS_DELIVERED = 'delivered'
+STATUS_QUEUED = 'queued'
+STATUS_FAILED = 'failed'
+
+class CommitLedger:
+    """Persistent record of processed commits, keyed by repository, branch and SHA."""
+    
+    def __init__(self, path="commit_ledger.db"):
+        """
+        Initialize the commit ledger.
+        
+        The database is opened lazily on first use and entries are looked up
+        one at a time, so a cold start never loads the whole ledger.
+        
+        Args:
+            path (str, optional): Path to the SQLite database file. Defaults to "commit_ledger.db".
+        """
+        self.path = path
+        self.connection = None
+        self.lock = threading.Lock()
+        
+        # Keys already known to be delivered, filled as lookups happen
+        self.delivered_keys = set()
+    
+    def connect(self):
+        """
+        Open the database and create the schema if needed.
+        
+        Returns:
+            sqlite3.Connection: Open database connection.
+        """
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS commits (
+                    repository TEXT NOT NULL,
+                    branch TEXT NOT NULL,
+                    sha TEXT NOT NULL,
+                    description TEXT,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (repository, branch, sha)
+                )"""
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS destinations (
+                    repository TEXT NOT NULL,
+                    branch TEXT NOT NULL,
+                    sha TEXT NOT NULL,
+                    destination TEXT NOT NULL,
+                    delivered_at REAL NOT NULL,
+                    PRIMARY KEY (repository, branch, sha, destination)
+                )"""
+            )
+            self.connection.commit()
+        return self.connection
+    
+    def close(self):
+        """Close the database connection if it is open."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+    
+    def get_entry(self, repository, branch, sha):
+        """
+        Get the ledger entry for a commit.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+        
+        Returns:
+            dict: Entry with 'description', 'status' and 'updated_at', or None if not recorded.
+        """
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT description, status, updated_at FROM commits "
+                "WHERE repository = ? AND branch = ? AND sha = ?",
+                (repository, branch, sha)
+            ).fetchone()
+        
+        if not row:
+            return None
+        
+        if row[1] in (STATUS_DELIVERED, STATUS_QUEUED):
+            self.delivered_keys.add((repository, branch, sha))
+        
+        return {'description': row[0], 'status': row[1], 'updated_at': row[2]}
+    
+    def is_delivered(self, repository, branch, sha):
+        """
+        Check whether a commit has already been delivered or queued in the outbox.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+        
+        Returns:
+            bool: True if the commit was delivered or queued before, False otherwise.
+        """
+        if (repository, branch, sha) in self.delivered_keys:
+            return True
+        
+        entry = self.get_entry(repository, branch, sha)
+        return bool(entry) and entry['status'] in (STATUS_DELIVERED, STATUS_QUEUED)
+    
+    def is_sent(self, repository, branch, sha):
+        """
+        Check whether the messages for a commit were actually sent, not just queued.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+        
+        Returns:
+            bool: True if the commit was delivered, False otherwise.
+        """
+        entry = self.get_entry(repository, branch, sha)
+        return bool(entry) and entry['status'] == STATUS_DELIVERED
+    
+    def record_analysis(self, repository, branch, sha, description):
+        """
+        Record the analysis result for a commit.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+            description (str): Generated description of the commit.
+        """
+        self._upsert(repository, branch, sha, description, STATUS_ANALYZED)
+    
+    def record_delivery(self, repository, branch, sha, success):
+        """
+        Record the delivery status for a commit.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+            success (bool): Whether the message was delivered.
+        """
+        status = STATUS_DELIVERED if success else STATUS_FAILED
+        self._upsert(repository, branch, sha, None, status)
+        
+        # A queued message that was given up makes the commit pending again
+        if success:
+            self.delivered_keys.add((repository, branch, sha))
+        else:
+            self.delivered_keys.discard((repository, branch, sha))
+    
+    def record_queued(self, repository, branch, sha):
+        """
+        Record that the message for a commit was handed to the outbox.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+        """
+        self._upsert(repository, branch, sha, None, STATUS_QUEUED)
+        self.delivered_keys.add((repository, branch, sha))
+    
+    def get_destinations(self, repository, branch, sha):
+        """
+        Get the destinations a commit was already delivered or queued to.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+        
+        Returns:
+            set: Names of the destinations.
+        """
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT destination FROM destinations WHERE repository = ? AND branch = ? AND sha = ?",
+                (repository, branch, sha)
+            ).fetchall()
+        return {row[0] for row in rows}
+    
+    def record_destination(self, repository, branch, sha, destination):
+        """
+        Record that the message for a commit was delivered or queued to one destination.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            sha (str): Commit SHA.
+            destination (str): Name of the destination.
+        """
+        try:
+            with self.lock:
+                connection = self.connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO destinations (repository, branch, sha, destination, delivered_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (repository, branch, sha, destination, time.time())
+                )
+                connection.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to update commit ledger for {sha}: {str(e)}")
+    
+    def _upsert(self, repository, branch, sha, description, status):
+        """Insert or update an entry, keeping the stored description when none is given."""
+        try:
+            with self.lock:
+                connection = self.connect()
+                connection.execute(
+                    "INSERT INTO commits (repository, branch, sha, description, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (repository, branch, sha) DO UPDATE SET "
+                    "description = COALESCE(excluded.description, commits.description), "
+                    "status = excluded.status, updated_at = excluded.updated_at",
+                    (repository, branch, sha, description, status, time.time())
+                )
+                connection.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to update commit ledger for {sha}: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+from fnmatch import fnmatchcase
+from concurrent.futures import ThreadPoolExecutor
+from metrics import bind_context
+
+# Template rendered by the sender's own commit formatter
+DEFAULT_TEMPLATE = 'full'
+
+# Named message templates; custom templates use the same placeholders
+TEMPLATES = {
+    DEFAULT_TEMPLATE: None,
+    'brief': "*{project}*: {subject}\n\n{summary}\n\n[View on GitHub]({url})",
+    'headline': "*{project}*: {subject} ({author}, +{additions}/-{deletions}) [{short_sha}]({url})"
+}
+
+def load_destinations(entry, telegram_config, channel_id):
+    """
+    Build the delivery destinations of a target.
+    
+    Destinations come from the target's own `destinations` list, then from
+    `telegram.destinations`. Without either, the target's channel is the only
+    destination and gets the full message.
+    
+    Args:
+        entry (dict): Target entry from the configuration.
+        telegram_config (dict): The `telegram` configuration section.
+        channel_id (str): Channel of the target.
+    
+    Returns:
+        list: Destination dictionaries with name, channel_id, template and filters.
+    
+    Raises:
+        ValueError: If a destination has no channel or names an unknown template.
+    """
+    entries = entry.get('destinations') or telegram_config.get('destinations')
+    if not entries:
+        return [{
+            'name': str(channel_id or 'default'), 'channel_id': channel_id, 'template': DEFAULT_TEMPLATE,
+            'paths': [], 'exclude_paths': [], 'authors': [], 'exclude_authors': []
+        }]
+    
+    destinations = []
+    for destination in entries:
+        if not destination.get('channel_id'):
+            raise ValueError(f"Destination without a channel_id: {destination}")
+        
+        template = destination.get('template') or DEFAULT_TEMPLATE
+        if template not in TEMPLATES and '{' not in template:
+            raise ValueError(f"Unknown message template: {template}")
+        
+        destinations.append({
+            'name': destination.get('name') or str(destination['channel_id']),
+            'channel_id': destination['channel_id'],
+            'template': template,
+            'paths': list(destination.get('paths') or []),
+            'exclude_paths': list(destination.get('exclude_paths') or []),
+            'authors': [author.lower() for author in destination.get('authors') or []],
+            'exclude_authors': [author.lower() for author in destination.get('exclude_authors') or []]
+        })
+    return destinations
+
+class TemplateFields(dict):
+    """Template values that leave unknown placeholders in place instead of failing."""
+    
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+class DeliveryRouter:
+    """Fans the description of a commit out to every destination of its target."""
+    
+    def __init__(self, render_default, max_workers=4):
+        """
+        Initialize the delivery router.
+        
+        Args:
+            render_default (callable): Formats the full message from project name,
+                commit details and description.
+            max_workers (int, optional): Destinations rendered and sent at once. Defaults to 4.
+        """
+        self.render_default = render_default
+        self.max_workers = max(max_workers, 1)
+    
+    @staticmethod
+    def matches(destination, commit_details):
+        """
+        Check whether a commit passes the path and author filters of a destination.
+        
+        Path filters are glob patterns matched against the changed files; a
+        commit touching only excluded files is not delivered.
+        
+        Args:
+            destination (dict): Destination from load_destinations().
+            commit_details (dict): Dictionary containing commit details.
+        
+        Returns:
+            bool: True if the commit should be sent to the destination.
+        """
+        author = commit_details.get('author', {}) or {}
+        identities = {(author.get('name') or '').lower(), (author.get('email') or '').lower()} - {''}
+        if destination['authors'] and not identities & set(destination['authors']):
+            return False
+        if identities & set(destination['exclude_authors']):
+            return False
+        
+        files = [file.get('filename', '') for file in commit_details.get('files_changed', [])]
+        relevant = [
+            filename for filename in files
+            if not any(fnmatchcase(filename, pattern) for pattern in destination['exclude_paths'])
+        ]
+        if files and not relevant:
+            return False
+        if destination['paths']:
+            return any(fnmatchcase(filename, pattern) for filename in relevant for pattern in destination['paths'])
+        return True
+    
+    def route(self, target, commit_details, skip=()):
+        """
+        Get the destinations of a target that should receive a commit.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            skip (iterable, optional): Names of destinations already served. Defaults to none.
+        
+        Returns:
+            list: Matching destinations, in configuration order.
+        """
+        return [
+            destination for destination in target['destinations']
+            if destination['name'] not in skip and self.matches(destination, commit_details)
+        ]
+    
+    def render(self, destination, project_name, commit_details, description):
+        """
+        Format the message for a commit with the template of a destination.
+        
+        Args:
+            destination (dict): Destination from load_destinations().
+            project_name (str): Name of the project.
+            commit_details (dict): Dictionary containing commit details.
+            description (str): Description of the commit.
+        
+        Returns:
+            str: Formatted message.
+        """
+        template = TEMPLATES.get(destination['template'], destination['template'])
+        if template is None:
+            return self.render_default(project_name, commit_details, description)
+        
+        message = commit_details.get('message', '') or 'No commit message'
+        author = commit_details.get('author', {}) or {}
+        stats = commit_details.get('stats', {}) or {}
+        sha = commit_details.get('sha', '')
+        return template.format_map(TemplateFields(
+            project=project_name,
+            subject=message.split("\n")[0],
+            message=message,
+            author=author.get('name') or 'Unknown',
+            author_email=author.get('email', ''),
+            sha=sha,
+            short_sha=sha[:7],
+            url=commit_details.get('html_url', ''),
+            files=commit_details.get('files_count', len(commit_details.get('files_changed', []))),
+            additions=stats.get('additions', 0),
+            deletions=stats.get('deletions', 0),
+            description=description,
+            summary=description.strip().split("\n\n")[0]
+        ))
+    
+    def fan_out(self, items, send):
+        """
+        Send to several destinations at once.
+        
+        Args:
+            items (list): One entry per message, passed to send.
+            send (callable): Renders and sends one entry, returning True on success.
+        
+        Returns:
+            list: Result of each send, in the order of items; False where it raised.
+        """
+        if len(items) <= 1 or self.max_workers == 1:
+            return [self.call(send, item) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)), thread_name_prefix='fan-out') as pool:
+            return list(pool.map(bind_context(lambda item: self.call(send, item)), items))
+    
+    async def afan_out(self, items, send):
+        """
+        Send to several destinations at once on the running event loop.
+        
+        Args:
+            items (list): One entry per message, passed to send.
+            send (callable): Coroutine function rendering and sending one entry.
+        
+        Returns:
+            list: Result of each send, in the order of items; False where it raised.
+        """
+        results = await asyncio.gather(*(send(item) for item in items), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.error(f"Error delivering message: {str(result)}")
+        return [result is True for result in results]
+    
+    @staticmethod
+    def call(send, item):
+        """Run one send, logging instead of raising its errors."""
+        try:
+            return bool(send(item))
+        except Exception as e:
+            logging.error(f"Error delivering message: {str(e)}")
+            return False
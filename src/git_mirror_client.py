@@ -0,0 +1,519 @@
+import os
+import time
+import logging
+import threading
+import subprocess
+from github_client import GitHubClient, CommitSummary
+
+# Separates the commits of a `git log` listing
+RECORD_SEPARATOR = '\x1e'
+
+# Author and message of each commit, followed by its raw and numstat diff summaries
+LOG_FORMAT = '%x1e%H%x00%an%x00%ae%x00%aI%x00%B%x00'
+
+# GitHub names for the status letters of `git log --raw`
+FILE_STATUSES = {
+    'A': 'added',
+    'D': 'removed',
+    'M': 'modified',
+    'R': 'renamed',
+    'C': 'copied',
+    'T': 'changed'
+}
+
+# README file names, in order of preference
+README_NAMES = ('readme.md', 'readme.rst', 'readme.txt', 'readme')
+
+class GitMirrorClient:
+    """Reads commits from a local bare or mirror clone instead of the GitHub API."""
+    
+    def __init__(self, path, repository=None, remote_url=None, fetch_interval_seconds=60, commit_url=None,
+                 timeout_seconds=300, patch_selector=None, git='git'):
+        """
+        Initialize the git mirror client.
+        
+        Args:
+            path (str): Path of the bare or mirror repository.
+            repository (str, optional): Repository name in format 'username/repo'. Defaults to None.
+            remote_url (str, optional): URL to clone from when the mirror does not exist yet. Defaults to None.
+            fetch_interval_seconds (int, optional): Least time between two fetches. Defaults to 60.
+            commit_url (str, optional): Web address of a commit, with {repository} and {sha}
+                placeholders. Defaults to None, which leaves commit links out.
+            timeout_seconds (int, optional): Longest a git command may run. Defaults to 300.
+            patch_selector (PatchSelector, optional): Picks the diff hunks kept with the commit details.
+                Defaults to None, which leaves diffs out.
+            git (str, optional): Git executable. Defaults to 'git'.
+        """
+        self.path = path
+        self.repository_name = repository
+        self.remote_url = remote_url
+        self.fetch_interval_seconds = fetch_interval_seconds
+        self.commit_url = commit_url
+        self.timeout_seconds = timeout_seconds
+        self.patch_selector = patch_selector
+        self.git_executable = git
+        self.last_fetch = None
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_target(cls, target, config, patch_selector=None):
+        """
+        Create the client of a target whose source is `git_mirror`.
+        
+        Args:
+            target (dict): Target from load_targets().
+            config (dict): Configuration dictionary, read for the `git_mirror` section.
+            patch_selector (PatchSelector, optional): Picks the diff hunks kept with the commit details.
+                Defaults to None.
+        
+        Returns:
+            GitMirrorClient: Client reading the target's mirror.
+        """
+        mirror_config = config.get('git_mirror', {}) or {}
+        path = target.get('mirror_path') or os.path.join(
+            mirror_config.get('root', 'mirrors'), f"{target['repository']}.git"
+        )
+        return cls(
+            path,
+            repository=target['repository'],
+            remote_url=target.get('mirror_url'),
+            fetch_interval_seconds=mirror_config.get('fetch_interval_seconds', 60),
+            commit_url=target.get('commit_url') or mirror_config.get('commit_url'),
+            timeout_seconds=mirror_config.get('timeout_seconds', 300),
+            patch_selector=patch_selector
+        )
+    
+    def git(self, *args):
+        """
+        Run a git command against the mirror.
+        
+        Args:
+            *args: Git subcommand and its arguments.
+        
+        Returns:
+            str: Standard output of the command.
+        
+        Raises:
+            subprocess.CalledProcessError: If the command fails.
+            subprocess.TimeoutExpired: If the command runs longer than timeout_seconds.
+        """
+        result = subprocess.run(
+            [self.git_executable, '--git-dir', self.path, *args],
+            capture_output=True, check=True, timeout=self.timeout_seconds
+        )
+        return result.stdout.decode('utf-8', errors='replace')
+    
+    def sync(self, force=False):
+        """
+        Bring the mirror up to date with its remote.
+        
+        The mirror is cloned on first use when a remote URL is configured. Later
+        calls fetch only what changed, and at most once per fetch_interval_seconds
+        unless forced. A repository without an `origin` remote is read as is.
+        
+        Args:
+            force (bool, optional): Fetch even if the last fetch is recent. Defaults to False.
+        
+        Returns:
+            bool: True if the mirror can be read, False otherwise.
+        """
+        with self.lock:
+            if not force and self.last_fetch and time.monotonic() - self.last_fetch < self.fetch_interval_seconds:
+                return True
+            
+            try:
+                if not os.path.isdir(self.path):
+                    if not self.remote_url:
+                        logging.error(f"Git mirror {self.path} does not exist and no mirror_url is configured.")
+                        return False
+                    logging.info(f"Cloning {self.repository_name} into {self.path}")
+                    subprocess.run(
+                        [self.git_executable, 'clone', '--mirror', '--quiet', self.remote_url, self.path],
+                        capture_output=True, check=True, timeout=self.timeout_seconds
+                    )
+                elif self.has_remote():
+                    # Explicit refspecs also update plain bare clones, which have no fetch refspec
+                    self.git('fetch', '--prune', '--quiet', 'origin', '+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*')
+            except (subprocess.SubprocessError, OSError) as e:
+                logging.error(f"Failed to update git mirror {self.path}: {str(e)}")
+                return os.path.isdir(self.path)
+            
+            self.last_fetch = time.monotonic()
+            return True
+    
+    def has_remote(self):
+        """Check whether the mirror has an `origin` remote to fetch from."""
+        try:
+            return bool(self.git('config', '--get', 'remote.origin.url').strip())
+        except subprocess.CalledProcessError:
+            return False
+    
+    def get_readme_content(self):
+        """
+        Get the content of the README file from the default branch.
+        
+        Returns:
+            str: Content of the README file or empty string if not found.
+        """
+        readme = self.get_readme()
+        return readme['content'] if readme else ""
+    
+    def get_readme(self):
+        """
+        Get the README file of the default branch together with its blob SHA.
+        
+        Returns:
+            dict: Dictionary with 'sha' and 'content', or None if not found.
+        """
+        if not self.sync():
+            return None
+        
+        try:
+            blobs = {}
+            for line in self.git('ls-tree', 'HEAD').splitlines():
+                meta, _, name = line.partition('\t')
+                if meta.split()[1:2] == ['blob']:
+                    blobs[name.lower()] = meta.split()[2]
+            
+            sha = next((blobs[name] for name in README_NAMES if name in blobs), None)
+            if not sha:
+                sha = next((blobs[name] for name in sorted(blobs) if name.startswith('readme')), None)
+            if not sha:
+                logging.error(f"No README found in {self.path}")
+                return None
+            return {'sha': sha, 'content': self.git('cat-file', 'blob', sha)}
+        except (subprocess.SubprocessError, OSError) as e:
+            logging.error(f"Failed to get README content: {str(e)}")
+            return None
+    
+    def get_head_sha(self, branch):
+        """
+        Get the SHA of the latest commit of a branch.
+        
+        Args:
+            branch (str): Branch name.
+        
+        Returns:
+            str: Head commit SHA, or None if the branch does not exist.
+        """
+        if not self.sync():
+            return None
+        return self.resolve(branch)
+    
+    def resolve(self, revision):
+        """Get the full SHA of a commit, or None if the mirror does not have it."""
+        try:
+            return self.git('rev-parse', '--verify', '--quiet', f"{revision}^{{commit}}").strip() or None
+        except subprocess.CalledProcessError:
+            return None
+    
+    def get_latest_commits(self, branch="main", limit=5, since=None):
+        """
+        Get the latest commits of a branch.
+        
+        Args:
+            branch (str, optional): Branch name. Defaults to "main".
+            limit (int, optional): Maximum number of commits to return. Defaults to 5.
+            since (str or datetime, optional): Only return commits newer than this.
+                Either a commit SHA (exclusive) or a timestamp (datetime or ISO 8601
+                string). Defaults to None.
+        
+        Returns:
+            list: List of CommitSummary objects, newest first.
+        """
+        if limit <= 0 or not self.sync():
+            return []
+        
+        since_sha, since_date = GitHubClient.parse_since(since)
+        args = ['rev-list', f"--max-count={limit}"]
+        if since_date:
+            args.append(f"--since={since_date.isoformat()}")
+        args.append(branch)
+        
+        # A SHA missing from the mirror, e.g. after a force push, limits nothing
+        if since_sha and self.resolve(since_sha):
+            args.append(f"^{since_sha}")
+        
+        try:
+            return [CommitSummary({'sha': sha}) for sha in self.git(*args, '--').split()]
+        except (subprocess.SubprocessError, OSError) as e:
+            logging.error(f"Failed to get commits: {str(e)}")
+            return []
+    
+    def iter_commits(self, head, base=None, since=None, until=None, reverse=False, limit=None):
+        """
+        Walk the history of a branch lazily.
+        
+        Args:
+            head (str): Branch name or commit SHA to start from.
+            base (str, optional): Stop at this commit SHA, exclusive. Defaults to None.
+            since (datetime, optional): Only commits after this time. Defaults to None.
+            until (datetime, optional): Only commits before this time. Defaults to None.
+            reverse (bool, optional): Yield the oldest commit first. Defaults to False.
+            limit (int, optional): Only walk the newest limit commits. Defaults to no limit.
+        
+        Yields:
+            CommitSummary: Commits, newest first unless reversed.
+        """
+        if not self.sync():
+            return
+        
+        args = [self.git_executable, '--git-dir', self.path, 'rev-list']
+        if reverse:
+            args.append('--reverse')
+        if limit is not None:
+            # Git picks the newest commits before reversing them
+            args.append(f"--max-count={limit}")
+        if since:
+            args.append(f"--since={since.isoformat()}")
+        if until:
+            args.append(f"--until={until.isoformat()}")
+        args.append(head)
+        if base:
+            args.append(f"^{base}")
+        args.append('--')
+        
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            for line in process.stdout:
+                yield CommitSummary({'sha': line.strip()})
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+            if process.wait() not in (0, -15):
+                logging.error(f"Failed to list commits of {head} in {self.path}")
+    
+    def get_commit(self, sha):
+        """
+        Get a single commit by SHA, fetching once if the mirror does not have it yet.
+        
+        Args:
+            sha (str): Commit SHA.
+        
+        Returns:
+            CommitSummary: The commit, or None if it does not exist.
+        """
+        full_sha = self.resolve(sha) if os.path.isdir(self.path) else None
+        if not full_sha and self.sync(force=True):
+            full_sha = self.resolve(sha)
+        if not full_sha:
+            logging.error(f"Failed to get commit {sha}: not found in {self.path}")
+            return None
+        return CommitSummary({'sha': full_sha})
+    
+    def get_commit_details(self, commit):
+        """
+        Extract relevant details from a commit.
+        
+        Args:
+            commit: Commit object with a 'sha' attribute.
+        
+        Returns:
+            dict: Dictionary containing commit details, in the same shape as GitHubClient.get_commit_details.
+        """
+        if not commit:
+            return {}
+        return self.get_commit_details_batch([commit]).get(commit.sha, {})
+    
+    def get_commit_details_batch(self, commits):
+        """
+        Fetch the details of several commits with a single `git log`.
+        
+        Merge commits are compared with their first parent, as on GitHub.
+        
+        Args:
+            commits (list): Commit objects with a 'sha' attribute.
+        
+        Returns:
+            dict: Commit details by SHA. Commits that could not be read are left out.
+        """
+        shas = [commit.sha for commit in commits]
+        if not shas:
+            return {}
+        
+        try:
+            output = self.git(
+                'log', '-z', '--no-walk=unsorted', '-m', '--first-parent', '--raw', '--numstat',
+                f"--format={LOG_FORMAT}", *shas, '--'
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            logging.error(f"Error extracting commit details: {str(e)}")
+            return {}
+        
+        details = {}
+        for record in output.split(RECORD_SEPARATOR)[1:]:
+            commit_details = self.parse_record(record)
+            if self.patch_selector:
+                self.attach_patches(commit_details)
+            details[commit_details['sha']] = commit_details
+        
+        # Abbreviated SHAs are looked up by the prefix they were given as
+        for sha in shas:
+            if sha not in details:
+                match = next((full for full in details if full.startswith(sha)), None)
+                if match:
+                    details[sha] = details[match]
+        return details
+    
+    def parse_record(self, record):
+        """
+        Build commit details from one commit of the `git log -z` listing.
+        
+        Args:
+            record (str): Commit header, raw lines and numstat lines separated by NUL characters.
+        
+        Returns:
+            dict: Dictionary containing commit details.
+        """
+        tokens = record.split('\0')
+        sha, name, email, date, message = tokens[:5]
+        
+        statuses = {}
+        files_changed = []
+        position = 5
+        while position < len(tokens):
+            token = tokens[position].strip('\n')
+            position += 1
+            if not token:
+                continue
+            
+            if token.startswith(':'):
+                # Raw line: status letter, then one path, or two for renames and copies
+                status = token.split()[-1][0]
+                paths = 2 if status in 'RC' else 1
+                statuses[tokens[position + paths - 1]] = FILE_STATUSES.get(status, 'modified')
+                position += paths
+                continue
+            
+            additions, deletions, filename = token.split('\t', 2)
+            if not filename:
+                filename = tokens[position + 1]
+                position += 2
+            
+            # Binary files have no line counts
+            additions = int(additions) if additions.isdigit() else 0
+            deletions = int(deletions) if deletions.isdigit() else 0
+            files_changed.append({
+                'filename': filename,
+                'additions': additions,
+                'deletions': deletions,
+                'changes': additions + deletions,
+                'status': statuses.get(filename, 'modified')
+            })
+        
+        additions = sum(file['additions'] for file in files_changed)
+        deletions = sum(file['deletions'] for file in files_changed)
+        return {
+            'sha': sha,
+            'message': message.strip(),
+            'author': {
+                'name': name,
+                'email': email,
+                'date': date
+            },
+            'files_changed': files_changed,
+            'stats': {
+                'additions': additions,
+                'deletions': deletions,
+                'total': additions + deletions
+            },
+            'html_url': self.commit_url.format(repository=self.repository_name, sha=sha) if self.commit_url else ''
+        }
+    
+    def attach_patches(self, commit_details):
+        """
+        Add the selected diff hunks of each changed file to commit details.
+        
+        The diff is streamed from `git show`. Only the files the selector may
+        pick are kept, each up to its read limit, and git is stopped once all
+        of them were read, so a multi-megabyte commit is never held in memory.
+        
+        Args:
+            commit_details (dict): Commit details from parse_record().
+        """
+        try:
+            patches = self.read_patches(
+                commit_details['sha'],
+                self.patch_selector.get_candidates(commit_details['files_changed']),
+                self.patch_selector.get_read_limit()
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            logging.error(f"Failed to get the diff of commit {commit_details['sha']}: {str(e)}")
+            return
+        
+        for file in commit_details['files_changed']:
+            if file['filename'] in patches:
+                file['patch'] = patches[file['filename']]
+        GitHubClient.select_patches(commit_details['files_changed'], self.patch_selector)
+    
+    def read_patches(self, sha, paths, limit):
+        """
+        Read the diff hunks of some files of a commit from a streamed `git show`.
+        
+        Args:
+            sha (str): Commit SHA.
+            paths (set): Files to read the diff of.
+            limit (int): Most characters kept per file; later lines of the file are skipped.
+        
+        Returns:
+            dict: Diff of each file, starting at its first hunk.
+        
+        Raises:
+            subprocess.CalledProcessError: If git fails.
+            subprocess.TimeoutExpired: If reading takes longer than timeout_seconds.
+        """
+        if not paths:
+            return {}
+        
+        args = [self.git_executable, '--git-dir', self.path, 'show', '-m', '--first-parent', '--format=',
+                '--patch', '--no-color', sha, '--']
+        deadline = time.monotonic() + self.timeout_seconds
+        patches = {}
+        remaining = set(paths)
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   encoding='utf-8', errors='replace')
+        stopped = False
+        try:
+            lines, used, header = None, 0, None
+            for line in process.stdout:
+                if time.monotonic() > deadline:
+                    raise subprocess.TimeoutExpired(args, self.timeout_seconds)
+                
+                if line.startswith('diff --git '):
+                    if not remaining:
+                        stopped = True
+                        break
+                    lines, header = None, []
+                    continue
+                
+                if header is not None:
+                    if not line.startswith('@@'):
+                        header.append(line)
+                        continue
+                    
+                    # Deleted files only name their old path
+                    names = [entry[6:] for entry in header if entry.startswith('+++ b/')]
+                    names = names or [entry[6:] for entry in header if entry.startswith('--- a/')]
+                    path = names[0].rstrip('\n').rstrip('\t') if names else None
+                    header = None
+                    if path in remaining:
+                        remaining.discard(path)
+                        lines, used = patches.setdefault(path, []), 0
+                
+                if lines is not None:
+                    if used + len(line) > limit:
+                        lines = None
+                        continue
+                    lines.append(line)
+                    used += len(line)
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+                stopped = True
+            returncode = process.wait()
+        
+        if returncode and not stopped:
+            raise subprocess.CalledProcessError(returncode, args)
+        return {path: ''.join(lines).rstrip('\n') for path, lines in patches.items()}
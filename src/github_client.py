@@ -1,25 +1,79 @@
 import os
+import re
+import base64
 import logging
-from github import Github
-from github.GithubException import GithubException
+from datetime import datetime, timezone
+from itertools import islice
+import requests
+
+# Abbreviated or full hexadecimal commit SHA
+SHA_PATTERN = re.compile(r'^[0-9a-fA-F]{7,40}$')
+
+# Commit fields fetched per commit by the GraphQL details source
+COMMIT_FRAGMENT = """
+fragment CommitFields on Commit {
+  oid
+  message
+  url
+  additions
+  deletions
+  changedFilesIfAvailable
+  author { name email date }
+}
+"""
+
+class CommitSummary:
+    """Commit entry from a commit list response, used when requests go through a GitHubRequestLayer."""
+    
+    def __init__(self, data):
+        """
+        Initialize the commit summary.
+        
+        Args:
+            data (dict): Raw commit payload from the commit list endpoint.
+        """
+        self.sha = data['sha']
+        self.raw_data = data
 
 class GitHubClient:
     """Client for interacting with GitHub API to fetch repository and commit information."""
     
-    def __init__(self, token=None, repository=None):
+    # Largest page size accepted by the GitHub REST API
+    MAX_PER_PAGE = 100
+    
+    # Commits looked up per GraphQL query
+    GRAPHQL_BATCH_SIZE = 50
+    
+    def __init__(self, token=None, repository=None, github=None, request_layer=None, http_pool=None,
+                 patch_selector=None, details_source='rest'):
         """
         Initialize the GitHub client.
         
         Args:
             token (str, optional): GitHub personal access token. Defaults to None.
             repository (str, optional): Repository name in format 'username/repo'. Defaults to None.
+            github (Github, optional): Existing PyGithub instance to share between clients. Defaults to None.
+            request_layer (GitHubRequestLayer, optional): Conditional, rate-limit-aware request layer
+                used for the commit list, commit and README endpoints. Defaults to None.
+            http_pool (HttpSessionPool, optional): Shared connection pool size and timeouts
+                for a new PyGithub instance. Defaults to None.
+            patch_selector (PatchSelector, optional): Picks the diff hunks kept with the commit details.
+                Defaults to None, which leaves diffs out.
+            details_source (str, optional): 'graphql' to fetch the details of a page of commits
+                in one query through the request layer, or 'rest'. Defaults to 'rest'.
         """
         self.token = token or os.getenv('GITHUB_TOKEN')
         if not self.token:
             raise ValueError("GitHub token is required. Set it in .env file or pass it to the constructor.")
         
         self.repository_name = repository
-        self.github = Github(self.token)
+        if github is None:
+            from github import Github
+            github = Github(self.token, **(http_pool.github_options() if http_pool else {}))
+        self.github = github
+        self.request_layer = request_layer
+        self.patch_selector = patch_selector
+        self.details_source = details_source
         self.repository = None
         
         if self.repository_name:
@@ -31,10 +85,12 @@ class GitHubClient:
         
         Args:
             repository_name (str): Repository name in format 'username/repo'.
-            
+        
         Returns:
             bool: True if connection successful, False otherwise.
         """
+        from github.GithubException import GithubException
+        
         try:
             self.repository = self.github.get_repo(repository_name)
             self.repository_name = repository_name
@@ -51,52 +107,281 @@ class GitHubClient:
         Returns:
             str: Content of the README.md file or empty string if not found.
         """
+        readme = self.get_readme()
+        return readme['content'] if readme else ""
+    
+    def get_readme(self):
+        """
+        Get the README file of the repository together with its blob SHA.
+        
+        Returns:
+            dict: Dictionary with 'sha' and 'content', or None if not found.
+        """
         if not self.repository:
             logging.error("Repository not connected. Call connect_to_repository first.")
-            return ""
+            return None
+        
+        if self.request_layer:
+            try:
+                data, _ = self.request_layer.get(
+                    f"/repos/{self.repository_name}/readme", target=self.repository_name
+                )
+                content = base64.b64decode(data.get('content', '')).decode('utf-8')
+                return {'sha': data.get('sha', ''), 'content': content}
+            except (requests.RequestException, ValueError) as e:
+                logging.error(f"Failed to get README content: {str(e)}")
+                return None
+        
+        from github.GithubException import GithubException
         
         try:
             readme = self.repository.get_readme()
-            return readme.decoded_content.decode('utf-8')
+            return {'sha': readme.sha, 'content': readme.decoded_content.decode('utf-8')}
         except GithubException as e:
             logging.error(f"Failed to get README content: {str(e)}")
-            return ""
+            return None
     
-    def get_latest_commits(self, branch="main", limit=5):
+    def get_latest_commits(self, branch="main", limit=5, since=None):
         """
         Get the latest commits from the repository.
         
+        Commits are read lazily from the paginated API and paging stops as soon
+        as `limit` commits have been collected, so the request count stays
+        proportional to the limit rather than to the length of the history.
+        
         Args:
             branch (str, optional): Branch name. Defaults to "main".
             limit (int, optional): Maximum number of commits to fetch. Defaults to 5.
-            
+            since (str or datetime, optional): Only return commits newer than this.
+                Either a commit SHA (exclusive) or a timestamp (datetime or ISO 8601
+                string). Defaults to None.
+        
         Returns:
-            list: List of commit objects.
+            list: List of commit objects, newest first.
         """
         if not self.repository:
             logging.error("Repository not connected. Call connect_to_repository first.")
             return []
         
+        if limit <= 0:
+            return []
+        
+        since_sha, since_date = self.parse_since(since)
+        
+        if self.request_layer:
+            return self.get_latest_commits_conditional(branch, limit, since_sha, since_date)
+        
+        from github.GithubException import GithubException
+        
         try:
-            commits = list(self.repository.get_commits(sha=branch))[:limit]
+            # Tune the page size to the limit so a small limit costs a single request
+            paginated = self.list_commits(branch, min(limit, self.MAX_PER_PAGE), since=since_date)
+            
+            commits = []
+            for commit in islice(paginated, limit):
+                if since_sha and commit.sha.startswith(since_sha):
+                    break
+                commits.append(commit)
             return commits
         except GithubException as e:
             logging.error(f"Failed to get commits: {str(e)}")
             return []
     
+    def get_latest_commits_conditional(self, branch, limit, since_sha=None, since_date=None):
+        """
+        Get the latest commits through the request layer, so an unchanged branch costs no quota.
+        
+        Args:
+            branch (str): Branch name.
+            limit (int): Maximum number of commits to fetch.
+            since_sha (str, optional): Stop at this commit SHA. Defaults to None.
+            since_date (datetime, optional): Only return commits after this time. Defaults to None.
+        
+        Returns:
+            list: List of CommitSummary objects, newest first.
+        """
+        params = {'sha': branch, 'per_page': min(limit, self.MAX_PER_PAGE)}
+        if since_date:
+            params['since'] = since_date.isoformat()
+        
+        commits = []
+        url = f"/repos/{self.repository_name}/commits"
+        try:
+            while url and len(commits) < limit:
+                page, links = self.request_layer.get(url, params=params, target=self.repository_name)
+                for data in page:
+                    if (since_sha and data['sha'].startswith(since_sha)) or len(commits) >= limit:
+                        return commits
+                    commits.append(CommitSummary(data))
+                
+                # The next link already carries the query parameters
+                url = links.get('next', {}).get('url')
+                params = None
+            return commits
+        except requests.RequestException as e:
+            logging.error(f"Failed to get commits: {str(e)}")
+            return []
+    
+    def iter_commits(self, head, base=None, since=None, until=None, reverse=False, limit=None):
+        """
+        Walk the history of a branch lazily, one page at a time.
+        
+        Pages are requested only as the iterator is consumed, so a long range
+        never has to be listed before processing starts. The API lists newest
+        first only, so walking oldest first lists the whole range up front, or
+        only the newest limit commits when a limit is given.
+        
+        Args:
+            head (str): Branch name or commit SHA to start from.
+            base (str, optional): Stop at this commit SHA, exclusive. Defaults to None.
+            since (datetime, optional): Only commits after this time. Defaults to None.
+            until (datetime, optional): Only commits before this time. Defaults to None.
+            reverse (bool, optional): Yield the oldest commit first. Defaults to False.
+            limit (int, optional): Only walk the newest limit commits. Defaults to no limit.
+        
+        Yields:
+            Commit objects, newest first unless reversed: CommitSummary objects
+            with a request layer, PyGithub commits otherwise.
+        """
+        if not self.repository:
+            logging.error("Repository not connected. Call connect_to_repository first.")
+            return
+        
+        if reverse or limit is not None:
+            commits = islice(self.iter_commits(head, base=base, since=since, until=until), limit)
+            yield from (reversed(list(commits)) if reverse else commits)
+            return
+        
+        base = base.lower() if base else None
+        
+        if self.request_layer:
+            params = {'sha': head, 'per_page': self.MAX_PER_PAGE}
+            if since:
+                params['since'] = since.isoformat()
+            if until:
+                params['until'] = until.isoformat()
+            
+            url = f"/repos/{self.repository_name}/commits"
+            while url:
+                page, links = self.request_layer.get(url, params=params, target=self.repository_name)
+                for data in page:
+                    if base and data['sha'].startswith(base):
+                        return
+                    yield CommitSummary(data)
+                
+                # The next link already carries the query parameters
+                url = links.get('next', {}).get('url')
+                params = None
+            return
+        
+        for commit in self.list_commits(head, self.MAX_PER_PAGE, since=since, until=until):
+            if base and commit.sha.startswith(base):
+                return
+            yield commit
+    
+    def list_commits(self, sha, per_page, since=None, until=None):
+        """
+        Open the paginated commit listing of the connected repository with its own page size.
+        
+        The PyGithub instance is shared by the clients of every target, so the
+        page size goes with the request instead of being set on it.
+        
+        Args:
+            sha (str): Branch name or commit SHA to start from.
+            per_page (int): Commits per page.
+            since (datetime, optional): Only commits after this time. Defaults to None.
+            until (datetime, optional): Only commits before this time. Defaults to None.
+        
+        Returns:
+            PaginatedList: PyGithub commits, newest first, fetched a page at a time.
+        """
+        from github.Commit import Commit
+        from github.PaginatedList import PaginatedList
+        
+        params = {'sha': sha, 'per_page': per_page}
+        for name, value in (('since', since), ('until', until)):
+            if value:
+                if value.tzinfo:
+                    value = value.astimezone(timezone.utc)
+                params[name] = value.strftime("%Y-%m-%dT%H:%M:%SZ")
+        return PaginatedList(Commit, self.repository._requester, f"{self.repository.url}/commits", params)
+    
+    def get_commit(self, sha):
+        """
+        Get a single commit by SHA.
+        
+        Args:
+            sha (str): Commit SHA.
+        
+        Returns:
+            Commit object, or None if it could not be fetched.
+        """
+        if not self.repository:
+            logging.error("Repository not connected. Call connect_to_repository first.")
+            return None
+        
+        # Details are fetched later through the request layer, so only the SHA is needed here
+        if self.request_layer:
+            return CommitSummary({'sha': sha})
+        
+        from github.GithubException import GithubException
+        
+        try:
+            return self.repository.get_commit(sha)
+        except GithubException as e:
+            logging.error(f"Failed to get commit {sha}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def parse_since(since):
+        """
+        Split a `since` marker into a commit SHA or a timestamp.
+        
+        Args:
+            since (str or datetime): Commit SHA, ISO 8601 timestamp or datetime.
+        
+        Returns:
+            tuple: (sha, datetime), at most one of which is set.
+        """
+        if not since:
+            return None, None
+        
+        if isinstance(since, datetime):
+            return None, since
+        
+        since = str(since).strip()
+        if SHA_PATTERN.match(since):
+            return since.lower(), None
+        
+        try:
+            return None, datetime.fromisoformat(since.replace('Z', '+00:00'))
+        except ValueError:
+            logging.warning(f"Ignoring unrecognized 'since' value: {since}")
+            return None, None
+    
     def get_commit_details(self, commit):
         """
         Extract relevant details from a commit object.
         
         Args:
             commit: GitHub commit object.
-            
+        
         Returns:
             dict: Dictionary containing commit details.
         """
         if not commit:
             return {}
         
+        if isinstance(commit, CommitSummary):
+            try:
+                data, _ = self.request_layer.get(
+                    f"/repos/{self.repository_name}/commits/{commit.sha}", target=self.repository_name
+                )
+                return self.details_from_json(data, self.patch_selector)
+            except requests.RequestException as e:
+                logging.error(f"Error extracting commit details: {str(e)}")
+                return {}
+        
         try:
             # Get the files changed in this commit
             files_changed = [{
@@ -104,8 +389,10 @@ class GitHubClient:
                 'additions': file.additions,
                 'deletions': file.deletions,
                 'changes': file.changes,
-                'status': file.status
+                'status': file.status,
+                **({'patch': file.patch} if self.patch_selector else {})
             } for file in commit.files]
+            self.select_patches(files_changed, self.patch_selector)
             
             # Create a structured commit details dictionary
             commit_details = {
@@ -128,4 +415,188 @@ class GitHubClient:
             return commit_details
         except Exception as e:
             logging.error(f"Error extracting commit details: {str(e)}")
-            return {}
\ No newline at end of file
+            return {}
+    
+    def get_commit_details_batch(self, commits):
+        """
+        Fetch the details of several commits with batched GraphQL queries.
+        
+        Each query looks up GRAPHQL_BATCH_SIZE commits, instead of one REST
+        request per commit. GraphQL has no list of changed files, so the details
+        carry only their count under 'files_count' and an empty 'files_changed'.
+        Nothing is fetched unless the GraphQL details source is configured with
+        a request layer, or when diffs are wanted, which only REST provides.
+        
+        Args:
+            commits (list): Commit objects with a 'sha' attribute.
+        
+        Returns:
+            dict: Commit details by SHA, in the same shape as get_commit_details.
+                Commits that could not be fetched are left out.
+        """
+        if self.details_source != 'graphql' or not self.request_layer or self.patch_selector:
+            return {}
+        if not self.repository_name:
+            logging.error("Repository not connected. Call connect_to_repository first.")
+            return {}
+        
+        shas = [commit.sha for commit in commits]
+        
+        details = {}
+        for offset in range(0, len(shas), self.GRAPHQL_BATCH_SIZE):
+            batch = shas[offset:offset + self.GRAPHQL_BATCH_SIZE]
+            query, variables = self.build_details_query(self.repository_name, batch)
+            try:
+                data = self.request_layer.graphql(query, variables, target=self.repository_name)
+            except requests.RequestException as e:
+                logging.error(f"Failed to get commit details with GraphQL: {str(e)}")
+                continue
+            details.update(self.details_from_batch(data, batch))
+        return details
+    
+    @staticmethod
+    def build_details_query(repository_name, shas):
+        """
+        Build the GraphQL query looking up the details of several commits.
+        
+        Args:
+            repository_name (str): Repository name in format 'username/repo'.
+            shas (list): Commit SHAs, at most GRAPHQL_BATCH_SIZE.
+        
+        Returns:
+            tuple: (query document, query variables).
+        """
+        owner, name = repository_name.split('/', 1)
+        variables = {'owner': owner, 'name': name}
+        variables.update({f"c{index}": sha for index, sha in enumerate(shas)})
+        
+        declarations = "".join(f", $c{index}: GitObjectID!" for index in range(len(shas)))
+        lookups = "\n".join(f"    c{index}: object(oid: $c{index}) {{ ...CommitFields }}" for index in range(len(shas)))
+        query = (
+            f"query($owner: String!, $name: String!{declarations}) {{\n"
+            f"  repository(owner: $owner, name: $name) {{\n{lookups}\n  }}\n}}\n{COMMIT_FRAGMENT}"
+        )
+        return query, variables
+    
+    @classmethod
+    def details_from_batch(cls, data, shas):
+        """
+        Build the commit details of a batched GraphQL query.
+        
+        Args:
+            data (dict): Response data of the query from build_details_query().
+            shas (list): Commit SHAs the query looked up.
+        
+        Returns:
+            dict: Commit details by SHA; commits the query did not find are left out.
+        """
+        repository = data.get('repository') or {}
+        details = {}
+        for index, sha in enumerate(shas):
+            commit_details = cls.details_from_graphql(repository.get(f"c{index}"))
+            if commit_details:
+                details[sha] = commit_details
+        return details
+    
+    @staticmethod
+    def details_from_graphql(data):
+        """
+        Build commit details from a GraphQL commit object.
+        
+        Args:
+            data (dict): Commit object with the fields of COMMIT_FRAGMENT.
+        
+        Returns:
+            dict: Dictionary containing commit details, in the same shape as get_commit_details,
+                with the number of changed files under 'files_count'.
+        """
+        if not data or not data.get('oid'):
+            return {}
+        
+        author = data.get('author') or {}
+        additions = data.get('additions') or 0
+        deletions = data.get('deletions') or 0
+        return {
+            'sha': data['oid'],
+            'message': data.get('message', ''),
+            'author': {
+                'name': author.get('name', ''),
+                'email': author.get('email', ''),
+                'date': author.get('date', '')
+            },
+            'files_changed': [],
+            'files_count': data.get('changedFilesIfAvailable') or 0,
+            'stats': {
+                'additions': additions,
+                'deletions': deletions,
+                'total': additions + deletions
+            },
+            'html_url': data.get('url', '')
+        }
+    
+    @staticmethod
+    def select_patches(files_changed, patch_selector):
+        """
+        Replace the raw diff of each changed file with its selected hunks.
+        
+        Files whose diff was not selected lose their 'patch' key.
+        
+        Args:
+            files_changed (list): Changed files, with the raw diff under 'patch'.
+            patch_selector (PatchSelector): Selector to apply, or None to leave the files unchanged.
+        """
+        if not patch_selector:
+            return
+        
+        selected = patch_selector.select(files_changed)
+        for file in files_changed:
+            file.pop('patch', None)
+            if file['filename'] in selected:
+                file['patch'] = selected[file['filename']]
+    
+    @staticmethod
+    def details_from_json(data, patch_selector=None):
+        """
+        Build commit details from a raw REST API commit payload.
+        
+        Args:
+            data (dict): JSON returned by GET /repos/{owner}/{repo}/commits/{sha}.
+            patch_selector (PatchSelector, optional): Picks the diff hunks kept with the
+                changed files. Defaults to None, which leaves diffs out.
+        
+        Returns:
+            dict: Dictionary containing commit details, in the same shape as get_commit_details.
+        """
+        if not data:
+            return {}
+        
+        commit = data.get('commit', {})
+        author = commit.get('author') or {}
+        stats = data.get('stats') or {}
+        
+        files_changed = [{
+            'filename': file.get('filename', ''),
+            'additions': file.get('additions', 0),
+            'deletions': file.get('deletions', 0),
+            'changes': file.get('changes', 0),
+            'status': file.get('status', ''),
+            **({'patch': file.get('patch')} if patch_selector else {})
+        } for file in data.get('files') or []]
+        GitHubClient.select_patches(files_changed, patch_selector)
+        
+        return {
+            'sha': data.get('sha', ''),
+            'message': commit.get('message', ''),
+            'author': {
+                'name': author.get('name', ''),
+                'email': author.get('email', ''),
+                'date': author.get('date', '')
+            },
+            'files_changed': files_changed,
+            'stats': {
+                'additions': stats.get('additions', 0),
+                'deletions': stats.get('deletions', 0),
+                'total': stats.get('total', 0)
+            },
+            'html_url': data.get('html_url', '')
+        }
\ No newline at end of file
@@ -0,0 +1,364 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import requests
+from metrics import record_run
+
+GITHUB_API_URL = 'https://api.github.com'
+JSON_MEDIA_TYPE = 'application/vnd.github+json'
+
+# Back-off when a secondary rate limit sends a Retry-After value that cannot be read
+DEFAULT_RETRY_AFTER_SECONDS = 60
+
+class GitHubRequestLayer:
+    """Conditional, rate-limit-aware GET requests against the GitHub REST API."""
+    
+    def __init__(self, token=None, session=None, min_remaining=100, max_cache_entries=1000,
+                 max_wait_seconds=900, api_url=GITHUB_API_URL):
+        """
+        Initialize the request layer.
+        
+        Args:
+            token (str, optional): GitHub personal access token. Defaults to None.
+            session (requests.Session, optional): Session used for all requests. Defaults to a new session.
+            min_remaining (int, optional): Quota reserve below which calls are paced until
+                the rate limit resets. Defaults to 100.
+            max_cache_entries (int, optional): Maximum number of cached responses. Defaults to 1000.
+            max_wait_seconds (int, optional): Longest pause before a request. Defaults to 900.
+            api_url (str, optional): Base URL of the API. Defaults to 'https://api.github.com'.
+        """
+        self.token = token or os.getenv('GITHUB_TOKEN')
+        if not self.token:
+            raise ValueError("GitHub token is required. Set it in .env file or pass it to the constructor.")
+        
+        self.session = session or requests.Session()
+        self.min_remaining = min_remaining
+        self.max_cache_entries = max_cache_entries
+        self.max_wait_seconds = max_wait_seconds
+        self.api_url = api_url.rstrip('/')
+        self.lock = threading.Lock()
+        
+        # Validators and bodies of previous responses, keyed by URL, parameters and media type
+        self.cache = OrderedDict()
+        
+        # Last rate limit state reported by GitHub
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        
+        # GraphQL points left, which GitHub counts separately from the REST quota
+        self.graphql_remaining = None
+        
+        # Requests and conditional cache hits per target
+        self.usage = {}
+    
+    def get(self, path, params=None, accept=JSON_MEDIA_TYPE, target=None):
+        """
+        Send a conditional GET request.
+        
+        A 304 response returns the cached body and does not count against the quota.
+        
+        Args:
+            path (str): API path or absolute URL.
+            params (dict, optional): Query parameters. Defaults to None.
+            accept (str, optional): Accept header. Defaults to the JSON media type.
+            target (str, optional): Name the request is accounted to. Defaults to None.
+        
+        Returns:
+            tuple: (decoded body, response links).
+        
+        Raises:
+            requests.RequestException: If the request fails.
+        """
+        url, key, cached, headers = self.prepare(path, params, accept)
+        
+        wait = self.get_pause(cached)
+        if wait is None:
+            return self.serve_cached(key, cached, target)
+        if wait > 0:
+            time.sleep(wait)
+        
+        response = self.session.get(url, params=params, headers=headers)
+        self.update_rate_limit(response.headers)
+        
+        # Secondary rate limits ask the client to back off for a while and retry
+        retry_after = self.get_retry_after(response.status_code, response.headers)
+        if retry_after is not None:
+            time.sleep(retry_after)
+            response = self.session.get(url, params=params, headers=headers)
+            self.update_rate_limit(response.headers)
+        
+        if response.status_code == 304 and cached:
+            return self.serve_cached(key, cached, target)
+        
+        self.record_usage(target, cache_hit=False)
+        response.raise_for_status()
+        
+        body = response.json() if accept.endswith('json') else response.text
+        self.store(key, response.headers, body, response.links)
+        return body, response.links
+    
+    def prepare(self, path, params=None, accept=JSON_MEDIA_TYPE):
+        """
+        Build a GET request, made conditional when an earlier response is cached.
+        
+        Shared with AsyncGitHubClient, which sends the request with aiohttp.
+        
+        Args:
+            path (str): API path or absolute URL.
+            params (dict, optional): Query parameters. Defaults to None.
+            accept (str, optional): Accept header. Defaults to the JSON media type.
+        
+        Returns:
+            tuple: (URL, cache key, cached response or None, request headers).
+        """
+        url = path if path.startswith('http') else f"{self.api_url}{path}"
+        key = (url, tuple(sorted((params or {}).items())), accept)
+        
+        with self.lock:
+            cached = self.cache.get(key)
+        
+        headers = {'Authorization': f"token {self.token}", 'Accept': accept}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        elif cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return url, key, cached, headers
+    
+    def get_pause(self, cached):
+        """
+        Get how long to pause before sending a request.
+        
+        Args:
+            cached (dict): Cached response of the request, or None.
+        
+        Returns:
+            float: Seconds to wait, or None to serve the cached response instead
+                of blocking when the quota is exhausted.
+        """
+        wait = self.get_wait_seconds()
+        if wait > 0 and cached and self.remaining == 0:
+            return None
+        if wait > 0:
+            logging.info(f"Pacing GitHub requests, waiting {wait:.1f}s (remaining quota: {self.remaining})")
+        return wait
+    
+    def get_retry_after(self, status, headers):
+        """
+        Get how long a secondary rate limit asks the client to back off before retrying.
+        
+        Retry-After holds either seconds or an HTTP date. A value that is
+        neither falls back to DEFAULT_RETRY_AFTER_SECONDS.
+        
+        Args:
+            status (int): Response status code.
+            headers (dict): Response headers.
+        
+        Returns:
+            int: Seconds to wait, or None if the request is not to be retried.
+        """
+        if status not in (403, 429) or 'Retry-After' not in headers:
+            return None
+        
+        value = str(headers['Retry-After']).strip()
+        try:
+            retry_after = int(value)
+        except ValueError:
+            try:
+                retry_after = int(parsedate_to_datetime(value).timestamp() - time.time() + 0.999)
+            except (TypeError, ValueError, OverflowError):
+                logging.warning(f"Unreadable Retry-After header from GitHub: {value!r}")
+                retry_after = DEFAULT_RETRY_AFTER_SECONDS
+        
+        retry_after = min(max(retry_after, 0), self.max_wait_seconds)
+        logging.warning(f"GitHub asked to retry after {retry_after}s")
+        return retry_after
+    
+    def serve_cached(self, key, cached, target=None):
+        """
+        Answer a request from its cached response.
+        
+        Args:
+            key (tuple): Cache key from prepare().
+            cached (dict): Cached response.
+            target (str, optional): Name the request is accounted to. Defaults to None.
+        
+        Returns:
+            tuple: (decoded body, response links).
+        """
+        self.record_usage(target, cache_hit=True)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+        return cached['body'], cached['links']
+    
+    def store(self, key, headers, body, links):
+        """
+        Cache a response that carries validators for later conditional requests.
+        
+        Args:
+            key (tuple): Cache key from prepare().
+            headers (dict): Response headers.
+            body: Decoded response body.
+            links (dict): Response links.
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if etag or last_modified:
+            with self.lock:
+                self.cache[key] = {'etag': etag, 'last_modified': last_modified, 'body': body, 'links': links}
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.max_cache_entries:
+                    self.cache.popitem(last=False)
+    
+    def graphql(self, query, variables=None, target=None):
+        """
+        Send a GraphQL query.
+        
+        GraphQL queries have their own point budget, so they never pace or
+        update the REST quota state.
+        
+        Args:
+            query (str): GraphQL query document.
+            variables (dict, optional): Query variables. Defaults to None.
+            target (str, optional): Name the request is accounted to. Defaults to None.
+        
+        Returns:
+            dict: The 'data' member of the response.
+        
+        Raises:
+            requests.RequestException: If the request fails or the query reports errors.
+        """
+        url, payload, headers = self.prepare_graphql(query, variables)
+        response = self.session.post(url, json=payload, headers=headers)
+        retry_after = self.get_retry_after(response.status_code, response.headers)
+        if retry_after is not None:
+            time.sleep(retry_after)
+            response = self.session.post(url, json=payload, headers=headers)
+        
+        self.record_usage(target, cache_hit=False)
+        response.raise_for_status()
+        return self.read_graphql(response.headers, response.json())
+    
+    def prepare_graphql(self, query, variables=None):
+        """
+        Build a GraphQL request.
+        
+        Args:
+            query (str): GraphQL query document.
+            variables (dict, optional): Query variables. Defaults to None.
+        
+        Returns:
+            tuple: (URL, JSON payload, request headers).
+        """
+        # GitHub Enterprise serves REST under /api/v3 and GraphQL under /api/graphql
+        url = f"{self.api_url[:-3] if self.api_url.endswith('/v3') else self.api_url + '/'}graphql"
+        payload = {'query': query, 'variables': variables or {}}
+        return url, payload, {'Authorization': f"bearer {self.token}"}
+    
+    def read_graphql(self, headers, body):
+        """
+        Record the GraphQL points left and extract the data of a successful response.
+        
+        Args:
+            headers (dict): Response headers.
+            body (dict): Decoded response body.
+        
+        Returns:
+            dict: The 'data' member of the response.
+        
+        Raises:
+            requests.RequestException: If the query reports errors and returned no data.
+        """
+        if 'X-RateLimit-Remaining' in headers:
+            with self.lock:
+                self.graphql_remaining = int(headers['X-RateLimit-Remaining'])
+        
+        if body.get('errors') and not body.get('data'):
+            raise requests.RequestException(f"GraphQL query failed: {body['errors'][0].get('message', body['errors'])}")
+        return body.get('data') or {}
+    
+    def get_recent_shas(self, repository, branch, limit, since=None, target=None):
+        """
+        Get the SHAs of the newest commits on a branch with a single request.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+            limit (int): Number of commits, at most 100 (one page).
+            since (datetime, optional): Only commits after this time. Defaults to None.
+            target (str, optional): Name the request is accounted to. Defaults to None.
+        
+        Returns:
+            list: Commit SHAs, newest first.
+        
+        Raises:
+            requests.RequestException: If the request fails.
+        """
+        params = {'sha': branch, 'per_page': max(1, min(limit, 100))}
+        if since:
+            params['since'] = since.isoformat()
+        body, _ = self.get(f"/repos/{repository}/commits", params=params, target=target)
+        return [commit['sha'] for commit in body]
+    
+    def update_rate_limit(self, headers):
+        """
+        Record the rate limit state from response headers.
+        
+        Args:
+            headers (dict): Response headers.
+        """
+        with self.lock:
+            if 'X-RateLimit-Remaining' in headers:
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+            if 'X-RateLimit-Limit' in headers:
+                self.limit = int(headers['X-RateLimit-Limit'])
+            if 'X-RateLimit-Reset' in headers:
+                self.reset_at = int(headers['X-RateLimit-Reset'])
+    
+    def get_wait_seconds(self):
+        """
+        Get how long to pause before the next request to stay within the quota.
+        
+        Above the reserve no pause is needed. Below it, the remaining calls are
+        spread evenly until the reset time, and an exhausted quota waits for the reset.
+        
+        Returns:
+            float: Seconds to wait.
+        """
+        with self.lock:
+            remaining, reset_at = self.remaining, self.reset_at
+        
+        if remaining is None or reset_at is None or remaining > self.min_remaining:
+            return 0.0
+        
+        until_reset = max(0.0, reset_at - time.time())
+        wait = until_reset if remaining <= 0 else until_reset / remaining
+        return min(wait, self.max_wait_seconds)
+    
+    def record_usage(self, target, cache_hit):
+        """Count a request or conditional cache hit against a target and the processing run in progress."""
+        with self.lock:
+            usage = self.usage.setdefault(target or 'default', {'requests': 0, 'cache_hits': 0})
+            usage['cache_hits' if cache_hit else 'requests'] += 1
+        record_run('github_cache_hits' if cache_hit else 'github_requests')
+    
+    def get_budget_usage(self):
+        """
+        Get the quota state and the usage of each target.
+        
+        Returns:
+            dict: Dictionary with 'limit', 'remaining', 'reset_at', 'graphql_remaining'
+                and per-target 'targets' counters.
+        """
+        with self.lock:
+            return {
+                'limit': self.limit,
+                'remaining': self.remaining,
+                'reset_at': self.reset_at,
+                'graphql_remaining': self.graphql_remaining,
+                'targets': {name: dict(usage) for name, usage in self.usage.items()}
+            }
\ No newline at end of file
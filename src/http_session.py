@@ -0,0 +1,145 @@
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter applying a default timeout to requests that do not set one."""
+    
+    def __init__(self, timeout=None, **kwargs):
+        """
+        Initialize the adapter.
+        
+        Args:
+            timeout (tuple, optional): Default (connect, read) timeout in seconds. Defaults to None.
+            **kwargs: Arguments passed on to HTTPAdapter.
+        """
+        self.timeout = timeout
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+class HttpSessionPool:
+    """Keep-alive connection pools and timeouts shared by the GitHub, OpenAI and Telegram clients."""
+    
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=30, max_retries=2):
+        """
+        Initialize the shared HTTP settings.
+        
+        Args:
+            pool_size (int, optional): Connections kept alive per host. Defaults to 10.
+            connect_timeout (float, optional): Seconds to wait for a connection. Defaults to 5.
+            read_timeout (float, optional): Seconds to wait for a response. Defaults to 30.
+            max_retries (int, optional): Retries of idempotent requests after connection errors
+                and 502/503/504 responses. Defaults to 2.
+        """
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.session = None
+    
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create the shared HTTP settings from the `http` configuration section.
+        
+        Args:
+            config (dict): Configuration dictionary.
+        
+        Returns:
+            HttpSessionPool: Shared HTTP settings.
+        """
+        http_config = config.get('http', {}) or {}
+        return cls(
+            pool_size=http_config.get('pool_size', 10),
+            connect_timeout=http_config.get('connect_timeout', 5),
+            read_timeout=http_config.get('read_timeout', 30),
+            max_retries=http_config.get('max_retries', 2)
+        )
+    
+    def get_session(self):
+        """
+        Get the shared requests session, creating it on first use.
+        
+        Returns:
+            requests.Session: Session with keep-alive pools and default timeouts.
+        """
+        if self.session is None:
+            retry = Retry(
+                total=self.max_retries,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False
+            )
+            adapter = TimeoutHTTPAdapter(
+                timeout=(self.connect_timeout, self.read_timeout),
+                pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size,
+                max_retries=retry
+            )
+            self.session = requests.Session()
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        return self.session
+    
+    def github_options(self):
+        """
+        Get the connection options for PyGithub, which manages its own session.
+        
+        Returns:
+            dict: Keyword arguments for github.Github.
+        """
+        return {'pool_size': self.pool_size, 'timeout': self.read_timeout}
+    
+    def telegram_request(self):
+        """
+        Build the connection pool used by telegram.Bot.
+        
+        Returns:
+            telegram.utils.request.Request: Request object for telegram.Bot(request=...).
+        """
+        from telegram.utils.request import Request
+        
+        return Request(
+            con_pool_size=self.pool_size,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout
+        )
+    
+    def configure_openai(self):
+        """
+        Route the OpenAI client's requests through the shared session.
+        
+        Returns:
+            tuple: (connect, read) timeout to pass to ChatOpenAI as request_timeout.
+        """
+        import openai
+        
+        if hasattr(openai, 'requestssession'):
+            openai.requestssession = self.get_session()
+        else:
+            logging.info("Installed OpenAI client does not accept a shared session, keeping its own pool")
+        return (self.connect_timeout, self.read_timeout)
+    
+    def aiohttp_options(self):
+        """
+        Get the connection settings for the asyncio engine's aiohttp session.
+        
+        Returns:
+            dict: 'limit_per_host', 'connect_timeout' and 'read_timeout' values.
+        """
+        return {
+            'limit_per_host': self.pool_size,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout
+        }
+    
+    def close(self):
+        """Close the shared session and its pooled connections."""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
@@ -1,11 +1,24 @@
 import os
 import sys
+import asyncio
 import logging
+import argparse
+import threading
+from itertools import takewhile
 import yaml
 from dotenv import load_dotenv
 from github_client import GitHubClient
-from commit_analyzer import CommitAnalyzer
+from github_requests import GitHubRequestLayer
+from git_mirror_client import GitMirrorClient
 from telegram_sender import TelegramSender
+from delivery_router import DeliveryRouter
+from commit_ledger import CommitLedger
+from pipeline import CommitPipeline
+from targets import load_targets, target_name
+from outbox import Outbox
+from http_session import HttpSessionPool
+from messenger_base import MessengerBase
+from metrics import count_run
 
 # Configure logging
 logging.basicConfig(
@@ -17,7 +30,7 @@ logging.basicConfig(
     ]
 )
 
-class SmartCommitMessenger:
+class SmartCommitMessenger(MessengerBase):
     """Main class that orchestrates the GitHub commit analysis and Telegram messaging."""
     
     def __init__(self, config_path='../config/config.yaml'):
@@ -27,99 +40,597 @@ class SmartCommitMessenger:
         Args:
             config_path (str, optional): Path to the configuration file. Defaults to '../config/config.yaml'.
         """
-        # Load environment variables
-        load_dotenv()
+        super().__init__(config_path)
         
-        # Load configuration
-        self.config = self.load_config(config_path)
-        if not self.config:
-            raise ValueError(f"Failed to load configuration from {config_path}")
+        # Targets read from local git mirrors need no GitHub token
+        self.github_client = None
+        if self.github_targets or not self.targets:
+            self.github_client = GitHubClient(
+                repository=self.github_targets[0]['repository'] if self.github_targets else None,
+                request_layer=self.request_layer,
+                http_pool=self.http,
+                patch_selector=self.patch_selector,
+                details_source=self.details_source
+            )
+            if self.github_targets:
+                self.github_clients[self.github_targets[0]['repository']] = self.github_client
         
-        # Initialize components
-        self.github_client = GitHubClient(
-            repository=self.config.get('github', {}).get('repository')
+        self.telegram_sender = TelegramSender(
+            channel_id=self.targets[0]['channel_id'] if self.targets else None,
+            request=self.http.telegram_request()
         )
         
-        self.commit_analyzer = CommitAnalyzer(
-            model_name=self.config.get('ai', {}).get('model', 'gpt-3.5-turbo'),
-            max_tokens=self.config.get('ai', {}).get('max_tokens', 500)
+        # Each description is rendered and sent to every destination of its target at once
+        self.router = DeliveryRouter(
+            self.telegram_sender.format_commit_message,
+            max_workers=self.config.get('telegram', {}).get('fan_out_workers', 4)
         )
+        self.outbox_worker = self.create_outbox_worker(self.telegram_sender.post_message)
         
-        self.telegram_sender = TelegramSender(
-            channel_id=self.config.get('telegram', {}).get('channel_id')
+        pipeline_config = self.config.get('pipeline', {})
+        self.pipeline = CommitPipeline(
+            fetch_workers=pipeline_config.get('fetch_workers', 4),
+            analyze_workers=pipeline_config.get('analyze_workers', 2),
+            delivery_workers=pipeline_config.get('delivery_workers', 1),
+            max_concurrency=pipeline_config.get('max_concurrency', 4)
         )
+        
+        # Polling and webhook runs of the same target take turns, so a commit is analyzed and sent once
+        self.target_locks = {}
+        self.target_locks_guard = threading.Lock()
     
-    def load_config(self, config_path):
+    def get_github_client(self, repository):
         """
-        Load configuration from YAML file.
+        Get the GitHub client for a repository, sharing one PyGithub instance across targets.
+        
+        Repositories whose target reads a local git mirror get a GitMirrorClient,
+        which has the same interface.
         
         Args:
-            config_path (str): Path to the configuration file.
+            repository (str): Repository name in format 'username/repo'.
+        
+        Returns:
+            GitHubClient: Client connected to the repository.
+        """
+        if repository not in self.github_clients:
+            target = self.get_target(repository)
+            if target and target['source'] == 'git_mirror':
+                self.github_clients[repository] = GitMirrorClient.from_target(target, self.config, self.patch_selector)
+                return self.github_clients[repository]
             
+            self.github_clients[repository] = GitHubClient(
+                token=self.github_client.token,
+                repository=repository,
+                github=self.github_client.github,
+                request_layer=self.request_layer,
+                patch_selector=self.patch_selector,
+                details_source=self.github_client.details_source
+            )
+        return self.github_clients[repository]
+    
+    def process_all_targets(self):
+        """
+        Process the latest commits of every configured target once.
+        
         Returns:
-            dict: Configuration dictionary or None if loading failed.
+            bool: True if every target was processed successfully, False otherwise.
         """
-        try:
-            with open(config_path, 'r') as file:
-                return yaml.safe_load(file)
-        except Exception as e:
-            logging.error(f"Error loading configuration: {str(e)}")
-            return None
+        results = [self.process_latest_commits(target) for target in self.targets]
+        return bool(results) and all(results)
     
-    def process_latest_commits(self):
+    def process_latest_commits(self, target=None):
         """
-        Process the latest commits from the configured repository.
+        Process the latest commits from a configured target.
+        
+        Args:
+            target (dict, optional): Target from load_targets(). Defaults to the first target.
         
         Returns:
             bool: True if processing was successful, False otherwise.
         """
-        # Get repository configuration
-        repo_config = self.config.get('github', {})
-        branch = repo_config.get('branch', 'main')
-        commit_limit = repo_config.get('commit_limit', 5)
+        if target is None:
+            if not self.targets:
+                logging.warning("No repository targets configured.")
+                return False
+            target = self.targets[0]
+        
+        github_client = self.get_github_client(target['repository'])
+        
+        # Get latest commits, only those newer than the cursor when known
+        since = self.get_since(target)
+        commits = github_client.get_latest_commits(branch=target['branch'], limit=target['commit_limit'], since=since)
+        if not commits:
+            if since:
+                logging.info(f"No new commits for {target_name(target)} since {since}.")
+                return True
+            logging.warning(f"No commits found to process for {target_name(target)}.")
+            return False
         
-        # Get project name from repository
-        project_name = repo_config.get('repository', '').split('/')[-1] if repo_config.get('repository') else 'Unknown Project'
+        with self.get_target_lock(target):
+            result = self.process_commits(target, commits)
+            self.advance_cursor(target, [commit.sha for commit in commits])
+        return result
+    
+    def process_commit_shas(self, target, shas):
+        """
+        Process specific commits of a target, e.g. those announced by a push webhook.
         
-        # Get README content for project description
-        readme_content = self.github_client.get_readme_content()
+        Args:
+            target (dict): Target the commits belong to.
+            shas (list): Commit SHAs, in delivery order.
         
-        # Get latest commits
-        commits = self.github_client.get_latest_commits(branch=branch, limit=commit_limit)
+        Returns:
+            bool: True if processing was successful, False otherwise.
+        """
+        github_client = self.get_github_client(target['repository'])
+        commits = [commit for commit in (github_client.get_commit(sha) for sha in shas) if commit]
         if not commits:
-            logging.warning("No commits found to process.")
+            logging.warning(f"No commits found to process for {target_name(target)}.")
             return False
         
-        # Process each commit
-        for commit in commits:
-            # Get detailed commit information
-            commit_details = self.github_client.get_commit_details(commit)
-            if not commit_details:
-                logging.warning(f"Failed to get details for commit {commit.sha}")
-                continue
+        with self.get_target_lock(target):
+            return self.process_commits(target, commits)
+    
+    def get_target_lock(self, target):
+        """
+        Get the lock serializing the runs of a target.
+        
+        It is held from the ledger check to the delivery of the last commit,
+        so a push processed from a webhook and a polling run never both send
+        the same commit.
+        
+        Args:
+            target (dict): Target of the run.
+        
+        Returns:
+            threading.Lock: Lock of the target's repository and branch.
+        """
+        key = (target['repository'], target['branch'])
+        with self.target_locks_guard:
+            if key not in self.target_locks:
+                self.target_locks[key] = threading.Lock()
+            return self.target_locks[key]
+    
+    def process_commits(self, target, commits):
+        """
+        Analyze and deliver the given commits of a target, skipping those already delivered.
+        
+        Callers hold the target's lock from get_target_lock(). A structured
+        summary of the run is logged and kept in last_run_summary.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            commits (list): Commit objects, in delivery order.
+        
+        Returns:
+            bool: True if processing was successful, False otherwise.
+        """
+        with count_run() as stats:
+            # Skip commits that were already delivered by a previous run
+            pending = self.select_pending(target, commits, lambda commit: commit.sha)
+            if not pending:
+                return True
             
-            # Analyze the commit
+            self.process_pending(target, pending)
+            self.finish_run(target, len(commits), [commit.sha for commit in pending], stats)
+        return True
+    
+    def process_pending(self, target, pending):
+        """
+        Fetch, analyze and deliver commits that were not delivered yet.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            pending (list): Commit objects, in delivery order.
+        """
+        github_client = self.get_github_client(target['repository'])
+        
+        # Get the project description from the cached README summary
+        project_description = self.get_project_description(github_client)
+        
+        # With the GraphQL details source, one query covers the details of many commits
+        with self.metrics.timer('fetch_batch'):
+            prefetched = github_client.get_commit_details_batch(pending)
+        
+        # Small commits of a push share analysis requests when batching is enabled
+        analyze_batch = None
+        if self.commit_analyzer.batch_size > 1 and len(pending) > 1:
+            analyze_batch = lambda commits, details: self.analyze_commit_batch(target, details, project_description)
+        
+        # Digests are sent once every commit is analyzed, instead of per commit
+        digest = self.digest_mode and len(pending) >= self.digest_min_commits
+        analyze = lambda commit, details: self.analyze_commit_details(target, details, project_description)
+        if digest:
+            deliver = lambda commit, details, description: True
+        elif self.streaming:
+            # The analysis runs in the delivery stage, so each message is posted before its description exists
+            analyze = lambda commit, details: ""
+            deliver = lambda commit, details, description: self.stream_commit(target, details, project_description)
+            analyze_batch = None
+        else:
+            deliver = lambda commit, details, description: self.deliver_commit(target, details, description)
+        
+        # Fetch, analyze and deliver the remaining commits concurrently, delivering in order
+        results = self.pipeline.run(
+            pending,
+            fetch=lambda commit: self.fetch_commit_details(github_client, commit, prefetched),
+            analyze=analyze,
+            deliver=deliver,
+            analyze_batch=analyze_batch
+        )
+        
+        if digest:
+            self.deliver_digest(target, [
+                (result['details'], result['description']) for result in results
+                if result['details'] and result['description']
+            ])
+    
+    def fetch_commit_details(self, github_client, commit, prefetched=None):
+        """
+        Fetch the details of a commit.
+        
+        Args:
+            github_client (GitHubClient): Client connected to the commit's repository.
+            commit: GitHub commit object.
+            prefetched (dict, optional): Details already fetched in a batch, by SHA. Defaults to None.
+        
+        Returns:
+            dict: Commit details, or None if they could not be fetched.
+        """
+        commit_details = (prefetched or {}).get(commit.sha)
+        if not commit_details:
+            with self.metrics.timer('fetch'):
+                commit_details = github_client.get_commit_details(commit)
+        if not commit_details:
+            logging.warning(f"Failed to get details for commit {commit.sha}")
+            return None
+        return commit_details
+    
+    def get_project_description(self, github_client):
+        """
+        Get the project description for a repository, refreshing it only when the README changes.
+        
+        The README is checked at most once per readme.check_interval_minutes. A
+        condensed summary is generated once per README version and used instead
+        of the full text when readme.summarize is enabled.
+        
+        Args:
+            github_client (GitHubClient): Client connected to the repository.
+        
+        Returns:
+            str: Project description for the analyzer.
+        """
+        repository = github_client.repository_name
+        entry = self.readme_cache.get_fresh(repository)
+        if entry:
+            return self.readme_cache.project_description(entry)
+        
+        readme = github_client.get_readme()
+        description = self.reuse_project_description(repository, readme)
+        if description is not None:
+            return description
+        
+        summary = ""
+        if self.summarize_readme:
+            summary = self.commit_analyzer.summarize_project(readme['content'], self.summary_max_words)
+        return self.store_project_description(repository, readme, summary)
+    
+    def analyze_commit_details(self, target, commit_details, readme_content):
+        """
+        Get the description of a commit, reusing a stored analysis when available.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            readme_content (str): Project description passed to the analyzer.
+        
+        Returns:
+            str: Description of the commit, or None if the analysis failed.
+        """
+        if not self.is_routed(target, commit_details):
+            return None
+        
+        # Reuse a stored analysis when only the delivery failed before
+        description = self.get_stored_description(target, commit_details['sha'])
+        if description:
+            return description
+        
+        with self.metrics.timer('analyze'):
             description = self.commit_analyzer.analyze_commit(commit_details, readme_content)
-            if not description:
-                logging.warning(f"Failed to generate description for commit {commit.sha}")
+        return self.store_analysis(target, commit_details['sha'], description)
+    
+    def analyze_commit_batch(self, target, commits_details, readme_content):
+        """
+        Get the descriptions of several commits, analyzing those without a stored analysis together.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            commits_details (list): Commit details dictionaries.
+            readme_content (str): Project description passed to the analyzer.
+        
+        Returns:
+            list: Description of each commit, None where the analysis failed or no destination takes it.
+        """
+        descriptions = []
+        missing = []
+        for commit_details in commits_details:
+            if not self.is_routed(target, commit_details):
+                descriptions.append(None)
                 continue
             
-            # Format and send the message
-            message = self.telegram_sender.format_commit_message(project_name, commit_details, description)
-            success = self.telegram_sender.send_message(message)
+            descriptions.append(self.get_stored_description(target, commit_details['sha']))
+            if descriptions[-1] is None:
+                missing.append(len(descriptions) - 1)
+        
+        with self.metrics.timer('analyze'):
+            analyzed = self.commit_analyzer.analyze_commits([commits_details[index] for index in missing], readme_content)
+        for index, description in zip(missing, analyzed):
+            descriptions[index] = self.store_analysis(target, commits_details[index]['sha'], description)
+        
+        return descriptions
+    
+    def deliver_commit(self, target, commit_details, description):
+        """
+        Format and send the message for a commit to each matching destination and record the delivery.
+        
+        Destinations that already received the commit in an earlier run are skipped.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            description (str): Description of the commit.
+        
+        Returns:
+            bool: True if the message was sent or queued to every destination, False otherwise.
+        """
+        sha = commit_details['sha']
+        destinations = self.route_undelivered(target, commit_details)
+        
+        routed = {sha: [destination['name'] for destination in destinations]}
+        
+        def send(destination):
+            with self.metrics.timer('format'):
+                message = self.router.render(destination, target['project_name'], commit_details, description)
+            return self.send_or_queue(target, destination, message, [sha], routed)
+        
+        results = self.router.fan_out(destinations, send)
+        return self.record_commit_delivery(target, sha, destinations, results)
+    
+    def stream_commit(self, target, commit_details, readme_content):
+        """
+        Post the message for a commit at once and fill in the description as the model generates it.
+        
+        The message is streamed to the first matching destination with the full
+        template, and the finished description is then sent to the others.
+        Stored analyses are delivered as regular messages, and the commit falls
+        back to a regular delivery when the message cannot be posted. Streamed
+        messages are sent directly, not through the outbox, and deleted again
+        when the analysis fails.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+            readme_content (str): Project description passed to the analyzer.
+        
+        Returns:
+            bool: True if the message was delivered, False otherwise.
+        """
+        sha = commit_details['sha']
+        
+        if not self.is_routed(target, commit_details):
+            return True
+        
+        description = self.get_stored_description(target, sha)
+        if description:
+            return self.deliver_commit(target, commit_details, description)
+        
+        destinations = self.route_undelivered(target, commit_details)
+        stream = None
+        if destinations:
+            stream = self.telegram_sender.start_stream(
+                target['project_name'], commit_details, destinations[0]['channel_id'], self.edit_interval
+            )
+        if stream is None:
+            description = self.analyze_commit_details(target, commit_details, readme_content)
+            return bool(description) and self.deliver_commit(target, commit_details, description)
+        
+        description = self.commit_analyzer.analyze_commit(commit_details, readme_content, on_token=stream.update)
+        description = self.store_analysis(target, sha, description)
+        if description is None:
+            stream.discard()
+            return False
+        
+        success = stream.finish(description)
+        self.record_stream(target, sha, destinations[0], success, finished=len(destinations) == 1)
+        
+        # The remaining destinations get the finished description
+        if len(destinations) > 1:
+            return self.deliver_commit(target, commit_details, description) and success
+        return success
+    
+    def deliver_digest(self, target, entries):
+        """
+        Send several analyzed commits of a target as a digest to each destination and record each delivery.
+        
+        Every destination gets a digest of the commits passing its filters that
+        it has not received yet. Destinations are served at once, the parts of
+        one digest in order.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            entries (list): (commit_details, description) tuples, in delivery order.
+        
+        Returns:
+            bool: True if every digest message was sent or queued, False otherwise.
+        """
+        select = self.get_digest_selector(target, entries)
+        routed = self.get_digest_routes(target, select)
+        failed = set()
+        
+        def send_digest(destination):
+            with self.metrics.timer('format'):
+                messages = self.telegram_sender.format_digest_message(target['project_name'], select(destination), target['branch'])
             
-            if success:
-                logging.info(f"Successfully processed and sent message for commit {commit.sha}")
-            else:
-                logging.error(f"Failed to send message for commit {commit.sha}")
+            all_sent = True
+            for message, covered in messages:
+                shas = [commit_details['sha'] for commit_details, _ in covered]
+                success = self.send_or_queue(target, destination, message, shas, routed)
+                self.log_digest(target, destination, covered, success)
+                if not success:
+                    failed.update(shas)
+                all_sent = all_sent and success
+            return all_sent
+        
+        results = self.router.fan_out(target['destinations'], send_digest)
+        self.record_digest_deliveries(target, entries, routed, failed)
+        return all(results)
+    
+    def send_or_queue(self, target, destination, message, shas, routed=None):
+        """
+        Send a message to a destination of the target, or hand it to the outbox when enabled.
+        
+        Direct deliveries are recorded for the destination; the status of the
+        commits is left to record_deliveries().
+        
+        Args:
+            target (dict): Target the message belongs to.
+            destination (dict): Destination to send the message to.
+            message (str): Message to send.
+            shas (list): SHAs of the commits the message covers.
+            routed (dict, optional): Names of all the destinations waiting for each commit,
+                by SHA, kept with queued messages. Defaults to None.
+        
+        Returns:
+            bool: True if the message was sent or queued, False otherwise.
+        """
+        if self.outbox:
+            self.queue_message(target, destination, message, shas, routed)
+            return True
+        
+        with self.metrics.timer('send'):
+            success = self.telegram_sender.send_message(message, channel_id=destination['channel_id'])
+        self.record_sent(target, destination, shas, success)
+        return success
+    
+    def drain_outbox(self, timeout=None):
+        """
+        Send the queued messages, waiting for retries up to the drain timeout.
+        
+        Args:
+            timeout (float, optional): Longest time to wait in seconds. Defaults to outbox.drain_timeout_seconds.
         
+        Returns:
+            int: Number of messages sent.
+        """
+        if not self.outbox_worker:
+            return 0
+        
+        sent = self.outbox_worker.drain(timeout if timeout is not None else self.outbox_drain_timeout)
+        stats = self.outbox.get_stats()
+        logging.info(
+            f"Outbox: sent {sent}, {stats['pending']} pending, {stats['dead']} given up, "
+            f"average latency {stats['avg_latency']:.1f}s"
+        )
+        return sent
+
+def has_new_commits(config):
+    """
+    Check cheaply whether any target may have something to process.
+    
+    One page of commit SHAs per branch, as many as a run lists, is requested
+    and compared with the ledger, without loading the GitHub, OpenAI or
+    Telegram SDKs. Commits that failed behind a delivered head therefore still
+    count. Messages waiting in the outbox also count as work.
+    
+    Args:
+        config (dict): Configuration dictionary.
+    
+    Returns:
+        bool: False only if every listed commit was already delivered, True otherwise.
+    """
+    outbox_config = config.get('outbox', {})
+    if outbox_config.get('enabled', False):
+        outbox = Outbox(path=outbox_config.get('path', 'outbox.db'))
+        try:
+            if outbox.get_stats()['pending']:
+                return True
+        finally:
+            outbox.close()
+    
+    ledger = CommitLedger(path=config.get('storage', {}).get('ledger_path', 'commit_ledger.db'))
+    http = HttpSessionPool.from_config(config)
+    try:
+        request_layer = None
+        for target in load_targets(config):
+            since_sha, since_date = GitHubClient.parse_since(target.get('since'))
+            if target['source'] == 'git_mirror':
+                mirror = GitMirrorClient.from_target(target, config)
+                if not mirror.sync():
+                    return True
+                shas = [commit.sha for commit in mirror.get_latest_commits(target['branch'], target['commit_limit'], target.get('since'))]
+            else:
+                request_layer = request_layer or GitHubRequestLayer(session=http.get_session())
+                shas = request_layer.get_recent_shas(
+                    target['repository'], target['branch'], target['commit_limit'],
+                    since=since_date, target=target['repository']
+                )
+                # Commits up to the configured starting point are never processed
+                if since_sha:
+                    shas = list(takewhile(lambda sha: not sha.startswith(since_sha), shas))
+            if any(not ledger.is_delivered(target['repository'], target['branch'], sha) for sha in shas):
+                return True
+        return False
+    except Exception as e:
+        logging.warning(f"Quick check for new commits failed, running a full check: {str(e)}")
         return True
+    finally:
+        ledger.close()
+        http.close()
+
+def nothing_to_do(config_path):
+    """
+    Run the quick check for a one-shot run, if it is enabled.
+    
+    Args:
+        config_path (str): Path to the configuration file.
+    
+    Returns:
+        bool: True if the run can exit without processing anything.
+    """
+    load_dotenv()
+    with open(config_path, 'r') as file:
+        config = yaml.safe_load(file) or {}
+    
+    if not config.get('github', {}).get('quick_check', True) or has_new_commits(config):
+        return False
+    
+    logging.info("No new commits on any target.")
+    return True
 
-def main():
+def parse_args(argv=None):
+    """Parse command line arguments shared by the entry points."""
+    parser = argparse.ArgumentParser(description="Analyze GitHub commits and send summaries to Telegram.")
+    parser.add_argument('--config', default='../config/config.yaml', help="Path to the configuration file.")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Use the asyncio engine instead of the threaded one.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function to run the Smart Commit Messenger."""
+    args = parse_args(argv)
     try:
-        messenger = SmartCommitMessenger()
-        messenger.process_latest_commits()
+        # Exit before the heavy clients are loaded when no branch moved
+        if nothing_to_do(args.config):
+            return 0
+        
+        if args.use_async:
+            from async_messenger import AsyncSmartCommitMessenger
+            messenger = AsyncSmartCommitMessenger(config_path=args.config)
+            asyncio.run(messenger.run(continuous=False))
+        else:
+            messenger = SmartCommitMessenger(config_path=args.config)
+            messenger.process_all_targets()
+            messenger.drain_outbox()
     except Exception as e:
         logging.error(f"Error running Smart Commit Messenger: {str(e)}")
         return 1
@@ -0,0 +1,718 @@
+import json
+import time
+import logging
+import yaml
+from dotenv import load_dotenv
+from github_requests import GitHubRequestLayer
+from analyzer_backends import create_backend
+from commit_analyzer import CommitAnalyzer, ANALYSIS_FAILED_MESSAGE
+from commit_classifier import CommitClassifier
+from patch_selector import PatchSelector
+from telegram_sender import TelegramSender
+from commit_ledger import CommitLedger, STATUS_FAILED
+from analysis_cache import AnalysisCache
+from targets import load_targets, target_name
+from readme_cache import ReadmeCache
+from outbox import Outbox, OutboxWorker
+from http_session import HttpSessionPool
+from metrics import Metrics, get_prices, estimate_cost, collect_messenger_metrics, record_run
+
+class MessengerBase:
+    """Configuration, ledger bookkeeping and run summaries shared by the synchronous and asynchronous messengers."""
+    
+    def __init__(self, config_path='../config/config.yaml'):
+        """
+        Load the configuration and create the components that do no network I/O of their own.
+        
+        Subclasses create the GitHub and Telegram clients and the delivery
+        router, and run every network request.
+        
+        Args:
+            config_path (str, optional): Path to the configuration file. Defaults to '../config/config.yaml'.
+        
+        Raises:
+            ValueError: If the configuration cannot be loaded or asks for GraphQL details
+                where commits need their changed files.
+        """
+        # Load environment variables
+        load_dotenv()
+        
+        # Load configuration
+        self.config = self.load_config(config_path)
+        if not self.config:
+            raise ValueError(f"Failed to load configuration from {config_path}")
+        
+        # Repositories to monitor, each with its own branch and channel
+        self.targets = load_targets(self.config)
+        if not self.targets:
+            logging.warning("No repository targets configured.")
+        
+        # Keep-alive connection pools and timeouts shared by all clients
+        self.http = HttpSessionPool.from_config(self.config)
+        
+        # Counters and stage latencies, served on /metrics and summarized after each run
+        self.metrics = Metrics()
+        self.metrics.add_collector(lambda metrics: collect_messenger_metrics(metrics, self, self.token_prices))
+        self.last_run_summary = None
+        
+        # ETags and the rate limit state are shared by every target read from the GitHub API
+        github_config = self.config.get('github', {})
+        self.details_source = github_config.get('details_source', 'rest')
+        self.github_targets = [target for target in self.targets if target['source'] == 'github']
+        self.request_layer = None
+        if github_config.get('conditional_requests', True) and (self.github_targets or not self.targets):
+            self.request_layer = GitHubRequestLayer(
+                session=self.http.get_session(),
+                min_remaining=github_config.get('min_remaining', 100)
+            )
+        
+        self.patch_selector = PatchSelector.from_config(self.config)
+        self.github_clients = {}
+        
+        cache_config = self.config.get('cache', {})
+        self.analysis_cache = None
+        if cache_config.get('enabled', True):
+            self.analysis_cache = AnalysisCache(
+                path=cache_config.get('path', 'analysis_cache.db'),
+                max_entries=cache_config.get('max_entries', 1000),
+                ttl_seconds=cache_config.get('ttl_days', 30) * 24 * 3600
+            )
+        
+        ai_config = self.config.get('ai', {})
+        self.token_prices = get_prices(ai_config.get('model', 'gpt-3.5-turbo'), self.config.get('metrics', {}))
+        self.commit_analyzer = CommitAnalyzer(
+            model_name=ai_config.get('model', 'gpt-3.5-turbo'),
+            max_tokens=ai_config.get('max_tokens', 500),
+            cache=self.analysis_cache,
+            prompt_token_budget=ai_config.get('prompt_token_budget'),
+            batch_size=ai_config.get('batch_size', 1),
+            batch_token_budget=ai_config.get('batch_token_budget', 3000),
+            backend=create_backend(ai_config, self.http),
+            classifier=CommitClassifier.from_config(self.config)
+        )
+        
+        if self.github_targets and self.details_source == 'graphql':
+            self.check_graphql_details(self.github_targets)
+        
+        # In digest mode a push of several commits is summarized in one message
+        telegram_config = self.config.get('telegram', {})
+        self.digest_mode = telegram_config.get('mode', 'per_commit') == 'digest'
+        self.digest_min_commits = telegram_config.get('digest_min_commits', 2)
+        
+        # Streamed messages are posted at once and edited as the description is generated
+        self.streaming = telegram_config.get('streaming', False)
+        self.edit_interval = telegram_config.get('edit_interval_seconds', 3)
+        
+        # Durable queue of outgoing messages, drained by a rate-limited worker from create_outbox_worker()
+        outbox_config = self.config.get('outbox', {})
+        self.outbox = None
+        self.outbox_worker = None
+        self.outbox_drain_timeout = outbox_config.get('drain_timeout_seconds', 300)
+        if outbox_config.get('enabled', False):
+            self.outbox = Outbox(
+                path=outbox_config.get('path', 'outbox.db'),
+                max_attempts=outbox_config.get('max_attempts', 8),
+                base_delay=outbox_config.get('base_delay_seconds', 2),
+                max_delay=outbox_config.get('max_delay_seconds', 600)
+            )
+        
+        readme_config = self.config.get('readme', {})
+        self.readme_cache = ReadmeCache(
+            path=readme_config.get('cache_path', 'readme_cache.json'),
+            check_interval_minutes=readme_config.get('check_interval_minutes', 60)
+        )
+        self.summarize_readme = readme_config.get('summarize', True)
+        self.summary_max_words = readme_config.get('summary_max_words', 150)
+        
+        self.ledger = CommitLedger(
+            path=self.config.get('storage', {}).get('ledger_path', 'commit_ledger.db')
+        )
+        
+        # Newest commit SHA delivered with all older ones, used to fetch only newer commits
+        self.last_commit_shas = {}
+    
+    def load_config(self, config_path):
+        """
+        Load configuration from YAML file.
+        
+        Args:
+            config_path (str): Path to the configuration file.
+        
+        Returns:
+            dict: Configuration dictionary or None if loading failed.
+        """
+        try:
+            with open(config_path, 'r') as file:
+                return yaml.safe_load(file)
+        except Exception as e:
+            logging.error(f"Error loading configuration: {str(e)}")
+            return None
+    
+    def check_graphql_details(self, targets):
+        """
+        Refuse the GraphQL details source where commits need their list of changed files.
+        
+        GraphQL details only carry the number of changed files, so path filters
+        would skip every commit and file-based classifier rules would never match.
+        
+        Args:
+            targets (list): Targets read from the GitHub API.
+        
+        Raises:
+            ValueError: If a destination filters by path or a file-based classifier rule is enabled.
+        """
+        filtered = sorted({
+            destination['name'] for target in targets for destination in target['destinations']
+            if destination['paths'] or destination['exclude_paths']
+        })
+        if filtered:
+            raise ValueError(
+                f"github.details_source 'graphql' lists no changed files, which the path filters of "
+                f"{', '.join(filtered)} need. Use 'rest' or remove paths/exclude_paths."
+            )
+        
+        classifier = self.commit_analyzer.classifier
+        file_rules = classifier.get_file_rules() if classifier else []
+        if file_rules:
+            raise ValueError(
+                f"github.details_source 'graphql' lists no changed files, which the classifier rules "
+                f"{', '.join(file_rules)} need. Use 'rest' or set classifier.rules to ['merge']."
+            )
+    
+    def create_outbox_worker(self, send):
+        """
+        Create the worker draining the outbox, when the outbox is enabled.
+        
+        Args:
+            send (callable): Synchronous function posting one message, like TelegramSender.post_message.
+        
+        Returns:
+            OutboxWorker: Worker recording each outcome in the ledger, or None without an outbox.
+        """
+        if not self.outbox:
+            return None
+        
+        outbox_config = self.config.get('outbox', {})
+        return OutboxWorker(
+            self.outbox,
+            send=self.metrics.timed('send', send),
+            per_chat_per_minute=outbox_config.get('per_chat_per_minute', 20),
+            global_per_second=outbox_config.get('global_per_second', 25),
+            burst=outbox_config.get('burst', 3),
+            permanent_errors=TelegramSender.get_permanent_errors(),
+            on_sent=lambda message: self.record_outbox_delivery(message, True),
+            on_dead=lambda message: self.record_outbox_delivery(message, False)
+        )
+    
+    def find_target(self, repository, branch):
+        """
+        Find the configured target for a repository and branch.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            branch (str): Branch name.
+        
+        Returns:
+            dict: Matching target, or None if the pair is not monitored.
+        """
+        for target in self.targets:
+            if target['repository'].lower() == repository.lower() and target['branch'] == branch:
+                return target
+        return None
+    
+    def get_target(self, repository):
+        """
+        Get the first configured target of a repository.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+        
+        Returns:
+            dict: Matching target, or None if the repository is not monitored.
+        """
+        return next((target for target in self.targets if target['repository'] == repository), None)
+    
+    def get_since(self, target):
+        """
+        Get the point after which the commits of a target are listed.
+        
+        Args:
+            target (dict): Target to list.
+        
+        Returns:
+            str: Cursor SHA of the target, its configured 'since', or None to list the latest commits.
+        """
+        return self.last_commit_shas.get((target['repository'], target['branch'])) or target.get('since')
+    
+    def advance_cursor(self, target, shas):
+        """
+        Move the cursor of a target past the listed commits that were delivered.
+        
+        The cursor stops below the oldest commit that was not sent yet, so
+        failed and still queued commits are listed again by the next run.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            shas (list): Listed commit SHAs, newest first.
+        """
+        repository, branch = target['repository'], target['branch']
+        for sha in reversed(shas):
+            if not self.ledger.is_sent(repository, branch, sha):
+                break
+            self.last_commit_shas[(repository, branch)] = sha
+    
+    def select_pending(self, target, commits, get_sha):
+        """
+        Leave out the commits that were already delivered by a previous run.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            commits (list): Commits, in delivery order.
+            get_sha (callable): Returns the SHA of a commit.
+        
+        Returns:
+            list: Commits not delivered yet, in delivery order.
+        """
+        pending = []
+        for commit in commits:
+            if self.ledger.is_delivered(target['repository'], target['branch'], get_sha(commit)):
+                logging.info(f"Skipping already delivered commit {get_sha(commit)}")
+            else:
+                pending.append(commit)
+        
+        self.metrics.inc('commits_total', len(commits) - len(pending), target=target_name(target), result='skipped')
+        if pending:
+            self.metrics.set('pending_commits', len(pending), target=target_name(target))
+        return pending
+    
+    def finish_run(self, target, listed, shas, stats):
+        """
+        Count the outcome of a processing run and log its summary.
+        
+        Commits no destination takes are recorded as delivered without a
+        message. The summary is kept in last_run_summary.
+        
+        Args:
+            target (dict): Target of the run.
+            listed (int): Number of listed commits.
+            shas (list): SHAs of the commits that were processed.
+            stats (RunStats): Counters of the run from count_run().
+        
+        Returns:
+            dict: Summary of the run from summarize_run().
+        """
+        repository, branch = target['repository'], target['branch']
+        delivered = sum(1 for sha in shas if self.ledger.is_delivered(repository, branch, sha))
+        self.metrics.inc('commits_total', delivered, target=target_name(target), result='delivered')
+        self.metrics.inc('commits_total', len(shas) - delivered, target=target_name(target), result='failed')
+        self.metrics.set('pending_commits', 0, target=target_name(target))
+        
+        self.last_run_summary = self.summarize_run(target, stats, {
+            'listed': listed,
+            'skipped': listed - len(shas),
+            'analyzed': stats.get('analyzed'),
+            'reused': stats.get('reused'),
+            'delivered': delivered,
+            'failed': len(shas) - delivered
+        })
+        logging.info(f"Run summary: {json.dumps(self.last_run_summary, sort_keys=True)}")
+        return self.last_run_summary
+    
+    def summarize_run(self, target, stats, commits):
+        """
+        Build the structured summary of a processing run.
+        
+        Every figure comes from the run's own counters, so runs of other
+        targets going on at the same time are never mixed in.
+        
+        Args:
+            target (dict): Target of the run.
+            stats (RunStats): Counters of the run from count_run().
+            commits (dict): Commit counts of the run.
+        
+        Returns:
+            dict: Duration, commit counts, per-stage latency, model usage and cost,
+                GitHub usage and quota, cache hits and outbox depth of the run.
+        """
+        duration = time.monotonic() - stats.started
+        self.metrics.observe('run_duration_seconds', duration, target=target_name(target))
+        
+        stages = {
+            stage: {
+                'count': totals['count'],
+                'seconds': round(totals['seconds'], 3),
+                'mean_seconds': round(totals['seconds'] / totals['count'], 3)
+            }
+            for stage, totals in stats.get_stages().items()
+        }
+        
+        prompt_tokens, completion_tokens = stats.get('prompt_tokens'), stats.get('completion_tokens')
+        cost = estimate_cost(self.token_prices, prompt_tokens, completion_tokens)
+        
+        # Templated, cached and reused descriptions cost nothing, so only model answers count per commit
+        model_commits = stats.get('generated')
+        llm = {
+            'requests': stats.get('llm_requests'),
+            'failures': stats.get('llm_failures'),
+            'commits': model_commits,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cost_usd': round(cost, 6),
+            'tokens_per_commit': round((prompt_tokens + completion_tokens) / model_commits, 1) if model_commits else 0,
+            'cost_per_commit_usd': round(cost / model_commits, 6) if model_commits else 0
+        }
+        self.metrics.set('llm_tokens_per_commit', llm['tokens_per_commit'], target=target_name(target))
+        self.metrics.set('llm_cost_per_commit_usd', llm['cost_per_commit_usd'], target=target_name(target))
+        
+        summary = {
+            'target': target_name(target),
+            'duration_seconds': round(duration, 3),
+            'commits': commits,
+            'stages': stages,
+            'llm': llm,
+            'github': {'requests': stats.get('github_requests'), 'cache_hits': stats.get('github_cache_hits')},
+            'analysis_cache': {'hits': stats.get('analysis_cache_hits'), 'misses': stats.get('analysis_cache_misses')}
+        }
+        if self.request_layer:
+            budget = self.request_layer.get_budget_usage()
+            summary['github'].update(quota_remaining=budget['remaining'], graphql_remaining=budget['graphql_remaining'])
+        if self.outbox:
+            summary['outbox'] = {'pending': self.outbox.get_stats()['pending']}
+        return summary
+    
+    def reuse_project_description(self, repository, readme):
+        """
+        Get the project description of a README that was fetched again, if it needs no new summary.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            readme (dict): Fetched README with 'sha' and 'content', or None if it could not be fetched.
+        
+        Returns:
+            str: Project description, or None if the README changed and must be summarized.
+        """
+        cached = self.readme_cache.get(repository)
+        if not readme:
+            # Keep using the last known version when the README cannot be fetched
+            return self.readme_cache.project_description(cached)
+        
+        # Unchanged README: reuse it, retrying only a summary that failed before
+        if cached and cached['sha'] == readme['sha'] and (cached['summary'] or not self.summarize_readme):
+            self.readme_cache.touch(repository)
+            return self.readme_cache.project_description(cached)
+        
+        if self.summarize_readme:
+            logging.info(f"Summarizing new README version of {repository}")
+        return None
+    
+    def store_project_description(self, repository, readme, summary):
+        """
+        Store a new README version with its summary.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            readme (dict): Fetched README with 'sha' and 'content'.
+            summary (str): Summary of the README, empty if not summarized.
+        
+        Returns:
+            str: Project description for the analyzer.
+        """
+        entry = self.readme_cache.store(repository, readme['sha'], readme['content'], summary)
+        return self.readme_cache.project_description(entry)
+    
+    def get_stored_description(self, target, sha):
+        """
+        Get the stored analysis of a commit whose delivery failed before.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            sha (str): Commit SHA.
+        
+        Returns:
+            str: Stored description, or None if the commit was not analyzed yet.
+        """
+        entry = self.ledger.get_entry(target['repository'], target['branch'], sha)
+        if not entry or not entry['description']:
+            return None
+        
+        record_run('reused')
+        return entry['description']
+    
+    def store_analysis(self, target, sha, description):
+        """
+        Store a new description of a commit in the ledger.
+        
+        A failed analysis is recorded as a failed delivery and never sent, so
+        the commit is analyzed again by the next run.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            sha (str): Commit SHA.
+            description (str): Description returned by the analyzer.
+        
+        Returns:
+            str: The description, or None if the analysis failed.
+        """
+        if not description or description == ANALYSIS_FAILED_MESSAGE:
+            logging.warning(f"Failed to generate description for commit {sha}")
+            self.ledger.record_delivery(target['repository'], target['branch'], sha, False)
+            return None
+        
+        self.ledger.record_analysis(target['repository'], target['branch'], sha, description)
+        record_run('analyzed')
+        return description
+    
+    def is_routed(self, target, commit_details):
+        """
+        Check whether any destination of a target takes a commit.
+        
+        Commits filtered out by every destination are recorded as delivered
+        without being analyzed.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+        
+        Returns:
+            bool: True if at least one destination takes the commit.
+        """
+        if self.router.route(target, commit_details):
+            return True
+        
+        logging.info(f"No destination of {target_name(target)} takes commit {commit_details['sha']}")
+        self.ledger.record_delivery(target['repository'], target['branch'], commit_details['sha'], True)
+        return False
+    
+    def route_undelivered(self, target, commit_details):
+        """
+        Get the destinations of a commit that did not receive it in an earlier run.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            commit_details (dict): Dictionary containing commit details.
+        
+        Returns:
+            list: Matching destinations still waiting for the commit.
+        """
+        repository, branch = target['repository'], target['branch']
+        return self.router.route(target, commit_details, skip=self.ledger.get_destinations(repository, branch, commit_details['sha']))
+    
+    def get_digest_selector(self, target, entries):
+        """
+        Get a function selecting the digest entries of each destination.
+        
+        The destinations that already received each commit are read from the
+        ledger once, before any digest is sent.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            entries (list): (commit_details, description) tuples, in delivery order.
+        
+        Returns:
+            callable: Takes a destination and returns the entries passing its filters
+                that it has not received yet.
+        """
+        repository, branch = target['repository'], target['branch']
+        delivered = {
+            commit_details['sha']: self.ledger.get_destinations(repository, branch, commit_details['sha'])
+            for commit_details, _ in entries
+        }
+        
+        def select(destination):
+            return [
+                (commit_details, description) for commit_details, description in entries
+                if destination['name'] not in delivered[commit_details['sha']]
+                and self.router.matches(destination, commit_details)
+            ]
+        return select
+    
+    def get_digest_routes(self, target, select):
+        """
+        Get the destinations each commit of a digest is sent to.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            select (callable): Digest selector from get_digest_selector().
+        
+        Returns:
+            dict: Names of the destinations waiting for each commit, by SHA.
+        """
+        routed = {}
+        for destination in target['destinations']:
+            for commit_details, _ in select(destination):
+                routed.setdefault(commit_details['sha'], []).append(destination['name'])
+        return routed
+    
+    def log_digest(self, target, destination, covered, success):
+        """
+        Log the outcome of one digest message.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            destination (dict): Destination of the digest.
+            covered (list): (commit_details, description) tuples the message covers.
+            success (bool): Whether the message was sent or queued.
+        """
+        if success:
+            logging.info(
+                f"{'Queued' if self.outbox else 'Sent'} digest of {len(covered)} commit(s) "
+                f"for {target_name(target)} to {destination['name']}"
+            )
+        else:
+            logging.error(f"Failed to send digest of {len(covered)} commit(s) for {target_name(target)} to {destination['name']}")
+    
+    def queue_message(self, target, destination, message, shas, routed=None):
+        """
+        Hand a message for a destination of the target to the outbox.
+        
+        Each part is its own outbox entry, so a retry never sends an earlier part twice.
+        The commits are recorded as queued first, so a message the worker sends
+        or gives up right away is never overwritten by that status.
+        
+        Args:
+            target (dict): Target the message belongs to.
+            destination (dict): Destination to send the message to.
+            message (str): Message to send.
+            shas (list): SHAs of the commits the message covers.
+            routed (dict, optional): Names of all the destinations waiting for each commit,
+                by SHA. Defaults to this destination only.
+        """
+        for sha in shas:
+            self.ledger.record_queued(target['repository'], target['branch'], sha)
+        self.outbox.enqueue_parts(destination['channel_id'], TelegramSender.split_message(message), {
+            'repository': target['repository'], 'branch': target['branch'], 'shas': shas, 'destination': destination['name'],
+            'routed': {sha: list((routed or {}).get(sha, [destination['name']])) for sha in shas}
+        })
+        self.metrics.inc('messages_total', result='queued')
+    
+    def record_sent(self, target, destination, shas, success):
+        """
+        Record a direct send of a message to a destination.
+        
+        Args:
+            target (dict): Target the message belongs to.
+            destination (dict): Destination the message was sent to.
+            shas (list): SHAs of the commits the message covers.
+            success (bool): Whether the message was sent.
+        """
+        self.metrics.inc('messages_total', result='sent' if success else 'failed')
+        if success:
+            for sha in shas:
+                self.ledger.record_destination(target['repository'], target['branch'], sha, destination['name'])
+    
+    def record_deliveries(self, target, shas, success):
+        """
+        Record the delivery status of commits once all their messages were sent.
+        
+        Commits handed to the outbox are left out by the callers; their status
+        is recorded by record_outbox_delivery().
+        
+        Args:
+            target (dict): Target the commits belong to.
+            shas (list): Commit SHAs.
+            success (bool): Whether every message of the commits was sent.
+        """
+        for sha in shas:
+            self.ledger.record_delivery(target['repository'], target['branch'], sha, success)
+    
+    def record_digest_deliveries(self, target, entries, routed, failed):
+        """
+        Record the delivery status of the commits of a digest.
+        
+        Args:
+            target (dict): Target the commits belong to.
+            entries (list): (commit_details, description) tuples of the digest.
+            routed (dict): Destinations of each commit from get_digest_routes().
+            failed (set): SHAs of the commits a message failed for.
+        """
+        shas = [commit_details['sha'] for commit_details, _ in entries]
+        if self.outbox:
+            shas = [sha for sha in shas if sha not in routed]
+        self.record_deliveries(target, [sha for sha in shas if sha not in failed], True)
+        self.record_deliveries(target, [sha for sha in shas if sha in failed], False)
+    
+    def record_commit_delivery(self, target, sha, destinations, results):
+        """
+        Record and log the delivery of a commit message to its destinations.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            sha (str): Commit SHA.
+            destinations (list): Destinations the message was sent or queued to.
+            results (list): Outcome for each destination.
+        
+        Returns:
+            bool: True if the message was sent or queued to every destination, False otherwise.
+        """
+        success = all(results)
+        if not (self.outbox and destinations):
+            self.record_deliveries(target, [sha], success)
+        
+        if not destinations:
+            logging.info(f"No destination of {target_name(target)} takes commit {sha}")
+        elif success:
+            logging.info(
+                f"Successfully processed and {'queued' if self.outbox else 'sent'} message for commit {sha} "
+                f"to {len(destinations)} destination(s)"
+            )
+        else:
+            logging.error(f"Failed to send message for commit {sha} to {results.count(False)} of {len(destinations)} destination(s)")
+        return success
+    
+    def record_stream(self, target, sha, destination, success, finished=True):
+        """
+        Record a streamed message of a commit.
+        
+        Args:
+            target (dict): Target the commit belongs to.
+            sha (str): Commit SHA.
+            destination (dict): Destination the message was streamed to.
+            success (bool): Whether the streamed message shows the final description.
+            finished (bool, optional): Whether no other destination waits for the commit,
+                so its delivery is recorded too. Defaults to True.
+        """
+        repository, branch = target['repository'], target['branch']
+        if success:
+            self.ledger.record_destination(repository, branch, sha, destination['name'])
+        if not finished:
+            return
+        
+        self.ledger.record_delivery(repository, branch, sha, success)
+        if success:
+            logging.info(f"Successfully processed and streamed message for commit {sha}")
+        else:
+            logging.error(f"Failed to complete streamed message for commit {sha}")
+    
+    def record_outbox_delivery(self, message, success):
+        """
+        Record the final outcome of a queued message in the ledger.
+        
+        A message sent in several parts counts as sent once its last part was
+        sent, and as failed as soon as one part is given up. A commit is
+        delivered once every destination it was routed to has its message, and
+        stays failed once one of them was given up, so the next run sends it to
+        that destination again.
+        
+        Args:
+            message (dict): Outbox message with the commit metadata.
+            success (bool): Whether the message was sent.
+        """
+        self.metrics.inc('messages_total', result='sent' if success else 'failed')
+        metadata = message.get('metadata') or {}
+        if success and metadata.get('part', 0) < metadata.get('parts', 1) - 1:
+            return
+        
+        repository, branch, destination = metadata['repository'], metadata['branch'], metadata.get('destination')
+        for sha in metadata.get('shas', []):
+            if not success:
+                self.ledger.record_delivery(repository, branch, sha, False)
+                continue
+            
+            if destination:
+                self.ledger.record_destination(repository, branch, sha, destination)
+            routed = set((metadata.get('routed') or {}).get(sha, [destination] if destination else []))
+            entry = self.ledger.get_entry(repository, branch, sha)
+            if entry and entry['status'] == STATUS_FAILED:
+                continue
+            if routed <= self.ledger.get_destinations(repository, branch, sha):
+                self.ledger.record_delivery(repository, branch, sha, True)
@@ -0,0 +1,493 @@
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Type and help text of each metric, without the namespace prefix
+METRICS = {
+    'commits_total': ('counter', "Commits handled, by target and result."),
+    'messages_total': ('counter', "Messages sent, queued or failed."),
+    'stage_duration_seconds': ('histogram', "Time spent in each processing stage."),
+    'stage_in_progress': ('gauge', "Calls currently running in each processing stage."),
+    'pending_commits': ('gauge', "Commits of the current run not yet delivered, by target."),
+    'llm_requests_total': ('counter', "Model requests, by result."),
+    'llm_tokens_total': ('counter', "Model tokens used, by kind."),
+    'llm_cost_usd_total': ('counter', "Estimated model cost in US dollars."),
+    'llm_tokens_per_commit': ('gauge', "Model tokens per analyzed commit in the last run, by target."),
+    'llm_cost_per_commit_usd': ('gauge', "Estimated model cost per analyzed commit in the last run, by target."),
+    'github_quota_remaining': ('gauge', "GitHub API quota left, by API."),
+    'github_requests_total': ('counter', "GitHub API requests, by target and result."),
+    'outbox_messages': ('gauge', "Messages in the outbox, by state."),
+    'cache_lookups_total': ('counter', "Cache lookups, by cache and result."),
+    'cache_hit_ratio': ('gauge', "Share of cache lookups that were hits, by cache."),
+    'run_duration_seconds': ('histogram', "Duration of processing runs, by target.")
+}
+
+# Counters of the processing run in progress, set by count_run()
+current_run = contextvars.ContextVar('current_run', default=None)
+
+# US dollars per 1000 prompt and completion tokens, matched by model name prefix
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4': (0.03, 0.06)
+}
+
+def get_prices(model_name, metrics_config=None):
+    """
+    Get the token prices of a model.
+    
+    Args:
+        model_name (str): Name of the model.
+        metrics_config (dict, optional): The `metrics` configuration section, whose
+            price_per_1k_tokens overrides the built-in prices. Defaults to None.
+    
+    Returns:
+        tuple: US dollars per 1000 prompt and per 1000 completion tokens, (0, 0) if unknown.
+    """
+    prices = (metrics_config or {}).get('price_per_1k_tokens')
+    if prices:
+        return prices.get('prompt', 0), prices.get('completion', 0)
+    
+    matches = [prefix for prefix in MODEL_PRICES if (model_name or '').startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else (0, 0)
+
+def estimate_cost(prices, prompt_tokens, completion_tokens):
+    """
+    Estimate the model cost of the given tokens.
+    
+    Args:
+        prices (tuple): Prices from get_prices().
+        prompt_tokens (int): Prompt tokens used.
+        completion_tokens (int): Completion tokens used.
+    
+    Returns:
+        float: Cost in US dollars.
+    """
+    prompt_price, completion_price = prices
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+def record_run(name, value=1):
+    """
+    Add to a counter of the processing run in progress, if any.
+    
+    Args:
+        name (str): Counter name, e.g. 'prompt_tokens' or 'reused'.
+        value (int, optional): Amount to add. Defaults to 1.
+    """
+    stats = current_run.get()
+    if stats is not None:
+        stats.add(name, value)
+
+@contextmanager
+def count_run():
+    """
+    Count the work done inside the block as one processing run.
+    
+    Components shared by concurrent runs record into the RunStats of the
+    context they are called from, so one run never counts another's work.
+    
+    Yields:
+        RunStats: Counters of the run.
+    """
+    stats = RunStats()
+    token = current_run.set(stats)
+    try:
+        yield stats
+    finally:
+        current_run.reset(token)
+
+def bind_context(func):
+    """
+    Wrap a function so it runs in the caller's context from any thread.
+    
+    Worker threads start with an empty context; each call of the wrapper
+    gets its own copy of the caller's, so work handed to a thread pool still
+    counts towards the caller's run.
+    
+    Args:
+        func (callable): Function to wrap.
+    
+    Returns:
+        callable: Function with the same arguments and result.
+    """
+    context = contextvars.copy_context()
+    
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+class RunStats:
+    """Thread-safe counters and stage latencies of one processing run."""
+    
+    def __init__(self):
+        """Initialize the counters of a run starting now."""
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.stages = {}
+    
+    def add(self, name, value=1):
+        """
+        Add to a counter.
+        
+        Args:
+            name (str): Counter name.
+            value (int, optional): Amount to add. Defaults to 1.
+        """
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+    
+    def get(self, name):
+        """Get the value of a counter, 0 if it was never added to."""
+        with self.lock:
+            return self.counts.get(name, 0)
+    
+    def add_stage(self, stage, seconds):
+        """
+        Count a call of a processing stage.
+        
+        Args:
+            stage (str): Stage name.
+            seconds (float): Duration of the call.
+        """
+        with self.lock:
+            totals = self.stages.setdefault(stage, {'count': 0, 'seconds': 0})
+            totals['count'] += 1
+            totals['seconds'] += seconds
+    
+    def get_stages(self):
+        """
+        Get the number of calls and the time spent in each stage during the run.
+        
+        Returns:
+            dict: {'count', 'seconds'} by stage name.
+        """
+        with self.lock:
+            return {stage: dict(totals) for stage, totals in self.stages.items()}
+
+def set_cache_metrics(metrics, cache, hits, misses):
+    """Set the lookup counters and hit ratio of a cache."""
+    metrics.set('cache_lookups_total', hits, cache=cache, result='hit')
+    metrics.set('cache_lookups_total', misses, cache=cache, result='miss')
+    metrics.set('cache_hit_ratio', hits / (hits + misses) if hits + misses else 0, cache=cache)
+
+def collect_messenger_metrics(metrics, messenger, prices):
+    """
+    Refresh the metrics kept by the components of a messenger.
+    
+    Covers model usage and cost, GitHub quota and requests, the analysis
+    cache, the classifier and the outbox, where the messenger has them.
+    
+    Args:
+        metrics (Metrics): Registry to update.
+        messenger: SmartCommitMessenger or AsyncSmartCommitMessenger.
+        prices (tuple): Token prices from get_prices().
+    """
+    usage = messenger.commit_analyzer.get_usage()
+    metrics.set('llm_requests_total', usage['requests'] - usage['failures'], result='success')
+    metrics.set('llm_requests_total', usage['failures'], result='failure')
+    metrics.set('llm_tokens_total', usage['prompt_tokens'], kind='prompt')
+    metrics.set('llm_tokens_total', usage['completion_tokens'], kind='completion')
+    metrics.set('llm_cost_usd_total', estimate_cost(prices, usage['prompt_tokens'], usage['completion_tokens']))
+    
+    request_layer = getattr(messenger, 'request_layer', None)
+    if request_layer:
+        budget = request_layer.get_budget_usage()
+        if budget['remaining'] is not None:
+            metrics.set('github_quota_remaining', budget['remaining'], api='rest')
+        if budget['graphql_remaining'] is not None:
+            metrics.set('github_quota_remaining', budget['graphql_remaining'], api='graphql')
+        
+        for repository, counts in budget['targets'].items():
+            metrics.set('github_requests_total', counts['requests'], target=repository, result='fetched')
+            metrics.set('github_requests_total', counts['cache_hits'], target=repository, result='not_modified')
+        
+        # Conditional requests answered with 304 Not Modified are the hits of the ETag cache
+        hits = sum(counts['cache_hits'] for counts in budget['targets'].values())
+        set_cache_metrics(metrics, 'github', hits, sum(counts['requests'] for counts in budget['targets'].values()))
+    
+    if messenger.analysis_cache:
+        stats = messenger.analysis_cache.get_stats()
+        set_cache_metrics(metrics, 'analysis', stats['hits'], stats['misses'])
+    
+    if messenger.commit_analyzer.classifier:
+        stats = messenger.commit_analyzer.classifier.get_stats()
+        set_cache_metrics(metrics, 'classifier', stats['skipped'], stats['checked'] - stats['skipped'])
+    
+    if messenger.outbox:
+        stats = messenger.outbox.get_stats()
+        for state in ('pending', 'sent', 'dead'):
+            metrics.set('outbox_messages', stats[state], state=state)
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms, rendered in the Prometheus text format."""
+    
+    def __init__(self, namespace='smart_commit', buckets=LATENCY_BUCKETS):
+        """
+        Initialize the metrics registry.
+        
+        Args:
+            namespace (str, optional): Prefix of every metric name. Defaults to 'smart_commit'.
+            buckets (tuple, optional): Upper bounds of the histogram buckets. Defaults to LATENCY_BUCKETS.
+        """
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.histograms = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def key(name, labels):
+        """Identify a series by its metric name and sorted labels."""
+        if name not in METRICS:
+            raise KeyError(f"Unknown metric: {name}")
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+    
+    def inc(self, name, value=1, **labels):
+        """
+        Add to a counter or gauge.
+        
+        Args:
+            name (str): Metric name from METRICS.
+            value (float, optional): Amount to add. Defaults to 1.
+            **labels: Labels of the series.
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+    
+    def set(self, name, value, **labels):
+        """
+        Set a gauge, or a counter kept by another component.
+        
+        Args:
+            name (str): Metric name from METRICS.
+            value (float): New value.
+            **labels: Labels of the series.
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            self.values[key] = value
+    
+    def get(self, name, **labels):
+        """Get the value of a counter or gauge series, 0 if it was never set."""
+        with self.lock:
+            return self.values.get(self.key(name, labels), 0)
+    
+    def observe(self, name, value, **labels):
+        """
+        Record a value in a histogram.
+        
+        Args:
+            name (str): Metric name from METRICS.
+            value (float): Observed value.
+            **labels: Labels of the series.
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+    
+    @contextmanager
+    def timer(self, stage, **labels):
+        """
+        Time a processing stage and count the calls running in it.
+        
+        Args:
+            stage (str): Stage name, e.g. 'fetch', 'analyze', 'format' or 'send'.
+            **labels: Further labels of the series.
+        """
+        self.inc('stage_in_progress', stage=stage, **labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.observe('stage_duration_seconds', seconds, stage=stage, **labels)
+            self.inc('stage_in_progress', -1, stage=stage, **labels)
+            
+            stats = current_run.get()
+            if stats is not None:
+                stats.add_stage(stage, seconds)
+    
+    def timed(self, stage, func):
+        """
+        Wrap a function so every call is timed as a stage.
+        
+        Args:
+            stage (str): Stage name.
+            func (callable): Function to wrap.
+        
+        Returns:
+            callable: Function with the same arguments and result.
+        """
+        def wrapper(*args, **kwargs):
+            with self.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    
+    def stage_totals(self):
+        """
+        Get the number of calls and the time spent in each stage so far.
+        
+        Returns:
+            dict: {'count', 'seconds'} by stage name.
+        """
+        totals = {}
+        with self.lock:
+            for (name, labels), histogram in self.histograms.items():
+                if name != 'stage_duration_seconds':
+                    continue
+                stage = dict(labels)['stage']
+                entry = totals.setdefault(stage, {'count': 0, 'seconds': 0})
+                entry['count'] += histogram['count']
+                entry['seconds'] += histogram['sum']
+        return totals
+    
+    def add_collector(self, collect):
+        """
+        Register a function that refreshes gauges from other components before they are read.
+        
+        Args:
+            collect (callable): Called with this registry.
+        """
+        self.collectors.append(collect)
+    
+    def collect(self):
+        """Run the registered collectors, logging instead of raising their errors."""
+        for collect in self.collectors:
+            try:
+                collect(self)
+            except Exception as e:
+                logging.error(f"Error collecting metrics: {str(e)}")
+    
+    def render(self):
+        """
+        Render every series in the Prometheus text exposition format.
+        
+        Returns:
+            str: Metrics text.
+        """
+        self.collect()
+        with self.lock:
+            values = dict(self.values)
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self.histograms.items()}
+        
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+            series_histograms = sorted((labels, value) for (metric, labels), value in histograms.items() if metric == name)
+            if not series and not series_histograms:
+                continue
+            
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in series:
+                lines.append(f"{full_name}{self.format_labels(labels)} {value:g}")
+            for labels, histogram in series_histograms:
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    lines.append(f"{full_name}_bucket{self.format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{full_name}_bucket{self.format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{full_name}_sum{self.format_labels(labels)} {histogram['sum']:g}")
+                lines.append(f"{full_name}_count{self.format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def format_labels(labels):
+        """Format label pairs as {key="value",...}, escaping quotes and backslashes."""
+        if not labels:
+            return ""
+        pairs = (
+            f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for key, value in labels
+        )
+        return "{" + ",".join(pairs) + "}"
+
+class MetricsServer:
+    """Local HTTP listener serving the metrics registry at /metrics."""
+    
+    def __init__(self, metrics, host='127.0.0.1', port=9100, path='/metrics'):
+        """
+        Initialize the metrics server.
+        
+        Args:
+            metrics (Metrics): Registry to serve.
+            host (str, optional): Interface to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): Port to listen on. Defaults to 9100.
+            path (str, optional): URL path of the metrics. Defaults to '/metrics'.
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.path = path
+        self.httpd = None
+        self.thread = None
+    
+    @classmethod
+    def from_config(cls, metrics, config):
+        """
+        Create the server from the `metrics` configuration section.
+        
+        Args:
+            metrics (Metrics): Registry to serve.
+            config (dict): Configuration dictionary.
+        
+        Returns:
+            MetricsServer: Server, or None if the endpoint is disabled.
+        """
+        metrics_config = config.get('metrics', {}) or {}
+        if not metrics_config.get('enabled', False):
+            return None
+        return cls(
+            metrics,
+            host=metrics_config.get('host', '127.0.0.1'),
+            port=metrics_config.get('port', 9100),
+            path=metrics_config.get('path', '/metrics')
+        )
+    
+    def start(self):
+        """Start listening in a background thread."""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != server.path:
+                    self.send_error(404)
+                    return
+                
+                body = server.metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                logging.debug(f"Metrics request: {format % args}")
+        
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+        self.thread.start()
+        logging.info(f"Serving metrics on http://{self.host}:{self.port}{self.path}")
+    
+    def stop(self):
+        """Stop listening."""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,484 @@
+import os
+import json
+import time
+import random
+import logging
+import sqlite3
+import threading
+
+# Message status values stored in the outbox
+STATUS_PENDING = 'pending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+class TokenBucket:
+    """Token bucket limiting how often an action may happen."""
+    
+    def __init__(self, rate, capacity=1):
+        """
+        Initialize the token bucket.
+        
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int, optional): Maximum number of stored tokens, i.e. the burst size. Defaults to 1.
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+    
+    def refill(self):
+        """Add the tokens accumulated since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def get_delay(self):
+        """
+        Get how long to wait until a token is available.
+        
+        Returns:
+            float: Seconds to wait, 0 if a token is available now.
+        """
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self):
+        """Take one token."""
+        self.refill()
+        self.tokens -= 1
+
+class Outbox:
+    """Durable SQLite queue of outgoing messages that survives restarts."""
+    
+    def __init__(self, path="outbox.db", max_attempts=8, base_delay=2.0, max_delay=600.0):
+        """
+        Initialize the outbox.
+        
+        Args:
+            path (str, optional): Path to the SQLite database file. Defaults to "outbox.db".
+            max_attempts (int, optional): Attempts before a message is given up. Defaults to 8.
+            base_delay (float, optional): Delay before the first retry in seconds; it doubles
+                with each further attempt. Defaults to 2.0.
+            max_delay (float, optional): Longest delay between attempts in seconds. Defaults to 600.0.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.connection = None
+        self.lock = threading.Lock()
+    
+    def connect(self):
+        """
+        Open the database and create the schema if needed.
+        
+        Returns:
+            sqlite3.Connection: Open database connection.
+        """
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    metadata TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    sent_at REAL,
+                    last_error TEXT
+                )"""
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS messages_status ON messages (status, chat_id, id)"
+            )
+            self.connection.commit()
+        return self.connection
+    
+    def close(self):
+        """Close the database connection if it is open."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+    
+    def enqueue(self, chat_id, text, metadata=None):
+        """
+        Add a message to the queue.
+        
+        Args:
+            chat_id (str): Telegram chat or channel ID.
+            text (str): Message text.
+            metadata (dict, optional): JSON serializable data handed back once the message
+                is sent or given up. Defaults to None.
+        
+        Returns:
+            int: ID of the queued message.
+        """
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            cursor = connection.execute(
+                "INSERT INTO messages (chat_id, text, metadata, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(chat_id), text, json.dumps(metadata) if metadata is not None else None, STATUS_PENDING, now, now)
+            )
+            connection.commit()
+            return cursor.lastrowid
+    
+    def enqueue_parts(self, chat_id, texts, metadata=None):
+        """
+        Add the parts of a long message to the queue, one entry per part.
+        
+        Each part is retried on its own, and the parts get consecutive IDs so
+        that the ones after a part that was given up can be dropped with it.
+        
+        Args:
+            chat_id (str): Telegram chat or channel ID.
+            texts (list): Message parts, in sending order.
+            metadata (dict, optional): JSON serializable data handed back once a part is
+                sent or given up, with the part's 'part' index and the number of 'parts'
+                added. Defaults to None.
+        
+        Returns:
+            list: IDs of the queued parts.
+        """
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            ids = []
+            for index, text in enumerate(texts):
+                cursor = connection.execute(
+                    "INSERT INTO messages (chat_id, text, metadata, status, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(chat_id), text, json.dumps(dict(metadata or {}, part=index, parts=len(texts))),
+                     STATUS_PENDING, now, now)
+                )
+                ids.append(cursor.lastrowid)
+            connection.commit()
+            return ids
+    
+    def get_due(self, limit=50):
+        """
+        Get the messages that are ready to be sent.
+        
+        Only the oldest pending message of each chat is returned, so a chat's
+        messages are always sent in the order they were queued.
+        
+        Args:
+            limit (int, optional): Maximum number of messages. Defaults to 50.
+        
+        Returns:
+            list: Dictionaries with 'id', 'chat_id', 'text', 'metadata', 'attempts' and 'created_at'.
+        """
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT id, chat_id, text, metadata, attempts, created_at FROM messages "
+                "WHERE id IN (SELECT MIN(id) FROM messages WHERE status = ? GROUP BY chat_id) "
+                "AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (STATUS_PENDING, time.time(), limit)
+            ).fetchall()
+        
+        return [
+            {
+                'id': row[0],
+                'chat_id': row[1],
+                'text': row[2],
+                'metadata': json.loads(row[3]) if row[3] else None,
+                'attempts': row[4],
+                'created_at': row[5]
+            }
+            for row in rows
+        ]
+    
+    def get_next_attempt_delay(self):
+        """
+        Get the time until the next pending message is due.
+        
+        Returns:
+            float: Seconds until the next attempt, 0 if one is due now, or None if the queue is empty.
+        """
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT MIN(next_attempt_at) FROM messages "
+                "WHERE id IN (SELECT MIN(id) FROM messages WHERE status = ? GROUP BY chat_id)",
+                (STATUS_PENDING,)
+            ).fetchone()
+        
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+    
+    def mark_sent(self, message_id):
+        """
+        Mark a message as sent.
+        
+        Args:
+            message_id (int): ID of the message.
+        """
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                "UPDATE messages SET status = ?, sent_at = ?, attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                (STATUS_SENT, time.time(), message_id)
+            )
+            connection.commit()
+    
+    def mark_failed(self, message_id, error, retry_after=None, permanent=False):
+        """
+        Record a failed attempt and schedule the next one.
+        
+        Args:
+            message_id (int): ID of the message.
+            error (str): Description of the failure.
+            retry_after (float, optional): Delay requested by the server, used instead of
+                the exponential backoff. Defaults to None.
+            permanent (bool, optional): Give up on the message right away. Defaults to False.
+        
+        Returns:
+            bool: True if the message will be retried, False if it was given up.
+        """
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT attempts FROM messages WHERE id = ?", (message_id,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            
+            retry = not permanent and attempts < self.max_attempts
+            if retry_after is not None:
+                delay = float(retry_after)
+            else:
+                delay = self.get_backoff_delay(attempts)
+            
+            connection.execute(
+                "UPDATE messages SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (STATUS_PENDING if retry else STATUS_DEAD, attempts, time.time() + delay, error, message_id)
+            )
+            connection.commit()
+        return retry
+    
+    def drop_remaining_parts(self, message):
+        """
+        Give up the pending parts that follow a part that was given up.
+        
+        Args:
+            message (dict): Part returned by Outbox.get_due().
+        
+        Returns:
+            int: Number of parts dropped.
+        """
+        metadata = message.get('metadata') or {}
+        remaining = metadata.get('parts', 1) - metadata.get('part', 0) - 1
+        if remaining <= 0:
+            return 0
+        
+        with self.lock:
+            connection = self.connect()
+            cursor = connection.execute(
+                "UPDATE messages SET status = ?, last_error = ? WHERE id > ? AND id <= ? AND status = ?",
+                (STATUS_DEAD, "an earlier part was given up", message['id'], message['id'] + remaining, STATUS_PENDING)
+            )
+            connection.commit()
+            return cursor.rowcount
+    
+    def get_backoff_delay(self, attempts):
+        """
+        Get the delay before the next attempt, doubling per attempt with random jitter.
+        
+        Args:
+            attempts (int): Number of failed attempts so far.
+        
+        Returns:
+            float: Seconds to wait.
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+    
+    def purge_sent(self, max_age_seconds=7 * 24 * 3600):
+        """
+        Delete sent messages older than the given age.
+        
+        Args:
+            max_age_seconds (int, optional): Age of sent messages to keep. Defaults to 7 days.
+        """
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                "DELETE FROM messages WHERE status = ? AND sent_at < ?",
+                (STATUS_SENT, time.time() - max_age_seconds)
+            )
+            connection.commit()
+    
+    def get_stats(self):
+        """
+        Get queue depth and delivery latency.
+        
+        Returns:
+            dict: Dictionary with 'pending', 'sent', 'dead', 'oldest_pending_age' and
+                'avg_latency' (seconds from queueing to sending over the last 100 messages).
+        """
+        with self.lock:
+            connection = self.connect()
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall())
+            oldest = connection.execute(
+                "SELECT MIN(created_at) FROM messages WHERE status = ?", (STATUS_PENDING,)
+            ).fetchone()[0]
+            latency = connection.execute(
+                "SELECT AVG(sent_at - created_at) FROM "
+                "(SELECT sent_at, created_at FROM messages WHERE status = ? ORDER BY sent_at DESC LIMIT 100)",
+                (STATUS_SENT,)
+            ).fetchone()[0]
+        
+        return {
+            'pending': counts.get(STATUS_PENDING, 0),
+            'sent': counts.get(STATUS_SENT, 0),
+            'dead': counts.get(STATUS_DEAD, 0),
+            'oldest_pending_age': time.time() - oldest if oldest else 0.0,
+            'avg_latency': latency or 0.0
+        }
+
+class OutboxWorker:
+    """Drains an outbox through rate limits, retrying failed sends."""
+    
+    def __init__(self, outbox, send, per_chat_per_minute=20, global_per_second=25, burst=3,
+                 permanent_errors=(), on_sent=None, on_dead=None, poll_interval=1.0):
+        """
+        Initialize the outbox worker.
+        
+        Args:
+            outbox (Outbox): Queue to drain.
+            send (callable): send(text, chat_id) delivering one message, raising on failure.
+                Exceptions with a `retry_after` attribute delay the retry by that many seconds.
+            per_chat_per_minute (float, optional): Messages per minute to one chat. Defaults to 20.
+            global_per_second (float, optional): Messages per second across all chats. Defaults to 25.
+            burst (int, optional): Messages a chat may receive back to back. Defaults to 3.
+            permanent_errors (tuple, optional): Exception types that are never retried. Defaults to ().
+            on_sent (callable, optional): on_sent(message) called after a message was sent. Defaults to None.
+            on_dead (callable, optional): on_dead(message) called when a message is given up. Defaults to None.
+            poll_interval (float, optional): Seconds between checks of an empty queue. Defaults to 1.0.
+        """
+        self.outbox = outbox
+        self.send = send
+        self.per_chat_rate = per_chat_per_minute / 60.0
+        self.burst = burst
+        self.global_bucket = TokenBucket(global_per_second, max(1, int(global_per_second)))
+        self.chat_buckets = {}
+        self.permanent_errors = tuple(permanent_errors)
+        self.on_sent = on_sent
+        self.on_dead = on_dead
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def get_chat_bucket(self, chat_id):
+        """Get the rate limiter of a chat."""
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.burst)
+        return self.chat_buckets[chat_id]
+    
+    def process(self, message):
+        """
+        Send one message, honouring the rate limits, and record the outcome.
+        
+        Args:
+            message (dict): Message returned by Outbox.get_due().
+        
+        Returns:
+            bool: True if the message was sent, False otherwise.
+        """
+        chat_bucket = self.get_chat_bucket(message['chat_id'])
+        delay = max(chat_bucket.get_delay(), self.global_bucket.get_delay())
+        while delay > 0:
+            if self.stop_event.wait(delay):
+                return False
+            delay = max(chat_bucket.get_delay(), self.global_bucket.get_delay())
+        
+        chat_bucket.consume()
+        self.global_bucket.consume()
+        
+        try:
+            self.send(message['text'], message['chat_id'])
+        except Exception as e:
+            retry_after = getattr(e, 'retry_after', None)
+            permanent = retry_after is None and isinstance(e, self.permanent_errors)
+            retry = self.outbox.mark_failed(message['id'], str(e), retry_after=retry_after, permanent=permanent)
+            
+            if retry:
+                logging.warning(f"Failed to send queued message {message['id']}, will retry: {str(e)}")
+            else:
+                logging.error(f"Giving up on queued message {message['id']}: {str(e)}")
+                self.outbox.drop_remaining_parts(message)
+                if self.on_dead:
+                    self.on_dead(message)
+            return False
+        
+        self.outbox.mark_sent(message['id'])
+        if self.on_sent:
+            self.on_sent(message)
+        return True
+    
+    def drain(self, timeout=None):
+        """
+        Send queued messages until the queue is empty.
+        
+        Messages waiting for a retry are waited for, up to the timeout.
+        
+        Args:
+            timeout (float, optional): Longest time to keep draining in seconds. Defaults to None (no limit).
+        
+        Returns:
+            int: Number of messages sent.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        sent = 0
+        
+        while not self.stop_event.is_set():
+            for message in self.outbox.get_due():
+                if self.process(message):
+                    sent += 1
+            
+            delay = self.outbox.get_next_attempt_delay()
+            if delay is None:
+                break
+            
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning("Stopped draining the outbox with messages still queued")
+                    break
+                delay = min(delay, remaining)
+            
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+        
+        return sent
+    
+    def run(self):
+        """Keep draining the outbox until stop() is called."""
+        while not self.stop_event.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                logging.error(f"Error draining the outbox: {str(e)}")
+            self.stop_event.wait(self.poll_interval)
+    
+    def start(self):
+        """Start draining in a background thread."""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='outbox', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the background thread after the message being sent."""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
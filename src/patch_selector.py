@@ -0,0 +1,230 @@
+import os
+import re
+import heapq
+from commit_classifier import LOCKFILES
+
+# Files whose diffs tell a reader nothing about the intent of a change
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.pdf', '.zip', '.gz', '.tgz', '.bz2', '.xz',
+    '.7z', '.jar', '.war', '.whl', '.egg', '.so', '.dll', '.dylib', '.exe', '.bin', '.class', '.pyc', '.o',
+    '.a', '.woff', '.woff2', '.ttf', '.otf', '.eot', '.mp3', '.mp4', '.mov', '.avi', '.wav', '.sqlite', '.db'
+}
+GENERATED_SUFFIXES = (
+    '.min.js', '.min.css', '.js.map', '.css.map', '.bundle.js', '.pb.go', '_pb2.py', '_pb2_grpc.py', '.snap',
+    '.designer.cs', '.g.dart'
+)
+GENERATED_DIRECTORIES = ('dist/', 'build/', 'vendor/', 'node_modules/', '__snapshots__/', 'generated/')
+
+# Changed lines that add, remove or alter a definition weigh more than other changes
+DEFINITION_PATTERN = re.compile(
+    r"^[+-]\s*(async def|def|class|function|func|fn|pub|public|private|protected|export|interface|struct|"
+    r"enum|type|CREATE|ALTER)\b"
+)
+
+# Lines of a hunk added to its score for each changed definition
+DEFINITION_WEIGHT = 5
+
+# Smallest allowance worth spending on another file
+MIN_FILE_CHARS = 200
+
+# Diff read per file, as a multiple of max_file_chars, so the best hunks can still be chosen
+READ_FACTOR = 4
+
+PATCH_TRUNCATED_MARKER = "\n... (hunk truncated)"
+
+class PatchSelector:
+    """Picks the most informative diff hunks of a commit within per-file and per-commit size caps."""
+    
+    def __init__(self, max_file_chars=2000, max_commit_chars=8000):
+        """
+        Initialize the patch selector.
+        
+        Args:
+            max_file_chars (int, optional): Most characters of diff kept per file. Defaults to 2000.
+            max_commit_chars (int, optional): Most characters of diff kept per commit. Defaults to 8000.
+        """
+        self.max_file_chars = max_file_chars
+        self.max_commit_chars = max_commit_chars
+    
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create the selector from the `ai.patches` configuration section.
+        
+        Args:
+            config (dict): Configuration dictionary.
+        
+        Returns:
+            PatchSelector: Selector, or None if diffs are not included in prompts.
+        """
+        patches_config = config.get('ai', {}).get('patches', {}) or {}
+        if not patches_config.get('enabled', False):
+            return None
+        return cls(
+            max_file_chars=patches_config.get('max_file_chars', 2000),
+            max_commit_chars=patches_config.get('max_commit_chars', 8000)
+        )
+    
+    @staticmethod
+    def is_excluded(filename):
+        """
+        Check whether a file is binary or generated, so its diff is left out.
+        
+        Args:
+            filename (str): Path of the file in the repository.
+        
+        Returns:
+            bool: True if the diff should not be included.
+        """
+        basename = os.path.basename(filename)
+        lowered = filename.lower()
+        return (
+            basename in LOCKFILES
+            or os.path.splitext(lowered)[1] in BINARY_EXTENSIONS
+            or lowered.endswith(GENERATED_SUFFIXES)
+            or lowered.startswith(GENERATED_DIRECTORIES)
+            or any(f"/{directory}" in lowered for directory in GENERATED_DIRECTORIES)
+        )
+    
+    @staticmethod
+    def iter_hunks(patch):
+        """
+        Yield the position of each hunk of a unified diff without copying the patch.
+        
+        Args:
+            patch (str): Unified diff of one file.
+        
+        Yields:
+            tuple: (start, end) offsets of a hunk in the patch.
+        """
+        start = 0 if patch.startswith('@@') else patch.find('\n@@')
+        while start != -1:
+            if patch[start] == '\n':
+                start += 1
+            end = patch.find('\n@@', start)
+            yield start, len(patch) if end == -1 else end
+            start = end
+    
+    @staticmethod
+    def score_hunk(patch, start, end):
+        """
+        Rate how much a hunk says about a change.
+        
+        Args:
+            patch (str): Unified diff of one file.
+            start (int): Offset of the hunk.
+            end (int): End offset of the hunk.
+        
+        Returns:
+            int: Changed lines, with changed definitions counted several times.
+        """
+        score = 0
+        position = patch.find('\n', start, end) + 1 or end
+        while position < end:
+            line_end = patch.find('\n', position, end)
+            line_end = end if line_end == -1 else line_end
+            if patch[position] in '+-' and patch[position + 1:line_end].strip():
+                score += 1
+                if DEFINITION_PATTERN.match(patch, position, line_end):
+                    score += DEFINITION_WEIGHT
+            position = line_end + 1
+        return score
+    
+    def trim_patch(self, patch, max_chars):
+        """
+        Keep the highest scoring hunks of a file diff that fit in max_chars.
+        
+        The kept hunks are returned in their original order. When even the best
+        hunk is too long, it is cut.
+        
+        Args:
+            patch (str): Unified diff of one file.
+            max_chars (int): Most characters to keep.
+        
+        Returns:
+            str: Trimmed diff.
+        """
+        if len(patch) <= max_chars:
+            return patch
+        
+        ranked = [(-self.score_hunk(patch, start, end), start, end) for start, end in self.iter_hunks(patch)]
+        heapq.heapify(ranked)
+        
+        kept, used, total = [], 0, len(ranked)
+        while ranked:
+            _, start, end = heapq.heappop(ranked)
+            if used + (end - start) + 1 <= max_chars:
+                kept.append((start, end))
+                used += end - start + 1
+        
+        if not kept:
+            if not total:
+                return ""
+            _, start, end = min((-self.score_hunk(patch, start, end), start, end) for start, end in self.iter_hunks(patch))
+            return patch[start:start + max_chars - len(PATCH_TRUNCATED_MARKER)] + PATCH_TRUNCATED_MARKER
+        
+        text = "\n".join(patch[start:end] for start, end in sorted(kept))
+        if len(kept) < total:
+            text += f"\n... ({total - len(kept)} more hunks omitted)"
+        return text
+    
+    def get_candidates(self, files):
+        """
+        Get the files whose diff select() may include, judged from their line counts alone.
+        
+        Every file select() takes uses at least MIN_FILE_CHARS of the commit cap,
+        so only that many of the largest changes are worth reading.
+        
+        Args:
+            files (list): Dictionaries with 'filename', 'additions' and 'deletions'.
+        
+        Returns:
+            set: Names of the files whose diff should be read.
+        """
+        candidates = [
+            file for file in files
+            if file.get('additions', 0) + file.get('deletions', 0) and not self.is_excluded(file.get('filename', ''))
+        ]
+        candidates.sort(key=lambda file: file.get('additions', 0) + file.get('deletions', 0), reverse=True)
+        return {file['filename'] for file in candidates[:max(self.max_commit_chars // MIN_FILE_CHARS, 1)]}
+    
+    def get_read_limit(self):
+        """
+        Get the most characters of diff worth reading for one file.
+        
+        Returns:
+            int: Read limit in characters.
+        """
+        return self.max_file_chars * READ_FACTOR
+    
+    def select(self, files):
+        """
+        Choose the diffs to include for the files of a commit.
+        
+        Files are taken in order of change size, so the per-commit cap is
+        spent on the largest changes first.
+        
+        Args:
+            files (list): Dictionaries with 'filename', 'additions', 'deletions' and 'patch'.
+        
+        Returns:
+            dict: Trimmed diff by filename, for the files that were selected.
+        """
+        candidates = [
+            file for file in files
+            if file.get('patch') and not self.is_excluded(file.get('filename', ''))
+        ]
+        candidates.sort(key=lambda file: file.get('additions', 0) + file.get('deletions', 0), reverse=True)
+        
+        selected = {}
+        remaining = self.max_commit_chars
+        for file in candidates:
+            allowance = min(self.max_file_chars, remaining)
+            if allowance < MIN_FILE_CHARS:
+                break
+            
+            patch = self.trim_patch(file['patch'], allowance)
+            if patch:
+                selected[file['filename']] = patch
+                remaining -= len(patch)
+        return selected
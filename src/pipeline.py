@@ -0,0 +1,189 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics import bind_context
+
+class CommitPipeline:
+    """Runs commits through fetch, analysis and delivery stages concurrently."""
+    
+    def __init__(self, fetch_workers=4, analyze_workers=2, delivery_workers=1, max_concurrency=4):
+        """
+        Initialize the commit pipeline.
+        
+        Args:
+            fetch_workers (int, optional): Threads fetching commit details. Defaults to 4.
+            analyze_workers (int, optional): Threads running the analysis. Defaults to 2.
+            delivery_workers (int, optional): Threads delivering messages. Deliveries to the
+                same channel always happen in commit order. Defaults to 1.
+            max_concurrency (int, optional): Cap on stage calls running at the same time
+                across all stages. Defaults to 4.
+        """
+        self.fetch_workers = max(1, fetch_workers)
+        self.analyze_workers = max(1, analyze_workers)
+        self.delivery_workers = max(1, delivery_workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrency)
+    
+    def run(self, items, fetch, analyze, deliver, channel_of=None, analyze_batch=None):
+        """
+        Process items through the three stages.
+        
+        A stage returning None drops the item from the later stages. Exceptions
+        raised by a stage are logged and treated the same way.
+        
+        Args:
+            items (list): Items to process, in delivery order.
+            fetch (callable): fetch(item) -> details.
+            analyze (callable): analyze(item, details) -> description.
+            deliver (callable): deliver(item, details, description) -> bool.
+            channel_of (callable, optional): channel_of(item) -> key of the channel an item
+                is delivered to. Items sharing a key are delivered one at a time in order.
+                Defaults to a single channel for all items.
+            analyze_batch (callable, optional): analyze_batch(items, details) -> descriptions.
+                When given, it replaces analyze and runs once after every fetch finished,
+                so several items can share one analysis request. Defaults to None.
+        
+        Returns:
+            list: One dictionary per item, in input order, with 'item', 'details',
+                'description' and 'delivered' keys.
+        """
+        results = [{'item': item, 'details': None, 'description': None, 'delivered': False} for item in items]
+        if not items:
+            return results
+        
+        # Stages run in the caller's context, so their work counts towards its run
+        fetch, analyze, deliver = bind_context(fetch), bind_context(analyze), bind_context(deliver)
+        if analyze_batch:
+            analyze_batch = bind_context(analyze_batch)
+        
+        fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix='fetch')
+        analyze_pool = ThreadPoolExecutor(max_workers=self.analyze_workers, thread_name_prefix='analyze')
+        delivery_pool = ThreadPoolExecutor(max_workers=self.delivery_workers, thread_name_prefix='deliver')
+        
+        try:
+            if analyze_batch:
+                analyses = self.run_batch_analysis(items, results, fetch_pool, fetch, analyze_batch)
+            else:
+                # Fetch and analysis run as soon as workers are free
+                analyses = []
+                for index, item in enumerate(items):
+                    fetched = fetch_pool.submit(self.call_stage, fetch, item)
+                    fetched.add_done_callback(self.store_result(results[index], 'details'))
+                    analyzed = self.then(fetched, analyze_pool, lambda details, item=item: analyze(item, details))
+                    analyzed.add_done_callback(self.store_result(results[index], 'description'))
+                    analyses.append(analyzed)
+            
+            # Deliveries are submitted in order and wait for the previous one on the same channel
+            previous = {}
+            deliveries = []
+            for index, item in enumerate(items):
+                description = self.wait(analyses[index])
+                details = results[index]['details']
+                if description is None or details is None:
+                    continue
+                
+                channel = channel_of(item) if channel_of else None
+                delivered = delivery_pool.submit(
+                    self.deliver_in_order, previous.get(channel), deliver, item, details, description
+                )
+                delivered.add_done_callback(self.store_result(results[index], 'delivered'))
+                previous[channel] = delivered
+                deliveries.append(delivered)
+            
+            for delivered in deliveries:
+                self.wait(delivered)
+        finally:
+            fetch_pool.shutdown(wait=True)
+            analyze_pool.shutdown(wait=True)
+            delivery_pool.shutdown(wait=True)
+        
+        return results
+    
+    def run_batch_analysis(self, items, results, fetch_pool, fetch, analyze_batch):
+        """
+        Fetch all items, then analyze the fetched ones with a single batch call.
+        
+        Returns:
+            list: Completed futures holding each item's description.
+        """
+        fetched = [fetch_pool.submit(self.call_stage, fetch, item) for item in items]
+        for index, future in enumerate(fetched):
+            future.add_done_callback(self.store_result(results[index], 'details'))
+        
+        details = [self.wait(future) for future in fetched]
+        ready = [index for index, value in enumerate(details) if value is not None]
+        
+        descriptions = {}
+        if ready:
+            try:
+                batch = self.call_stage(analyze_batch, [items[index] for index in ready], [details[index] for index in ready])
+                descriptions = dict(zip(ready, batch))
+            except Exception as e:
+                logging.error(f"Pipeline stage failed: {str(e)}")
+        
+        analyses = []
+        for index in range(len(items)):
+            analyzed = Future()
+            analyzed.set_result(descriptions.get(index))
+            self.store_result(results[index], 'description')(analyzed)
+            analyses.append(analyzed)
+        return analyses
+    
+    def call_stage(self, func, *args):
+        """Call a stage function while holding a slot of the global concurrency cap."""
+        with self.semaphore:
+            return func(*args)
+    
+    def then(self, source, executor, func):
+        """
+        Run func on the result of a future in the given executor once it completes.
+        
+        Args:
+            source (Future): Future producing the input value.
+            executor (ThreadPoolExecutor): Executor to run func in.
+            func (callable): Function taking the result of source.
+        
+        Returns:
+            Future: Future holding the result of func, or None if source produced None or failed.
+        """
+        target = Future()
+        
+        def on_source_done(future):
+            value = self.wait(future)
+            if value is None:
+                target.set_result(None)
+                return
+            
+            stage = executor.submit(self.call_stage, func, value)
+            stage.add_done_callback(lambda done: target.set_result(self.wait(done)))
+        
+        source.add_done_callback(on_source_done)
+        return target
+    
+    def deliver_in_order(self, previous, deliver, item, details, description):
+        """Wait for the previous delivery on the same channel, then deliver this item."""
+        if previous is not None:
+            self.wait(previous)
+        return bool(self.call_stage(deliver, item, details, description))
+    
+    @staticmethod
+    def wait(future):
+        """
+        Get the result of a future, logging and swallowing stage errors.
+        
+        Returns:
+            The future's result, or None if the stage raised an exception.
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            logging.error(f"Pipeline stage failed: {str(e)}")
+            return None
+    
+    @staticmethod
+    def store_result(result, key):
+        """Build a callback that stores a future's result under key in the result dictionary."""
+        def callback(future):
+            if future.exception() is None and future.result() is not None:
+                result[key] = future.result()
+        return callback
\ No newline at end of file
@@ -0,0 +1,200 @@
+import os
+import logging
+from collections import defaultdict
+
+README_TRUNCATED_MARKER = "\n[... README truncated to fit the prompt budget ...]"
+TEXT_TRUNCATED_MARKER = "\n[... truncated ...]"
+
+class PromptBuilder:
+    """Fits the variable parts of the commit prompt into a token budget."""
+    
+    def __init__(self, model_name="gpt-3.5-turbo", budget_tokens=3000, readme_share=0.3):
+        """
+        Initialize the prompt builder.
+        
+        Args:
+            model_name (str, optional): Model whose tokenizer is used for counting. Defaults to "gpt-3.5-turbo".
+            budget_tokens (int, optional): Maximum tokens of the rendered prompt. Defaults to 3000.
+            readme_share (float, optional): Largest share of the free budget given to the project
+                description; the rest goes to the list of changed files. Defaults to 0.3.
+        """
+        self.model_name = model_name
+        self.budget_tokens = budget_tokens
+        self.readme_share = readme_share
+        self.encoding = self.load_encoding(model_name)
+    
+    @staticmethod
+    def load_encoding(model_name):
+        """
+        Load the tokenizer for a model.
+        
+        Returns:
+            tiktoken.Encoding: Encoding, or None when tiktoken is not installed.
+        """
+        try:
+            import tiktoken
+        except ImportError:
+            logging.info("tiktoken is not installed, estimating token counts from text length")
+            return None
+        
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+    
+    def count_tokens(self, text):
+        """
+        Count the tokens of a text for the configured model.
+        
+        Args:
+            text (str): Text to count.
+        
+        Returns:
+            int: Number of tokens.
+        """
+        if not text:
+            return 0
+        if self.encoding is None:
+            # Roughly four characters per token for English text and code
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+    
+    def truncate(self, text, max_tokens, marker=TEXT_TRUNCATED_MARKER):
+        """
+        Cut a text down to a number of tokens, appending a marker when it was shortened.
+        
+        Args:
+            text (str): Text to truncate.
+            max_tokens (int): Maximum tokens of the result, marker included.
+            marker (str, optional): Text appended to truncated output. Defaults to TEXT_TRUNCATED_MARKER.
+        
+        Returns:
+            str: Original or truncated text.
+        """
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        
+        keep = max_tokens - self.count_tokens(marker)
+        if keep <= 0:
+            return marker.strip()
+        
+        if self.encoding is None:
+            return text[:keep * 4] + marker
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:keep]) + marker
+    
+    def fit_files(self, files_changed, max_tokens, format_files):
+        """
+        Describe the changed files within a token budget.
+        
+        When the full list does not fit, diff hunks are left out first. If it
+        still does not fit, the largest changes are listed individually and
+        the rest are collapsed into per directory and extension aggregates,
+        ranked by change size.
+        
+        Args:
+            files_changed (list): List of dictionaries containing file change information.
+            max_tokens (int): Token budget for the file list.
+            format_files (callable): Formats a list of files, one line each.
+        
+        Returns:
+            str: File list that fits the budget.
+        """
+        full = format_files(files_changed)
+        if self.count_tokens(full) <= max_tokens:
+            return full
+        
+        # Diff hunks are the first thing dropped when the list does not fit
+        if any(file.get('patch') for file in files_changed):
+            without_patches = [{key: value for key, value in file.items() if key != 'patch'} for file in files_changed]
+            return self.fit_files(without_patches, max_tokens, format_files)
+        
+        ranked = sorted(files_changed, key=self.change_size, reverse=True)
+        
+        # Half of the budget for individual files, the rest for aggregates of the remainder
+        lines = []
+        used = 0
+        listed = 0
+        for file in ranked:
+            line = format_files([file])
+            tokens = self.count_tokens(line)
+            if used + tokens > max_tokens // 2:
+                break
+            lines.append(line)
+            used += tokens
+            listed += 1
+        
+        groups = defaultdict(list)
+        for file in ranked[listed:]:
+            directory = os.path.dirname(file.get('filename', '')) or '.'
+            extension = os.path.splitext(file.get('filename', ''))[1] or '(no extension)'
+            groups[(directory, extension)].append(file)
+        
+        ranked_groups = sorted(groups.items(), key=lambda item: sum(map(self.change_size, item[1])), reverse=True)
+        
+        for index, ((directory, extension), files) in enumerate(ranked_groups):
+            line = self.format_group(directory, extension, files)
+            tail = self.format_tail(ranked_groups[index + 1:])
+            if used + self.count_tokens(line) + self.count_tokens(tail) > max_tokens:
+                break
+            lines.append(line)
+            used += self.count_tokens(line)
+            ranked_groups[index] = None
+        
+        leftover = [group for group in ranked_groups if group is not None]
+        if leftover:
+            lines.append(self.format_tail(leftover))
+        
+        return "".join(lines)
+    
+    @staticmethod
+    def change_size(file):
+        """Number of changed lines of a file."""
+        return file.get('additions', 0) + file.get('deletions', 0)
+    
+    def format_group(self, directory, extension, files):
+        """Format one directory and extension aggregate."""
+        statuses = defaultdict(int)
+        for file in files:
+            statuses[file.get('status', 'modified')] += 1
+        status_text = ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+        
+        additions = sum(file.get('additions', 0) for file in files)
+        deletions = sum(file.get('deletions', 0) for file in files)
+        return f"- {len(files)} {extension} files in {directory}/ ({status_text}) (+{additions}, -{deletions})\n"
+    
+    def format_tail(self, groups):
+        """Format the line summarizing aggregates that did not fit."""
+        if not groups:
+            return ""
+        files = [file for _, group_files in groups for file in group_files]
+        additions = sum(file.get('additions', 0) for file in files)
+        deletions = sum(file.get('deletions', 0) for file in files)
+        return f"- ... and {len(files)} more files in {len(groups)} other groups (+{additions}, -{deletions})\n"
+    
+    def fit(self, template, project_description, commit_message, files_changed, format_files):
+        """
+        Fit the project description, commit message and file list into the budget.
+        
+        Args:
+            template (str): Prompt template text, counted as fixed overhead.
+            project_description (str): Description of the project.
+            commit_message (str): Commit message.
+            files_changed (list): List of dictionaries containing file change information.
+            format_files (callable): Formats a list of files, one line each.
+        
+        Returns:
+            tuple: (project_description, commit_message, files_changed text) within the budget.
+        """
+        # Template text plus a small allowance for the stats numbers
+        available = self.budget_tokens - self.count_tokens(template) - 20
+        
+        commit_message = self.truncate(commit_message, max(available // 4, 1))
+        available -= self.count_tokens(commit_message)
+        
+        project_description = self.truncate(
+            project_description, max(int(available * self.readme_share), 1), README_TRUNCATED_MARKER
+        )
+        available -= self.count_tokens(project_description)
+        
+        files_text = self.fit_files(files_changed, max(available, 1), format_files)
+        return project_description, commit_message, files_text
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import logging
+import threading
+
+class ReadmeCache:
+    """Per-repository cache of README content and its condensed summary, keyed by blob SHA."""
+    
+    def __init__(self, path="readme_cache.json", check_interval_minutes=60):
+        """
+        Initialize the README cache.
+        
+        Args:
+            path (str, optional): Path to the JSON file persisting the cache. Defaults to "readme_cache.json".
+            check_interval_minutes (int, optional): Minutes before the README is checked for
+                changes again. Defaults to 60.
+        """
+        self.path = path
+        self.check_interval = check_interval_minutes * 60
+        self.lock = threading.Lock()
+        self.entries = None
+    
+    def load(self):
+        """
+        Load the cache file on first use.
+        
+        Returns:
+            dict: Entries keyed by repository name.
+        """
+        if self.entries is None:
+            self.entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r') as file:
+                        self.entries = json.load(file)
+                except (OSError, ValueError) as e:
+                    logging.error(f"Failed to load README cache: {str(e)}")
+        return self.entries
+    
+    def save(self):
+        """Write the cache to disk."""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as file:
+                json.dump(self.entries, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to save README cache: {str(e)}")
+    
+    def get(self, repository):
+        """
+        Get the cached entry for a repository.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+        
+        Returns:
+            dict: Entry with 'sha', 'content', 'summary' and 'checked_at', or None if not cached.
+        """
+        with self.lock:
+            return self.load().get(repository)
+    
+    def get_fresh(self, repository):
+        """
+        Get the cached entry if it was checked within the check interval.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+        
+        Returns:
+            dict: Cached entry, or None if missing or due for a check.
+        """
+        entry = self.get(repository)
+        if entry and time.time() - entry.get('checked_at', 0) < self.check_interval:
+            return entry
+        return None
+    
+    def store(self, repository, sha, content, summary=""):
+        """
+        Store a README version and its summary.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+            sha (str): Blob SHA of the README.
+            content (str): README content.
+            summary (str, optional): Condensed project summary. Defaults to "".
+        
+        Returns:
+            dict: Stored entry.
+        """
+        entry = {'sha': sha, 'content': content, 'summary': summary, 'checked_at': time.time()}
+        with self.lock:
+            self.load()[repository] = entry
+            self.save()
+        return entry
+    
+    def touch(self, repository):
+        """
+        Mark the cached README of a repository as checked and unchanged.
+        
+        Args:
+            repository (str): Repository name in format 'username/repo'.
+        """
+        with self.lock:
+            entry = self.load().get(repository)
+            if entry:
+                entry['checked_at'] = time.time()
+                self.save()
+    
+    @staticmethod
+    def project_description(entry):
+        """
+        Get the text to use as project description for an entry.
+        
+        Args:
+            entry (dict): Cached entry, or None.
+        
+        Returns:
+            str: Summary when available, otherwise the full README content.
+        """
+        if not entry:
+            return ""
+        return entry.get('summary') or entry.get('content', "")
\ No newline at end of file
@@ -1,8 +1,14 @@
 import time
+import asyncio
+from datetime import datetime, timedelta
 import logging
 import schedule
+import yaml
 import sys
-from main import SmartCommitMessenger
+from main import SmartCommitMessenger, parse_args, nothing_to_do
+from targets import target_name
+from webhook_server import WebhookServer, MAX_BODY_BYTES
+from metrics import MetricsServer
 
 # Configure logging
 logging.basicConfig(
@@ -28,45 +34,134 @@ class CommitMessengerScheduler:
         self.config = self.messenger.config
         self.interval = self.config.get('schedule', {}).get('interval_minutes', 15)
         self.continuous = self.config.get('schedule', {}).get('continuous', True)
+        
+        # With webhooks, polling only reconciles missed deliveries at a lower frequency
+        self.webhook_config = self.config.get('webhook', {})
+        self.webhook_server = None
+        if self.webhook_config.get('enabled', False):
+            self.interval = self.webhook_config.get('reconcile_interval_minutes', 60)
+        
+        self.metrics_server = None
     
-    def job(self):
-        """The job to run at scheduled intervals."""
-        logging.info("Running scheduled commit analysis job")
+    def job(self, target=None):
+        """
+        The job to run at scheduled intervals.
+        
+        Args:
+            target (dict, optional): Target to process. Defaults to all targets.
+        """
+        name = target_name(target) if target else "all targets"
+        logging.info(f"Running scheduled commit analysis job for {name}")
         try:
-            self.messenger.process_latest_commits()
-            logging.info("Scheduled job completed successfully")
+            if target:
+                self.messenger.process_latest_commits(target)
+            else:
+                self.messenger.process_all_targets()
+            logging.info(f"Scheduled job for {name} completed successfully")
         except Exception as e:
-            logging.error(f"Error in scheduled job: {str(e)}")
+            logging.error(f"Error in scheduled job for {name}: {str(e)}")
+    
+    def stagger_offsets(self, count):
+        """
+        Spread the first runs of count targets evenly over one interval.
+        
+        Args:
+            count (int): Number of targets.
+        
+        Returns:
+            list: Offset in seconds of the first run of each target.
+        """
+        if count <= 0:
+            return []
+        step = self.interval * 60 / count
+        return [index * step for index in range(count)]
     
     def run(self):
         """Run the scheduler."""
-        logging.info(f"Starting scheduler with {self.interval} minute intervals")
+        targets = self.messenger.targets
+        logging.info(f"Starting scheduler for {len(targets)} target(s) with {self.interval} minute intervals")
+        
+        if not self.continuous:
+            # Process every target once and exit
+            self.job()
+            self.messenger.drain_outbox()
+            logging.info("Scheduler completed one-time execution")
+            return
+        
+        # Schedule one job per target, with first runs staggered across the interval
+        now = datetime.now()
+        for target, offset in zip(targets, self.stagger_offsets(len(targets))):
+            job = schedule.every(self.interval).minutes.do(self.job, target)
+            job.next_run = now + timedelta(seconds=offset)
         
-        # Schedule the job
-        schedule.every(self.interval).minutes.do(self.job)
+        if self.webhook_config.get('enabled', False):
+            self.webhook_server = WebhookServer(
+                self.messenger,
+                host=self.webhook_config.get('host', '0.0.0.0'),
+                port=self.webhook_config.get('port', 8080),
+                path=self.webhook_config.get('path', '/webhook'),
+                max_body_bytes=self.webhook_config.get('max_body_bytes', MAX_BODY_BYTES)
+            )
+            self.webhook_server.start()
         
-        # Run the job immediately once
-        self.job()
+        # Queued messages are sent in the background as they are produced
+        if self.messenger.outbox_worker:
+            self.messenger.outbox_worker.start()
+        
+        self.metrics_server = MetricsServer.from_config(self.messenger.metrics, self.config)
+        if self.metrics_server:
+            self.metrics_server.start()
         
         # Keep the scheduler running
-        if self.continuous:
-            logging.info("Running in continuous mode. Press Ctrl+C to exit.")
-            try:
-                while True:
-                    schedule.run_pending()
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                logging.info("Scheduler stopped by user")
-        else:
-            # Run pending jobs and exit
-            schedule.run_pending()
-            logging.info("Scheduler completed one-time execution")
+        logging.info("Running in continuous mode. Press Ctrl+C to exit.")
+        try:
+            while True:
+                schedule.run_pending()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logging.info("Scheduler stopped by user")
+        finally:
+            if self.webhook_server:
+                self.webhook_server.stop()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.messenger.outbox_worker:
+                self.messenger.outbox_worker.stop()
 
-def main():
+def run_async(config_path='../config/config.yaml'):
+    """
+    Run the scheduler on the asyncio engine.
+    
+    Args:
+        config_path (str, optional): Path to the configuration file. Defaults to '../config/config.yaml'.
+    """
+    from async_messenger import AsyncSmartCommitMessenger
+    
+    messenger = AsyncSmartCommitMessenger(config_path=config_path)
+    schedule_config = messenger.config.get('schedule', {})
+    interval = schedule_config.get('interval_minutes', 15)
+    continuous = schedule_config.get('continuous', True)
+    
+    logging.info(f"Starting async scheduler with {interval} minute intervals")
+    try:
+        asyncio.run(messenger.run(interval_minutes=interval, continuous=continuous))
+    except KeyboardInterrupt:
+        logging.info("Scheduler stopped by user")
+
+def main(argv=None):
     """Main function to run the scheduler."""
+    args = parse_args(argv)
     try:
-        scheduler = CommitMessengerScheduler()
-        scheduler.run()
+        with open(args.config, 'r') as file:
+            continuous = (yaml.safe_load(file) or {}).get('schedule', {}).get('continuous', True)
+        if not continuous and nothing_to_do(args.config):
+            return 0
+        
+        if args.use_async:
+            run_async(config_path=args.config)
+        else:
+            scheduler = CommitMessengerScheduler(config_path=args.config)
+            scheduler.run()
     except Exception as e:
         logging.error(f"Error running scheduler: {str(e)}")
         return 1
@@ -0,0 +1,78 @@
+import logging
+from delivery_router import load_destinations
+
+# Where the commits of a target are read from
+SOURCES = ('github', 'git_mirror')
+
+def load_targets(config):
+    """
+    Build the list of monitored repository targets from the configuration.
+    
+    Each entry of the `targets` list may set repository, branch, commit_limit,
+    since, channel_id, destinations and source. Missing values fall back to
+    the `github` and `telegram` sections, which also describe the only target
+    when no `targets` list is configured. Targets with the `git_mirror` source
+    may also set mirror_path, mirror_url and commit_url.
+    
+    Args:
+        config (dict): Configuration dictionary.
+    
+    Returns:
+        list: List of target dictionaries.
+    """
+    github_config = config.get('github', {}) or {}
+    telegram_config = config.get('telegram', {}) or {}
+    
+    defaults = {
+        'repository': github_config.get('repository'),
+        'branch': github_config.get('branch', 'main'),
+        'commit_limit': github_config.get('commit_limit', 5),
+        'since': github_config.get('since'),
+        'channel_id': telegram_config.get('channel_id'),
+        'source': github_config.get('source', 'github')
+    }
+    
+    entries = config.get('targets') or [{}]
+    
+    targets = []
+    seen = set()
+    for entry in entries:
+        target = dict(defaults)
+        target.update({key: value for key, value in entry.items() if value is not None})
+        
+        if not target['repository']:
+            logging.error(f"Skipping target without a repository: {entry}")
+            continue
+        
+        if target['source'] not in SOURCES:
+            logging.error(f"Skipping target {target['repository']} with unknown source: {target['source']}")
+            continue
+        
+        key = (target['repository'], target['branch'])
+        if key in seen:
+            logging.warning(f"Skipping duplicate target {target['repository']}@{target['branch']}")
+            continue
+        seen.add(key)
+        
+        try:
+            target['destinations'] = load_destinations(entry, telegram_config, target['channel_id'])
+        except ValueError as e:
+            logging.error(f"Skipping target {target['repository']}: {str(e)}")
+            continue
+        
+        target['project_name'] = target.get('project_name') or target['repository'].split('/')[-1]
+        targets.append(target)
+    
+    return targets
+
+def target_name(target):
+    """
+    Get a readable name for a target.
+    
+    Args:
+        target (dict): Target dictionary.
+    
+    Returns:
+        str: Name in format 'username/repo@branch'.
+    """
+    return f"{target['repository']}@{target['branch']}"
\ No newline at end of file
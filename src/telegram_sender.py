@@ -1,25 +1,41 @@
 import os
+import time
 import logging
-import telegram
-from telegram.error import TelegramError
+import threading
+
+# Longest text Telegram accepts in one message
+MAX_MESSAGE_LENGTH = 4096
+
+# Marker appended to text cut at the message length limit
+TRUNCATED_MARKER = "\n[...]"
+
+# Description shown in a streamed message until the first text arrives
+STREAM_PLACEHOLDER = "_Analyzing..._"
+
+# Appended to the partial description while it is being generated
+STREAM_CURSOR = " ..."
 
 class TelegramSender:
     """Handles sending messages to Telegram channels."""
     
-    def __init__(self, token=None, channel_id=None):
+    def __init__(self, token=None, channel_id=None, request=None):
         """
         Initialize the Telegram sender.
         
         Args:
             token (str, optional): Telegram bot token. Defaults to None.
             channel_id (str, optional): Telegram channel ID. Defaults to None.
+            request (telegram.utils.request.Request, optional): Connection pool used by the bot.
+                Defaults to None (a single-connection pool).
         """
         self.token = token or os.getenv('TELEGRAM_BOT_TOKEN')
         if not self.token:
             raise ValueError("Telegram bot token is required. Set it in .env file or pass it to the constructor.")
         
         self.channel_id = channel_id
-        self.bot = telegram.Bot(token=self.token)
+        
+        import telegram
+        self.bot = telegram.Bot(token=self.token, request=request)
     
     def set_channel(self, channel_id):
         """
@@ -46,18 +62,184 @@ class TelegramSender:
             logging.error("Channel ID is required. Set it with set_channel() or pass it to send_message().")
             return False
         
+        from telegram.error import TelegramError
         try:
-            self.bot.send_message(
-                chat_id=target_channel,
-                text=message,
-                parse_mode='Markdown'
-            )
+            self.post_message(message, target_channel)
             logging.info(f"Message sent to channel {target_channel}")
             return True
         except TelegramError as e:
             logging.error(f"Failed to send message to Telegram: {str(e)}")
             return False
     
+    def post_message(self, message, channel_id):
+        """
+        Send a message, raising on failure.
+        
+        Messages over Telegram's length limit are sent in several parts. Parts
+        with incomplete Markdown, or Markdown Telegram cannot parse, are sent as
+        plain text instead of being rejected.
+        
+        Args:
+            message (str): Message to send.
+            channel_id (str): Channel ID to send the message to.
+        
+        Raises:
+            TelegramError: If Telegram rejects the message. RetryAfter carries the
+                delay Telegram asks for in its retry_after attribute.
+        """
+        from telegram.error import BadRequest
+        
+        for part in self.split_message(message):
+            parse_mode = 'Markdown' if self.is_markdown_balanced(part) else None
+            try:
+                self.bot.send_message(
+                    chat_id=channel_id,
+                    text=part,
+                    parse_mode=parse_mode
+                )
+            except BadRequest as e:
+                if parse_mode is None or 'parse entities' not in str(e).lower():
+                    raise
+                self.bot.send_message(chat_id=channel_id, text=part, parse_mode=None)
+    
+    def start_stream(self, project_name, commit_details, channel_id=None, min_interval=3.0):
+        """
+        Post the message for a commit right away, to be completed while its description is generated.
+        
+        Args:
+            project_name (str): Name of the project.
+            commit_details (dict): Dictionary containing commit details.
+            channel_id (str, optional): Channel ID to send the message to. Defaults to None.
+            min_interval (float, optional): Least seconds between edits. Defaults to 3.0.
+        
+        Returns:
+            StreamingMessage: Posted message, or None if it could not be sent.
+        """
+        target_channel = channel_id or self.channel_id
+        if not target_channel:
+            logging.error("Channel ID is required. Set it with set_channel() or pass it to start_stream().")
+            return None
+        
+        stream = StreamingMessage(
+            self,
+            target_channel,
+            lambda description: self.format_commit_message(project_name, commit_details, description),
+            min_interval
+        )
+        
+        from telegram.error import TelegramError
+        try:
+            stream.start()
+            return stream
+        except TelegramError as e:
+            logging.error(f"Failed to send message to Telegram: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_permanent_errors():
+        """
+        Get the Telegram errors that retrying the same message cannot fix.
+        
+        Returns:
+            tuple: Exception types.
+        """
+        from telegram.error import BadRequest, Unauthorized
+        return (BadRequest, Unauthorized)
+    
+    @staticmethod
+    def split_message(message, limit=MAX_MESSAGE_LENGTH):
+        """
+        Split a message into parts within Telegram's length limit.
+        
+        Parts end at paragraph breaks where possible, then at line breaks, and
+        lines longer than the limit are cut. Breaks inside a Markdown entity are
+        skipped, so each part parses on its own unless it had to be cut.
+        
+        Args:
+            message (str): Message to split.
+            limit (int, optional): Maximum length of a part. Defaults to MAX_MESSAGE_LENGTH.
+            
+        Returns:
+            list: Message parts, a single part for short messages.
+        """
+        parts = []
+        remaining = message
+        while len(remaining) > limit:
+            cut = TelegramSender.find_cut(remaining, limit)
+            parts.append(remaining[:cut])
+            remaining = remaining[cut:].lstrip("\n")
+        if remaining or not parts:
+            parts.append(remaining)
+        return parts
+    
+    @staticmethod
+    def find_cut(text, limit):
+        """
+        Find where the first part of a long message ends.
+        
+        Args:
+            text (str): Message text longer than limit.
+            limit (int): Maximum length of a part.
+        
+        Returns:
+            int: Position of the last paragraph break, else line break, outside
+                any Markdown entity, or limit if there is none.
+        """
+        paragraph = line = 0
+        index, entity = 0, None
+        while index < limit:
+            if entity is None and index and text[index] == "\n":
+                line = index
+                if text.startswith("\n\n", index) and index + 2 <= limit:
+                    paragraph = index
+            index, entity = TelegramSender.step_markdown(text, index, entity)
+        return paragraph or line or limit
+    
+    @staticmethod
+    def is_markdown_balanced(text):
+        """
+        Check whether text leaves no Markdown entity open.
+        
+        Args:
+            text (str): Message text.
+        
+        Returns:
+            bool: True if Telegram can parse the text as Markdown.
+        """
+        index, entity = 0, None
+        while index < len(text):
+            index, entity = TelegramSender.step_markdown(text, index, entity)
+        return entity is None
+    
+    @staticmethod
+    def step_markdown(text, index, entity):
+        """
+        Read one character or marker of Telegram's Markdown.
+        
+        Args:
+            text (str): Message text.
+            index (int): Position to read at.
+            entity (str): Marker of the entity open at index, or None.
+        
+        Returns:
+            tuple: (position after what was read, marker of the entity then open or None).
+        """
+        char = text[index]
+        if entity is None:
+            if char == "\\":
+                return index + 2, None
+            if text.startswith("```", index):
+                return index + 3, "```"
+            return index + 1, char if char in "*_`[" else None
+        if entity == "```":
+            return (index + 3, None) if text.startswith("```", index) else (index + 1, entity)
+        if entity == "[" and char == "]":
+            # Link text is followed by its URL in parentheses
+            return (index + 2, "(") if text.startswith("](", index) else (index + 1, None)
+        if entity == "(":
+            return index + 1, None if char == ")" else entity
+        return index + 1, None if char == entity else entity
+    
     def format_commit_message(self, project_name, commit_details, description):
         """
         Format a commit message for Telegram.
@@ -79,7 +261,7 @@ class TelegramSender:
         commit_url = commit_details.get('html_url', '')
         
         # Count of files changed
-        files_count = len(commit_details.get('files_changed', []))
+        files_count = commit_details.get('files_count', len(commit_details.get('files_changed', [])))
         
         # Format the message
         message = f"*Project:* {project_name}\n\n"
@@ -93,4 +275,213 @@ class TelegramSender:
         
         message += f"\n*Description:*\n{description}"
         
-        return message
\ No newline at end of file
+        return message
+    
+    def format_digest_message(self, project_name, entries, branch=None, limit=MAX_MESSAGE_LENGTH):
+        """
+        Format several commits as a digest for Telegram.
+        
+        Commits are never split across messages: when the digest exceeds the
+        length limit it continues in further messages, and a single commit
+        longer than the limit has its description truncated.
+        
+        Args:
+            project_name (str): Name of the project.
+            entries (list): (commit_details, description) tuples, in display order.
+            branch (str, optional): Branch the commits were pushed to. Defaults to None.
+            limit (int, optional): Maximum length of a message. Defaults to MAX_MESSAGE_LENGTH.
+            
+        Returns:
+            list: (message, entries) tuples, each message with the entries it covers.
+        """
+        if not entries:
+            return []
+        
+        location = f" on {branch}" if branch else ""
+        
+        messages = []
+        for number, (commit_details, description) in enumerate(entries, start=1):
+            commit_message = commit_details.get('message', 'No commit message').split("\n")[0]
+            author_name = commit_details.get('author', {}).get('name', 'Unknown')
+            commit_url = commit_details.get('html_url', '')
+            
+            section = f"*{number}. {commit_message}*\n"
+            section += f"- Author: {author_name}\n"
+            files_count = commit_details.get('files_count', len(commit_details.get('files_changed', [])))
+            section += f"- Files Changed: {files_count}\n"
+            if commit_url:
+                section += f"- [View on GitHub]({commit_url})\n"
+            section += f"{description}\n\n"
+            
+            if messages and len(messages[-1][0]) + len(section) <= limit:
+                messages[-1] = (messages[-1][0] + section, messages[-1][1] + [(commit_details, description)])
+                continue
+            
+            header = f"*Project:* {project_name}\n*Digest:* {len(entries)} commits{location}"
+            header += f" (part {len(messages) + 1})\n\n" if messages else "\n\n"
+            if len(header) + len(section) > limit:
+                section = section[:limit - len(header) - len(TRUNCATED_MARKER)] + TRUNCATED_MARKER
+            messages.append((header + section, [(commit_details, description)]))
+        
+        return [(message.rstrip(), covered) for message, covered in messages]
+
+class StreamingMessage:
+    """Telegram message edited in place while its description is being generated."""
+    
+    def __init__(self, sender, channel_id, render, min_interval=3.0):
+        """
+        Initialize the streamed message.
+        
+        Args:
+            sender (TelegramSender): Sender whose bot posts and edits the message.
+            channel_id (str): Channel ID to post to.
+            render (callable): Builds the full message text from a description.
+            min_interval (float, optional): Least seconds between edits, keeping within
+                Telegram's limits on edits per chat. Defaults to 3.0.
+        """
+        self.sender = sender
+        self.channel_id = channel_id
+        self.render = render
+        self.min_interval = min_interval
+        self.message_id = None
+        self.text = ""
+        self.last_sent = None
+        self.next_edit_at = 0.0
+        self.lock = threading.Lock()
+    
+    def start(self):
+        """
+        Post the message with a placeholder description.
+        
+        Raises:
+            TelegramError: If Telegram rejects the message.
+        """
+        message = self.fit(self.render(STREAM_PLACEHOLDER))
+        sent = self.sender.bot.send_message(chat_id=self.channel_id, text=message, parse_mode='Markdown')
+        self.message_id = sent.message_id
+        self.last_sent = message
+        self.next_edit_at = time.monotonic() + self.min_interval
+    
+    def take_update(self, delta):
+        """
+        Add generated text and get the message to show if an edit is due.
+        
+        Args:
+            delta (str): Newly generated text.
+        
+        Returns:
+            str: Message text for the edit, or None while the edit interval has not passed.
+        """
+        with self.lock:
+            self.text += delta
+            now = time.monotonic()
+            if now < self.next_edit_at:
+                return None
+            self.next_edit_at = now + self.min_interval
+            return self.fit(self.render(self.text + STREAM_CURSOR))
+    
+    def update(self, delta):
+        """
+        Add generated text, editing the message at most once per interval.
+        
+        Args:
+            delta (str): Newly generated text.
+        """
+        message = self.take_update(delta)
+        if message:
+            self.edit(message)
+    
+    def finish(self, description):
+        """
+        Replace the partial text with the final description.
+        
+        Text beyond Telegram's length limit is sent as follow-up messages.
+        
+        Args:
+            description (str): Final description.
+        
+        Returns:
+            bool: True if the message was completed, False otherwise.
+        """
+        parts = self.sender.split_message(self.render(description))
+        if not self.edit(parts[0], final=True):
+            return False
+        
+        from telegram.error import TelegramError
+        try:
+            for part in parts[1:]:
+                self.sender.post_message(part, self.channel_id)
+        except TelegramError as e:
+            logging.error(f"Failed to send message to Telegram: {str(e)}")
+            return False
+        return True
+    
+    def discard(self):
+        """
+        Delete the posted message, e.g. when its description could not be generated.
+        
+        Returns:
+            bool: True if the message was deleted, False otherwise.
+        """
+        from telegram.error import TelegramError
+        try:
+            self.sender.bot.delete_message(chat_id=self.channel_id, message_id=self.message_id)
+            return True
+        except TelegramError as e:
+            logging.error(f"Failed to delete message in Telegram: {str(e)}")
+            return False
+    
+    def edit(self, message, final=False):
+        """
+        Replace the text of the posted message.
+        
+        Intermediate edits are dropped when Telegram asks to slow down or cannot
+        parse partial Markdown. The final edit waits out rate limits and falls
+        back to plain text.
+        
+        Args:
+            message (str): New message text.
+            final (bool, optional): Whether this is the final text. Defaults to False.
+        
+        Returns:
+            bool: True if the message shows the text, False otherwise.
+        """
+        from telegram.error import BadRequest, RetryAfter, TelegramError
+        
+        if message == self.last_sent:
+            return True
+        
+        parse_mode = 'Markdown'
+        for _ in range(3):
+            try:
+                self.sender.bot.edit_message_text(
+                    text=message, chat_id=self.channel_id, message_id=self.message_id, parse_mode=parse_mode
+                )
+                self.last_sent = message
+                return True
+            except RetryAfter as e:
+                with self.lock:
+                    self.next_edit_at = time.monotonic() + e.retry_after
+                if not final:
+                    return False
+                time.sleep(e.retry_after)
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    return True
+                # Partial text may end inside a Markdown entity
+                if not final:
+                    return False
+                parse_mode = None
+            except TelegramError as e:
+                logging.error(f"Failed to update message in Telegram: {str(e)}")
+                return False
+        
+        logging.error("Failed to update message in Telegram after retries")
+        return False
+    
+    @staticmethod
+    def fit(message):
+        """Cut a message to Telegram's length limit."""
+        if len(message) <= MAX_MESSAGE_LENGTH:
+            return message
+        return message[:MAX_MESSAGE_LENGTH - len(TRUNCATED_MARKER)] + TRUNCATED_MARKER
@@ -0,0 +1,232 @@
+import os
+import sys
+import hmac
+import json
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# GitHub caps webhook payloads at 25 MB
+MAX_BODY_BYTES = 25 * 1024 * 1024
+
+def verify_signature(secret, body, signature_header):
+    """
+    Verify the HMAC signature GitHub attaches to webhook deliveries.
+    
+    Args:
+        secret (str): Webhook secret configured on GitHub.
+        body (bytes): Raw request body.
+        signature_header (str): Value of the X-Hub-Signature-256 header.
+    
+    Returns:
+        bool: True if the signature matches, False otherwise.
+    """
+    if not secret or not signature_header or not signature_header.startswith('sha256='):
+        return False
+    
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header)
+
+def parse_push_event(payload):
+    """
+    Extract the repository, branch and commit SHAs from a push event.
+    
+    Args:
+        payload (dict): Decoded push event payload.
+    
+    Returns:
+        tuple: (repository, branch, shas) with SHAs newest first, or None for pushes
+            that carry no branch commits (tags, branch deletions).
+    """
+    ref = payload.get('ref', '')
+    if not ref.startswith('refs/heads/') or payload.get('deleted'):
+        return None
+    
+    repository = payload.get('repository', {}).get('full_name')
+    shas = [commit['id'] for commit in payload.get('commits', []) if commit.get('id')]
+    if not repository or not shas:
+        return None
+    
+    # Payload commits are oldest first; the pipeline delivers newest first like polling does
+    return repository, ref[len('refs/heads/'):], list(reversed(shas))
+
+class WebhookServer:
+    """HTTP listener that feeds GitHub push events into the commit pipeline."""
+    
+    def __init__(self, messenger, secret=None, host='0.0.0.0', port=8080, path='/webhook', max_body_bytes=MAX_BODY_BYTES):
+        """
+        Initialize the webhook server.
+        
+        Args:
+            messenger (SmartCommitMessenger): Messenger processing the pushed commits.
+            secret (str, optional): Webhook secret. Defaults to the GITHUB_WEBHOOK_SECRET environment variable.
+            host (str, optional): Interface to listen on. Defaults to '0.0.0.0'.
+            port (int, optional): Port to listen on. Defaults to 8080.
+            path (str, optional): URL path accepting deliveries. Defaults to '/webhook'.
+            max_body_bytes (int, optional): Largest request body that is read; larger
+                deliveries are rejected unread. Defaults to 25 MB.
+        """
+        self.secret = secret or os.getenv('GITHUB_WEBHOOK_SECRET')
+        if not self.secret:
+            raise ValueError("Webhook secret is required. Set GITHUB_WEBHOOK_SECRET in .env file or pass it to the constructor.")
+        
+        self.messenger = messenger
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_body_bytes = max_body_bytes
+        self.httpd = None
+        self.thread = None
+        
+        # One worker keeps pushes to the same channel in arrival order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='webhook')
+    
+    def handle_delivery(self, event, body, signature):
+        """
+        Validate and dispatch one webhook delivery.
+        
+        Args:
+            event (str): Value of the X-GitHub-Event header.
+            body (bytes): Raw request body.
+            signature (str): Value of the X-Hub-Signature-256 header.
+        
+        Returns:
+            tuple: (HTTP status code, response message).
+        """
+        if not verify_signature(self.secret, body, signature):
+            logging.warning("Rejected webhook delivery with an invalid signature")
+            return 401, "invalid signature"
+        
+        if event == 'ping':
+            return 200, "pong"
+        
+        if event != 'push':
+            return 202, f"ignored {event} event"
+        
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return 400, "invalid JSON payload"
+        
+        push = parse_push_event(payload)
+        if not push:
+            return 202, "no branch commits"
+        
+        repository, branch, shas = push
+        target = self.messenger.find_target(repository, branch)
+        if not target:
+            return 202, f"{repository}@{branch} is not monitored"
+        
+        logging.info(f"Received push of {len(shas)} commit(s) to {repository}@{branch}")
+        self.executor.submit(self.process_push, target, shas)
+        return 202, "accepted"
+    
+    def process_push(self, target, shas):
+        """Run the pushed commits through the messenger, logging failures."""
+        try:
+            self.messenger.process_commit_shas(target, shas)
+        except Exception as e:
+            logging.error(f"Error processing webhook push: {str(e)}")
+    
+    def start(self):
+        """Start listening in a background thread."""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split('?')[0] != server.path:
+                    self.respond(404, "not found")
+                    return
+                
+                # The body is only read once its announced size is known to be acceptable
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.respond(400, "invalid Content-Length")
+                    return
+                if length > server.max_body_bytes:
+                    logging.warning(f"Rejected webhook delivery of {length} bytes")
+                    self.respond(413, "payload too large")
+                    return
+                
+                body = self.rfile.read(length)
+                status, message = server.handle_delivery(
+                    self.headers.get('X-GitHub-Event', ''),
+                    body,
+                    self.headers.get('X-Hub-Signature-256', '')
+                )
+                self.respond(status, message)
+            
+            def respond(self, status, message):
+                data = message.encode('utf-8')
+                self.close_connection = True
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                logging.debug(f"Webhook request: {format % args}")
+        
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info(f"Listening for GitHub webhooks on {self.host}:{self.port}{self.path}")
+    
+    def stop(self):
+        """Stop listening and wait for queued pushes to finish."""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        self.executor.shutdown(wait=True)
+
+def replay(messenger, payload_path):
+    """
+    Feed a recorded push payload straight into the messenger, skipping HTTP and signatures.
+    
+    Args:
+        messenger (SmartCommitMessenger): Messenger processing the commits.
+        payload_path (str): Path to a JSON file with a recorded push event.
+    
+    Returns:
+        bool: True if the commits were processed, False otherwise.
+    """
+    with open(payload_path, 'r') as file:
+        push = parse_push_event(json.load(file))
+    
+    if not push:
+        logging.warning("Recorded payload contains no branch commits.")
+        return False
+    
+    repository, branch, shas = push
+    target = messenger.find_target(repository, branch)
+    if not target:
+        logging.warning(f"{repository}@{branch} is not monitored.")
+        return False
+    return messenger.process_commit_shas(target, shas)
+
+def main(argv=None):
+    """Replay a recorded push event through the pipeline."""
+    parser = argparse.ArgumentParser(description="Replay a recorded GitHub push event.")
+    parser.add_argument('payload', help="Path to a JSON file with a recorded push event.")
+    parser.add_argument('--config', default='../config/config.yaml', help="Path to the configuration file.")
+    args = parser.parse_args(argv)
+    
+    from main import SmartCommitMessenger
+    try:
+        messenger = SmartCommitMessenger(config_path=args.config)
+        return 0 if replay(messenger, args.payload) else 1
+    except Exception as e:
+        logging.error(f"Error replaying webhook payload: {str(e)}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from analysis_cache import AnalysisCache
+
+class TestAnalysisCache(unittest.TestCase):
+    """Test cases for the AnalysisCache class."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'cache.db')
+        self.cache = AnalysisCache(path=self.path)
+    
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+    
+    def test_make_key_depends_on_inputs_and_model(self):
+        """Test that the key changes with the prompt inputs, model and token limit."""
+        inputs = {'commit_message': 'Fix bug', 'additions': 1}
+        key = AnalysisCache.make_key(inputs, "gpt-3.5-turbo", 500)
+        
+        self.assertEqual(key, AnalysisCache.make_key(dict(inputs), "gpt-3.5-turbo", 500))
+        self.assertNotEqual(key, AnalysisCache.make_key({'commit_message': 'Fix bugs', 'additions': 1}, "gpt-3.5-turbo", 500))
+        self.assertNotEqual(key, AnalysisCache.make_key(inputs, "gpt-4", 500))
+        self.assertNotEqual(key, AnalysisCache.make_key(inputs, "gpt-3.5-turbo", 1000))
+    
+    def test_get_and_set(self):
+        """Test storing and retrieving a description with hit/miss counters."""
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.set("key", "A description")
+        self.assertEqual(self.cache.get("key"), "A description")
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+    
+    def test_ttl_expiry(self):
+        """Test that expired entries are treated as misses."""
+        self.cache.ttl_seconds = 60
+        with patch('analysis_cache.time.time', return_value=1000.0):
+            self.cache.set("key", "A description")
+        with patch('analysis_cache.time.time', return_value=1100.0):
+            self.assertIsNone(self.cache.get("key"))
+    
+    def test_size_eviction(self):
+        """Test that the least recently used entries are evicted over the size limit."""
+        self.cache.max_entries = 2
+        self.cache.ttl_seconds = 0
+        with patch('analysis_cache.time.time', return_value=1.0):
+            self.cache.set("a", "first")
+        with patch('analysis_cache.time.time', return_value=2.0):
+            self.cache.set("b", "second")
+        with patch('analysis_cache.time.time', return_value=3.0):
+            self.cache.get("a")
+        with patch('analysis_cache.time.time', return_value=4.0):
+            self.cache.set("c", "third")
+        
+        self.assertEqual(self.cache.get("a"), "first")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), "third")
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
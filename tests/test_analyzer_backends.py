@@ -0,0 +1,296 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import json
+import asyncio
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import requests
+import time
+from analyzer_backends import (
+    AnalyzerBackend, OpenAIChatBackend, LangChainBackend, LlamaCppBackend, FallbackBackend, StreamAbandoned,
+    create_backend
+)
+from commit_analyzer import CommitAnalyzer, COMMIT_PROMPT
+
+def make_response(status_code=200, body=None, lines=None, headers=None):
+    """Build a fake requests response."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = body
+    response.iter_lines.return_value = lines or []
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} Error")
+    return response
+
+def completion(content, prompt_tokens=12, completion_tokens=5):
+    """Build a chat completions response body."""
+    return {
+        'choices': [{'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+    }
+
+class TestOpenAIChatBackend(unittest.TestCase):
+    """Test cases for the OpenAIChatBackend class."""
+    
+    def setUp(self):
+        self.session = MagicMock()
+        self.backend = OpenAIChatBackend(
+            model_name="gpt-4", api_key="fake_key", request_timeout=(2, 9), session=self.session
+        )
+    
+    def test_complete(self):
+        """Test a plain request fills the template and records token usage."""
+        self.session.post.return_value = make_response(200, completion(" Fixed a bug. "))
+        
+        result = self.backend.complete("Explain: {message}", {'message': "fix bug"}, 100)
+        
+        self.assertEqual(result, " Fixed a bug. ")
+        url = self.session.post.call_args[0][0]
+        kwargs = self.session.post.call_args[1]
+        self.assertEqual(url, "https://api.openai.com/v1/chat/completions")
+        self.assertEqual(kwargs['json']['messages'][0]['content'], "Explain: fix bug")
+        self.assertEqual(kwargs['json']['max_tokens'], 100)
+        self.assertFalse(kwargs['json']['stream'])
+        self.assertEqual(kwargs['timeout'], (2, 9))
+        self.assertEqual(kwargs['headers']['Authorization'], "Bearer fake_key")
+        self.assertEqual(self.backend.get_usage(), {
+            'requests': 1, 'failures': 0, 'prompt_tokens': 12, 'completion_tokens': 5, 'total_tokens': 17
+        })
+    
+    def test_complete_streaming(self):
+        """Test that streamed chunks reach the callback and usage is read from the final chunk."""
+        chunks = [{'choices': [{'delta': {'content': text}}]} for text in ("Fixed", " a", " bug.")]
+        chunks.append({'choices': [], 'usage': {'prompt_tokens': 10, 'completion_tokens': 3}})
+        lines = [f"data: {json.dumps(chunk)}" for chunk in chunks] + ["", "data: [DONE]"]
+        self.session.post.return_value = make_response(200, lines=lines)
+        
+        received = []
+        result = self.backend.complete("{message}", {'message': "fix"}, 100, on_token=received.append)
+        
+        self.assertEqual(result, "Fixed a bug.")
+        self.assertEqual(received, ["Fixed", " a", " bug."])
+        self.assertTrue(self.session.post.call_args[1]['json']['stream'])
+        self.assertEqual(self.backend.get_usage()['total_tokens'], 13)
+    
+    @patch('analyzer_backends.time.sleep')
+    def test_retry_after_rate_limit(self, mock_sleep):
+        """Test that rate limited and dropped requests are retried."""
+        self.session.post.side_effect = [
+            make_response(429, headers={'Retry-After': '3'}),
+            requests.ConnectionError("reset"),
+            make_response(200, completion("Done"))
+        ]
+        
+        self.assertEqual(self.backend.complete("{message}", {'message': "fix"}, 100), "Done")
+        self.assertEqual(self.session.post.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[0][0][0], 3.0)
+    
+    @patch('analyzer_backends.time.sleep')
+    def test_no_retry_after_streaming_started(self, mock_sleep):
+        """Test that a stream breaking off after the first chunk is not retried."""
+        def lines(decode_unicode=True):
+            yield f"data: {json.dumps({'choices': [{'delta': {'content': 'Fixed'}}]})}"
+            raise requests.ConnectionError("reset")
+        
+        response = make_response(200)
+        response.iter_lines.side_effect = lines
+        self.session.post.return_value = response
+        
+        received = []
+        with self.assertRaises(requests.ConnectionError):
+            self.backend.complete("{message}", {'message': "fix"}, 100, on_token=received.append)
+        self.assertEqual(received, ["Fixed"])
+        self.assertEqual(self.session.post.call_count, 1)
+        self.assertEqual(self.backend.get_usage()['failures'], 1)
+    
+    @patch('analyzer_backends.time.sleep')
+    def test_gives_up_after_retries(self, mock_sleep):
+        """Test that the error is raised once the retries are used up."""
+        self.backend.max_retries = 1
+        self.session.post.return_value = make_response(503)
+        
+        with self.assertRaises(requests.HTTPError):
+            self.backend.complete("{message}", {'message': "fix"}, 100)
+        self.assertEqual(self.session.post.call_count, 2)
+        self.assertEqual(self.backend.get_usage()['failures'], 1)
+    
+    def test_acomplete_without_async_support(self):
+        """Test that the base asynchronous path runs complete() in an executor."""
+        class EchoBackend(AnalyzerBackend):
+            def complete(self, template, values, max_tokens, on_token=None):
+                return template.format(**values)
+        
+        result = asyncio.run(EchoBackend().acomplete("Echo {message}", {'message': "x"}, 10))
+        self.assertEqual(result, "Echo x")
+
+class TestFallbackBackend(unittest.TestCase):
+    """Test cases for the FallbackBackend class."""
+    
+    def make_backend(self, name, result=None, error=None, delay=0):
+        """Build a backend answering after a delay, or failing."""
+        class StubBackend(AnalyzerBackend):
+            def complete(self, template, values, max_tokens, on_token=None):
+                time.sleep(delay)
+                if error:
+                    self.record_usage(failed=True)
+                    raise error
+                self.record_usage(10, 5)
+                return result
+        
+        backend = StubBackend()
+        backend.name = name
+        return backend
+    
+    def test_primary_answers(self):
+        """Test that the secondary backend is not used while the primary works."""
+        backend = FallbackBackend(self.make_backend('openai', "remote"), self.make_backend('llama_cpp', "local"))
+        self.assertEqual(backend.complete("{x}", {'x': 1}, 10), "remote")
+        self.assertEqual(backend.get_usage()['fallbacks'], 0)
+    
+    def test_fallback_on_error(self):
+        """Test that a failing primary hands the prompt to the secondary backend."""
+        backend = FallbackBackend(
+            self.make_backend('openai', error=requests.ConnectionError("down")), self.make_backend('llama_cpp', "local")
+        )
+        self.assertEqual(backend.complete("{x}", {'x': 1}, 10), "local")
+        
+        usage = backend.get_usage()
+        self.assertEqual(usage['fallbacks'], 1)
+        self.assertEqual(usage['requests'], 2)
+        self.assertEqual(usage['openai']['failures'], 1)
+        self.assertEqual(usage['llama_cpp']['completion_tokens'], 5)
+    
+    def test_fallback_on_latency_slo(self):
+        """Test that a primary slower than the latency target is not waited for."""
+        backend = FallbackBackend(
+            self.make_backend('openai', "remote", delay=0.5), self.make_backend('llama_cpp', "local"), latency_slo=0.05
+        )
+        self.assertEqual(backend.complete("{x}", {'x': 1}, 10), "local")
+        self.assertEqual(asyncio.run(backend.acomplete("{x}", {'x': 1}, 10)), "local")
+        self.assertEqual(backend.get_usage()['fallbacks'], 2)
+    
+    def test_abandoned_primary_stops_streaming(self):
+        """Test that a primary past the latency target passes on no more text and stops."""
+        abandoned = []
+        
+        class SlowStreamingBackend(AnalyzerBackend):
+            name = 'llama_cpp'
+            
+            def complete(self, template, values, max_tokens, on_token=None):
+                try:
+                    for _ in range(20):
+                        time.sleep(0.02)
+                        on_token("slow ")
+                except StreamAbandoned:
+                    abandoned.append(True)
+                    raise
+                return "slow " * 20
+        
+        class FastBackend(AnalyzerBackend):
+            name = 'openai'
+            
+            def complete(self, template, values, max_tokens, on_token=None):
+                on_token("fast")
+                return "fast"
+        
+        backend = FallbackBackend(SlowStreamingBackend(), FastBackend(), latency_slo=0.05)
+        for run in (
+            lambda on_token: backend.complete("{x}", {'x': 1}, 10, on_token),
+            lambda on_token: asyncio.run(backend.acomplete("{x}", {'x': 1}, 10, on_token))
+        ):
+            received = []
+            self.assertEqual(run(received.append), "fast")
+            time.sleep(0.1)
+            self.assertEqual(received[-1], "fast")
+            self.assertLess(len(received), 5)
+        self.assertEqual(abandoned, [True, True])
+
+class TestLlamaCppBackend(unittest.TestCase):
+    """Test cases for the LlamaCppBackend class."""
+    
+    def test_complete_fits_context(self):
+        """Test that the response limit is lowered to the room left in the context window."""
+        backend = LlamaCppBackend("models/test.gguf", context_tokens=600)
+        backend.llama = MagicMock()
+        backend.llama.tokenize.return_value = [0] * 200
+        backend.llama.create_chat_completion.return_value = completion("Local answer", 200, 3)
+        
+        self.assertEqual(backend.complete("{x}", {'x': "prompt"}, 500), "Local answer")
+        self.assertEqual(backend.llama.create_chat_completion.call_args[1]['max_tokens'], 600 - 200 - 64)
+        self.assertEqual(backend.get_usage()['completion_tokens'], 3)
+    
+    def test_missing_model_file(self):
+        """Test that a missing model file is reported as an error."""
+        backend = LlamaCppBackend("models/missing.gguf")
+        with patch.dict(sys.modules, {'llama_cpp': MagicMock()}):
+            with self.assertRaises(ValueError):
+                backend.complete("{x}", {'x': 1}, 10)
+        self.assertEqual(backend.get_usage()['failures'], 1)
+
+class TestCreateBackend(unittest.TestCase):
+    """Test cases for selecting the backend from the configuration."""
+    
+    def test_create_backend(self):
+        """Test the backend named in the ai section is created."""
+        backend = create_backend({'backend': 'openai', 'model': 'gpt-4', 'max_retries': 5, 'stream': True})
+        self.assertIsInstance(backend, OpenAIChatBackend)
+        self.assertEqual(backend.model_name, 'gpt-4')
+        self.assertEqual(backend.max_retries, 5)
+        self.assertTrue(backend.stream)
+        
+        self.assertIsInstance(create_backend({}), LangChainBackend)
+        with self.assertRaises(ValueError):
+            create_backend({'backend': 'unknown'})
+    
+    def test_create_local_backends(self):
+        """Test the local runners and the ways of combining them with the remote backend."""
+        local = create_backend({'backend': 'local', 'local': {'runner': 'llama_cpp', 'model_path': 'm.gguf'}})
+        self.assertIsInstance(local, LlamaCppBackend)
+        self.assertFalse(local.requires_api_key)
+        
+        server = create_backend({'backend': 'local', 'local': {'runner': 'server', 'server_url': 'http://gpu:8000/v1'}})
+        self.assertIsInstance(server, OpenAIChatBackend)
+        self.assertEqual(server.api_base, 'http://gpu:8000/v1')
+        self.assertEqual(server.api_key, '')
+        self.assertFalse(server.requires_api_key)
+        
+        fallback = create_backend({'backend': 'openai', 'local': {'mode': 'fallback', 'latency_slo_seconds': 5}})
+        self.assertIsInstance(fallback.primary, OpenAIChatBackend)
+        self.assertIsInstance(fallback.secondary, LlamaCppBackend)
+        self.assertEqual(fallback.latency_slo, 5)
+        
+        first_pass = create_backend({'backend': 'openai', 'local': {'mode': 'first_pass'}})
+        self.assertIsInstance(first_pass.primary, LlamaCppBackend)
+        
+        with self.assertRaises(ValueError):
+            create_backend({'backend': 'openai', 'local': {'mode': 'sometimes'}})
+    
+    @patch.dict(os.environ, {}, clear=True)
+    def test_local_backend_needs_no_api_key(self):
+        """Test that CommitAnalyzer runs on a local backend without an OpenAI key."""
+        analyzer = CommitAnalyzer(backend=LlamaCppBackend("m.gguf"))
+        self.assertIsNone(analyzer.api_key)
+    
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"})
+    def test_analyzer_uses_backend(self):
+        """Test that CommitAnalyzer sends its prompts through the given backend."""
+        backend = MagicMock()
+        backend.complete.return_value = " Summary "
+        analyzer = CommitAnalyzer(max_tokens=300, backend=backend)
+        
+        result = analyzer.analyze_commit({'message': "Fix bug", 'files_changed': [], 'stats': {}})
+        
+        self.assertEqual(result, "Summary")
+        template, values, max_tokens, on_token = backend.complete.call_args[0]
+        self.assertEqual(template, COMMIT_PROMPT)
+        self.assertEqual(values['commit_message'], "Fix bug")
+        self.assertEqual(max_tokens, 300)
+        self.assertIsNone(on_token)
+
+if __name__ == '__main__':
+    unittest.main()
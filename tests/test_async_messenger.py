@@ -0,0 +1,243 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import os
+import sys
+import asyncio
+import tempfile
+import yaml
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from async_messenger import AsyncGitHubClient, AsyncTelegramSender, AsyncSmartCommitMessenger
+from analyzer_backends import AnalyzerBackend
+from github_requests import GitHubRequestLayer
+from delivery_router import DeliveryRouter
+from commit_analyzer import ANALYSIS_FAILED_MESSAGE
+
+class TestAsyncGitHubClient(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the AsyncGitHubClient class."""
+    
+    def test_init_without_token(self):
+        """Test initialization without a token raises ValueError."""
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(ValueError):
+                AsyncGitHubClient(MagicMock())
+    
+    async def test_get_latest_commits_stops_at_limit(self):
+        """Test that paging stops once the limit is reached."""
+        client = AsyncGitHubClient(MagicMock(), token="fake_token", repository="user/repo")
+        page = [{'sha': f"{i:040x}"} for i in range(3)]
+        client.request = AsyncMock(return_value=(page, {'next': {'url': 'https://api.github.com/next'}}))
+        
+        commits = await client.get_latest_commits(branch="main", limit=5)
+        
+        self.assertEqual(len(commits), 5)
+        self.assertEqual(client.request.await_count, 2)
+        _, kwargs = client.request.await_args_list[0]
+        self.assertEqual(kwargs['params'], {'sha': 'main', 'per_page': 5})
+    
+    async def test_get_latest_commits_since_sha(self):
+        """Test that fetching stops at the given since SHA."""
+        client = AsyncGitHubClient(MagicMock(), token="fake_token", repository="user/repo")
+        page = [{'sha': "c" * 40}, {'sha': "b" * 40}, {'sha': "a" * 40}]
+        client.request = AsyncMock(return_value=(page, {}))
+        
+        commits = await client.get_latest_commits(branch="main", limit=5, since="b" * 40)
+        self.assertEqual([c['sha'] for c in commits], ["c" * 40])
+    
+    async def test_get_commit_details(self):
+        """Test that commit details have the same shape as the synchronous client."""
+        client = AsyncGitHubClient(MagicMock(), token="fake_token", repository="user/repo")
+        client.request = AsyncMock(return_value=({
+            'sha': 'abc123',
+            'commit': {'message': 'Test commit', 'author': {'name': 'Test User', 'email': 'test@example.com', 'date': '2023-01-01T12:00:00Z'}},
+            'files': [{'filename': 'test.py', 'additions': 10, 'deletions': 5, 'changes': 15, 'status': 'modified'}],
+            'stats': {'additions': 10, 'deletions': 5, 'total': 15},
+            'html_url': 'https://github.com/user/repo/commit/abc123'
+        }, {}))
+        
+        details = await client.get_commit_details({'sha': 'abc123'})
+        
+        self.assertEqual(details['message'], "Test commit")
+        self.assertEqual(details['author']['name'], "Test User")
+        self.assertEqual(details['files_changed'][0]['filename'], "test.py")
+        self.assertEqual(details['stats']['total'], 15)
+    
+    async def test_conditional_request(self):
+        """Test that requests share the ETag cache and quota state of the request layer."""
+        layer = GitHubRequestLayer(token="fake_token")
+        client = AsyncGitHubClient(MagicMock(), token="fake_token", repository="user/repo", request_layer=layer)
+        fresh = MagicMock(status=200, headers={'ETag': '"v1"', 'X-RateLimit-Remaining': '4999'}, links={})
+        not_modified = MagicMock(status=304, headers={'X-RateLimit-Remaining': '4999'}, links={})
+        client.send = AsyncMock(side_effect=[(fresh, {'sha': 'abc'}), (not_modified, None)])
+        
+        self.assertEqual((await client.request("/repos/user/repo/readme"))[0], {'sha': 'abc'})
+        self.assertEqual((await client.request("/repos/user/repo/readme"))[0], {'sha': 'abc'})
+        
+        self.assertEqual(client.send.await_args_list[1][0][2]['If-None-Match'], '"v1"')
+        self.assertEqual(layer.get_budget_usage()['remaining'], 4999)
+        self.assertEqual(layer.get_budget_usage()['targets']['user/repo'], {'requests': 1, 'cache_hits': 1})
+    
+    async def test_get_commit_details_batch(self):
+        """Test that the GraphQL details source fetches several commits with one query."""
+        client = AsyncGitHubClient(
+            MagicMock(), token="fake_token", repository="user/repo",
+            request_layer=GitHubRequestLayer(token="fake_token"), details_source='graphql'
+        )
+        client.graphql = AsyncMock(return_value={'repository': {
+            f"c{index}": {
+                'oid': sha, 'message': 'Fix bug', 'url': f"https://github.com/user/repo/commit/{sha}",
+                'additions': 3, 'deletions': 1, 'changedFilesIfAvailable': 2,
+                'author': {'name': 'Dev', 'email': 'dev@example.com', 'date': '2024-01-01'}
+            }
+            for index, sha in enumerate(['a' * 40, 'b' * 40])
+        }})
+        
+        details = await client.get_commit_details_batch([{'sha': 'a' * 40}, {'sha': 'b' * 40}])
+        
+        client.graphql.assert_awaited_once()
+        self.assertEqual(details['b' * 40]['files_count'], 2)
+        self.assertEqual(details['a' * 40]['message'], 'Fix bug')
+
+class TestAsyncTelegramSender(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the AsyncTelegramSender class."""
+    
+    def make_session(self, result):
+        response = MagicMock()
+        response.json = AsyncMock(return_value=result)
+        context = MagicMock()
+        context.__aenter__ = AsyncMock(return_value=response)
+        context.__aexit__ = AsyncMock(return_value=False)
+        session = MagicMock()
+        session.post.return_value = context
+        return session
+    
+    async def test_send_message_success(self):
+        """Test successful message sending."""
+        session = self.make_session({'ok': True})
+        sender = AsyncTelegramSender(session, token="fake_token", channel_id="@test_channel")
+        
+        result = await sender.send_message("Test message")
+        
+        self.assertTrue(result)
+        _, kwargs = session.post.call_args
+        self.assertEqual(kwargs['json']['chat_id'], "@test_channel")
+    
+    async def test_send_message_api_error(self):
+        """Test handling of an error response from the Bot API."""
+        session = self.make_session({'ok': False, 'description': 'Bad Request'})
+        sender = AsyncTelegramSender(session, token="fake_token", channel_id="@test_channel")
+        
+        self.assertFalse(await sender.send_message("Test message"))
+    
+    def test_format_commit_message(self):
+        """Test that message formatting is shared with the synchronous sender."""
+        sender = AsyncTelegramSender(MagicMock(), token="fake_token")
+        message = sender.format_commit_message("Test Project", {'message': 'Test commit'}, "Description")
+        self.assertIn("*Project:* Test Project", message)
+    
+    async def test_streaming_message(self):
+        """Test that a streamed message is posted, edited in the background and completed."""
+        session = self.make_session({'ok': True, 'result': {'message_id': 7}})
+        sender = AsyncTelegramSender(session, token="fake_token", channel_id="@test_channel")
+        
+        stream = await sender.start_stream("Test Project", {'message': 'Test commit'}, min_interval=0)
+        stream.update("Partial")
+        await stream.pending_edit
+        self.assertTrue(await stream.finish("Full description"))
+        
+        methods = [call[0][0].rsplit('/', 1)[1] for call in session.post.call_args_list]
+        self.assertEqual(methods, ['sendMessage', 'editMessageText', 'editMessageText'])
+        self.assertIn("Full description", session.post.call_args[1]['json']['text'])
+        self.assertEqual(session.post.call_args[1]['json']['message_id'], 7)
+    
+    async def test_streaming_from_executor_backend(self):
+        """Test that text generated in an executor thread is edited in on the event loop."""
+        class ThreadBackend(AnalyzerBackend):
+            def complete(self, template, values, max_tokens, on_token=None):
+                on_token("Partial")
+                return "Full description"
+        
+        session = self.make_session({'ok': True, 'result': {'message_id': 7}})
+        sender = AsyncTelegramSender(session, token="fake_token", channel_id="@test_channel")
+        
+        stream = await sender.start_stream("Test Project", {'message': 'Test commit'}, min_interval=0)
+        description = await ThreadBackend().acomplete("{x}", {'x': 1}, 10, on_token=stream.update)
+        self.assertIsNotNone(stream.pending_edit)
+        await stream.pending_edit
+        self.assertTrue(await stream.finish(description))
+        
+        texts = [call[1]['json']['text'] for call in session.post.call_args_list]
+        self.assertIn("Partial", texts[1])
+        self.assertIn("Full description", texts[2])
+
+class TestAsyncSmartCommitMessenger(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the AsyncSmartCommitMessenger processing runs."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        config = {
+            'github': {'repository': 'user/repo', 'branch': 'main', 'commit_limit': 5},
+            'telegram': {'channel_id': '@channel'},
+            'readme': {'cache_path': os.path.join(self.temp_dir.name, 'readme_cache.json'), 'summarize': False},
+            'storage': {'ledger_path': os.path.join(self.temp_dir.name, 'ledger.db')},
+            'cache': {'enabled': False}
+        }
+        self.config_path = os.path.join(self.temp_dir.name, 'config.yaml')
+        with open(self.config_path, 'w') as file:
+            yaml.safe_dump(config, file)
+        
+        env = patch.dict(os.environ, {'GITHUB_TOKEN': 'fake_token', 'OPENAI_API_KEY': 'fake_key'})
+        env.start()
+        self.addCleanup(env.stop)
+        patcher = patch('messenger_base.create_backend')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def make_messenger(self):
+        """Create a messenger with fake GitHub, Telegram and analyzer components."""
+        messenger = AsyncSmartCommitMessenger(config_path=self.config_path)
+        self.addCleanup(messenger.ledger.close)
+        messenger.semaphore = asyncio.Semaphore(4)
+        
+        messenger.telegram_sender = AsyncTelegramSender(MagicMock(), token="fake_token")
+        messenger.telegram_sender.send_message = AsyncMock(return_value=True)
+        messenger.router = DeliveryRouter(lambda project, details, description, **kwargs: f"{details['sha']}: {description}")
+        
+        github_client = MagicMock(repository_name='user/repo')
+        github_client.get_readme = AsyncMock(return_value=None)
+        github_client.get_commit_details_batch = AsyncMock(return_value={})
+        github_client.get_commit_details = AsyncMock(side_effect=lambda commit: {
+            'sha': commit['sha'], 'message': f"Change {commit['sha']}", 'files_changed': []
+        })
+        messenger.github_clients['user/repo'] = github_client
+        
+        messenger.commit_analyzer = MagicMock(batch_size=1, classifier=None)
+        messenger.commit_analyzer.get_usage.return_value = {
+            'requests': 0, 'failures': 0, 'prompt_tokens': 0, 'completion_tokens': 0
+        }
+        return messenger
+    
+    async def test_process_commits(self):
+        """Test that a run delivers in order, retries failed analyses and keeps its summary."""
+        messenger = self.make_messenger()
+        target = messenger.targets[0]
+        messenger.commit_analyzer.aanalyze_commit = AsyncMock(
+            side_effect=lambda details, readme: ANALYSIS_FAILED_MESSAGE if details['sha'] == 'bbb222' else "A description"
+        )
+        
+        self.assertTrue(await messenger.process_commits(target, [{'sha': 'aaa111'}, {'sha': 'bbb222'}]))
+        messenger.telegram_sender.send_message.assert_awaited_once_with("aaa111: A description", channel_id='@channel')
+        self.assertTrue(messenger.ledger.is_delivered('user/repo', 'main', 'aaa111'))
+        self.assertFalse(messenger.ledger.is_delivered('user/repo', 'main', 'bbb222'))
+        self.assertEqual(messenger.last_run_summary['commits']['delivered'], 1)
+        self.assertEqual(messenger.last_run_summary['commits']['failed'], 1)
+        
+        self.assertTrue(await messenger.process_commits(target, [{'sha': 'aaa111'}, {'sha': 'bbb222'}]))
+        self.assertEqual(messenger.last_run_summary['commits']['skipped'], 1)
+        self.assertEqual(messenger.commit_analyzer.aanalyze_commit.await_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
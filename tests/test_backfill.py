@@ -0,0 +1,156 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import json
+import os
+import sys
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from backfill import Backfill, BackfillCheckpoint
+from commit_ledger import CommitLedger
+from delivery_router import DeliveryRouter, load_destinations
+from pipeline import CommitPipeline
+
+SHAS = ['c5', 'c4', 'c3', 'c2', 'c1']
+
+class TestBackfill(unittest.TestCase):
+    """Test cases for the Backfill class."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.target = {
+            'repository': 'user/repo', 'branch': 'release/3.x', 'project_name': 'repo',
+            'destinations': load_destinations({}, {}, '@channel')
+        }
+        
+        self.github_client = MagicMock()
+        self.github_client.iter_commits.side_effect = lambda *args, reverse=False, limit=None, **kwargs: iter(
+            [SimpleNamespace(sha=sha) for sha in (reversed(SHAS[:limit]) if reverse else SHAS[:limit])]
+        )
+        self.github_client.get_commit.side_effect = lambda sha: SimpleNamespace(sha=sha)
+        self.github_client.get_commit_details_batch.return_value = {}
+        
+        self.messenger = MagicMock()
+        self.messenger.get_github_client.return_value = self.github_client
+        self.messenger.get_project_description.return_value = "A project"
+        self.messenger.pipeline = CommitPipeline()
+        self.messenger.ledger = CommitLedger(path=os.path.join(self.temp_dir.name, 'ledger.db'))
+        self.messenger.router = DeliveryRouter(lambda project, details, description: description)
+        self.messenger.commit_analyzer.batch_size = 1
+        self.messenger.commit_analyzer.analyze_commit.side_effect = lambda details, readme: f"About {details['sha']}"
+        self.messenger.fetch_commit_details.side_effect = lambda client, commit, prefetched=None: {
+            'sha': commit.sha, 'message': f"Commit {commit.sha}", 'files_changed': []
+        }
+        self.messenger.analyze_commit_details.side_effect = lambda target, details, readme: f"About {details['sha']}"
+        
+        def deliver_commit(target, details, description):
+            self.messenger.ledger.record_delivery(target['repository'], target['branch'], details['sha'], True)
+            return True
+        self.messenger.deliver_commit.side_effect = deliver_commit
+        
+        self.checkpoint_path = os.path.join(self.temp_dir.name, 'checkpoint.json')
+    
+    def tearDown(self):
+        self.messenger.ledger.close()
+        self.temp_dir.cleanup()
+    
+    def make_backfill(self, **kwargs):
+        return Backfill(
+            self.messenger, self.target, base='c0', checkpoint=BackfillCheckpoint(self.checkpoint_path),
+            chunk_size=2, **kwargs
+        )
+    
+    def test_dry_run_exports_without_sending(self):
+        """Test that a dry run exports every description and records nothing."""
+        export_path = os.path.join(self.temp_dir.name, 'export.jsonl')
+        stats = self.make_backfill(dry_run=True, export_path=export_path).run()
+        
+        self.assertEqual(stats, {'listed': 5, 'processed': 5, 'failed': 0})
+        self.messenger.deliver_commit.assert_not_called()
+        self.assertFalse(self.messenger.ledger.is_delivered('user/repo', 'release/3.x', 'c5'))
+        self.github_client.iter_commits.assert_called_with(
+            'release/3.x', base='c0', since=None, until=None, reverse=True, limit=None
+        )
+        
+        with open(export_path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([record['sha'] for record in records], list(reversed(SHAS)))
+        self.assertEqual(records[0]['messages'], {'@channel': "About c1"})
+    
+    def test_newest_first(self):
+        """Test that the range can be replayed from the latest commit."""
+        backfill = self.make_backfill(order='newest_first', limit=2)
+        backfill.run()
+        delivered = [call.args[1]['sha'] for call in self.messenger.deliver_commit.call_args_list]
+        self.assertEqual(delivered, ['c5', 'c4'])
+        self.assertFalse(backfill.checkpoint.get(backfill.key)['done'])
+        
+        with self.assertRaises(ValueError):
+            self.make_backfill(order='random')
+        
+        # Without a limit, base or since the whole history would be listed before replaying oldest first
+        self.assertEqual(Backfill(self.messenger, self.target).order, 'newest_first')
+        self.assertEqual(self.make_backfill().order, 'oldest_first')
+    
+    def test_limit_replays_newest_commits(self):
+        """Test that a limit oldest first replays the newest commits without listing the rest."""
+        backfill = self.make_backfill(limit=2)
+        self.assertEqual(backfill.run(), {'listed': 2, 'processed': 2, 'failed': 0})
+        delivered = [call.args[1]['sha'] for call in self.messenger.deliver_commit.call_args_list]
+        self.assertEqual(delivered, ['c4', 'c5'])
+        self.github_client.iter_commits.assert_called_with(
+            'release/3.x', base='c0', since=None, until=None, reverse=True, limit=2
+        )
+        self.assertTrue(backfill.checkpoint.get(backfill.key)['done'])
+    
+    def test_resumes_after_crash(self):
+        """Test that a run interrupted after a chunk continues after the checkpoint."""
+        with patch.object(Backfill, 'throttle', side_effect=[None, RuntimeError("crash")]):
+            with self.assertRaises(RuntimeError):
+                self.make_backfill().run()
+        self.assertEqual(self.messenger.deliver_commit.call_count, 4)
+        
+        self.messenger.fetch_commit_details.reset_mock()
+        stats = self.make_backfill().run()
+        
+        self.assertEqual(stats, {'listed': 1, 'processed': 1, 'failed': 0})
+        fetched = [call.args[1].sha for call in self.messenger.fetch_commit_details.call_args_list]
+        self.assertEqual(fetched, ['c5'])
+        
+        # A completed range is not replayed unless restarted
+        self.assertEqual(self.make_backfill().run()['listed'], 0)
+        self.assertEqual(self.make_backfill().run(restart=True), {'listed': 5, 'processed': 0, 'failed': 0})
+    
+    def test_changed_history_starts_over(self):
+        """Test that a checkpoint not matching the history falls back to the ledger."""
+        backfill = self.make_backfill(limit=3)
+        backfill.checkpoint.update(backfill.key, position=2, last_sha='rewritten')
+        self.messenger.ledger.record_delivery('user/repo', 'release/3.x', 'c3', True)
+        
+        stats = backfill.run()
+        self.assertEqual(stats, {'listed': 3, 'processed': 2, 'failed': 0})
+        delivered = [call.args[1]['sha'] for call in self.messenger.deliver_commit.call_args_list]
+        self.assertEqual(delivered, ['c4', 'c5'])
+    
+    def test_failed_commits_are_retried(self):
+        """Test that failed commits stay in the checkpoint and are retried by the next run."""
+        self.messenger.analyze_commit_details.side_effect = (
+            lambda target, details, readme: None if details['sha'] == 'c2' else f"About {details['sha']}"
+        )
+        backfill = self.make_backfill()
+        self.assertEqual(backfill.run(), {'listed': 5, 'processed': 4, 'failed': 1})
+        state = backfill.checkpoint.get(backfill.key)
+        self.assertEqual((state['position'], state['failed'], state['done']), (5, ['c2'], False))
+        
+        self.messenger.analyze_commit_details.side_effect = lambda target, details, readme: f"About {details['sha']}"
+        self.messenger.deliver_commit.reset_mock()
+        self.assertEqual(self.make_backfill().run(), {'listed': 0, 'processed': 1, 'failed': 0})
+        self.assertEqual([call.args[1]['sha'] for call in self.messenger.deliver_commit.call_args_list], ['c2'])
+        state = BackfillCheckpoint(self.checkpoint_path).get(backfill.key)
+        self.assertEqual((state['failed'], state['done']), ([], True))
+
+if __name__ == '__main__':
+    unittest.main()
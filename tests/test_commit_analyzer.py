@@ -7,6 +7,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
 from commit_analyzer import CommitAnalyzer
+from commit_classifier import CommitClassifier
 
 class TestCommitAnalyzer(unittest.TestCase):
     """Test cases for the CommitAnalyzer class."""
@@ -83,6 +84,122 @@ class TestCommitAnalyzer(unittest.TestCase):
             self.assertEqual(description, "This is a test description of the commit.")
             mock_run.assert_called_once()
     
+    @patch('langchain.chains.LLMChain.run')
+    def test_analyze_commit_uses_cache(self, mock_run):
+        """Test that a cached description is returned without calling the model."""
+        mock_run.return_value = "Fresh description"
+        cache = MagicMock()
+        cache.make_key.return_value = "key"
+        cache.get.return_value = "Cached description"
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"}):
+            analyzer = CommitAnalyzer(cache=cache)
+            description = analyzer.analyze_commit({'message': 'Test commit'})
+            
+            self.assertEqual(description, "Cached description")
+            mock_run.assert_not_called()
+            
+            cache.get.return_value = None
+            description = analyzer.analyze_commit({'message': 'Test commit'})
+            
+            self.assertEqual(description, "Fresh description")
+            cache.set.assert_called_once_with("key", "Fresh description")
+    
+    @patch('langchain.chains.LLMChain.run')
+    def test_summarize_project(self, mock_run):
+        """Test condensing a README into a project summary."""
+        mock_run.return_value = " A tool that posts commit summaries. "
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"}):
+            analyzer = CommitAnalyzer()
+            
+            self.assertEqual(analyzer.summarize_project("# Project\n\nLong README"), "A tool that posts commit summaries.")
+            self.assertEqual(analyzer.summarize_project("   "), "")
+            mock_run.assert_called_once()
+    
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"})
+    def test_build_chain_input_with_token_budget(self):
+        """Test that large commits are condensed to the prompt token budget."""
+        analyzer = CommitAnalyzer(prompt_token_budget=800)
+        files = [
+            {'filename': f"generated/file_{index}.json", 'status': 'added', 'additions': 100, 'deletions': 0}
+            for index in range(1000)
+        ]
+        
+        chain_input = analyzer.build_chain_input({'message': 'Regenerate fixtures', 'files_changed': files}, "Readme " * 2000)
+        
+        self.assertEqual(chain_input['commit_message'], 'Regenerate fixtures')
+        self.assertLess(len(chain_input['files_changed']), len(analyzer.format_files_changed(files)))
+        self.assertIn("truncated", chain_input['project_description'])
+    
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"})
+    def test_build_chain_input_with_file_count_only(self):
+        """Test that details without a file list still tell the model how many files changed."""
+        analyzer = CommitAnalyzer()
+        chain_input = analyzer.build_chain_input({'message': 'Refactor', 'files_changed': [], 'files_count': 3})
+        self.assertEqual(chain_input['files_changed'], "- 3 file(s), names not available\n")
+    
+    @patch('langchain.chains.LLMChain.run')
+    def test_analyze_commits_batch(self, mock_run):
+        """Test that small commits share one request and large ones are analyzed alone."""
+        mock_run.side_effect = [
+            '```json\n[{"id": 1, "description": "First"}, {"id": 2, "description": "Second"}]\n```',
+            "Large commit description"
+        ]
+        small = {'message': 'Fix typo', 'files_changed': [], 'stats': {}}
+        large = {
+            'message': 'Big change',
+            'files_changed': [
+                {'filename': f"src/module_{index}.py", 'status': 'modified', 'additions': 1, 'deletions': 1}
+                for index in range(200)
+            ],
+            'stats': {}
+        }
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"}):
+            analyzer = CommitAnalyzer(batch_size=5, batch_token_budget=2000)
+            descriptions = analyzer.analyze_commits([small, large, dict(small, message='Bump version')])
+        
+        self.assertEqual(descriptions, ["First", "Large commit description", "Second"])
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertEqual(mock_run.call_args_list[0][0][0]['count'], 2)
+    
+    @patch('langchain.chains.LLMChain.run')
+    def test_analyze_commits_invalid_batch_response(self, mock_run):
+        """Test falling back to individual requests when the batch response cannot be parsed."""
+        mock_run.side_effect = ["Not JSON at all", "One", "Two"]
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"}):
+            analyzer = CommitAnalyzer(batch_size=5)
+            descriptions = analyzer.analyze_commits([{'message': 'a'}, {'message': 'b'}])
+        
+        self.assertEqual(descriptions, ["One", "Two"])
+        self.assertEqual(mock_run.call_count, 3)
+    
+    @patch('langchain.chains.LLMChain.run')
+    def test_analyze_commits_checks_each_commit_once(self, mock_run):
+        """Test that commits falling back to their own request are not classified or looked up again."""
+        mock_run.side_effect = ['[{"id": 1, "description": "First"}]', "Second"]
+        cache = MagicMock()
+        cache.make_key.side_effect = lambda chain_input, model, max_tokens: chain_input['commit_message']
+        cache.get.return_value = None
+        classifier = CommitClassifier()
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"}):
+            analyzer = CommitAnalyzer(batch_size=5, cache=cache, classifier=classifier)
+            descriptions = analyzer.analyze_commits([{'message': 'a'}, {'message': 'b'}])
+        
+        self.assertEqual(descriptions, ["First", "Second"])
+        self.assertEqual(classifier.get_stats()['checked'], 2)
+        self.assertEqual(cache.get.call_count, 2)
+        cache.set.assert_any_call('b', "Second")
+    
+    def test_parse_batch_response(self):
+        """Test parsing structured batch responses."""
+        parsed = CommitAnalyzer.parse_batch_response('Here: [{"id": 2, "description": " B "}, {"id": "x"}, {"id": 1, "description": ""}]')
+        self.assertEqual(parsed, {2: "B"})
+        self.assertEqual(CommitAnalyzer.parse_batch_response("[not json]"), {})
+    
     def test_analyze_commit_empty_details(self):
         """Test analyzing a commit with empty details."""
         with patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"}):
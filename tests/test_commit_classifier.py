@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from commit_classifier import CommitClassifier
+from commit_analyzer import CommitAnalyzer
+
+def make_commit(message, files, additions=1, deletions=1):
+    """Build commit details changing the given files."""
+    return {
+        'sha': 'abc123',
+        'message': message,
+        'files_changed': [
+            {'filename': filename, 'status': 'modified', 'additions': additions, 'deletions': deletions}
+            for filename in files
+        ],
+        'stats': {
+            'additions': additions * len(files),
+            'deletions': deletions * len(files),
+            'total': (additions + deletions) * len(files)
+        }
+    }
+
+class TestCommitClassifier(unittest.TestCase):
+    """Test cases for the CommitClassifier class."""
+    
+    def setUp(self):
+        self.classifier = CommitClassifier()
+    
+    def test_merge_commit(self):
+        """Test that pull request merges are described with their title."""
+        commit = make_commit("Merge pull request #42 from user/feature\n\nAdd login page", ['src/app.py'], 300, 20)
+        description = self.classifier.classify(commit)
+        self.assertIn("Merge pull request #42 from user/feature (Add login page)", description)
+    
+    def test_version_bump(self):
+        """Test that release commits touching only version files are recognized."""
+        commit = make_commit("chore(release): 2.4.0", ['package.json', 'package-lock.json', 'CHANGELOG.md'])
+        self.assertIn("version 2.4.0", self.classifier.classify(commit))
+        
+        # A release commit that also changes code still goes to the model
+        commit = make_commit("chore(release): 2.4.0", ['package.json', 'src/index.js'])
+        self.assertIsNone(self.classifier.classify(commit))
+    
+    def test_lockfile_ci_and_docs(self):
+        """Test the file based rules."""
+        self.assertIn("lock files", self.classifier.classify(make_commit("Update deps", ['poetry.lock'], 200, 180)))
+        self.assertIn("build and test", self.classifier.classify(make_commit("ci: cache pip", ['.github/workflows/test.yml'])))
+        self.assertIn("README.md", self.classifier.classify(make_commit("docs: fix typo", ['README.md'])))
+        
+        # Large documentation rewrites are worth a real description
+        self.assertIsNone(self.classifier.classify(make_commit("docs: rewrite guide", ['docs/guide.md'], 200, 150)))
+    
+    def test_text_files(self):
+        """Test that only documentation text files are treated as documentation."""
+        self.assertIsNotNone(self.classifier.classify(make_commit("Update license year", ['LICENSE.txt'])))
+        self.assertIsNotNone(self.classifier.classify(make_commit("Fix typo", ['docs/install.txt'])))
+        self.assertIsNone(self.classifier.classify(make_commit("Bump requests", ['requirements.txt'])))
+        self.assertIsNone(self.classifier.classify(make_commit("Bump pytest", ['requirements-dev.txt'])))
+        self.assertIsNone(self.classifier.classify(make_commit("Pin sphinx", ['docs/requirements.txt'])))
+        self.assertIsNone(self.classifier.classify(make_commit("Link zlib", ['CMakeLists.txt'])))
+        self.assertIsNone(self.classifier.classify(make_commit("Add notes", ['data/words.txt'])))
+    
+    def test_substantive_commit(self):
+        """Test that ordinary commits are left to the model."""
+        self.assertIsNone(self.classifier.classify(make_commit("feat: add export", ['src/export.py', 'README.md'])))
+    
+    def test_rules_and_stats(self):
+        """Test rule selection from the configuration and the counters."""
+        classifier = CommitClassifier.from_config({'classifier': {'rules': ['docs']}})
+        self.assertIsNone(classifier.classify(make_commit("Update deps", ['yarn.lock'])))
+        self.assertIsNotNone(classifier.classify(make_commit("Fix typo", ['README.md'])))
+        self.assertEqual(classifier.get_stats(), {'checked': 2, 'skipped': 1, 'rules': {'docs': 1}})
+        self.assertEqual(classifier.get_file_rules(), ['docs'])
+        self.assertEqual(CommitClassifier(rules=['merge']).get_file_rules(), [])
+        
+        self.assertIsNone(CommitClassifier.from_config({'classifier': {'enabled': False}}))
+        with self.assertRaises(ValueError):
+            CommitClassifier(rules=['typos'])
+    
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"})
+    def test_analyzer_skips_model(self):
+        """Test that trivial commits never reach the backend, also in batches."""
+        backend = MagicMock()
+        backend.complete.return_value = '[{"id": 1, "description": "One"}, {"id": 2, "description": "Two"}]'
+        analyzer = CommitAnalyzer(backend=backend, classifier=self.classifier, batch_size=5)
+        
+        self.assertIn("lock files", analyzer.analyze_commit(make_commit("Update deps", ['yarn.lock'])))
+        backend.complete.assert_not_called()
+        
+        descriptions = analyzer.analyze_commits([
+            make_commit("feat: add export", ['src/export.py']),
+            make_commit("Fix typo", ['README.md']),
+            make_commit("fix: handle empty input", ['src/parse.py'])
+        ])
+        self.assertEqual(descriptions[0], "One")
+        self.assertIn("documentation", descriptions[1])
+        self.assertEqual(descriptions[2], "Two")
+        self.assertEqual(backend.complete.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from commit_ledger import CommitLedger, STATUS_ANALYZED, STATUS_FAILED, STATUS_QUEUED
+
+class TestCommitLedger(unittest.TestCase):
+    """Test cases for the CommitLedger class."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'ledger.db')
+        self.ledger = CommitLedger(path=self.path)
+    
+    def tearDown(self):
+        self.ledger.close()
+        self.temp_dir.cleanup()
+    
+    def test_lazy_connection(self):
+        """Test that the database is not opened until first use."""
+        self.assertIsNone(self.ledger.connection)
+        self.assertFalse(os.path.exists(self.path))
+        self.ledger.is_delivered("user/repo", "main", "abc123")
+        self.assertIsNotNone(self.ledger.connection)
+    
+    def test_record_analysis(self):
+        """Test recording an analysis result."""
+        self.ledger.record_analysis("user/repo", "main", "abc123", "A description")
+        entry = self.ledger.get_entry("user/repo", "main", "abc123")
+        
+        self.assertEqual(entry['description'], "A description")
+        self.assertEqual(entry['status'], STATUS_ANALYZED)
+        self.assertFalse(self.ledger.is_delivered("user/repo", "main", "abc123"))
+    
+    def test_record_delivery_keeps_description(self):
+        """Test that recording delivery keeps the stored description."""
+        self.ledger.record_analysis("user/repo", "main", "abc123", "A description")
+        self.ledger.record_delivery("user/repo", "main", "abc123", True)
+        
+        entry = self.ledger.get_entry("user/repo", "main", "abc123")
+        self.assertEqual(entry['description'], "A description")
+        self.assertTrue(self.ledger.is_delivered("user/repo", "main", "abc123"))
+    
+    def test_queued_counts_as_delivered(self):
+        """Test that a commit handed to the outbox is not processed again after a restart."""
+        self.ledger.record_queued("user/repo", "main", "abc123")
+        self.ledger.close()
+        
+        reopened = CommitLedger(path=self.path)
+        self.assertTrue(reopened.is_delivered("user/repo", "main", "abc123"))
+        self.assertEqual(reopened.get_entry("user/repo", "main", "abc123")['status'], STATUS_QUEUED)
+        reopened.close()
+    
+    def test_failed_delivery(self):
+        """Test that a failed delivery is not treated as delivered."""
+        self.ledger.record_delivery("user/repo", "main", "abc123", False)
+        
+        entry = self.ledger.get_entry("user/repo", "main", "abc123")
+        self.assertEqual(entry['status'], STATUS_FAILED)
+        self.assertFalse(self.ledger.is_delivered("user/repo", "main", "abc123"))
+    
+    def test_given_up_queued_message(self):
+        """Test that a queued commit whose message was given up is pending again."""
+        self.ledger.record_queued("user/repo", "main", "abc123")
+        self.assertTrue(self.ledger.is_delivered("user/repo", "main", "abc123"))
+        self.assertFalse(self.ledger.is_sent("user/repo", "main", "abc123"))
+        
+        self.ledger.record_delivery("user/repo", "main", "abc123", False)
+        self.assertFalse(self.ledger.is_delivered("user/repo", "main", "abc123"))
+    
+    def test_keyed_by_repository_and_branch(self):
+        """Test that the same SHA on another branch or repository is tracked separately."""
+        self.ledger.record_delivery("user/repo", "main", "abc123", True)
+        
+        self.assertFalse(self.ledger.is_delivered("user/repo", "dev", "abc123"))
+        self.assertFalse(self.ledger.is_delivered("user/other", "main", "abc123"))
+    
+    def test_destinations(self):
+        """Test that deliveries are tracked per destination."""
+        self.assertEqual(self.ledger.get_destinations("user/repo", "main", "abc123"), set())
+        self.ledger.record_destination("user/repo", "main", "abc123", "@engineering")
+        self.ledger.record_destination("user/repo", "main", "abc123", "@engineering")
+        self.ledger.record_destination("user/repo", "main", "abc123", "@exec")
+        
+        self.assertEqual(self.ledger.get_destinations("user/repo", "main", "abc123"), {"@engineering", "@exec"})
+        self.assertEqual(self.ledger.get_destinations("user/repo", "dev", "abc123"), set())
+    
+    def test_persists_across_instances(self):
+        """Test that entries survive reopening the ledger."""
+        self.ledger.record_delivery("user/repo", "main", "abc123", True)
+        self.ledger.close()
+        
+        reopened = CommitLedger(path=self.path)
+        try:
+            self.assertTrue(reopened.is_delivered("user/repo", "main", "abc123"))
+        finally:
+            reopened.close()
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
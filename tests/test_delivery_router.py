@@ -0,0 +1,85 @@
+import unittest
+import asyncio
+import threading
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from delivery_router import DeliveryRouter, load_destinations
+from targets import load_targets
+
+COMMIT = {
+    'sha': 'abc1234def',
+    'message': 'Add export endpoint\n\nLonger explanation',
+    'author': {'name': 'Dev', 'email': 'dev@example.com'},
+    'files_changed': [{'filename': 'api/export.py'}, {'filename': 'docs/export.md'}],
+    'stats': {'additions': 40, 'deletions': 2, 'total': 42},
+    'html_url': 'https://github.com/user/repo/commit/abc1234def'
+}
+
+class TestDeliveryRouter(unittest.TestCase):
+    """Test cases for the DeliveryRouter class."""
+    
+    def setUp(self):
+        self.router = DeliveryRouter(lambda project, details, description: f"full:{project}:{description}")
+        self.target = {'destinations': load_destinations({'destinations': [
+            {'channel_id': '@engineering'},
+            {'name': 'exec', 'channel_id': '@exec', 'template': 'brief', 'paths': ['api/*']},
+            {'channel_id': '@web', 'paths': ['web/*']},
+            {'channel_id': '@docs', 'exclude_paths': ['api/*'], 'exclude_authors': ['bot@example.com']},
+            {'channel_id': '@team', 'authors': ['someone']}
+        ]}, {}, None)}
+    
+    def test_default_destination(self):
+        """Test that a target without destinations sends the full message to its channel."""
+        targets = load_targets({'github': {'repository': 'user/repo'}, 'telegram': {'channel_id': '@channel'}})
+        self.assertEqual([(d['name'], d['channel_id'], d['template']) for d in targets[0]['destinations']],
+                         [('@channel', '@channel', 'full')])
+        
+        with self.assertRaises(ValueError):
+            load_destinations({'destinations': [{'channel_id': '@x', 'template': 'fancy'}]}, {}, None)
+    
+    def test_route_filters(self):
+        """Test path and author filters."""
+        names = [destination['name'] for destination in self.router.route(self.target, COMMIT)]
+        self.assertEqual(names, ['@engineering', 'exec', '@docs'])
+        
+        names = [destination['name'] for destination in self.router.route(self.target, COMMIT, skip={'exec'})]
+        self.assertEqual(names, ['@engineering', '@docs'])
+        
+        bot_commit = dict(COMMIT, author={'name': 'Bot', 'email': 'bot@example.com'})
+        self.assertNotIn('@docs', [d['name'] for d in self.router.route(self.target, bot_commit)])
+    
+    def test_render(self):
+        """Test named, custom and default templates."""
+        engineering, executive = self.target['destinations'][:2]
+        self.assertEqual(self.router.render(engineering, "Repo", COMMIT, "Desc"), "full:Repo:Desc")
+        
+        message = self.router.render(executive, "Repo", COMMIT, "Short summary.\n\nMore detail.")
+        self.assertEqual(message, "*Repo*: Add export endpoint\n\nShort summary.\n\n[View on GitHub](" + COMMIT['html_url'] + ")")
+        
+        custom = dict(engineering, template="{short_sha} by {author}: {unknown}")
+        self.assertEqual(self.router.render(custom, "Repo", COMMIT, "Desc"), "abc1234 by Dev: {unknown}")
+    
+    def test_fan_out_runs_concurrently(self):
+        """Test that sends overlap and that failures do not stop the others."""
+        barrier = threading.Barrier(3, timeout=5)
+        
+        def send(item):
+            barrier.wait()
+            if item == 'b':
+                raise RuntimeError("boom")
+            return True
+        
+        self.assertEqual(self.router.fan_out(['a', 'b', 'c'], send), [True, False, True])
+        
+        async def asend(item):
+            await asyncio.sleep(0)
+            return item != 'b'
+        
+        self.assertEqual(asyncio.run(self.router.afan_out(['a', 'b', 'c'], asend)), [True, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import asyncio
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from git_mirror_client import GitMirrorClient
+from patch_selector import PatchSelector
+from async_messenger import AsyncGitMirrorClient
+
+@unittest.skipUnless(shutil.which('git'), "git is not installed")
+class TestGitMirrorClient(unittest.TestCase):
+    """Test cases for the GitMirrorClient class."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.origin = os.path.join(self.temp_dir.name, 'origin')
+        self.mirror = os.path.join(self.temp_dir.name, 'mirrors', 'user', 'repo.git')
+        
+        self.run_git('init', '--quiet', '--initial-branch=main', self.origin)
+        self.commit({'README.md': "# Repo\n", 'app.py': "a = 1\nb = 2\n"}, "Initial commit")
+        self.commit({'app.py': "a = 1\nb = 3\nc = 4\n", 'logo.png': b"\x89PNG\x00\x01"}, "Change app\n\nLonger body")
+        
+        self.client = GitMirrorClient.from_target(
+            {'repository': 'user/repo', 'mirror_url': self.origin, 'commit_url': "https://git.example.com/{repository}/commit/{sha}"},
+            {'git_mirror': {'root': os.path.join(self.temp_dir.name, 'mirrors'), 'fetch_interval_seconds': 0}}
+        )
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def run_git(self, *args):
+        env = dict(os.environ, GIT_AUTHOR_NAME="Dev", GIT_AUTHOR_EMAIL="dev@example.com",
+                   GIT_COMMITTER_NAME="Dev", GIT_COMMITTER_EMAIL="dev@example.com")
+        return subprocess.run(['git', *args], capture_output=True, check=True, env=env).stdout.decode().strip()
+    
+    def commit(self, files, message):
+        for name, content in files.items():
+            mode = 'wb' if isinstance(content, bytes) else 'w'
+            with open(os.path.join(self.origin, name), mode) as file:
+                file.write(content)
+        self.run_git('-C', self.origin, 'add', '--all')
+        self.run_git('-C', self.origin, 'commit', '--quiet', '-m', message)
+        return self.run_git('-C', self.origin, 'rev-parse', 'HEAD')
+    
+    def test_clone_and_incremental_fetch(self):
+        """Test that the mirror is cloned on first use and later fetches pick up new commits."""
+        commits = self.client.get_latest_commits(branch="main", limit=5)
+        self.assertTrue(os.path.isdir(self.mirror))
+        self.assertEqual(len(commits), 2)
+        
+        newest = self.commit({'app.py': "a = 2\n"}, "Third")
+        self.assertEqual([c.sha for c in self.client.get_latest_commits("main", 5, since=commits[0].sha)], [newest])
+        self.assertEqual(self.client.get_head_sha("main"), newest)
+        self.assertEqual(self.client.get_commit(newest[:10]).sha, newest)
+        self.assertIsNone(self.client.get_commit("0" * 40))
+        
+        self.assertEqual([c.sha for c in self.client.iter_commits("main", base=commits[0].sha)], [newest])
+        self.assertEqual([c.sha for c in self.client.iter_commits("main", reverse=True)], [commits[1].sha, commits[0].sha, newest])
+        self.assertEqual([c.sha for c in self.client.iter_commits("main", reverse=True, limit=2)], [commits[0].sha, newest])
+        
+        readme = self.client.get_readme()
+        self.assertEqual(readme['content'], "# Repo\n")
+        self.assertEqual(readme['sha'], self.run_git('-C', self.origin, 'rev-parse', 'HEAD:README.md'))
+    
+    def test_commit_details(self):
+        """Test that details have the same shape as those read from the GitHub API."""
+        commit = self.client.get_latest_commits("main", 1)[0]
+        details = self.client.get_commit_details(commit)
+        
+        self.assertEqual(details['sha'], commit.sha)
+        self.assertEqual(details['message'], "Change app\n\nLonger body")
+        self.assertEqual((details['author']['name'], details['author']['email']), ("Dev", "dev@example.com"))
+        self.assertEqual(details['html_url'], f"https://git.example.com/user/repo/commit/{commit.sha}")
+        self.assertEqual(details['files_changed'], [
+            {'filename': 'app.py', 'additions': 2, 'deletions': 1, 'changes': 3, 'status': 'modified'},
+            {'filename': 'logo.png', 'additions': 0, 'deletions': 0, 'changes': 0, 'status': 'added'}
+        ])
+        self.assertEqual(details['stats'], {'additions': 2, 'deletions': 1, 'total': 3})
+        
+        self.client.patch_selector = PatchSelector()
+        files = self.client.get_commit_details(commit)['files_changed']
+        self.assertTrue(files[0]['patch'].startswith("@@ -1,2 +1,3 @@"))
+        self.assertNotIn('patch', files[1])
+        
+        async_client = AsyncGitMirrorClient(self.client)
+        commits = asyncio.run(async_client.get_latest_commits("main", 2))
+        self.assertEqual(asyncio.run(async_client.get_commit_details(commits[1]))['message'], "Initial commit")
+    
+    def test_large_diff_is_read_up_to_the_limits(self):
+        """Test that only the selectable files of a large commit are read, each up to the read limit."""
+        sha = self.commit({
+            'big.py': "".join(f"value_{index} = {index}\n" for index in range(5000)),
+            'yarn.lock': "".join(f"package-{index}@1.0.0\n" for index in range(5000))
+        }, "Add generated data")
+        self.client.sync(force=True)
+        
+        patches = self.client.read_patches(sha, {'big.py'}, 300)
+        self.assertEqual(list(patches), ['big.py'])
+        self.assertTrue(patches['big.py'].startswith("@@ -0,0 +1,5000 @@"))
+        self.assertLessEqual(len(patches['big.py']), 300)
+        
+        self.client.patch_selector = PatchSelector(max_file_chars=500, max_commit_chars=1000)
+        files = self.client.get_commit_details(self.client.get_commit(sha))['files_changed']
+        patches = {file['filename']: file.get('patch') for file in files}
+        self.assertLessEqual(len(patches['big.py']), 500)
+        self.assertIsNone(patches['yarn.lock'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,14 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import sys
+import time
+from datetime import datetime, timezone, timedelta
 
 # Add the src directory to the path so we can import the modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from github_client import GitHubClient
+from github_client import GitHubClient, CommitSummary
+from github_requests import GitHubRequestLayer
 
 class TestGitHubClient(unittest.TestCase):
     """Test cases for the GitHubClient class."""
@@ -88,6 +91,118 @@ class TestGitHubClient(unittest.TestCase):
         self.assertEqual(len(commits), 2)
         mock_get_commits.assert_called_once_with(sha="main")
     
+    def test_get_latest_commits_stops_paging_at_limit(self):
+        """Test that commits are consumed lazily up to the limit."""
+        consumed = []
+        
+        def history():
+            for i in range(1000):
+                commit = MagicMock()
+                commit.sha = f"{i:040x}"
+                consumed.append(commit)
+                yield commit
+        
+        client = GitHubClient(token="fake_token")
+        client.repository = MagicMock()
+        client.list_commits = MagicMock(return_value=history())
+        
+        commits = client.get_latest_commits(branch="main", limit=5)
+        self.assertEqual(len(commits), 5)
+        self.assertEqual(len(consumed), 5)
+        client.list_commits.assert_called_once_with("main", 5, since=None)
+    
+    @patch('github.PaginatedList.PaginatedList')
+    def test_list_commits_sets_page_size_per_request(self, mock_paginated_list):
+        """Test that the page size goes with the request instead of the shared PyGithub instance."""
+        client = GitHubClient(token="fake_token")
+        client.repository = MagicMock()
+        client.repository.url = "https://api.github.com/repos/user/repo"
+        per_page = client.github.per_page
+        
+        client.list_commits("main", 5, since=datetime(2024, 1, 1, 2, tzinfo=timezone(timedelta(hours=2))))
+        args = mock_paginated_list.call_args[0]
+        self.assertEqual(args[1:], (
+            client.repository._requester, "https://api.github.com/repos/user/repo/commits",
+            {'sha': "main", 'per_page': 5, 'since': "2024-01-01T00:00:00Z"}
+        ))
+        self.assertEqual(client.github.per_page, per_page)
+    
+    def test_get_latest_commits_since_sha(self):
+        """Test that fetching stops at the given since SHA."""
+        mock_commits = []
+        for sha in ["c" * 40, "b" * 40, "a" * 40]:
+            commit = MagicMock()
+            commit.sha = sha
+            mock_commits.append(commit)
+        
+        client = GitHubClient(token="fake_token")
+        client.repository = MagicMock()
+        client.list_commits = MagicMock(return_value=iter(mock_commits))
+        
+        commits = client.get_latest_commits(branch="main", limit=5, since="b" * 7)
+        self.assertEqual([c.sha for c in commits], ["c" * 40])
+        client.list_commits.assert_called_once_with("main", 5, since=None)
+    
+    def test_get_latest_commits_since_timestamp(self):
+        """Test that a since timestamp is passed through to the API."""
+        client = GitHubClient(token="fake_token")
+        client.repository = MagicMock()
+        client.list_commits = MagicMock(return_value=iter([]))
+        
+        client.get_latest_commits(branch="dev", limit=3, since="2024-01-01T00:00:00Z")
+        args, kwargs = client.list_commits.call_args
+        self.assertEqual(args, ("dev", 3))
+        self.assertEqual(kwargs['since'].year, 2024)
+    
+    def test_get_latest_commits_with_request_layer(self):
+        """Test fetching commits and details through the request layer."""
+        layer = MagicMock()
+        layer.get.side_effect = [
+            ([{'sha': "c" * 40}, {'sha': "b" * 40}], {}),
+            ({'sha': "c" * 40, 'commit': {'message': 'Test commit'}, 'files': [], 'stats': {'total': 3}}, {})
+        ]
+        
+        client = GitHubClient(token="fake_token", request_layer=layer)
+        client.repository = MagicMock()
+        client.repository_name = "user/repo"
+        
+        commits = client.get_latest_commits(branch="main", limit=5, since="b" * 40)
+        self.assertEqual([c.sha for c in commits], ["c" * 40])
+        
+        details = client.get_commit_details(commits[0])
+        self.assertEqual(details['message'], "Test commit")
+        self.assertEqual(details['stats']['total'], 3)
+        layer.get.assert_called_with("/repos/user/repo/commits/" + "c" * 40, target="user/repo")
+    
+    def test_iter_commits_pages_lazily(self):
+        """Test that history pages are requested only as the iterator is consumed."""
+        layer = MagicMock()
+        layer.get.side_effect = [
+            ([{'sha': "e" * 40}, {'sha': "d" * 40}], {'next': {'url': "https://api.github.com/next"}}),
+            ([{'sha': "c" * 40}, {'sha': "b" * 40}], {})
+        ]
+        
+        client = GitHubClient(token="fake_token", request_layer=layer)
+        client.repository = MagicMock()
+        client.repository_name = "user/repo"
+        
+        commits = client.iter_commits("release/3.x", base="b" * 7)
+        self.assertEqual(next(commits).sha, "e" * 40)
+        self.assertEqual(layer.get.call_count, 1)
+        self.assertEqual(layer.get.call_args[1]['params'], {'sha': "release/3.x", 'per_page': 100})
+        
+        self.assertEqual([commit.sha for commit in commits], ["d" * 40, "c" * 40])
+        layer.get.assert_called_with("https://api.github.com/next", params=None, target="user/repo")
+        
+        layer.get.side_effect = [([{'sha': "e" * 40}], {'next': {'url': "https://api.github.com/next"}}), ([{'sha': "d" * 40}], {})]
+        self.assertEqual([commit.sha for commit in client.iter_commits("main", reverse=True)], ["d" * 40, "e" * 40])
+        
+        # The newest commits are picked before reversing, and pages past the limit are never requested
+        layer.get.reset_mock()
+        layer.get.side_effect = [([{'sha': "e" * 40}, {'sha': "d" * 40}], {'next': {'url': "https://api.github.com/next"}})]
+        self.assertEqual([commit.sha for commit in client.iter_commits("main", reverse=True, limit=2)], ["d" * 40, "e" * 40])
+        self.assertEqual(layer.get.call_count, 1)
+    
     def test_get_commit_details(self):
         """Test extracting commit details."""
         mock_commit = MagicMock()
@@ -121,6 +236,70 @@ class TestGitHubClient(unittest.TestCase):
         self.assertEqual(details['stats']['additions'], 10)
         self.assertEqual(details['stats']['deletions'], 5)
         self.assertEqual(details['stats']['total'], 15)
+    
+    def test_get_commit_details_batch_against_rest(self):
+        """Benchmark batched GraphQL details against one REST request per commit."""
+        shas = [f"{index:040x}" for index in range(120)]
+        
+        def respond(body):
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = {}
+            response.links = {}
+            response.json.return_value = body
+            time.sleep(0.002)
+            return response
+        
+        def rest(url, params=None, headers=None):
+            sha = url.rsplit('/', 1)[1]
+            return respond({
+                'sha': sha, 'html_url': f"https://github.com/user/repo/commit/{sha}",
+                'commit': {'message': 'Fix bug', 'author': {'name': 'Dev', 'email': 'dev@example.com', 'date': '2024-01-01'}},
+                'stats': {'additions': 3, 'deletions': 1, 'total': 4},
+                'files': [{'filename': 'a.py', 'additions': 2, 'deletions': 1, 'changes': 3, 'status': 'modified'},
+                          {'filename': 'b.py', 'additions': 1, 'deletions': 0, 'changes': 1, 'status': 'modified'}]
+            })
+        
+        def graphql(url, json=None, headers=None):
+            return respond({'data': {'repository': {
+                alias: {
+                    'oid': sha, 'message': 'Fix bug', 'url': f"https://github.com/user/repo/commit/{sha}",
+                    'additions': 3, 'deletions': 1, 'changedFilesIfAvailable': 2,
+                    'author': {'name': 'Dev', 'email': 'dev@example.com', 'date': '2024-01-01'}
+                }
+                for alias, sha in json['variables'].items() if alias.startswith('c')
+            }}})
+        
+        session = MagicMock()
+        session.get.side_effect = rest
+        session.post.side_effect = graphql
+        commits = [CommitSummary({'sha': sha}) for sha in shas]
+        
+        timings = {}
+        results = {}
+        for source in ('rest', 'graphql'):
+            client = GitHubClient(token="fake_token", request_layer=GitHubRequestLayer(token="fake_token", session=session),
+                                  details_source=source)
+            client.repository_name = "user/repo"
+            
+            started = time.perf_counter()
+            prefetched = client.get_commit_details_batch(commits)
+            results[source] = [prefetched.get(commit.sha) or client.get_commit_details(commit) for commit in commits]
+            timings[source] = time.perf_counter() - started
+        
+        self.assertEqual(session.get.call_count, 120)
+        self.assertEqual(session.post.call_count, 3)
+        self.assertLess(timings['graphql'], timings['rest'])
+        
+        rest_details, graphql_details = results['rest'][0], results['graphql'][0]
+        self.assertEqual(set(graphql_details) - {'files_count'}, set(rest_details))
+        for key in ('sha', 'message', 'author', 'stats', 'html_url'):
+            self.assertEqual(graphql_details[key], rest_details[key])
+        self.assertEqual(graphql_details['files_count'], len(rest_details['files_changed']))
+        
+        # REST stays in use where diffs are wanted
+        client.patch_selector = MagicMock()
+        self.assertEqual(client.get_commit_details_batch(commits), {})
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
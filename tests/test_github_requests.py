@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import time
+import requests
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from github_requests import GitHubRequestLayer
+
+def make_response(status_code=200, body=None, headers=None, links=None):
+    """Build a fake requests response."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = body
+    response.links = links or {}
+    return response
+
+class TestGitHubRequestLayer(unittest.TestCase):
+    """Test cases for the GitHubRequestLayer class."""
+    
+    def setUp(self):
+        self.session = MagicMock()
+        self.layer = GitHubRequestLayer(token="fake_token", session=self.session)
+    
+    @patch.dict(os.environ, {}, clear=True)
+    def test_init_without_token(self):
+        """Test initialization without a token raises ValueError."""
+        with self.assertRaises(ValueError):
+            GitHubRequestLayer()
+    
+    def test_conditional_request_uses_cache(self):
+        """Test that an ETag is sent back and a 304 returns the cached body."""
+        self.session.get.side_effect = [
+            make_response(200, [{'sha': 'abc'}], {'ETag': '"v1"', 'X-RateLimit-Remaining': '4999'}),
+            make_response(304, None, {'X-RateLimit-Remaining': '4999'})
+        ]
+        
+        first, _ = self.layer.get("/repos/user/repo/commits", params={'sha': 'main'}, target="user/repo")
+        second, _ = self.layer.get("/repos/user/repo/commits", params={'sha': 'main'}, target="user/repo")
+        
+        self.assertEqual(first, second)
+        _, kwargs = self.session.get.call_args
+        self.assertEqual(kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(self.layer.get_budget_usage()['targets']['user/repo'], {'requests': 1, 'cache_hits': 1})
+    
+    def test_get_recent_shas(self):
+        """Test that one page of commit SHAs is listed."""
+        self.session.get.return_value = make_response(200, [{'sha': 'abc'}, {'sha': 'def'}])
+        
+        self.assertEqual(self.layer.get_recent_shas("user/repo", "main", 5), ['abc', 'def'])
+        args, kwargs = self.session.get.call_args
+        self.assertEqual(args[0], "https://api.github.com/repos/user/repo/commits")
+        self.assertEqual(kwargs['params'], {'sha': 'main', 'per_page': 5})
+    
+    def test_rate_limit_state(self):
+        """Test that the rate limit headers are recorded."""
+        self.session.get.return_value = make_response(200, {}, {
+            'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': '1700000000'
+        })
+        
+        self.layer.get("/rate")
+        budget = self.layer.get_budget_usage()
+        
+        self.assertEqual(budget['limit'], 5000)
+        self.assertEqual(budget['remaining'], 4000)
+        self.assertEqual(budget['reset_at'], 1700000000)
+    
+    def test_wait_seconds(self):
+        """Test pacing below the quota reserve."""
+        self.layer.remaining = 1000
+        self.layer.reset_at = time.time() + 100
+        self.assertEqual(self.layer.get_wait_seconds(), 0.0)
+        
+        self.layer.remaining = 10
+        self.assertAlmostEqual(self.layer.get_wait_seconds(), 10, delta=1)
+    
+    def test_retry_after(self):
+        """Test reading Retry-After as seconds, as an HTTP date and as garbage."""
+        self.assertEqual(self.layer.get_retry_after(429, {'Retry-After': '30'}), 30)
+        self.assertEqual(self.layer.get_retry_after(403, {'Retry-After': '99999'}), 900)
+        self.assertIsNone(self.layer.get_retry_after(500, {'Retry-After': '30'}))
+        self.assertIsNone(self.layer.get_retry_after(403, {}))
+        
+        with patch('github_requests.time.time', return_value=1704067200):
+            self.assertEqual(self.layer.get_retry_after(429, {'Retry-After': 'Mon, 01 Jan 2024 00:00:45 GMT'}), 45)
+            self.assertEqual(self.layer.get_retry_after(429, {'Retry-After': 'Sun, 31 Dec 2023 23:00:00 GMT'}), 0)
+        
+        self.assertEqual(self.layer.get_retry_after(429, {'Retry-After': 'soon'}), 60)
+        self.assertEqual(self.layer.get_retry_after(429, {'Retry-After': ''}), 60)
+    
+    @patch('github_requests.time.sleep')
+    def test_exhausted_quota_serves_cache(self, mock_sleep):
+        """Test that a cached response is served without a request when the quota is exhausted."""
+        self.session.get.return_value = make_response(200, {'content': 'cached'}, {'ETag': '"v1"'})
+        self.layer.get("/repos/user/repo/readme")
+        
+        self.layer.remaining = 0
+        self.layer.reset_at = time.time() + 600
+        body, _ = self.layer.get("/repos/user/repo/readme")
+        
+        self.assertEqual(body, {'content': 'cached'})
+        self.assertEqual(self.session.get.call_count, 1)
+        mock_sleep.assert_not_called()
+    
+    def test_graphql(self):
+        """Test that queries are posted and their own point budget is recorded."""
+        self.session.post.side_effect = [
+            make_response(200, {'data': {'viewer': {'login': 'dev'}}}, {'X-RateLimit-Remaining': '4990'}),
+            make_response(200, {'errors': [{'message': 'Bad query'}]})
+        ]
+        
+        self.assertEqual(self.layer.graphql("{ viewer { login } }", target='user/repo'), {'viewer': {'login': 'dev'}})
+        self.assertEqual(self.session.post.call_args[0][0], "https://api.github.com/graphql")
+        self.assertEqual(self.layer.get_budget_usage()['graphql_remaining'], 4990)
+        self.assertIsNone(self.layer.get_budget_usage()['remaining'])
+        
+        with self.assertRaises(requests.RequestException):
+            self.layer.graphql("{ nope }")
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
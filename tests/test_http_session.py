@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import openai
+import requests
+from http_session import HttpSessionPool, TimeoutHTTPAdapter
+
+class TestHttpSessionPool(unittest.TestCase):
+    """Test cases for the HttpSessionPool class."""
+    
+    def setUp(self):
+        self.pool = HttpSessionPool.from_config({'http': {'pool_size': 7, 'connect_timeout': 2, 'read_timeout': 9}})
+    
+    def tearDown(self):
+        self.pool.close()
+    
+    def test_from_config_defaults(self):
+        """Test default settings when the http section is missing."""
+        pool = HttpSessionPool.from_config({})
+        self.assertEqual(pool.pool_size, 10)
+        self.assertEqual(pool.github_options(), {'pool_size': 10, 'timeout': 30})
+    
+    def test_session_is_shared_and_pooled(self):
+        """Test that one session with sized pools and default timeouts is reused."""
+        session = self.pool.get_session()
+        self.assertIs(self.pool.get_session(), session)
+        
+        adapter = session.get_adapter('https://api.github.com')
+        self.assertIsInstance(adapter, TimeoutHTTPAdapter)
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter.timeout, (2, 9))
+    
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_default_timeout_applied(self, mock_send):
+        """Test that requests without a timeout get the configured one."""
+        response = requests.Response()
+        response.status_code = 200
+        mock_send.return_value = response
+        
+        self.pool.get_session().get('https://api.telegram.org')
+        self.assertEqual(mock_send.call_args[1]['timeout'], (2, 9))
+        
+        self.pool.get_session().get('https://api.telegram.org', timeout=1)
+        self.assertEqual(mock_send.call_args[1]['timeout'], 1)
+    
+    def test_telegram_request(self):
+        """Test that the Telegram bot gets a connection pool of the configured size."""
+        request = self.pool.telegram_request()
+        self.assertEqual(request._con_pool_size, 7)
+    
+    def test_configure_openai(self):
+        """Test routing OpenAI requests through the shared session."""
+        previous = openai.requestssession
+        try:
+            self.assertEqual(self.pool.configure_openai(), (2, 9))
+            self.assertIs(openai.requestssession, self.pool.get_session())
+        finally:
+            openai.requestssession = previous
+
+if __name__ == '__main__':
+    unittest.main()
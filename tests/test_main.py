@@ -0,0 +1,227 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import time
+import tempfile
+import threading
+import yaml
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import main
+from main import SmartCommitMessenger
+from commit_analyzer import ANALYSIS_FAILED_MESSAGE
+
+def make_commit(sha):
+    """Create a fake commit object with the given SHA."""
+    commit = MagicMock()
+    commit.sha = sha
+    return commit
+
+def make_details(sha):
+    """Create the details of a fake commit with the given SHA."""
+    return {
+        'sha': sha,
+        'message': f"Change {sha}",
+        'author': {'name': 'Test User', 'email': 'test@example.com', 'date': '2024-01-01T00:00:00+00:00'},
+        'files_changed': [{'filename': 'src/app.py', 'status': 'modified', 'additions': 1, 'deletions': 0}],
+        'stats': {'additions': 1, 'deletions': 0, 'total': 1},
+        'html_url': f"https://github.com/user/repo/commit/{sha}"
+    }
+
+class TestSmartCommitMessenger(unittest.TestCase):
+    """Test cases for the SmartCommitMessenger processing runs."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = {
+            'github': {'repository': 'user/repo', 'branch': 'main', 'commit_limit': 5},
+            'telegram': {'channel_id': '@channel'},
+            'readme': {'cache_path': os.path.join(self.temp_dir.name, 'readme_cache.json'), 'summarize': False},
+            'storage': {'ledger_path': os.path.join(self.temp_dir.name, 'ledger.db')},
+            'cache': {'enabled': False}
+        }
+        
+        env = patch.dict(os.environ, {'GITHUB_TOKEN': 'fake_token', 'OPENAI_API_KEY': 'fake_key'})
+        env.start()
+        self.addCleanup(env.stop)
+        
+        for name in ('main.TelegramSender', 'main.GitHubClient', 'messenger_base.create_backend'):
+            patcher = patch(name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def make_messenger(self):
+        """Create a messenger with fake GitHub, Telegram and analyzer components."""
+        config_path = os.path.join(self.temp_dir.name, 'config.yaml')
+        with open(config_path, 'w') as file:
+            yaml.safe_dump(self.config, file)
+        
+        messenger = SmartCommitMessenger(config_path=config_path)
+        self.addCleanup(messenger.ledger.close)
+        messenger.github_client.repository_name = 'user/repo'
+        messenger.github_client.get_readme.return_value = None
+        messenger.github_client.get_commit_details_batch.return_value = {}
+        messenger.github_client.get_commit_details.side_effect = lambda commit: make_details(commit.sha)
+        messenger.telegram_sender.format_commit_message.side_effect = (
+            lambda project, details, description, **kwargs: f"{details['sha']}: {description}"
+        )
+        messenger.telegram_sender.send_message.return_value = True
+        messenger.commit_analyzer = MagicMock()
+        messenger.commit_analyzer.batch_size = 1
+        messenger.commit_analyzer.classifier = None
+        messenger.commit_analyzer.get_usage.return_value = {
+            'requests': 0, 'failures': 0, 'prompt_tokens': 0, 'completion_tokens': 0
+        }
+        return messenger
+    
+    def test_graphql_needs_no_file_list(self):
+        """Test that the GraphQL details source is refused where commits need their changed files."""
+        self.config['github']['details_source'] = 'graphql'
+        self.config['classifier'] = {'rules': ['merge']}
+        self.config['telegram']['destinations'] = [{'name': 'backend', 'channel_id': '@backend', 'paths': ['src/*']}]
+        with self.assertRaisesRegex(ValueError, "backend"):
+            self.make_messenger()
+        
+        del self.config['telegram']['destinations']
+        self.config['classifier'] = {'rules': ['merge', 'docs']}
+        with self.assertRaisesRegex(ValueError, "docs"):
+            self.make_messenger()
+        
+        self.config['classifier'] = {'rules': ['merge']}
+        self.make_messenger()
+        self.assertEqual(main.GitHubClient.call_args[1]['details_source'], 'graphql')
+    
+    def test_failed_analysis_is_retried(self):
+        """Test that a failed analysis is neither sent nor recorded as delivered."""
+        messenger = self.make_messenger()
+        target = messenger.targets[0]
+        messenger.commit_analyzer.analyze_commit.return_value = ANALYSIS_FAILED_MESSAGE
+        
+        self.assertTrue(messenger.process_commits(target, [make_commit('abc123')]))
+        messenger.telegram_sender.send_message.assert_not_called()
+        self.assertFalse(messenger.ledger.is_delivered('user/repo', 'main', 'abc123'))
+        self.assertEqual(messenger.last_run_summary['commits']['failed'], 1)
+        
+        messenger.commit_analyzer.analyze_commit.return_value = "A description"
+        self.assertTrue(messenger.process_commits(target, [make_commit('abc123')]))
+        messenger.telegram_sender.send_message.assert_called_once_with("abc123: A description", channel_id='@channel')
+        self.assertTrue(messenger.ledger.is_delivered('user/repo', 'main', 'abc123'))
+    
+    def test_run_summary_counts(self):
+        """Test that streamed analyses count as analyzed and stored descriptions as reused."""
+        self.config['telegram']['streaming'] = True
+        messenger = self.make_messenger()
+        target = messenger.targets[0]
+        stream = messenger.telegram_sender.start_stream.return_value
+        stream.finish.return_value = False
+        messenger.commit_analyzer.analyze_commit.return_value = "A description"
+        
+        self.assertTrue(messenger.process_commits(target, [make_commit('abc123')]))
+        self.assertEqual(messenger.last_run_summary['commits']['analyzed'], 1)
+        self.assertEqual(messenger.last_run_summary['commits']['reused'], 0)
+        self.assertFalse(messenger.ledger.is_delivered('user/repo', 'main', 'abc123'))
+        
+        self.assertTrue(messenger.process_commits(target, [make_commit('abc123')]))
+        messenger.commit_analyzer.analyze_commit.assert_called_once()
+        self.assertEqual(messenger.last_run_summary['commits']['analyzed'], 0)
+        self.assertEqual(messenger.last_run_summary['commits']['reused'], 1)
+        self.assertEqual(messenger.last_run_summary['llm']['commits'], 0)
+        self.assertTrue(messenger.ledger.is_delivered('user/repo', 'main', 'abc123'))
+    
+    def test_outbox_destination_given_up(self):
+        """Test that a commit queued to two destinations is sent again to the one that was given up."""
+        self.config['outbox'] = {'enabled': True, 'path': os.path.join(self.temp_dir.name, 'outbox.db')}
+        self.config['telegram']['destinations'] = [
+            {'name': 'backend', 'channel_id': '@backend'},
+            {'name': 'frontend', 'channel_id': '@frontend'}
+        ]
+        messenger = self.make_messenger()
+        self.addCleanup(messenger.outbox.close)
+        target = messenger.targets[0]
+        messenger.commit_analyzer.analyze_commit.return_value = "A description"
+        messenger.github_client.get_latest_commits.return_value = [make_commit('abc123')]
+        
+        def deliver(order):
+            messages = {message['chat_id']: message for message in messenger.outbox.get_due()}
+            for chat_id, success in order:
+                messenger.record_outbox_delivery(messages[chat_id], success)
+                if success:
+                    messenger.outbox.mark_sent(messages[chat_id]['id'])
+                else:
+                    messenger.outbox.mark_failed(messages[chat_id]['id'], "Chat not found", permanent=True)
+        
+        # One destination sends while the other is still queued
+        self.assertTrue(messenger.process_latest_commits())
+        deliver([('@backend', True)])
+        self.assertFalse(messenger.ledger.is_sent('user/repo', 'main', 'abc123'))
+        messenger.advance_cursor(target, ['abc123'])
+        self.assertNotIn(('user/repo', 'main'), messenger.last_commit_shas)
+        
+        # The other is given up, then a late success never marks the commit delivered
+        deliver([('@frontend', False)])
+        self.assertEqual(messenger.ledger.get_entry('user/repo', 'main', 'abc123')['status'], 'failed')
+        self.assertTrue(messenger.process_latest_commits())
+        self.assertEqual([message['chat_id'] for message in messenger.outbox.get_due()], ['@frontend'])
+        deliver([('@frontend', True)])
+        self.assertTrue(messenger.ledger.is_sent('user/repo', 'main', 'abc123'))
+        
+        # A success after the other destination was given up keeps the commit failed
+        messenger.github_client.get_latest_commits.return_value = [make_commit('def456')]
+        self.assertTrue(messenger.process_latest_commits())
+        deliver([('@frontend', False), ('@backend', True)])
+        self.assertEqual(messenger.ledger.get_entry('user/repo', 'main', 'def456')['status'], 'failed')
+        self.assertEqual(messenger.ledger.get_destinations('user/repo', 'main', 'def456'), {'backend'})
+    
+    def test_cursor_stops_at_failed_commit(self):
+        """Test that the next run lists commits again from the oldest one not delivered."""
+        messenger = self.make_messenger()
+        messenger.commit_analyzer.analyze_commit.side_effect = (
+            lambda details, readme: ANALYSIS_FAILED_MESSAGE if details['sha'] == 'bbb222' else "A description"
+        )
+        messenger.github_client.get_latest_commits.return_value = [
+            make_commit(sha) for sha in ('ccc333', 'bbb222', 'aaa111')
+        ]
+        
+        self.assertTrue(messenger.process_latest_commits())
+        self.assertEqual(messenger.last_commit_shas[('user/repo', 'main')], 'aaa111')
+        
+        messenger.commit_analyzer.analyze_commit.side_effect = lambda details, readme: "A description"
+        messenger.github_client.get_latest_commits.return_value = [make_commit(sha) for sha in ('ccc333', 'bbb222')]
+        self.assertTrue(messenger.process_latest_commits())
+        messenger.github_client.get_latest_commits.assert_called_with(branch='main', limit=5, since='aaa111')
+        self.assertEqual(messenger.last_commit_shas[('user/repo', 'main')], 'ccc333')
+        self.assertEqual(messenger.telegram_sender.send_message.call_count, 3)
+    
+    def test_poll_and_webhook_deliver_once(self):
+        """Test that a commit reached by a polling run and a webhook push at once is sent once."""
+        messenger = self.make_messenger()
+        target = messenger.targets[0]
+        
+        def analyze_commit(details, readme):
+            time.sleep(0.2)
+            return "A description"
+        
+        messenger.commit_analyzer.analyze_commit.side_effect = analyze_commit
+        messenger.github_client.get_latest_commits.return_value = [make_commit('abc123')]
+        messenger.github_client.get_commit.side_effect = make_commit
+        
+        threads = [
+            threading.Thread(target=messenger.process_latest_commits, args=(target,)),
+            threading.Thread(target=messenger.process_commit_shas, args=(target, ['abc123']))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        messenger.commit_analyzer.analyze_commit.assert_called_once()
+        messenger.telegram_sender.send_message.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
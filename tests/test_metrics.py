@@ -0,0 +1,151 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import threading
+import urllib.request
+import urllib.error
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from metrics import Metrics, MetricsServer, get_prices, collect_messenger_metrics, count_run, record_run, bind_context
+from main import SmartCommitMessenger
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for the Metrics registry and server."""
+    
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1))
+    
+    def test_render(self):
+        """Test counters, gauges and histograms in the Prometheus text format."""
+        self.metrics.inc('messages_total', result='sent')
+        self.metrics.inc('messages_total', 2, result='sent')
+        self.metrics.set('github_quota_remaining', 4200, api='rest')
+        self.metrics.observe('stage_duration_seconds', 0.5, stage='analyze')
+        self.metrics.observe('stage_duration_seconds', 3, stage='analyze')
+        
+        text = self.metrics.render()
+        self.assertIn("# TYPE smart_commit_messages_total counter\n", text)
+        self.assertIn('smart_commit_messages_total{result="sent"} 3\n', text)
+        self.assertIn('smart_commit_github_quota_remaining{api="rest"} 4200\n', text)
+        self.assertIn('smart_commit_stage_duration_seconds_bucket{stage="analyze",le="0.1"} 0\n', text)
+        self.assertIn('smart_commit_stage_duration_seconds_bucket{stage="analyze",le="1"} 1\n', text)
+        self.assertIn('smart_commit_stage_duration_seconds_bucket{stage="analyze",le="+Inf"} 2\n', text)
+        self.assertIn('smart_commit_stage_duration_seconds_count{stage="analyze"} 2\n', text)
+        self.assertNotIn("outbox_messages", text)
+        
+        with self.assertRaises(KeyError):
+            self.metrics.inc('unknown_total')
+    
+    def test_timer(self):
+        """Test that stages are timed and counted while they run."""
+        with self.metrics.timer('fetch'):
+            self.assertEqual(self.metrics.get('stage_in_progress', stage='fetch'), 1)
+        self.assertEqual(self.metrics.get('stage_in_progress', stage='fetch'), 0)
+        
+        wrapped = self.metrics.timed('send', lambda text: text.upper())
+        self.assertEqual(wrapped("hi"), "HI")
+        self.assertEqual({stage: totals['count'] for stage, totals in self.metrics.stage_totals().items()},
+                         {'fetch': 1, 'send': 1})
+    
+    def test_collect_messenger_metrics(self):
+        """Test that component statistics are exported and prices applied."""
+        self.assertEqual(get_prices('gpt-4o-mini-2024-07-18'), (0.00015, 0.0006))
+        self.assertEqual(get_prices('llama'), (0, 0))
+        self.assertEqual(get_prices('gpt-4', {'price_per_1k_tokens': {'prompt': 1, 'completion': 2}}), (1, 2))
+        
+        messenger = MagicMock()
+        messenger.commit_analyzer.get_usage.return_value = {
+            'requests': 5, 'failures': 1, 'prompt_tokens': 2000, 'completion_tokens': 1000
+        }
+        messenger.commit_analyzer.classifier = None
+        messenger.request_layer.get_budget_usage.return_value = {
+            'remaining': 4000, 'graphql_remaining': None, 'targets': {'user/repo': {'requests': 3, 'cache_hits': 1}}
+        }
+        messenger.analysis_cache.get_stats.return_value = {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+        messenger.outbox.get_stats.return_value = {'pending': 2, 'sent': 7, 'dead': 0}
+        
+        self.metrics.add_collector(lambda metrics: collect_messenger_metrics(metrics, messenger, (1, 2)))
+        self.metrics.collect()
+        
+        self.assertEqual(self.metrics.get('llm_cost_usd_total'), 4)
+        self.assertEqual(self.metrics.get('llm_requests_total', result='failure'), 1)
+        self.assertEqual(self.metrics.get('github_quota_remaining', api='rest'), 4000)
+        self.assertEqual(self.metrics.get('cache_hit_ratio', cache='analysis'), 0.75)
+        self.assertEqual(self.metrics.get('cache_hit_ratio', cache='github'), 0.25)
+        self.assertEqual(self.metrics.get('outbox_messages', state='pending'), 2)
+    
+    def test_server(self):
+        """Test that the registry is served at /metrics only."""
+        self.assertIsNone(MetricsServer.from_config(self.metrics, {}))
+        
+        self.metrics.inc('commits_total', target='user/repo@main', result='delivered')
+        server = MetricsServer.from_config(self.metrics, {'metrics': {'enabled': True, 'port': 0}})
+        server.start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                self.assertIn('smart_commit_commits_total{result="delivered",target="user/repo@main"} 1',
+                              response.read().decode('utf-8'))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other")
+        finally:
+            server.stop()
+    
+    def test_run_summary(self):
+        """Test the figures the end-of-run summary takes from the run's counters."""
+        messenger = SmartCommitMessenger.__new__(SmartCommitMessenger)
+        messenger.metrics = self.metrics
+        messenger.token_prices = (1, 2)
+        messenger.request_layer = None
+        messenger.outbox = None
+        target = {'repository': 'user/repo', 'branch': 'main'}
+        
+        with count_run() as stats:
+            stats.add_stage('analyze', 0.5)
+            stats.add_stage('analyze', 1.5)
+            record_run('llm_requests', 2)
+            record_run('generated', 2)
+            record_run('reused')
+            record_run('prompt_tokens', 1000)
+            record_run('completion_tokens', 500)
+            record_run('github_cache_hits')
+        record_run('prompt_tokens', 1000)
+        summary = messenger.summarize_run(target, stats, {
+            'listed': 3, 'skipped': 0, 'analyzed': 2, 'reused': 1, 'delivered': 3, 'failed': 0
+        })
+        
+        self.assertEqual(summary['target'], 'user/repo@main')
+        self.assertEqual(summary['stages'], {'analyze': {'count': 2, 'seconds': 2.0, 'mean_seconds': 1.0}})
+        self.assertEqual(summary['llm']['prompt_tokens'], 1000)
+        self.assertEqual(summary['llm']['commits'], 2)
+        self.assertEqual(summary['llm']['cost_usd'], 2.0)
+        self.assertEqual(summary['llm']['tokens_per_commit'], 750)
+        self.assertEqual(summary['github']['cache_hits'], 1)
+        self.assertEqual(self.metrics.get('llm_cost_per_commit_usd', target='user/repo@main'), 1.0)
+    
+    def test_concurrent_runs(self):
+        """Test that runs in different threads count only their own work, including their worker threads."""
+        results = {}
+        
+        def run(name, tokens):
+            with count_run() as stats:
+                worker = threading.Thread(target=bind_context(record_run), args=('prompt_tokens', tokens))
+                worker.start()
+                worker.join()
+                record_run('generated')
+            results[name] = stats
+        
+        threads = [threading.Thread(target=run, args=(name, tokens)) for name, tokens in (('a', 100), ('b', 300))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(results['a'].get('prompt_tokens'), 100)
+        self.assertEqual(results['b'].get('prompt_tokens'), 300)
+        self.assertEqual(results['a'].get('generated'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
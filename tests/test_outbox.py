@@ -0,0 +1,158 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import time
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from outbox import Outbox, OutboxWorker, TokenBucket
+
+class RetryAfterError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+class PermanentError(Exception):
+    pass
+
+class TestOutbox(unittest.TestCase):
+    """Test cases for the Outbox and OutboxWorker classes."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'outbox.db')
+        self.outbox = Outbox(path=self.path, max_attempts=3, base_delay=0.01, max_delay=0.05)
+    
+    def tearDown(self):
+        self.outbox.close()
+        self.temp_dir.cleanup()
+    
+    def make_worker(self, send, **kwargs):
+        return OutboxWorker(self.outbox, send, per_chat_per_minute=60000, global_per_second=1000, **kwargs)
+    
+    def test_messages_survive_restart(self):
+        """Test that queued messages are still pending after reopening the database."""
+        self.outbox.enqueue("@channel", "Hello", {'shas': ['abc']})
+        self.outbox.close()
+        
+        reopened = Outbox(path=self.path)
+        due = reopened.get_due()
+        reopened.close()
+        
+        self.assertEqual(len(due), 1)
+        self.assertEqual(due[0]['text'], "Hello")
+        self.assertEqual(due[0]['metadata'], {'shas': ['abc']})
+    
+    def test_drain_keeps_chat_order(self):
+        """Test that each chat receives its messages in queue order."""
+        sent = []
+        for index in range(3):
+            self.outbox.enqueue("@a", f"a{index}")
+            self.outbox.enqueue("@b", f"b{index}")
+        
+        worker = self.make_worker(lambda text, chat_id: sent.append(text))
+        self.assertEqual(worker.drain(timeout=5), 6)
+        
+        self.assertEqual([text for text in sent if text.startswith('a')], ["a0", "a1", "a2"])
+        self.assertEqual([text for text in sent if text.startswith('b')], ["b0", "b1", "b2"])
+        self.assertEqual(self.outbox.get_stats()['sent'], 6)
+        self.assertEqual(self.outbox.get_stats()['pending'], 0)
+    
+    def test_retry_after_is_honoured(self):
+        """Test that a flood control error delays the retry by the requested time."""
+        attempts = []
+        
+        def send(text, chat_id):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfterError(0.2)
+        
+        self.outbox.enqueue("@channel", "Hello")
+        delivered = []
+        worker = self.make_worker(send, on_sent=delivered.append)
+        worker.drain(timeout=5)
+        
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.19)
+        self.assertEqual(delivered[0]['text'], "Hello")
+    
+    def test_gives_up_after_max_attempts(self):
+        """Test that transient failures are retried with backoff until max_attempts."""
+        calls = []
+        dead = []
+        
+        def send(text, chat_id):
+            calls.append(text)
+            raise ConnectionError("network down")
+        
+        self.outbox.enqueue("@channel", "Hello")
+        worker = self.make_worker(send, on_dead=dead.append)
+        worker.drain(timeout=5)
+        
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(dead), 1)
+        self.assertEqual(self.outbox.get_stats()['dead'], 1)
+    
+    def test_permanent_error_is_not_retried(self):
+        """Test that permanent errors give up on the message right away."""
+        calls = []
+        
+        def send(text, chat_id):
+            calls.append(text)
+            raise PermanentError("chat not found")
+        
+        self.outbox.enqueue("@channel", "Hello")
+        worker = self.make_worker(send, permanent_errors=(PermanentError,))
+        worker.drain(timeout=5)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.outbox.get_stats()['dead'], 1)
+    
+    def test_parts_are_retried_separately(self):
+        """Test that a retry resends only the failed part and a given up part drops the rest."""
+        sent = []
+        failures = {'p1': 1, 'q1': 3}
+        
+        def send(text, chat_id):
+            if failures.get(text):
+                failures[text] -= 1
+                raise ConnectionError("network down")
+            sent.append(text)
+        
+        self.outbox.enqueue_parts("@a", ["p0", "p1", "p2"], {'shas': ['abc']})
+        self.outbox.enqueue_parts("@b", ["q0", "q1", "q2"], {'shas': ['def']})
+        delivered, dead = [], []
+        worker = self.make_worker(send, on_sent=delivered.append, on_dead=dead.append)
+        worker.drain(timeout=5)
+        
+        self.assertEqual([text for text in sent if text.startswith('p')], ["p0", "p1", "p2"])
+        self.assertEqual([text for text in sent if text.startswith('q')], ["q0"])
+        self.assertEqual([message['metadata']['part'] for message in dead], [1])
+        self.assertEqual(delivered[-1]['metadata'], {'shas': ['abc'], 'part': 2, 'parts': 3})
+        self.assertEqual(self.outbox.get_stats()['dead'], 2)
+    
+    def test_backoff_delay(self):
+        """Test that the backoff doubles per attempt, stays within max_delay and is jittered."""
+        outbox = Outbox(path=self.path, base_delay=1, max_delay=10)
+        
+        with patch('random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual(outbox.get_backoff_delay(1), 1)
+            self.assertEqual(outbox.get_backoff_delay(3), 4)
+            self.assertEqual(outbox.get_backoff_delay(10), 10)
+        self.assertGreaterEqual(outbox.get_backoff_delay(3), 2)
+    
+    def test_token_bucket(self):
+        """Test that the bucket allows a burst and then paces calls."""
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket.consume()
+        bucket.consume()
+        
+        self.assertGreater(bucket.get_delay(), 0.05)
+        time.sleep(0.11)
+        self.assertEqual(bucket.get_delay(), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
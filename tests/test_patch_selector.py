@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from patch_selector import PatchSelector
+from github_client import GitHubClient
+from commit_analyzer import CommitAnalyzer
+
+def make_hunk(start, lines, prefix='+'):
+    """Build a hunk adding or removing the given lines."""
+    body = "\n".join(f"{prefix}{line}" for line in lines)
+    return f"@@ -{start},3 +{start},{len(lines) + 3} @@\n context\n{body}\n context"
+
+class TestPatchSelector(unittest.TestCase):
+    """Test cases for the PatchSelector class."""
+    
+    def setUp(self):
+        self.selector = PatchSelector(max_file_chars=300, max_commit_chars=500)
+    
+    def test_excluded_files(self):
+        """Test that binary, generated and lock files are skipped."""
+        for filename in ['logo.png', 'yarn.lock', 'static/app.min.js', 'api/service_pb2.py',
+                         'web/node_modules/left-pad/index.js', 'dist/bundle.js']:
+            self.assertTrue(PatchSelector.is_excluded(filename), filename)
+        for filename in ['src/app.py', 'builder.py', 'docs/index.md']:
+            self.assertFalse(PatchSelector.is_excluded(filename), filename)
+    
+    def test_iter_hunks(self):
+        """Test that hunks are found by their offsets."""
+        patch_text = make_hunk(1, ['a']) + "\n" + make_hunk(20, ['b', 'c'])
+        hunks = [patch_text[start:end] for start, end in PatchSelector.iter_hunks(patch_text)]
+        self.assertEqual(len(hunks), 2)
+        self.assertTrue(hunks[1].startswith("@@ -20,3"))
+        self.assertEqual(list(PatchSelector.iter_hunks("Binary files differ")), [])
+    
+    def test_trim_keeps_informative_hunks_in_order(self):
+        """Test that definitions outrank other changes and order is preserved."""
+        filler = make_hunk(1, [f"label_{i} = 'a fairly long but unremarkable value'" for i in range(6)])
+        definition = make_hunk(50, ["def export(rows):", "    return rows"])
+        small = make_hunk(90, ["y = 1"])
+        patch_text = "\n".join([filler, definition, small])
+        
+        trimmed = self.selector.trim_patch(patch_text, 150)
+        self.assertIn("def export", trimmed)
+        self.assertNotIn("label_0", trimmed)
+        self.assertLess(trimmed.index("def export"), trimmed.index("y = 1"))
+        self.assertIn("1 more hunks omitted", trimmed)
+        
+        # A single hunk longer than the cap is cut
+        trimmed = self.selector.trim_patch(filler, 60)
+        self.assertEqual(len(trimmed), 60)
+        self.assertTrue(trimmed.endswith("(hunk truncated)"))
+    
+    def test_select_within_commit_budget(self):
+        """Test that the largest changes are taken first within the per-commit cap."""
+        files = [
+            {'filename': 'src/small.py', 'additions': 1, 'deletions': 0, 'patch': make_hunk(1, ['a'] * 80)},
+            {'filename': 'src/large.py', 'additions': 90, 'deletions': 10, 'patch': make_hunk(1, ['b'] * 80)},
+            {'filename': 'poetry.lock', 'additions': 500, 'deletions': 400, 'patch': make_hunk(1, ['c'])},
+            {'filename': 'src/medium.py', 'additions': 20, 'deletions': 5, 'patch': make_hunk(1, ['d'] * 80)},
+        ]
+        selected = self.selector.select(files)
+        self.assertEqual(list(selected), ['src/large.py', 'src/medium.py'])
+        self.assertLessEqual(sum(len(text) for text in selected.values()), 500)
+        
+        self.assertIsNone(PatchSelector.from_config({}))
+        selector = PatchSelector.from_config({'ai': {'patches': {'enabled': True, 'max_file_chars': 100}}})
+        self.assertEqual((selector.max_file_chars, selector.max_commit_chars), (100, 8000))
+    
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key"})
+    def test_patches_reach_prompt(self):
+        """Test that selected hunks are kept with the commit details and included in the prompt."""
+        data = {
+            'sha': 'abc123',
+            'commit': {'message': 'Add export', 'author': {'name': 'Dev'}},
+            'files': [
+                {'filename': 'src/export.py', 'status': 'added', 'additions': 2, 'deletions': 0,
+                 'patch': make_hunk(1, ["def export(rows):", "    return rows"])},
+                {'filename': 'logo.png', 'status': 'added', 'additions': 0, 'deletions': 0}
+            ]
+        }
+        self.assertNotIn('patch', GitHubClient.details_from_json(data)['files_changed'][0])
+        
+        details = GitHubClient.details_from_json(data, self.selector)
+        self.assertIn("def export", details['files_changed'][0]['patch'])
+        self.assertNotIn('patch', details['files_changed'][1])
+        
+        backend = MagicMock()
+        backend.complete.return_value = "Adds an export."
+        CommitAnalyzer(backend=backend).analyze_commit(details)
+        values = backend.complete.call_args[0][1]
+        self.assertIn("```diff\n@@ -1,3", values['files_changed'])
+
+if __name__ == '__main__':
+    unittest.main()
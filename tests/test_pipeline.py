@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+import time
+import random
+import threading
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from pipeline import CommitPipeline
+
+class TestCommitPipeline(unittest.TestCase):
+    """Test cases for the CommitPipeline class."""
+    
+    def test_delivery_preserves_order(self):
+        """Test that deliveries happen in input order despite uneven stage latency."""
+        delivered = []
+        
+        def fetch(item):
+            time.sleep(random.uniform(0, 0.02))
+            return {'sha': item}
+        
+        def analyze(item, details):
+            time.sleep(random.uniform(0, 0.02))
+            return f"description {item}"
+        
+        def deliver(item, details, description):
+            delivered.append(item)
+            return True
+        
+        pipeline = CommitPipeline(fetch_workers=4, analyze_workers=4, delivery_workers=3, max_concurrency=8)
+        items = list(range(20))
+        results = pipeline.run(items, fetch, analyze, deliver)
+        
+        self.assertEqual(delivered, items)
+        self.assertTrue(all(result['delivered'] for result in results))
+        self.assertEqual(results[3]['description'], "description 3")
+    
+    def test_batch_analysis(self):
+        """Test that a batch analyzer receives every fetched item in one call."""
+        calls = []
+        delivered = []
+        
+        def analyze_batch(items, details):
+            calls.append(list(items))
+            return [f"description {item}" for item in items]
+        
+        def deliver(item, details, description):
+            delivered.append((item, description))
+            return True
+        
+        pipeline = CommitPipeline()
+        results = pipeline.run(
+            [1, 2, 3],
+            fetch=lambda item: None if item == 2 else {'sha': item},
+            analyze=None,
+            deliver=deliver,
+            analyze_batch=analyze_batch
+        )
+        
+        self.assertEqual(calls, [[1, 3]])
+        self.assertEqual(delivered, [(1, "description 1"), (3, "description 3")])
+        self.assertFalse(results[1]['delivered'])
+    
+    def test_concurrency_cap(self):
+        """Test that no more than max_concurrency stage calls run at once."""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+        
+        def tracked(*args):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.01)
+            with lock:
+                state['active'] -= 1
+            return True
+        
+        pipeline = CommitPipeline(fetch_workers=4, analyze_workers=4, delivery_workers=4, max_concurrency=2)
+        pipeline.run(list(range(10)), tracked, tracked, tracked, channel_of=lambda item: item)
+        
+        self.assertLessEqual(state['peak'], 2)
+    
+    def test_failed_stages_skip_item(self):
+        """Test that failed or empty stages skip later stages for that item only."""
+        delivered = []
+        
+        def fetch(item):
+            if item == 1:
+                raise RuntimeError("fetch failed")
+            return {'sha': item}
+        
+        def analyze(item, details):
+            return None if item == 2 else "description"
+        
+        def deliver(item, details, description):
+            delivered.append(item)
+            return True
+        
+        results = CommitPipeline().run([0, 1, 2, 3], fetch, analyze, deliver)
+        
+        self.assertEqual(delivered, [0, 3])
+        self.assertIsNone(results[1]['details'])
+        self.assertFalse(results[2]['delivered'])
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
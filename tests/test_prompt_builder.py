@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from prompt_builder import PromptBuilder, README_TRUNCATED_MARKER
+
+def format_files(files):
+    return "".join(f"- {file['status']}: {file['filename']} (+{file['additions']}, -{file['deletions']})\n" for file in files)
+
+class TestPromptBuilder(unittest.TestCase):
+    """Test cases for the PromptBuilder class."""
+    
+    def setUp(self):
+        # Use the length based estimate so results do not depend on tiktoken being installed
+        with patch.dict(sys.modules, {'tiktoken': None}):
+            self.builder = PromptBuilder(budget_tokens=1000)
+    
+    def test_small_commit_unchanged(self):
+        """Test that prompts within the budget are left untouched."""
+        files = [{'filename': 'src/app.py', 'status': 'modified', 'additions': 3, 'deletions': 1}]
+        
+        description, message, files_text = self.builder.fit("template", "A project", "Fix bug", files, format_files)
+        
+        self.assertEqual(description, "A project")
+        self.assertEqual(message, "Fix bug")
+        self.assertEqual(files_text, format_files(files))
+    
+    def test_large_commit_is_condensed(self):
+        """Test that large file lists are ranked and aggregated within the budget."""
+        files = [{'filename': 'src/core.py', 'status': 'modified', 'additions': 500, 'deletions': 20}]
+        files += [
+            {'filename': f"vendor/lib/module_{index}.js", 'status': 'added', 'additions': 10, 'deletions': 0}
+            for index in range(2000)
+        ]
+        
+        description, message, files_text = self.builder.fit("template", "A" * 10000, "Vendor update", files, format_files)
+        
+        total = self.builder.count_tokens(description) + self.builder.count_tokens(message) + self.builder.count_tokens(files_text)
+        self.assertLessEqual(total, 1000)
+        self.assertTrue(description.endswith(README_TRUNCATED_MARKER))
+        self.assertEqual(message, "Vendor update")
+        self.assertTrue(files_text.startswith("- modified: src/core.py (+500, -20)\n"))
+        self.assertIn("files in vendor/lib/", files_text)
+    
+    def test_groups_that_do_not_fit_are_summarized(self):
+        """Test that leftover aggregates collapse into one closing line."""
+        files = [
+            {'filename': f"dir{index}/file.py", 'status': 'modified', 'additions': index, 'deletions': 0}
+            for index in range(1, 400)
+        ]
+        
+        files_text = self.builder.fit_files(files, 300, format_files)
+        
+        self.assertLessEqual(self.builder.count_tokens(files_text), 300)
+        self.assertTrue(files_text.startswith("- modified: dir399/file.py"))
+        self.assertIn("more files in", files_text)
+    
+    def test_truncate(self):
+        """Test truncating text to a token count."""
+        self.assertEqual(self.builder.truncate("short", 10), "short")
+        
+        truncated = self.builder.truncate("word " * 1000, 50, README_TRUNCATED_MARKER)
+        self.assertLessEqual(self.builder.count_tokens(truncated), 50)
+        self.assertTrue(truncated.endswith(README_TRUNCATED_MARKER))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from readme_cache import ReadmeCache
+
+class TestReadmeCache(unittest.TestCase):
+    """Test cases for the ReadmeCache class."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'readme_cache.json')
+        self.cache = ReadmeCache(path=self.path, check_interval_minutes=10)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_store_and_get(self):
+        """Test storing a README version."""
+        self.cache.store("user/repo", "sha1", "# Readme", "Short summary")
+        entry = self.cache.get("user/repo")
+        
+        self.assertEqual(entry['sha'], "sha1")
+        self.assertEqual(entry['content'], "# Readme")
+        self.assertEqual(ReadmeCache.project_description(entry), "Short summary")
+    
+    def test_project_description_falls_back_to_content(self):
+        """Test that the full README is used when there is no summary."""
+        entry = self.cache.store("user/repo", "sha1", "# Readme")
+        self.assertEqual(ReadmeCache.project_description(entry), "# Readme")
+        self.assertEqual(ReadmeCache.project_description(None), "")
+    
+    def test_get_fresh_respects_check_interval(self):
+        """Test that entries are due for a check after the interval."""
+        with patch('readme_cache.time.time', return_value=1000.0):
+            self.cache.store("user/repo", "sha1", "# Readme")
+        
+        with patch('readme_cache.time.time', return_value=1000.0 + 5 * 60):
+            self.assertIsNotNone(self.cache.get_fresh("user/repo"))
+        with patch('readme_cache.time.time', return_value=1000.0 + 11 * 60):
+            self.assertIsNone(self.cache.get_fresh("user/repo"))
+            self.cache.touch("user/repo")
+            self.assertIsNotNone(self.cache.get_fresh("user/repo"))
+    
+    def test_persists_across_instances(self):
+        """Test that the cache is reloaded from disk."""
+        self.cache.store("user/repo", "sha1", "# Readme", "Short summary")
+        
+        reloaded = ReadmeCache(path=self.path)
+        self.assertEqual(reloaded.get("user/repo")['summary'], "Short summary")
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
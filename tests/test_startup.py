@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+# Add the src directory to the path so we can import the modules
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(SRC_DIR)
+
+from main import has_new_commits
+from commit_ledger import CommitLedger
+
+# SDKs that must only be imported once a run has work to do
+HEAVY_MODULES = ['langchain', 'openai', 'telegram', 'github', 'tiktoken', 'aiohttp']
+
+# Ceiling for importing the entry points; loading the SDKs alone takes about a second
+MAX_IMPORT_SECONDS = 0.5
+
+IMPORT_CHECK = """
+import sys, json, time
+start = time.perf_counter()
+import main, scheduler
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split('.')[0] for name in sys.modules} & set(%r))
+print(json.dumps({'heavy': heavy, 'seconds': elapsed}))
+"""
+
+class TestStartup(unittest.TestCase):
+    """Test cases for the startup path of the entry points."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = {
+            'github': {'repository': 'user/repo', 'branch': 'main'},
+            'storage': {'ledger_path': os.path.join(self.temp_dir.name, 'ledger.db')},
+            'outbox': {'enabled': True, 'path': os.path.join(self.temp_dir.name, 'outbox.db')}
+        }
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_entry_points_do_not_import_sdks(self):
+        """Test that importing main and scheduler leaves the API SDKs unloaded."""
+        result = subprocess.run(
+            [sys.executable, '-c', IMPORT_CHECK % (HEAVY_MODULES,)],
+            cwd=self.temp_dir.name, env=dict(os.environ, PYTHONPATH=SRC_DIR),
+            capture_output=True, text=True, check=True
+        )
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(report['heavy'], [])
+        self.assertLess(report['seconds'], MAX_IMPORT_SECONDS)
+    
+    @patch.dict(os.environ, {'GITHUB_TOKEN': 'fake_token'})
+    @patch('main.GitHubRequestLayer.get_recent_shas')
+    def test_has_new_commits(self, mock_shas):
+        """Test the comparison of the listed commits against the ledger."""
+        mock_shas.return_value = ['abc123', 'def456']
+        self.assertTrue(has_new_commits(self.config))
+        
+        # A failed commit behind a delivered head is still new
+        ledger = CommitLedger(path=self.config['storage']['ledger_path'])
+        ledger.record_delivery('user/repo', 'main', 'abc123', True)
+        ledger.record_delivery('user/repo', 'main', 'def456', False)
+        self.assertTrue(has_new_commits(self.config))
+        
+        ledger.record_delivery('user/repo', 'main', 'def456', True)
+        ledger.close()
+        self.assertFalse(has_new_commits(self.config))
+        mock_shas.assert_called_with('user/repo', 'main', 5, since=None, target='user/repo')
+    
+    @patch.dict(os.environ, {'GITHUB_TOKEN': 'fake_token'})
+    @patch('main.GitHubRequestLayer.get_recent_shas')
+    def test_has_new_commits_since_sha(self, mock_shas):
+        """Test that commits up to the configured starting point are ignored."""
+        self.config['github']['since'] = 'def4567'
+        mock_shas.return_value = ['abc123', 'def4567890', 'fff000']
+        
+        ledger = CommitLedger(path=self.config['storage']['ledger_path'])
+        ledger.record_delivery('user/repo', 'main', 'abc123', True)
+        ledger.close()
+        self.assertFalse(has_new_commits(self.config))
+    
+    @patch.dict(os.environ, {'GITHUB_TOKEN': 'fake_token'})
+    @patch('main.GitHubRequestLayer.get_recent_shas')
+    def test_has_new_commits_on_error(self, mock_shas):
+        """Test that a failed check falls back to a full run."""
+        mock_shas.side_effect = Exception("API Error")
+        self.assertTrue(has_new_commits(self.config))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import sys
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from targets import load_targets, target_name
+
+class TestTargets(unittest.TestCase):
+    """Test cases for loading repository targets."""
+    
+    def test_legacy_single_target(self):
+        """Test that the github and telegram sections form a single target."""
+        config = {
+            'github': {'repository': 'user/repo', 'branch': 'dev', 'commit_limit': 3},
+            'telegram': {'channel_id': '@channel'}
+        }
+        
+        targets = load_targets(config)
+        
+        self.assertEqual(len(targets), 1)
+        self.assertEqual(targets[0]['repository'], 'user/repo')
+        self.assertEqual(targets[0]['branch'], 'dev')
+        self.assertEqual(targets[0]['commit_limit'], 3)
+        self.assertEqual(targets[0]['channel_id'], '@channel')
+        self.assertEqual(targets[0]['project_name'], 'repo')
+    
+    def test_targets_inherit_defaults(self):
+        """Test that target entries fall back to the github and telegram sections."""
+        config = {
+            'github': {'branch': 'main', 'commit_limit': 5},
+            'telegram': {'channel_id': '@default'},
+            'targets': [
+                {'repository': 'user/one'},
+                {'repository': 'user/two', 'branch': 'release', 'channel_id': '@two', 'project_name': 'Two'}
+            ]
+        }
+        
+        targets = load_targets(config)
+        
+        self.assertEqual([target_name(t) for t in targets], ['user/one@main', 'user/two@release'])
+        self.assertEqual(targets[0]['channel_id'], '@default')
+        self.assertEqual(targets[1]['channel_id'], '@two')
+        self.assertEqual(targets[1]['project_name'], 'Two')
+    
+    def test_skips_invalid_and_duplicate_targets(self):
+        """Test that targets without a repository and duplicates are dropped."""
+        config = {
+            'targets': [
+                {'branch': 'main'},
+                {'repository': 'user/one'},
+                {'repository': 'user/one'},
+                {'repository': 'user/two', 'source': 'svn'}
+            ]
+        }
+        
+        targets = load_targets(config)
+        self.assertEqual(len(targets), 1)
+        self.assertEqual(targets[0]['source'], 'github')
+    
+    def test_no_repository(self):
+        """Test that a configuration without any repository has no targets."""
+        self.assertEqual(load_targets({}), [])
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
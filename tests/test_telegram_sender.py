@@ -6,7 +6,8 @@ import sys
 # Add the src directory to the path so we can import the modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from telegram_sender import TelegramSender
+from telegram.error import BadRequest, RetryAfter
+from telegram_sender import TelegramSender, StreamingMessage, STREAM_PLACEHOLDER
 
 class TestTelegramSender(unittest.TestCase):
     """Test cases for the TelegramSender class."""
@@ -112,5 +113,109 @@ class TestTelegramSender(unittest.TestCase):
         self.assertIn("*Description:*", message)
         self.assertIn("This is a test description of the commit.", message)
 
+    def test_split_message(self):
+        """Test splitting long messages at paragraph breaks within the length limit."""
+        message = "\n\n".join(["a" * 30] * 10)
+        parts = TelegramSender.split_message(message, limit=100)
+        
+        self.assertTrue(all(len(part) <= 100 for part in parts))
+        self.assertEqual("\n\n".join(parts), message)
+        self.assertEqual(TelegramSender.split_message("short"), ["short"])
+        self.assertEqual(len(TelegramSender.split_message("b" * 250, limit=100)), 3)
+    
+    def test_split_message_keeps_entities(self):
+        """Test that parts never end inside a Markdown entity."""
+        message = "Intro\n\n*" + "x" * 40 + "\n\n" + "y" * 30 + "*\n\n[View on GitHub](https://example.com)"
+        parts = TelegramSender.split_message(message, limit=80)
+        
+        self.assertEqual(parts[0], "Intro")
+        self.assertTrue(all(TelegramSender.is_markdown_balanced(part) for part in parts))
+        self.assertFalse(TelegramSender.is_markdown_balanced("snake_case"))
+    
+    @patch.object(TelegramSender, '__init__', lambda self: None)
+    def test_post_message_falls_back_to_plain_text(self):
+        """Test that parts Telegram cannot parse as Markdown are sent as plain text."""
+        sender = TelegramSender()
+        sender.bot = MagicMock()
+        
+        sender.post_message("a_b", "@test_channel")
+        self.assertIsNone(sender.bot.send_message.call_args[1]['parse_mode'])
+        
+        sender.bot.send_message.side_effect = [BadRequest("Can't parse entities: can't find end"), MagicMock()]
+        sender.post_message("*bold* [link](url_with_underscore)", "@test_channel")
+        self.assertEqual([call[1]['parse_mode'] for call in sender.bot.send_message.call_args_list[1:]], ['Markdown', None])
+    
+    @patch.object(TelegramSender, '__init__', lambda self: None)
+    def test_format_digest_message(self):
+        """Test formatting a digest that continues in a second message at the length limit."""
+        sender = TelegramSender()
+        entries = [
+            ({'sha': str(index), 'message': f"Commit {index}\n\nBody", 'author': {'name': 'Dev'}}, "x" * 300)
+            for index in range(5)
+        ]
+        
+        messages = sender.format_digest_message("Test Project", entries, branch="main", limit=1200)
+        
+        self.assertEqual(len(messages), 2)
+        self.assertTrue(all(len(message) <= 1200 for message, _ in messages))
+        self.assertIn("*Digest:* 5 commits on main", messages[0][0])
+        self.assertIn("*1. Commit 0*", messages[0][0])
+        self.assertNotIn("Body", messages[0][0])
+        self.assertIn("(part 2)", messages[1][0])
+        self.assertEqual(sum(len(covered) for _, covered in messages), 5)
+    
+    @patch.object(TelegramSender, '__init__', lambda self: None)
+    def test_format_digest_message_truncates_long_commit(self):
+        """Test that a single commit longer than the limit is truncated."""
+        sender = TelegramSender()
+        messages = sender.format_digest_message("Test Project", [({'message': 'Huge'}, "y" * 5000)], limit=1000)
+        
+        self.assertEqual(len(messages), 1)
+        self.assertLessEqual(len(messages[0][0]), 1000)
+        self.assertTrue(messages[0][0].endswith("[...]"))
+    
+    def make_stream(self, min_interval=0):
+        """Build a streamed message on a mocked bot."""
+        sender = MagicMock()
+        sender.split_message = TelegramSender.split_message
+        sender.bot.send_message.return_value = MagicMock(message_id=7)
+        return StreamingMessage(sender, "@test_channel", lambda text: f"*Header*\n{text}", min_interval)
+    
+    def test_streaming_message(self):
+        """Test that a streamed message is posted at once, edited as text arrives and completed."""
+        stream = self.make_stream()
+        stream.start()
+        bot = stream.sender.bot
+        self.assertEqual(bot.send_message.call_args[1]['text'], f"*Header*\n{STREAM_PLACEHOLDER}")
+        
+        stream.update("Fixed")
+        stream.update(" a bug")
+        self.assertEqual(bot.edit_message_text.call_args[1]['text'], "*Header*\nFixed a bug ...")
+        self.assertEqual(bot.edit_message_text.call_args[1]['message_id'], 7)
+        
+        self.assertTrue(stream.finish("Fixed a bug."))
+        self.assertEqual(bot.edit_message_text.call_args[1]['text'], "*Header*\nFixed a bug.")
+        self.assertEqual(bot.edit_message_text.call_count, 3)
+    
+    def test_streaming_message_throttled(self):
+        """Test that edits wait for the interval and intermediate failures are skipped."""
+        stream = self.make_stream(min_interval=60)
+        stream.start()
+        bot = stream.sender.bot
+        
+        for token in ("a", "b", "c"):
+            stream.update(token)
+        bot.edit_message_text.assert_not_called()
+        
+        # The final text is sent as plain text when Telegram cannot parse its Markdown
+        bot.edit_message_text.side_effect = [BadRequest("Can't parse entities"), MagicMock()]
+        self.assertTrue(stream.finish("abc_"))
+        self.assertIsNone(bot.edit_message_text.call_args[1]['parse_mode'])
+        
+        stream.next_edit_at = 0
+        bot.edit_message_text.side_effect = RetryAfter(30)
+        stream.update("d")
+        self.assertGreater(stream.next_edit_at, 0)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
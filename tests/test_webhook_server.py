@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import hmac
+import json
+import hashlib
+import urllib.request
+import urllib.error
+
+# Add the src directory to the path so we can import the modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from webhook_server import WebhookServer, verify_signature, parse_push_event, replay
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'push_event.json')
+
+def sign(secret, body):
+    """Compute the X-Hub-Signature-256 header for a body."""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+class TestWebhookServer(unittest.TestCase):
+    """Test cases for the webhook receiver."""
+    
+    def setUp(self):
+        with open(FIXTURE, 'rb') as file:
+            self.body = file.read()
+        self.messenger = MagicMock()
+        self.messenger.find_target.return_value = {'repository': 'username/repository', 'branch': 'main'}
+        self.server = WebhookServer(self.messenger, secret="test_secret", host='127.0.0.1', port=0)
+    
+    def tearDown(self):
+        self.server.stop()
+    
+    def test_verify_signature(self):
+        """Test HMAC signature validation."""
+        self.assertTrue(verify_signature("test_secret", self.body, sign("test_secret", self.body)))
+        self.assertFalse(verify_signature("test_secret", self.body, sign("other_secret", self.body)))
+        self.assertFalse(verify_signature("test_secret", self.body, ""))
+    
+    def test_parse_push_event(self):
+        """Test extracting the repository, branch and SHAs from a recorded push."""
+        repository, branch, shas = parse_push_event(json.loads(self.body))
+        
+        self.assertEqual(repository, "username/repository")
+        self.assertEqual(branch, "main")
+        self.assertEqual(shas, ["0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c", "6113728f27ae82c7b1a177c8d03f9e96e0adf246"])
+    
+    def test_parse_push_event_ignores_tags(self):
+        """Test that tag pushes are ignored."""
+        payload = json.loads(self.body)
+        payload['ref'] = "refs/tags/v1.0"
+        self.assertIsNone(parse_push_event(payload))
+    
+    def test_handle_delivery_rejects_bad_signature(self):
+        """Test that unsigned deliveries are rejected."""
+        status, _ = self.server.handle_delivery('push', self.body, sign("wrong", self.body))
+        self.assertEqual(status, 401)
+        self.messenger.process_commit_shas.assert_not_called()
+    
+    def test_handle_delivery_dispatches_push(self):
+        """Test that a valid push is fed into the messenger."""
+        status, _ = self.server.handle_delivery('push', self.body, sign("test_secret", self.body))
+        self.server.executor.shutdown(wait=True)
+        
+        self.assertEqual(status, 202)
+        self.messenger.find_target.assert_called_once_with("username/repository", "main")
+        target, shas = self.messenger.process_commit_shas.call_args[0]
+        self.assertEqual(len(shas), 2)
+    
+    def test_http_round_trip(self):
+        """Test posting a recorded payload to the running listener."""
+        self.server.start()
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.server.port}/webhook",
+            data=self.body,
+            headers={
+                'Content-Type': 'application/json',
+                'X-GitHub-Event': 'push',
+                'X-Hub-Signature-256': sign("test_secret", self.body)
+            }
+        )
+        with urllib.request.urlopen(request) as response:
+            self.assertEqual(response.status, 202)
+        
+        request.remove_header('X-hub-signature-256')
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(request)
+        self.assertEqual(context.exception.code, 401)
+    
+    def test_oversized_body_is_rejected(self):
+        """Test that a delivery larger than max_body_bytes is rejected before it is read."""
+        self.server.max_body_bytes = len(self.body) - 1
+        self.server.start()
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.server.port}/webhook",
+            data=self.body,
+            headers={'X-GitHub-Event': 'push', 'X-Hub-Signature-256': sign("test_secret", self.body)}
+        )
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(request)
+        self.assertEqual(context.exception.code, 413)
+        self.messenger.find_target.assert_not_called()
+    
+    def test_replay(self):
+        """Test replaying a recorded payload without HTTP."""
+        self.messenger.process_commit_shas.return_value = True
+        self.assertTrue(replay(self.messenger, FIXTURE))
+        self.messenger.process_commit_shas.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file